@@ -31,6 +31,14 @@ from .algo import *
 from .igemm_codegen_driver import *
 from .igemm_sequence_driver import *
 from .igemm_host_driver import *
+from .igemm_kernel_cache import *
+from .perf_advisor import *
+from .igemm_cycle_estimator import *
+from .igemm_icache_estimator import *
+from .igemm_lane_replay import *
+from .igemm_lds_bank_simulator import *
+from .igemm_global_coalescing_analyzer import *
+from .igemm_coalescing_store_tracer import *
 
 if sys.hexversion < 0x30600f0:
     print("must use python 3.6+. current is {}".format(sys.version))
@@ -39,4 +39,5 @@ from .coalescing_store import *
 from .mfma import *
 from .xdlops_mapping import *
 from .mfma_main_loop import *
-from .nop import *
\ No newline at end of file
+from .nop import *
+from .igemm_resource_estimator import *
\ No newline at end of file
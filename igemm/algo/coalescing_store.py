@@ -33,9 +33,32 @@ from .xdlops_mapping import *
 import copy
 import itertools
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 IGEMM_COALESCING_GEMM_M_ORDER_M0_M1 = 0
 IGEMM_COALESCING_GEMM_M_ORDER_M1_M0 = 1
 
+IGEMM_COALESCING_GROUPS_AUTO = 'auto'   # coalescing_store_groups chosen by coalescing_store_cost_model_t
+
+IGEMM_COALESCING_INDEX_NUMPY = 1        # build index table of ctrl_coalescing_store_xdlops_t by numpy if installed, 0 for python loop
+IGEMM_COALESCING_INDEX_CACHE = 1        # cache index table of ctrl_coalescing_store_xdlops_t, see get_index_cache_key()
+IGEMM_COALESCING_SKIP_LDS = 1           # skip lds round trip of xdlops coalescing store if it change nothing, see can_skip_coalescing()
+_coalescing_index_cache = dict()
+
+# cycles of one wave on gfx908, same rough number as IGEMM_CYCLE_LATENCY_DEFAULT of igemm_cycle_estimator
+IGEMM_COALESCING_STORE_COST_DEFAULT = {
+    'valu_issue'            : 4,
+    'salu_issue'            : 4,
+    'ds_issue'              : 4,
+    'vmem_issue'            : 4,
+    'barrier'               : 16,
+    'ds_latency'            : 64,
+    'lds_bytes_per_cycle'   : 128,
+}
+
 class ctrl_coalescing_store_t(object):
     def __init__(self):
         self.ctm = None # ctrl_thread_mapping_t
@@ -423,6 +446,7 @@ class ctrl_coalescing_store_xdlops_t(object):
         self.coalescing_groups = 1
         self.block_size = 256
         self.vector_store_size = 1
+        self.vector_write_out = 1
         self.data_byte = 1
         self.gemm_m_order = IGEMM_COALESCING_GEMM_M_ORDER_M0_M1
         self.gemm_m_m0_m1 = []
@@ -431,6 +455,9 @@ class ctrl_coalescing_store_xdlops_t(object):
     def adjust_optimal_coalescing_groups(self):
         '''
         in xdlops M1_M0 order if have better write pattern, change cgroup is quite complex.
+        to choose group count by cost, see coalescing_store_cost_model_t
+        block narrower than macro_tile_n need vector_write_out to cover n by one round, hence raised to get_min_vector_write_out()
+        here, every index table depend on it.
         '''
         # if self.gemm_m_order == IGEMM_COALESCING_GEMM_M_ORDER_M1_M0:
         #     cg = self.coalescing_groups
@@ -438,19 +465,143 @@ class ctrl_coalescing_store_xdlops_t(object):
         #         cg = cg * 2
         #     assert cg <= self.get_length_m_groups()
         #     self.coalescing_groups = cg
-        pass
+        self.vector_write_out = max(self.vector_write_out, self.get_min_vector_write_out())
 
-    def can_skip_coalescing(self):
+    def get_min_vector_write_out(self):
+        '''
+        least vector_write_out for transposed thread mapping (see get_transposed_thread_mapping) to cover n by one round,
+        more than 1 only if block is narrower than macro_tile_n, like 16x256 by 2 waves
+        '''
+        return max(1, self.cxm.macro_tile_n // self.block_size)
+
+    def get_legal_vector_write_out(self, length_n_continuous):
+        '''
+        power of 2 vector_write_out this ctrl can store with, widest last. every thread load 4 x vector_write_out pixel
+        from lds per round, and store vector_write_out pixel continuous in n by one buffer_store, hence
+          - vector_write_out * data_byte is at most 16 byte, and divide length_n_continuous, the number of gemm_n
+            continuous in memory given by kernel, so a vector never cross a discontinuity.
+          - transposed thread mapping (see get_transposed_thread_mapping) should still cover whole m of one group by rounds.
+          - atomic add only support dword, hence no vector if gemm_k_global_split.
+        vector_write_out start from get_min_vector_write_out(), and there may be nothing legal if block is narrower than macro_tile_n.
+        '''
+        n_n_total = self.cxm.macro_tile_n
+        m_granularity_per_group = self.cxm.macro_tile_m // (self.coalescing_groups * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M)
+        min_vwo = self.get_min_vector_write_out()
+        legal = [1] if min_vwo == 1 else list()
+        vwo = max(2, min_vwo)
+        while not self.gemm_k_global_split and vwo * self.data_byte <= 16:
+            if length_n_continuous % vwo != 0 or n_n_total % vwo != 0 or (self.block_size * vwo) % n_n_total != 0:
+                break
+            if m_granularity_per_group % (self.block_size * vwo // n_n_total) != 0:
+                break
+            legal.append(vwo)
+            vwo = vwo * 2
+        return legal
+
+    def adjust_optimal_vector_write_out(self, length_n_continuous, max_vector_write_out = 'auto'):
+        '''
+        widest legal vector_write_out no larger than max_vector_write_out, less buffer_store for the same pixel.
+        this make lds load of coalescing strided by vector_write_out, and cost some v_swap_b32/v_perm_b32 to transpose.
+        '''
+        legal = self.get_legal_vector_write_out(length_n_continuous)
+        if max_vector_write_out != 'auto':
+            legal = [vwo for vwo in legal if vwo <= max_vector_write_out]
+        assert len(legal) != 0, f"no legal vector_write_out (max:{max_vector_write_out}) for macro tile {self.cxm.macro_tile_m}x{self.cxm.macro_tile_n}" + \
+                f" by block_size:{self.block_size}, length_n_continuous:{length_n_continuous}, gemm_k_global_split:{self.gemm_k_global_split}"
+        self.vector_write_out = legal[-1]
+
+    def get_vector_write_out_swaps(self):
+        '''
+        after one round of lds load, pixel of n:i_n, m:i_m is in position i_n * 4 + i_m, while store need it in i_m * vector_write_out + i_n.
+        return list of position pair to v_swap_b32 for this transpose in place, for 32bit data. 16bit data use v_perm_b32 instead
+        '''
+        vwo = self.vector_write_out
+        num = AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * vwo
+        target = [(q % vwo) * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M + q // vwo for q in range(num)]     # pixel needed in each position
+        current = [p for p in range(num)]
+        swaps = list()
+        for q in range(num):
+            if current[q] != target[q]:
+                k = current.index(target[q])
+                current[q], current[k] = current[k], current[q]
+                swaps.append((q, k))
+        return swaps
+
+    def can_skip_coalescing(self, coalescing_groups = None):
         '''
         in some configuration, after LDS shuffle the data layout is the same compare with un-shuffled shape.
+        this is when every thread load back from lds exactly the pixel it stored, into the same vgpr, like skinny tile
+        of one xdlops block wide (256x4, 4x256, 64x4...), where the xdlops layout of c is already one thread per column.
+        then lds store/load and barrier can be skipped, accvgpr is read and stored directly.
+        coalescing_groups is to ask for a group count other than this ctrl, as coalescing_store_cost_model_t does.
+        '''
+        if coalescing_groups is not None and coalescing_groups != self.coalescing_groups:
+            ctrl = copy.copy(self)
+            ctrl.coalescing_groups = coalescing_groups
+            return ctrl.can_skip_coalescing()
+        if not IGEMM_COALESCING_SKIP_LDS or self.vector_write_out != 1:
+            return False
+        return self._get_index_table('skip_coalescing', self._build_skip_coalescing)
+
+    def get_co_sst_index(self, tid):
+        '''
+        pixel index of lds store of thread tid, same as v_co_sst of init_co_lds_offset(), whose v_gemm_im/v_gemm_in is
+        c matrix index of igemm_xdlops_mapping_t.get_gemm_index_for_dst_matrix()
         '''
-        # if self.coalescing_groups == 1 and self.cxm.wave_step_m == 1 and self.cxm.wave_step_n == 1 and \
-        #         self.cxm.wave_repeat_m == 1 and self.cxm.wave_repeat_n == 1:
-        #     if self.cxm.wave_tile_m == self.cxm.inst_mfma.m:
-        #         return True
-        #     if self.cxm.wave_tile_n == self.cxm.macro_tile_n:
-        #         return True
-        return False
+        cxm = self.cxm
+        g_mr, g_ms, g_mw, g_mb, g_mt = self.get_subgroups()
+        granularity = AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M
+        gemm_in, gemm_im = 0, 0
+        for length, dim, stride in ((cxm.lanegroup_n_per_cluster(), 'n', 1),
+                                    (cxm.lanegroup_m_per_cluster(), 'm', cxm.lanegroup_m_per_thread()),
+                                    (cxm.block_n_per_lanegroup(), 'n', cxm.lanegroup_n_per_cluster()),
+                                    (cxm.block_m_per_lanegroup(), 'm', cxm.lanegroup_m_per_block() * cxm.lanegroup_m_per_cluster() * cxm.lanegroup_m_per_thread()),
+                                    (cxm.waves_per_n(), 'n', cxm.wave_tile_n * cxm.wave_step_n),
+                                    (cxm.waves_per_m(), 'm', cxm.wave_tile_m * cxm.wave_step_m)):
+            if dim == 'n':
+                gemm_in += (tid % length) * stride
+            else:
+                gemm_im += (tid % length) * stride
+            tid = tid // length
+
+        sst = ((gemm_im >> igemm_log2(cxm.lanegroup_m_per_thread())) & (cxm.lanegroup_m_per_cluster() - 1)) << igemm_log2(cxm.lanegroup_m_per_thread())
+        if cxm.block_m_per_lanegroup() != 1:
+            length_above_block_m_per_lanegroup = cxm.lanegroup_m_per_block() * cxm.lanegroup_m_per_cluster() * cxm.lanegroup_m_per_thread()
+            sst |= ((gemm_im >> igemm_log2(length_above_block_m_per_lanegroup)) & (cxm.block_m_per_lanegroup() - 1)) << \
+                        igemm_log2(length_above_block_m_per_lanegroup // g_mb)
+        if cxm.waves_per_m() != 1:
+            length_above_waves_per_m = cxm.wave_step_m * cxm.lanegroup_m_per_wave() * cxm.lanegroup_m_per_block() * \
+                        cxm.block_m_per_lanegroup() * cxm.lanegroup_m_per_thread() * cxm.lanegroup_m_per_cluster()
+            sst |= (gemm_im >> igemm_log2(length_above_waves_per_m)) << igemm_log2(length_above_waves_per_m // (g_ms * g_mw * g_mb))
+        return ((sst >> igemm_log2(granularity)) << igemm_log2(cxm.macro_tile_n * granularity)) | (gemm_in << igemm_log2(granularity))
+
+    def get_sst_index_per_group(self):
+        '''
+        pixel offset of every lds store within a group, in the order of agpr read by igemm_coalescing_store_xdlops_t, that
+        every store is granularity of 4 agpr. to be added to get_co_sst_index()
+        '''
+        cxm = self.cxm
+        l_mr, l_ms, l_mw, l_mb, l_mt = self.get_subgroup_length()
+        t_mr, t_nr, t_ms, t_ns, t_mw, t_nw, t_mb, t_mt = cxm.acc_c_lengths()
+        n_mc, n_ml, n_mv = cxm.lanegroup_m_per_cluster(), cxm.block_m_per_lanegroup(), cxm.waves_per_m()
+        n_nc, n_nl, n_nv = cxm.lanegroup_n_per_cluster(), cxm.block_n_per_lanegroup(), cxm.waves_per_n()
+        sst_index = list()
+        for i_mr, i_ms, i_mw, i_mb in itertools.product(range(l_mr), range(l_ms), range(l_mw), range(l_mb)):
+            sst_m_offset = i_mr * n_mv * l_ms * l_mw * l_mb * n_ml * n_mc + i_ms * l_mw * l_mb * n_ml * n_mc + \
+                            i_mw * l_mb * n_ml * n_mc + i_mb * n_ml * n_mc
+            for i_nr, i_ns, i_nw in itertools.product(range(t_nr), range(t_ns), range(t_nw)):
+                sst_n_offset = i_nr * n_nv * cxm.wave_step_n * cxm.lanegroup_n_per_wave() * n_nl * n_nc + \
+                            i_ns * cxm.lanegroup_n_per_wave() * n_nl * n_nc + i_nw * n_nl * n_nc
+                sst_index.append((sst_m_offset * cxm.macro_tile_n + sst_n_offset) * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M)
+        return sst_index
+
+    def _build_skip_coalescing(self):
+        # with vector_write_out 1, thread tid load round i_d from pixel (i_d * block_size + tid) * granularity, into the
+        # vgpr the i_d-th lds store is from. so identity if every lds store land there
+        granularity = AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M
+        if any(sst_index != i_d * self.block_size * granularity for i_d, sst_index in enumerate(self.get_sst_index_per_group())):
+            return False
+        return all(self.get_co_sst_index(tid) == tid * granularity for tid in range(self.block_size))
 
     def get_length_m_groups(self):
         ''' agpr per thread in m dimension '''
@@ -514,13 +665,14 @@ class ctrl_coalescing_store_xdlops_t(object):
     def get_transposed_thread_mapping(self):
         # xdlops need transfer agpr to vgpr, then do LDS shuffle
         # here we still use legacy thread mapping to describe
+        # every thread store vector_write_out pixel along n
         assert self.vector_store_size == 1
 
         n_n_total = self.cxm.macro_tile_n
         n_m_total = self.cxm.macro_tile_m
-        assert self.cxm.waves * AMDGPU_WAVE_SIZE % n_n_total == 0, f"waves:{self.cxm.waves}, n_n_total:{n_n_total}, cxm:{self.cxm.serialize()}"
+        assert self.cxm.waves * AMDGPU_WAVE_SIZE * self.vector_write_out % n_n_total == 0, f"waves:{self.cxm.waves}, n_n_total:{n_n_total}, vector_write_out:{self.vector_write_out}, cxm:{self.cxm.serialize()}"
 
-        trans_t_n0 = self.vector_store_size
+        trans_t_n0 = self.vector_write_out
         trans_c_n0 = n_n_total // trans_t_n0
         trans_t_m0 = AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M  # here we append granularity to perthread m0
         trans_c_m0 = self.block_size // trans_c_n0
@@ -591,19 +743,89 @@ class ctrl_coalescing_store_xdlops_t(object):
         else:
             return m_index % m0, m_index // m0
 
+    def get_index_cache_key(self):
+        '''
+        everything index table of this ctrl depend on. cxm is one of ctrl_xdlops_mapping_fp32/fp16 shared by every kernel, hence
+        compared by identity. vector_write_out and block_size change the transposed thread mapping
+        '''
+        return (id(self.cxm), self.coalescing_groups, self.gemm_m_order, tuple(self.gemm_m_m0_m1), self.vector_write_out, self.block_size)
+
+    def _get_index_table(self, name, build):
+        '''
+        index table of name, from cache or by build(). table is kept as tuple and returned as list, caller may modify it
+        '''
+        def to_tuple(x):
+            return tuple(to_tuple(i) for i in x) if type(x) in (list, tuple) else x
+        def to_list(x):
+            return [to_list(i) for i in x] if type(x) is tuple else x
+        if not IGEMM_COALESCING_INDEX_CACHE:
+            return build()
+        key = (name,) + self.get_index_cache_key()
+        if key not in _coalescing_index_cache:
+            _coalescing_index_cache[key] = (self.cxm, to_tuple(build()))       # hold cxm, so its id is not reused
+        return to_list(_coalescing_index_cache[key][1])
+
+    def _use_numpy(self):
+        return np is not None and IGEMM_COALESCING_INDEX_NUMPY
+
     def get_m_index_per_group(self):
         '''
         get m index after LDS shuffle
         '''
+        return self._get_index_table('m_index_per_group', self._build_m_index_per_group)
+
+    def _build_m_index_per_group(self):
         def flatten(x):
             from functools import reduce
             return reduce(lambda a, b: a*b, x, 1)
         num_dword_per_group = self.get_num_dword_per_group()
-        g_mr, g_ms, g_mw, g_mb, g_mt = self.get_subgroups()
         l_mr, l_ms, l_mw, l_mb, l_mt = self.get_subgroup_length()
 
         assert num_dword_per_group == (l_mr * l_ms * l_mw * l_mb * l_mt) * flatten(self.cxm.acc_c_per_thread_n()), \
                 f"num_dword_per_group:{num_dword_per_group}, l_mr:{l_mr}, l_ms:{l_ms}, l_mw:{l_mw}, l_mb:{l_mb}, l_mt:{l_mt} x acc_c_per_thread_n:{self.cxm.acc_c_per_thread_n()}"
+        ttm = self.get_transposed_thread_mapping()
+        num_m_per_group = self.cxm.macro_tile_m // self.coalescing_groups
+        if self._use_numpy() and num_m_per_group % (ttm.t_m0() * ttm.c_m0()) == 0:
+            return self._build_m_index_per_group_numpy()
+        return self._build_m_index_per_group_python()
+
+    def _build_m_index_per_group_numpy(self):
+        '''
+        same as _build_m_index_per_group_python(), m index of group x (thread x pixel) by broadcast add, then sorted per group.
+        after sort, pixel i of a group go to c_m0 index (i // t_m0) % c_m0, that is a reshape
+        '''
+        def offsets(lengths, strides):
+            # every index of itertools.product(*[range(l) for l in lengths]) dot strides, in the same order
+            offset = np.zeros(1, dtype = np.int64)
+            for length, stride in zip(lengths, strides):
+                offset = (offset[:, None] + np.arange(length, dtype = np.int64)[None, :] * stride).reshape(-1)
+            return offset
+        cxm = self.cxm
+        g_mr, g_ms, g_mw, g_mb, g_mt = self.get_subgroups()
+        l_mr, l_ms, l_mw, l_mb, l_mt = self.get_subgroup_length()
+        stride_mr = cxm.wave_step_m * cxm.wave_tile_m * cxm.waves_per_m()
+        stride_ms = cxm.wave_tile_m
+        stride_mw = cxm.lanegroup_m_per_block() * cxm.lanegroup_m_per_cluster() * cxm.lanegroup_m_per_thread()
+        stride_mb = cxm.lanegroup_m_per_cluster() * cxm.lanegroup_m_per_thread()
+        group_start = offsets((g_mr, g_ms, g_mw, g_mb, g_mt), (l_mr * stride_mr, l_ms * stride_ms, l_mw * stride_mw, l_mb * stride_mb, l_mt))
+        thread_start = offsets((cxm.waves_per_m(), cxm.block_m_per_lanegroup(), cxm.lanegroup_m_per_cluster()),
+                                (cxm.wave_step_m * cxm.wave_tile_m, cxm.lanegroup_m_per_thread() * cxm.lanegroup_m_per_cluster(), cxm.lanegroup_m_per_thread()))
+        pixel = offsets((l_mr, l_ms, l_mw, l_mb, l_mt), (stride_mr, stride_ms, stride_mw, stride_mb, 1))
+        m_index = np.sort(group_start[:, None] + (thread_start[:, None] + pixel[None, :]).reshape(1, -1), axis = 1)
+
+        assert np.array_equal(np.sort(m_index.reshape(-1)), np.arange(cxm.macro_tile_m)), f"len:{m_index.size}, {np.sort(m_index.reshape(-1)).tolist()}"
+
+        ttm = self.get_transposed_thread_mapping()
+        num_groups, num_m_per_group = m_index.shape
+        m_index_per_group = m_index.reshape(num_groups, num_m_per_group // (ttm.t_m0() * ttm.c_m0()), ttm.c_m0(), ttm.t_m0()). \
+                                transpose(0, 2, 1, 3).reshape(num_groups, ttm.c_m0(), -1)
+        diff = m_index_per_group[:, 1:, :] - m_index_per_group[:, :-1, :]
+        assert np.all(diff == diff[:, :, :1]), "stride between different transpose m0 not the same, should not happen"
+        return m_index_per_group.tolist()
+
+    def _build_m_index_per_group_python(self):
+        g_mr, g_ms, g_mw, g_mb, g_mt = self.get_subgroups()
+        l_mr, l_ms, l_mw, l_mb, l_mt = self.get_subgroup_length()
 
         # print(f"mr:{g_mr}x{l_mr}x{self.cxm.wave_repeat_m}, ms:{g_ms}x{l_ms}x{self.cxm.wave_step_m}, mw:{g_mw}x{l_mw}x{self.cxm.lanegroup_m_per_wave()}, mb:{g_mb}x{l_mb}x{self.cxm.lanegroup_m_per_block()}, mt:{g_mt}x{l_mt}x{self.cxm.lanegroup_m_per_thread()}")
 
@@ -701,6 +923,39 @@ class ctrl_coalescing_store_xdlops_t(object):
         after LDS shuffle, before store to global, now thread-mapping is inteed transposed (see get_transposed_thread_mapping)
         this function try to get the m_index of the first element of each ttm.c_m0
         '''
+        return self._get_index_table('co_sub_m_index', self._build_co_sub_m_index)
+
+    def _build_co_sub_m_index(self):
+        if self._use_numpy():
+            return self._build_co_sub_m_index_numpy()
+        return self._build_co_sub_m_index_python()
+
+    def _build_co_sub_m_index_numpy(self):
+        '''
+        same as _build_co_sub_m_index_python(), every ttm.c_m0 at once. a dimension is sliced only if its length is not 1 and
+        c_m0 is not yet exhausted, same for every ic, hence the condition is scalar
+        '''
+        ttm = self.get_transposed_thread_mapping()
+        g_mr, g_ms, g_mw, g_mb, g_mt = self.get_subgroups()
+        l_mr, l_ms, l_mw, l_mb, l_mt = self.get_subgroup_length()
+        n_mc = self.cxm.lanegroup_m_per_cluster()
+        n_ml = self.cxm.block_m_per_lanegroup()
+        n_mv = self.cxm.waves_per_m()
+        # (length sliced from ic, length of this dimension in m)
+        dims = [(n_mc, n_mc), (n_ml, n_ml), (l_mb, g_mb * l_mb), (l_mw, l_mw * g_mw), (l_ms, g_ms * l_ms), (n_mv, n_mv), (l_mr, 1)]
+        c_m0 = ttm.c_m0()
+        nic = np.arange(c_m0, dtype = np.int64)
+        sub_m = np.zeros(c_m0, dtype = np.int64)
+        stride = 1
+        for length, length_in_m in dims:
+            if length != 1 and c_m0 != 1:
+                sub_m = sub_m | ((nic % length) * stride)
+                nic = nic // length
+                c_m0 = c_m0 // length
+            stride = stride * length_in_m
+        return (sub_m * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M).tolist()
+
+    def _build_co_sub_m_index_python(self):
         def flatten(x):
             from functools import reduce
             return reduce(lambda a, b: a*b, x, 1)
@@ -806,11 +1061,18 @@ class ctrl_coalescing_store_xdlops_t(object):
         return i_m0 * n_m1 + i_m1
 
     def get_m_index_per_group_m1_m0(self):
-        m_index_per_group = copy.copy(self.get_m_index_per_group())
         if self.gemm_m_order == IGEMM_COALESCING_GEMM_M_ORDER_M0_M1:
-            return m_index_per_group
+            return self.get_m_index_per_group()
+        return self._get_index_table('m_index_per_group_m1_m0', self._build_m_index_per_group_m1_m0)
+
+    def _build_m_index_per_group_m1_m0(self):
+        m_index_per_group = self.get_m_index_per_group()
         assert len(self.gemm_m_m0_m1) == 2
         assert len(m_index_per_group) == self.coalescing_groups
+        if self._use_numpy() and len(set(len(m_index) for m_index_of_group in m_index_per_group for m_index in m_index_of_group)) == 1:
+            n_m0, n_m1 = self.gemm_m_m0_m1[0], self.gemm_m_m0_m1[1]
+            m_index = np.array(m_index_per_group, dtype = np.int64)
+            return ((m_index % n_m0) * n_m1 + m_index // n_m0).tolist()
         for ig in range(len(m_index_per_group)):
             for i_cm0 in range(len(m_index_per_group[ig])):
                 for i_t in range(len(m_index_per_group[ig][i_cm0])):
@@ -818,6 +1080,100 @@ class ctrl_coalescing_store_xdlops_t(object):
                     m_index_per_group[ig][i_cm0][i_t] = self.get_m_index_from_m1_m0(m_index)
         return m_index_per_group
 
+class coalescing_store_cost_t(object):
+    '''
+    cost of xdlops coalescing store with some coalescing groups. inst count is per wave
+    '''
+    def __init__(self):
+        self.coalescing_groups  = 1
+        self.lds_bytes          = 0     # lds of the workgroup used by one group
+        self.num_vgpr           = 0     # vgpr to hold c of one group
+        self.num_accvgpr_read   = 0
+        self.num_valu           = 0     # cvt/pack for fp16/bf16, swap/perm to transpose for vector_write_out
+        self.num_ds_write       = 0
+        self.num_ds_read        = 0
+        self.num_buffer_store   = 0     # buffer_atomic if gemm_k_global_split
+        self.num_barrier        = 0
+        self.cycles             = 0
+        self.occupancy          = None  # workgroups per CU if known
+
+    def serialize(self):
+        return f"groups:{self.coalescing_groups}, lds:{self.lds_bytes}, vgpr:{self.num_vgpr}, accvgpr_read:{self.num_accvgpr_read}, " + \
+                f"ds_write:{self.num_ds_write}, ds_read:{self.num_ds_read}, buffer_store:{self.num_buffer_store}, barrier:{self.num_barrier}, " + \
+                f"cycles:{self.cycles}" + (f", occupancy:{self.occupancy}" if self.occupancy is not None else '')
+
+class coalescing_store_cost_model_t(object):
+    '''
+    score every legal coalescing group count of igemm_coalescing_store_xdlops_t, and select the cheapest.
+    every group is sst -> waitcnt -> barrier -> sld -> waitcnt -> gst -> barrier before next group, so lds round trip
+    and barrier are paid once per group, while accvgpr read, ds and buffer inst are the same in total for any group count.
+    more groups use less lds and less vgpr, which may keep lds of main loop as is, or give better occupancy.
+    cheapest is the one of highest occupancy if occupancy_func is given, then least cycles.
+    '''
+    def __init__(self, ctrl, cost_dict = None):
+        assert type(ctrl) is ctrl_coalescing_store_xdlops_t
+        self.ctrl = ctrl
+        self.cost = dict(IGEMM_COALESCING_STORE_COST_DEFAULT)
+        if cost_dict is not None:
+            for k, v in cost_dict.items():
+                assert k in IGEMM_COALESCING_STORE_COST_DEFAULT, f"unknown cost key:{k}"
+                self.cost[k] = v
+
+    def get_legal_groups(self):
+        '''
+        power of 2 group count that get_subgroups() can split, from 1 to get_length_m_max_groups()
+        '''
+        max_groups = self.ctrl.get_length_m_max_groups()
+        return [1 << i for i in range(max_groups.bit_length()) if max_groups % (1 << i) == 0]
+
+    def get_cost(self, coalescing_groups):
+        ctrl = self.ctrl
+        cxm = ctrl.cxm
+        assert ctrl.get_length_m_max_groups() % coalescing_groups == 0, f"coalescing_groups:{coalescing_groups} not legal"
+        total_acc_c = cxm.total_acc_c()
+        c = coalescing_store_cost_t()
+        c.coalescing_groups = coalescing_groups
+        c.lds_bytes = cxm.macro_tile_m * cxm.macro_tile_n * ctrl.data_byte // coalescing_groups
+        c.num_vgpr = total_acc_c // coalescing_groups
+        c.num_accvgpr_read = total_acc_c
+        c.num_valu = (total_acc_c // AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M) * 6 if ctrl.data_byte != 4 else 0
+        skip = ctrl.can_skip_coalescing(coalescing_groups)
+        vwo = ctrl.vector_write_out
+        num_rounds = total_acc_c // (AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * vwo)
+        if vwo != 1:
+            c.num_valu += num_rounds * (len(ctrl.get_vector_write_out_swaps()) if ctrl.data_byte == 4 else 2 * vwo)    # transpose after lds load
+        c.num_ds_write = 0 if skip else total_acc_c // AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M
+        c.num_ds_read = 0 if skip else num_rounds * max(AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * vwo * ctrl.data_byte // 16, 1)
+        c.num_buffer_store = total_acc_c // ctrl.vector_write_out
+        c.num_barrier = 0 if skip else 2 * coalescing_groups
+
+        cost = self.cost
+        issue_cycles = (c.num_accvgpr_read + c.num_valu) * cost['valu_issue'] + (c.num_ds_write + c.num_ds_read) * cost['ds_issue'] + \
+                        c.num_buffer_store * (cost['vmem_issue'] + cost['salu_issue'])      # a salu to update s_out_offset per store
+        lds_cycles = 0 if skip else 2 * cxm.macro_tile_m * cxm.macro_tile_n * ctrl.data_byte // cost['lds_bytes_per_cycle']
+        round_trip_cycles = 0 if skip else coalescing_groups * 2 * (cost['barrier'] + cost['ds_latency'])
+        c.cycles = issue_cycles + lds_cycles + round_trip_cycles
+        return c
+
+    def get_costs(self, occupancy_func = None):
+        costs = [self.get_cost(g) for g in self.get_legal_groups()]
+        if occupancy_func is not None:
+            for c in costs:
+                c.occupancy = occupancy_func(c)
+        return costs
+
+    def select(self, lds_budget = None, occupancy_func = None):
+        '''
+        return coalescing_store_cost_t of the cheapest group count.
+        lds_budget is lds already allocated by main loop, group count need more than this is not chosen unless none fits.
+        occupancy_func(coalescing_store_cost_t) return workgroups per CU with this group count, if given.
+        '''
+        costs = self.get_costs(occupancy_func)
+        if lds_budget is not None:
+            fit = [c for c in costs if c.lds_bytes <= lds_budget]
+            costs = fit if len(fit) != 0 else [min(costs, key = lambda c: c.lds_bytes)]
+        return min(costs, key = lambda c: (-(c.occupancy or 0), c.cycles, c.lds_bytes))
+
 class igemm_coalescing_store_xdlops_t(mc_base_t):
     def __init__(self, mc, ctrl):
         mc_base_t.__init__(self, mc)
@@ -1086,7 +1442,15 @@ class igemm_coalescing_store_xdlops_t(mc_base_t):
 
         # for xdlops, always consider granularity in column, hence here is always ds_write_b128/ds_read_b128
         inst_sst = inst_ds_write_t(AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * ctrl.data_byte)
-        inst_sld = inst_ds_read_t(AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * ctrl.data_byte)
+        # every round of lds load is granularity x vector_write_out pixel, then transposed to vector_write_out pixel per m
+        vwo = ctrl.vector_write_out
+        sld_bytes_per_round = AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * vwo * ctrl.data_byte
+        inst_sld = inst_ds_read_t(min(sld_bytes_per_round, 16))
+        num_sld_per_round = max(sld_bytes_per_round // 16, 1)
+        num_rounds = ctrl.get_num_dword_per_group() // (AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * vwo)
+        # 16bit data is packed to lower half of v_c, lds load into upper half then v_perm_b32 to lower half
+        v_sld_start = ctrl.get_num_dword_per_group() * ctrl.data_byte // 4 if vwo != 1 and ctrl.data_byte != 4 else 0
+        s_perm_sel = sym_t(s_tmp6(1))
         if ctrl.gemm_k_global_split: 
             inst_gst = inst_buffer_atomic_add_dword_t(ctrl.vector_write_out * ctrl.data_byte) 
         else:
@@ -1183,7 +1547,9 @@ class igemm_coalescing_store_xdlops_t(mc_base_t):
                             self._emit(inst_sst(v_co_sst(), v_c(vgpr_index), sst_offset) + \
                                 f"   ; idword:{idword}({idword // ctrl.cxm.macro_tile_n},{idword % ctrl.cxm.macro_tile_n}),  {sst_m_offset}x{sst_n_offset} |" + \
                                 f" /{AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M}, i_mr:{i_mr}, i_ms:{i_ms}, i_mw:{i_mw}, i_mb:{i_mb}  x  i_nr:{i_nr}, i_ns:{i_ns}, i_nw:{i_nw}")
-                        vgpr_index_acc += AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M
+                        # without lds, 16bit data is stored from where it is packed, the same as lds load would put it
+                        vgpr_index_acc += AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * ctrl.data_byte // 4 if ctrl.can_skip_coalescing() else \
+                                            AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M
 
                 issue_list = []
                 if not ctrl.can_skip_coalescing():
@@ -1191,17 +1557,37 @@ class igemm_coalescing_store_xdlops_t(mc_base_t):
                     self._emit(f"s_barrier")
                     self._emit(f";   load from lds")
                     #for i_mr, i_ms, i_mw, i_mb in itertools.product(range(l_mr), range(l_ms), range(l_mw), range(l_mb)):
-                    for i_d in range(ctrl.get_num_dword_per_group() // AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M):
-                        vgpr_index = i_d * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * ctrl.data_byte // 4 # when data byte is 2, only cost 2 vgpr per time
-                        sld_offset = i_d * AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M * ctrl.block_size * ctrl.vector_write_out * ctrl.data_byte
-                        self._emit(inst_sld(v_c(vgpr_index), v_co_sld(), sld_offset))
-                        issue_list.append(inst_sld.get_issues(sld_offset))
+                    for i_d in range(num_rounds):
+                        issues = 0
+                        for i_s in range(num_sld_per_round):
+                            vgpr_index = v_sld_start + (i_d * sld_bytes_per_round + i_s * 16) // 4 # when data byte is 2, only cost 2 vgpr per time
+                            sld_offset = i_d * sld_bytes_per_round * ctrl.block_size + i_s * 16
+                            self._emit(inst_sld(v_c(vgpr_index), v_co_sld(), sld_offset))
+                            issues += inst_sld.get_issues(sld_offset)
+                        issue_list.append(issues)
 
                 if v_store_flag is not None and type(v_store_flag) is str:
                     self._emit(f"v_cmpx_eq_u32 vcc, 1, v[{v_store_flag}]")
 
                 self._emit(f";   store to global, m index start from {m_index_start_per_group}, m0:{m0_index_start_per_group}, m1:{m1_index_start_per_group}")
 
+                def emit_transpose_vector_write_out(i_d):
+                    # pixel of round i_d is n major after lds load, make it m major for store
+                    if ctrl.data_byte == 4:
+                        v_base = i_d * sld_bytes_per_round // 4
+                        for p, q in ctrl.get_vector_write_out_swaps():
+                            self._emit(f"v_swap_b32 v[{v_c(v_base + p)}], v[{v_c(v_base + q)}]")
+                    else:
+                        v_dst = i_d * sld_bytes_per_round // 4
+                        v_src = v_sld_start + v_dst
+                        for i_half in range(2):
+                            # m of even index is in lower half of a dword after lds load, odd in upper half
+                            self._emit(f"s_mov_b32 s[{s_perm_sel()}], {'0x07060302' if i_half else '0x05040100'}")
+                            for i_m, i_n in itertools.product(range(i_half, AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M, 2), range(vwo // 2)):
+                                # lower half from n:2*i_n, upper half from n:2*i_n+1, of the same m
+                                v_lo = v_src + 4 * i_n + i_m // 2
+                                self._emit(f"v_perm_b32 v[{v_c(v_dst + i_m * vwo // 2 + i_n)}], v[{v_c(v_lo + 2)}], v[{v_c(v_lo)}], s[{s_perm_sel()}]")
+
                 def emit_calculate_s_out_offset_itr(i_m, i_m0, i_m1):
                     # self._emit(f"; i_m:{i_m},  i_m0:{i_m0}xi_m1:{i_m1}")
                     comments = f"   ; i_m:{i_m}(i_m0:{i_m0},i_m1:{i_m1})"
@@ -1248,6 +1634,8 @@ class igemm_coalescing_store_xdlops_t(mc_base_t):
                             i_issue_list = issue_list[i_issues:]
                             i_issue_cnt = igemm_flatten_list_accumulate(i_issue_list) if len(i_issue_list) != 0 else 0
                             self._emit(f"s_waitcnt lgkmcnt({i_issue_cnt})")
+                            if vwo != 1:
+                                emit_transpose_vector_write_out(i_gst // AMDGPU_XDLOPS_LANEGROUP_GRANULARITY_M)
                     # vdata, vaddr, srsrc, soffset, offset
                     if s_k is not None:
                         self._emit(f"v_cmp_gt_u32 vcc, s[{s_k()}], v[{v_tmp0()}]")
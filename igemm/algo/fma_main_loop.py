@@ -45,27 +45,25 @@ class macro_v_fma_mxn_t(macro_base_t):
     continuous fma, or strided fma
     TODO: implement any index-ed fma (for rdna)
     '''
+    decl_delimiter = ', '
     def name(self):
         return f".v_fma_{self.m}x{self.n}" + \
                 ("" if self.stride == 1 else f"_s{self.stride}")
 
-    def __init__(self, mc, m, n, stride):
-        macro_base_t.__init__(self, mc)
+    def __init__(self, mc, m, n, stride, inline = False):
+        macro_base_t.__init__(self, mc, inline)
         self.m = m
         self.n = n
         self.stride = stride
         assert stride >= n and stride % n == 0
-    def __call__(self, c, a, b):
-        return '{} {},{},{}'.format(self.name(), c, a, b)
-    def emit(self):
+        self.declare_arg("c")
+        self.declare_arg("a")
+        self.declare_arg("b")
+    def expr(self):
         fma = inst_fma_t(self.mc.arch_config)
-        reg_a = msym_t(sym_t('a'))
-        reg_b = msym_t(sym_t('b'))
-        reg_c = msym_t(sym_t('c'))
-        with self._emit_macro_indented('.macro {} c, a, b'.format(self.name())):
-            for idx_m in range(self.m):
-                for idx_n in range(self.n):
-                    self._emit(fma(reg_c(idx_m * self.stride + idx_n), reg_a(idx_m), reg_b(idx_n)))
+        for idx_m in range(self.m):
+            for idx_n in range(self.n):
+                self._emit(fma(self.c(idx_m * self.stride + idx_n), self.a(idx_m), self.b(idx_n)))
 
 class ctrl_fma_main_loop_t(object):
     def __init__(self):
@@ -183,7 +181,7 @@ class fma_main_loop_t(mc_base_t):
         self._emit(f_sst_a())
         self._emit_empty_line()
 
-        self._emit(f".v_clear_nc {v_c()}, {thread_m * thread_n}")
+        self._emit(macro_c_clear_t(self.mc)(v_c(), f"{thread_m * thread_n}"))
 
         # decrese k
         self._emit(f"s_sub_i32 s[{s_kitr()}], s[{s_knum()}], {unroll_k}")
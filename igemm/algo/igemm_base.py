@@ -43,6 +43,13 @@ IGEMM_GTC_FEAT_USE_BUFFER_LOAD_OOB = 1
 IGEMM_GTC_FEAT_USE_DS_WRITE2_b64 = 0
 IGEMM_GTC_FEAT_PACK_INPUT_GLOBAL = 1
 IGEMM_GTC_FEAT_BUFFER_LOAD_WITHOUT_INTERLEAVE = 0
+IGEMM_GTC_FEAT_SCHEDULER = 'simple'       # 'simple' interleave, or dependency-aware 'list' scheduler
+IGEMM_GTC_FEAT_WAITCNT_RELAX = 0          # relax s_waitcnt of emitted kernel body by waitcnt_relax_pass_t
+IGEMM_GTC_FEAT_GPR_PACK = 1               # pack vgpr by live range with gpr_allocator_t, otherwise lay out linearly
+IGEMM_GTC_FEAT_PEEPHOLE = 0               # rewrite or remove alu inst of emitted kernel body by peephole_pass_t
+IGEMM_GTC_FEAT_MACRO_INLINE = 0           # expand every macro_base_t inline instead of .macro invocation
+IGEMM_GTC_FEAT_COALESCING_STORE_GROUPS = 0  # 0 derive from lds size of main loop, 'auto' by coalescing_store_cost_model_t, or number of groups
+IGEMM_GTC_FEAT_VECTOR_WRITE_OUT = 'auto'    # elements per buffer store of xdlops coalescing store, 'auto' widest legal, or max of it
 
 # IGEMM_GTC_TENSOR_LAYOUT_NCHW = ((1 << 4) | 0)
 # IGEMM_GTC_TENSOR_LAYOUT_NHWC = ((1 << 4) | 1)
@@ -197,6 +204,13 @@ class igemm_gtc_tunable_parameter_t(object):
         self.gemm_k_global_split                = get_igemm_gtc_gemm_k_global_split(tunable_dict)
         self.allow_lds_reorder                  = utility_dict_with_default_t(tunable_dict)('allow_lds_reorder', IGEMM_GTC_FEAT_ALLOW_LDS_REORDER)
         self.precache_soffset                   = utility_dict_with_default_t(tunable_dict)('precache_soffset', IGEMM_GTC_FEAT_PRECACHE_SOFFSET)
+        self.scheduler                          = utility_dict_with_default_t(tunable_dict)('scheduler', IGEMM_GTC_FEAT_SCHEDULER)
+        self.waitcnt_relax                      = utility_dict_with_default_t(tunable_dict)('waitcnt_relax', IGEMM_GTC_FEAT_WAITCNT_RELAX)
+        self.gpr_pack                           = utility_dict_with_default_t(tunable_dict)('gpr_pack', IGEMM_GTC_FEAT_GPR_PACK)
+        self.peephole                           = utility_dict_with_default_t(tunable_dict)('peephole', IGEMM_GTC_FEAT_PEEPHOLE)
+        self.macro_inline                       = utility_dict_with_default_t(tunable_dict)('macro_inline', IGEMM_GTC_FEAT_MACRO_INLINE)
+        self.coalescing_store_groups_option     = utility_dict_with_default_t(tunable_dict)('coalescing_store_groups', IGEMM_GTC_FEAT_COALESCING_STORE_GROUPS)
+        self.vector_write_out                   = utility_dict_with_default_t(tunable_dict)('vector_write_out', IGEMM_GTC_FEAT_VECTOR_WRITE_OUT)
 
         default_source_access_order             = IGEMM_GTC_TUNABLE_SOURCE_ACCESS_ORDER_GEMM_N_GEMM_M if self.direction == 'fwd' \
                                                         else IGEMM_GTC_TUNABLE_SOURCE_ACCESS_ORDER_GEMM_M_GEMM_N
@@ -218,6 +232,14 @@ class igemm_gtc_tunable_parameter_t(object):
         assert self.precision in ('fp32', 'fp16', 'bf16')
         assert self.nxb in (1,4,8,16,32,64,128,256)
         assert self.nxe in (0,1)
+        assert self.scheduler in ('simple', 'list')
+        assert self.waitcnt_relax in (0, 1)
+        assert self.gpr_pack in (0, 1)
+        assert self.peephole in (0, 1)
+        assert self.macro_inline in (0, 1)
+        assert self.coalescing_store_groups_option == 'auto' or \
+                (type(self.coalescing_store_groups_option) is int and (self.coalescing_store_groups_option == 0 or igemm_is_pow2(self.coalescing_store_groups_option)))
+        assert self.vector_write_out in ('auto', 1, 2, 4, 8)
 
         # gemm_k_pack static value
         # TODO: make gemm_k_pack to be tunable 
@@ -348,6 +370,67 @@ class igemm_gtc_tunable_parameter_t(object):
                 self.lds_total = self.lds_buffer_num * self.lds_single
                 self.coalescing_store_groups = self.coalescing_store_groups // shrink_in_co_group
 
+        if self.coalescing_store_groups_option == 'auto':
+            if self.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
+                self.coalescing_store_groups = self.get_coalescing_store_cost(tunable_dict['arch']).coalescing_groups
+                self.lds_buffer_num = self.get_coalescing_store_lds_buffer_num(self.coalescing_store_groups)
+                self.lds_total = self.lds_buffer_num * self.lds_single
+        elif self.coalescing_store_groups_option != 0:
+            self.coalescing_store_groups = self.coalescing_store_groups_option
+            self.lds_buffer_num = self.get_coalescing_store_lds_buffer_num(self.coalescing_store_groups)
+            self.lds_total = self.lds_buffer_num * self.lds_single
+            if self.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
+                # groups must split agpr of each thread in m evenly, see coalescing_store_cost_model_t.get_legal_groups()
+                max_groups = self.get_coalescing_store_ctrl().get_length_m_max_groups()
+                assert self.coalescing_store_groups <= max_groups and max_groups % self.coalescing_store_groups == 0, \
+                        f"coalescing_store_groups:{self.coalescing_store_groups} not valid for {self.gemm_m_per_block}x{self.gemm_n_per_block} " + \
+                        f"wave_tile:{self.wave_tile_m}x{self.wave_tile_n}, should be power of 2 not bigger than {max_groups}"
+            lds_size = amdgpu_get_arch_detail(amdgpu_string_to_arch(tunable_dict['arch'])).lds_size
+            assert self.lds_total <= lds_size, \
+                    f"coalescing_store_groups:{self.coalescing_store_groups} need lds_total:{self.lds_total}, " + \
+                    f"bigger than lds size:{lds_size} of {tunable_dict['arch']}, try bigger groups or 'auto'"
+
+    def get_coalescing_store_lds_buffer_num(self, coalescing_store_groups):
+        '''
+        lds_buffer_num to make lds_total big enough for c matrix of one coalescing group
+        '''
+        lds_c = self.gemm_m_per_block * self.gemm_n_per_block * amdgpu_precision_data_byte(self.precision) // coalescing_store_groups
+        lds_buffer_num = self.lds_buffer_num
+        while lds_buffer_num * self.lds_single < lds_c:
+            lds_buffer_num = lds_buffer_num * 2
+        return lds_buffer_num
+
+    def get_coalescing_store_ctrl(self):
+        '''
+        ctrl of xdlops coalescing store of this tunable, coalescing groups not set
+        '''
+        # coalescing_store import this file, hence import here
+        from .coalescing_store import ctrl_coalescing_store_xdlops_t
+        ctrl = ctrl_coalescing_store_xdlops_t()
+        ctrl.cxm = get_ctrl_xdlops_mapping(self.gemm_m_per_block, self.gemm_n_per_block, self.wave_tile_m, self.wave_tile_n, self.precision, self.block_size // AMDGPU_WAVE_SIZE)
+        ctrl.data_byte = amdgpu_precision_data_byte(self.precision)
+        ctrl.block_size = self.block_size
+        ctrl.gemm_k_global_split = self.gemm_k_global_split
+        return ctrl
+
+    def get_coalescing_store_cost(self, arch):
+        '''
+        cheapest coalescing group count of xdlops coalescing store, by occupancy then cycles of coalescing_store_cost_model_t
+        '''
+        # coalescing_store and resource estimator import this file, hence import here
+        from .coalescing_store import coalescing_store_cost_model_t
+        from .igemm_resource_estimator import igemm_resource_estimator_t
+        import copy
+        ctrl = self.get_coalescing_store_ctrl()
+        arch_detail = amdgpu_get_arch_detail(amdgpu_string_to_arch(arch))
+
+        def occupancy(cost):
+            tunable = copy.copy(self)
+            tunable.coalescing_store_groups = cost.coalescing_groups
+            tunable.lds_total = self.get_coalescing_store_lds_buffer_num(cost.coalescing_groups) * self.lds_single
+            return igemm_resource_estimator_t(tunable).get_occupancy(arch_detail)
+        return coalescing_store_cost_model_t(ctrl).select(occupancy_func = occupancy)
+
     def output(self):
         brace_left='   {'
         brace_right='}'
@@ -399,6 +482,13 @@ class igemm_gtc_tunable_parameter_t(object):
         tunable_dict['multihead']                       = self.multihead
         tunable_dict['allow_lds_reorder']               = self.allow_lds_reorder
         tunable_dict['precache_soffset']                = self.precache_soffset
+        tunable_dict['scheduler']                       = self.scheduler
+        tunable_dict['waitcnt_relax']                   = self.waitcnt_relax
+        tunable_dict['gpr_pack']                        = self.gpr_pack
+        tunable_dict['peephole']                        = self.peephole
+        tunable_dict['macro_inline']                    = self.macro_inline
+        tunable_dict['coalescing_store_groups']         = self.coalescing_store_groups_option
+        tunable_dict['vector_write_out']                = self.vector_write_out
 
         tunable_dict['local_prefetch_num']              = self.local_prefetch_num
         tunable_dict['fma_interleave']                  = self.fma_interleave
@@ -459,6 +549,27 @@ class igemm_gtc_tunable_parameter_t(object):
         if self.gemm_k_global_split:
             sstr += \
                 line_start + 'gemm_k_global_split        {} {}'.format(equal, self.gemm_k_global_split) + new_line
+        if self.scheduler != IGEMM_GTC_FEAT_SCHEDULER:
+            sstr += \
+                line_start + 'scheduler                  {} {}'.format(equal, '\'' + self.scheduler + '\'') + new_line
+        if self.waitcnt_relax != IGEMM_GTC_FEAT_WAITCNT_RELAX:
+            sstr += \
+                line_start + 'waitcnt_relax              {} {}'.format(equal, self.waitcnt_relax) + new_line
+        if self.gpr_pack != IGEMM_GTC_FEAT_GPR_PACK:
+            sstr += \
+                line_start + 'gpr_pack                   {} {}'.format(equal, self.gpr_pack) + new_line
+        if self.peephole != IGEMM_GTC_FEAT_PEEPHOLE:
+            sstr += \
+                line_start + 'peephole                   {} {}'.format(equal, self.peephole) + new_line
+        if self.macro_inline != IGEMM_GTC_FEAT_MACRO_INLINE:
+            sstr += \
+                line_start + 'macro_inline               {} {}'.format(equal, self.macro_inline) + new_line
+        if self.coalescing_store_groups_option != IGEMM_GTC_FEAT_COALESCING_STORE_GROUPS:
+            sstr += \
+                line_start + 'coalescing_store_groups    {} {}'.format(equal, '\'auto\'' if self.coalescing_store_groups_option == 'auto' else self.coalescing_store_groups_option) + new_line
+        if self.vector_write_out != IGEMM_GTC_FEAT_VECTOR_WRITE_OUT:
+            sstr += \
+                line_start + 'vector_write_out           {} {}'.format(equal, self.vector_write_out) + new_line
         if extra_info:
             sstr += \
                 line_start + new_line + \
@@ -521,6 +632,9 @@ def igemm_gtc_encode_kernel_name(tunable):
     if tunable.gemm_k_global_split:
         kernel_name += "_gkgs"
 
+    if tunable.scheduler == 'list':
+        kernel_name += "_ls"
+
     return kernel_name
 
 
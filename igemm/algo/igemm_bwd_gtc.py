@@ -42,6 +42,34 @@ IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B = 4
 IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N1B_N0 = 5
 
 
+def _need_reverse_order(x0, x1):
+    if x0 != 1 and x1 == 1:
+        return True
+    if x0 > x1:
+        return True
+    return False
+
+def igemm_bwd_gtc_get_lds_gemm_n_order(tunable):
+    '''
+    lds store order of gemm_n, by thread lengths n0/n1b of output. function of tunable, hence usable without kernel
+    '''
+    t_n0, t_n1b = tunable.tensor_b_thread_lengths[2], tunable.tensor_b_thread_lengths[3]
+    if tunable.allow_lds_reorder and _need_reverse_order(t_n0, t_n1b):
+        return IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N1B_N0
+    return IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B
+
+def igemm_bwd_gtc_get_length_n_continuous_out(tunable):
+    '''
+    number of gemm_n continuous in input, every run start from multiple of it. used as vector_write_out limit.
+    only n1b is continuous in memory, and when nxe is 0 host make sure b (dslice_h*dslice_w) is multiple of nxb.
+    when nxe is not 0, b of input is strided by dtile, hence no vector.
+    function of tunable, hence sequencer can check vector_write_out without kernel.
+    '''
+    n_n1b = tunable.tensor_b_thread_lengths[3] * tunable.tensor_b_cluster_lengths[3]
+    if tunable.nxe != 0 or igemm_bwd_gtc_get_lds_gemm_n_order(tunable) != IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B:
+        return 1
+    return math.gcd(tunable.nxb, n_n1b)
+
 def _find_non_1_index_in_list(list_object):
     result_list = list()
     for idx, item in enumerate(list_object):
@@ -416,6 +444,7 @@ class igemm_bwd_gtc_t(mc_base_t):
         assert type(tunable) is igemm_gtc_tunable_parameter_t
         mc_base_t.__init__(self, mc)
         self.tunable = tunable
+        self.mc.inline_macro = self.tunable.macro_inline == 1     # must be set before any macro is created
         self.global_load_out = self.global_load_out_t(mc, self)
         self.global_load_wei = self.global_load_wei_t(mc, self)
         self.shared_store_out = self.shared_store_out_t(mc, self)
@@ -475,7 +504,6 @@ class igemm_bwd_gtc_t(mc_base_t):
             ctrl_coalescing_store_xdlops.coalescing_groups = self.coalescing_store_groups
             ctrl_coalescing_store_xdlops.data_byte = amdgpu_precision_data_byte(self.tunable.precision)
 
-            ctrl_coalescing_store_xdlops.vector_write_out = 1                      # TODO: some cases this can be set to other value
             ctrl_coalescing_store_xdlops.block_size = self.tunable.block_size
         
             gemm_m_order, gemm_n_order = self.get_lds_gemm_m_gemm_n_order()
@@ -485,6 +513,7 @@ class igemm_bwd_gtc_t(mc_base_t):
                 # we may consider not suppor this mode
                 ctrl_coalescing_store_xdlops.gemm_m_order = IGEMM_COALESCING_GEMM_M_ORDER_M1_M0
             ctrl_coalescing_store_xdlops.adjust_optimal_coalescing_groups()        # in m1_m0 order, must adjust 
+            ctrl_coalescing_store_xdlops.adjust_optimal_vector_write_out(self.get_length_n_continuous_out(), self.tunable.vector_write_out)
             self.coalescing_store = igemm_coalescing_store_xdlops_t(mc, ctrl_coalescing_store_xdlops)
 
 
@@ -523,27 +552,23 @@ class igemm_bwd_gtc_t(mc_base_t):
         return False
 
     def get_lds_gemm_m_gemm_n_order(self):
-        def need_reverse_order(x0, x1):
-            if x0 != 1 and x1 == 1:
-                return True
-            if x0 > x1:
-                return True
-            return False
-
         t_c0, t_c1, t_k0, t_k1e, t_n0, t_n1b = self.get_thread_lengths()
 
-        gemm_n_order = IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B
-        if self.tunable.allow_lds_reorder:
-            if need_reverse_order(t_n0, t_n1b):
-                gemm_n_order = IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_N_N1B_N0
+        gemm_n_order = igemm_bwd_gtc_get_lds_gemm_n_order(self.tunable)
 
         gemm_m_order = IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_M_C0_C1
         if self.tunable.allow_lds_reorder:
-            if need_reverse_order(t_c0, t_c1):
+            if _need_reverse_order(t_c0, t_c1):
                 gemm_m_order = IGEMM_BWD_GTC_LDS_STORE_ORDER_GEMM_M_C1_C0
 
         return gemm_m_order, gemm_n_order
 
+    def get_length_n_continuous_out(self):
+        '''
+        number of gemm_n continuous in input, see igemm_bwd_gtc_get_length_n_continuous_out()
+        '''
+        return igemm_bwd_gtc_get_length_n_continuous_out(self.tunable)
+
     class global_load_out_t(mc_base_t):
         def __init__(self, mc, outer):
             mc_base_t.__init__(self, mc)
@@ -561,7 +586,7 @@ class igemm_bwd_gtc_t(mc_base_t):
             with self._deferred_context():
                 self._emit(f"; load output")
                 if self.outer.tunable.nxe != 0:
-                    self._emit(f".v_clear_nc {v.v_gld_b()}, {m_out_2d_global_load.ctrl.length_d0 * m_out_2d_global_load.ctrl.length_d1}")
+                    self._emit(macro_c_clear_t(self.mc)(v.v_gld_b(), f"{m_out_2d_global_load.ctrl.length_d0 * m_out_2d_global_load.ctrl.length_d1}"))
                     self._emit(f"v_cmp_eq_u32 vcc, 1, v[{v.v_out_flag()}]")
                     self._emit(f"s_and_saveexec_b64 s[{s.s_tmp(4)}:{s.s_tmp(5)}], vcc")
                 if self.outer.tunable.precache_soffset:
@@ -835,11 +860,17 @@ class igemm_bwd_gtc_t(mc_base_t):
         def __init__(self, mc, outer):
             mc_base_t.__init__(self, mc)
             is_vgpr_acc_c = outer.tunable.fma_type != IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS
-            vseq = gpr_sequencer_t()
+            is_gpr_pack = outer.tunable.gpr_pack and not is_vgpr_acc_c
+            vseq = gpr_allocator_t(granularity = 2)
+            live_p, live_l, live_pl = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_PROLOGUE_LOOP
             self.outer               = outer
             if is_vgpr_acc_c:
                 self.v_c             = sym_t("v_c"            ,vseq(outer.tunable.num_vgpr_accumulate_c))
                 v_c_num              = vseq()
+            elif is_gpr_pack:
+                # v_c is only used by coalescing store, and can share with any vgpr not live in epilogue
+                v_c_coalescing_num   = outer.tunable.num_agpr_accumulate_c // outer.coalescing_store_groups
+                self.v_c             = sym_t("v_c"            ,vseq(v_c_coalescing_num, live=GPR_LIVE_EPILOGUE), f"coalescing:{v_c_coalescing_num}")
             else:
                 v_c_resuable_num     = outer.tunable.num_vgpr_accumulate_a + outer.tunable.num_vgpr_accumulate_b + \
                                         outer.tunable.num_vgpr_global_load_a + outer.tunable.num_vgpr_global_load_b + \
@@ -849,56 +880,56 @@ class igemm_bwd_gtc_t(mc_base_t):
 
                 v_c_needed           = v_c_needed if v_c_needed > 2 else 2  # let at least 2
                 self.v_c             = sym_t("v_c"            ,vseq(v_c_needed), f"coalescing:{v_c_coalescing_num}, needed:{v_c_needed}, resuable:{v_c_resuable_num}")
-            self.v_a                 = sym_t("v_a"            ,vseq(outer.tunable.num_vgpr_accumulate_a))
-            self.v_b                 = sym_t("v_b"            ,vseq(outer.tunable.num_vgpr_accumulate_b))
-            self.v_gld_a             = sym_t("v_gld_a"        ,vseq(outer.tunable.num_vgpr_global_load_a))
-            self.v_gld_b             = sym_t("v_gld_b"        ,vseq(outer.tunable.num_vgpr_global_load_b))
-            self.v_sst_a_os          = sym_t("v_sst_a_os"     ,vseq(1))
-            self.v_sst_b_os          = sym_t("v_sst_b_os"     ,vseq(1))
-            self.v_sld_a_os          = sym_t("v_sld_a_os"     ,vseq(1))
-            self.v_sld_b_os          = sym_t("v_sld_b_os"     ,vseq(1))
-            self.v_out_iho           = sym_t("v_out_iho"      ,vseq(1))
-            self.v_out_iwo           = sym_t("v_out_iwo"      ,vseq(1))
+            self.v_a                 = sym_t("v_a"            ,vseq(outer.tunable.num_vgpr_accumulate_a, live=live_l))
+            self.v_b                 = sym_t("v_b"            ,vseq(outer.tunable.num_vgpr_accumulate_b, live=live_l))
+            self.v_gld_a             = sym_t("v_gld_a"        ,vseq(outer.tunable.num_vgpr_global_load_a, live=live_pl))
+            self.v_gld_b             = sym_t("v_gld_b"        ,vseq(outer.tunable.num_vgpr_global_load_b, live=live_pl))
+            self.v_sst_a_os          = sym_t("v_sst_a_os"     ,vseq(1, live=live_pl))
+            self.v_sst_b_os          = sym_t("v_sst_b_os"     ,vseq(1, live=live_pl))
+            self.v_sld_a_os          = sym_t("v_sld_a_os"     ,vseq(1, live=live_pl))
+            self.v_sld_b_os          = sym_t("v_sld_b_os"     ,vseq(1, live=live_pl))
+            self.v_out_iho           = sym_t("v_out_iho"      ,vseq(1, live=live_pl))
+            self.v_out_iwo           = sym_t("v_out_iwo"      ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_out_dslice_ih     = sym_t("v_out_dslice_ih",vseq(1))
-                self.v_out_dslice_iw     = sym_t("v_out_dslice_iw",vseq(1))
-            self.v_out_os            = sym_t("v_out_os"       ,vseq(1))
+                self.v_out_dslice_ih     = sym_t("v_out_dslice_ih",vseq(1, live=live_pl))
+                self.v_out_dslice_iw     = sym_t("v_out_dslice_iw",vseq(1, live=live_pl))
+            self.v_out_os            = sym_t("v_out_os"       ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_out_os_base   = sym_t("v_out_os_base"  ,vseq(1))
+                self.v_out_os_base   = sym_t("v_out_os_base"  ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_wei_iy        = sym_t("v_wei_iy"       ,vseq(1))
-                self.v_wei_ix        = sym_t("v_wei_ix"       ,vseq(1))
-                self.v_dtile_iy      = sym_t("v_dtile_iy"     ,vseq(1))
-                self.v_dtile_ix      = sym_t("v_dtile_ix"     ,vseq(1))
-            self.v_wei_os            = sym_t("v_wei_os"       ,vseq(1))
+                self.v_wei_iy        = sym_t("v_wei_iy"       ,vseq(1, live=live_pl))
+                self.v_wei_ix        = sym_t("v_wei_ix"       ,vseq(1, live=live_pl))
+                self.v_dtile_iy      = sym_t("v_dtile_iy"     ,vseq(1, live=live_pl))
+                self.v_dtile_ix      = sym_t("v_dtile_ix"     ,vseq(1, live=live_pl))
+            self.v_wei_os            = sym_t("v_wei_os"       ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_wei_os_base   = sym_t("v_wei_os_base"  ,vseq(1))
+                self.v_wei_os_base   = sym_t("v_wei_os_base"  ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_out_flag      = sym_t("v_out_flag"     ,vseq(1))
+                self.v_out_flag      = sym_t("v_out_flag"     ,vseq(1, live=live_pl))
             self.v_co_sst            = sym_t("v_co_sst"       ,vseq(1))
             self.v_co_sld            = sym_t("v_co_sld"       ,vseq(1))
             if outer.tunable.nxe != 0:
                 self.v_in_flag       = sym_t("v_in_flag"      ,vseq(1))
             self.v_in_os             = sym_t("v_in_os"        ,vseq(1))
-            self.v_gtc_ik1           = sym_t("v_gtc_ik1"      ,vseq(1))
+            self.v_gtc_ik1           = sym_t("v_gtc_ik1"      ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_gtc_dslice_iy = sym_t("v_gtc_dslice_iy",vseq(1))
-                self.v_gtc_dslice_ix = sym_t("v_gtc_dslice_ix",vseq(1))
+                self.v_gtc_dslice_iy = sym_t("v_gtc_dslice_iy",vseq(1, live=live_pl))
+                self.v_gtc_dslice_ix = sym_t("v_gtc_dslice_ix",vseq(1, live=live_pl))
             self.v_move_slice_k_ik1  = sym_t("v_move_slice_k_ik1" , self.v_gtc_ik1.value)
             if outer.tunable.nxe != 0:
                 self.v_move_slice_k_idsy = sym_t("v_move_slice_k_idsy", self.v_gtc_dslice_iy.value)
                 self.v_move_slice_k_idsx = sym_t("v_move_slice_k_idsx", self.v_gtc_dslice_ix.value)
 
-            self.v_gtc_ic0       = sym_t("v_gtc_ic0"      ,v_c_num - 1  if is_vgpr_acc_c else vseq(1))
-            self.v_gtc_ic1       = sym_t("v_gtc_ic1"      ,v_c_num - 2  if is_vgpr_acc_c else vseq(1))
-            self.v_gtc_ik0       = sym_t("v_gtc_ik0"      ,v_c_num - 3  if is_vgpr_acc_c else vseq(1))
-            self.v_gtc_ik1e      = sym_t("v_gtc_ik1e"     ,v_c_num - 4  if is_vgpr_acc_c else vseq(1))
+            self.v_gtc_ic0       = sym_t("v_gtc_ic0"      ,v_c_num - 1  if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gtc_ic1       = sym_t("v_gtc_ic1"      ,v_c_num - 2  if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gtc_ik0       = sym_t("v_gtc_ik0"      ,v_c_num - 3  if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gtc_ik1e      = sym_t("v_gtc_ik1e"     ,v_c_num - 4  if is_vgpr_acc_c else vseq(1, live=live_p))
 
-            self.v_gtc_in0       = sym_t("v_gtc_in0"      ,v_c_num - 8  if is_vgpr_acc_c else vseq(1))
-            self.v_gtc_in1b      = sym_t("v_gtc_in1b"     ,v_c_num - 9  if is_vgpr_acc_c else vseq(1))
-            self.v_gtc_in1       = sym_t("v_gtc_in1"      ,v_c_num - 10 if is_vgpr_acc_c else vseq(1))
-            self.v_gemm_in       = sym_t("v_gemm_in"      ,v_c_num - 11 if is_vgpr_acc_c else vseq(1))
-            self.v_gemm_im       = sym_t("v_gemm_im"      ,v_c_num - 12 if is_vgpr_acc_c else vseq(1))
+            self.v_gtc_in0       = sym_t("v_gtc_in0"      ,v_c_num - 8  if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gtc_in1b      = sym_t("v_gtc_in1b"     ,v_c_num - 9  if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gtc_in1       = sym_t("v_gtc_in1"      ,v_c_num - 10 if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gemm_in       = sym_t("v_gemm_in"      ,v_c_num - 11 if is_vgpr_acc_c else vseq(1, live=live_p))
+            self.v_gemm_im       = sym_t("v_gemm_im"      ,v_c_num - 12 if is_vgpr_acc_c else vseq(1, live=live_p))
 
             if is_vgpr_acc_c:
                 if v_c_num < 16:
@@ -930,21 +961,26 @@ class igemm_bwd_gtc_t(mc_base_t):
                         self.v_co_sub_m_index = sym_t("v_co_sub_m_index" ,v_c_num - 18)
                         self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,v_c_num - 19)
             else:
-                self.v_in_in0        = sym_t("v_in_in0"       ,vseq(1))
-                self.v_in_in1b       = sym_t("v_in_in1b"      ,vseq(1))
-                self.v_in_in1        = sym_t("v_in_in1"       ,vseq(1))
-                self.v_in_ihi        = sym_t("v_in_ihi"       ,vseq(1))
-                self.v_in_iwi        = sym_t("v_in_iwi"       ,vseq(1))
+                self.v_in_in0        = sym_t("v_in_in0"       ,vseq(1, live=live_p))
+                self.v_in_in1b       = sym_t("v_in_in1b"      ,vseq(1, live=live_p))
+                self.v_in_in1        = sym_t("v_in_in1"       ,vseq(1, live=live_p))
+                self.v_in_ihi        = sym_t("v_in_ihi"       ,vseq(1, live=live_p))
+                self.v_in_iwi        = sym_t("v_in_iwi"       ,vseq(1, live=live_p))
                 if outer.tunable.nxe != 0:
-                    self.v_in_dslice_ih  = sym_t("v_in_dslice_ih" ,vseq(1))
-                    self.v_in_dslice_iw  = sym_t("v_in_dslice_iw" ,vseq(1))
+                    self.v_in_dslice_ih  = sym_t("v_in_dslice_ih" ,vseq(1, live=live_p))
+                    self.v_in_dslice_iw  = sym_t("v_in_dslice_iw" ,vseq(1, live=live_p))
                     self.v_co_sub_m_index = sym_t("v_co_sub_m_index" ,vseq(1))
-                    self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1))
+                    self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1, live=live_p))
                 else:
                     self.v_co_sub_m_index = sym_t("v_co_sub_m_index" ,vseq(1))
-                    self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1))
+                    self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1, live=live_p))
             self.v_cur_c         = sym_t("v_cur_c" ,       vseq(1))
             self.v_tmp           = sym_t("v_tmp"          ,vseq(6, 2))
+            self.gpr_allocator   = None
+            if is_gpr_pack:
+                vseq.reserve(0, 1, GPR_LIVE_PROLOGUE)       # v0 is local id when kernel start
+                vseq.pack(self)
+                self.gpr_allocator = vseq
             total_vgpr           = vseq()
             if outer.tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
                 # if xdlops agpr is larger than vgpr usage, must change vgpr count to agpr
@@ -2199,6 +2235,9 @@ class igemm_bwd_gtc_t(mc_base_t):
             fctrl.lds_buffer_num              = self.tunable.lds_buffer_num
             fctrl.local_prefetch_num          = self.tunable.local_prefetch_num
             fctrl.interleave                  = self.tunable.fma_interleave
+            fctrl.scheduler_type              = SCHEDULER_TYPE_LIST if self.tunable.scheduler == 'list' else SCHEDULER_TYPE_SIMPLE_INTERLEAVE
+            fctrl.symbol_table                = sym_get_table(self.sgpr, self.vgpr, self.agpr)
+            fctrl.gpr_extent                  = {'v' : self.vgpr.gpr_allocator.get_extent(GPR_LIVE_LOOP)} if self.vgpr.gpr_allocator else None
 
             # functor
             fctrl.global_load_a_functor       = self.global_load_wei
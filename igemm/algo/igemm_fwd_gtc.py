@@ -43,6 +43,34 @@ IGEMM_FWD_GTC_GLOBAL_LOAD_TA_ORDER_K_M= 0
 IGEMM_FWD_GTC_GLOBAL_LOAD_TA_ORDER_M_K= 1
 IGEMM_FWD_GTC_DEBUG = 0
 
+def _need_reverse_order(x0, x1):
+    if x0 != 1 and x1 == 1:
+        return True
+    if x0 > x1:
+        return True
+    return False
+
+def igemm_fwd_gtc_get_lds_gemm_n_order(tunable):
+    '''
+    lds store order of gemm_n, by thread lengths n0/n1b of input. function of tunable, hence usable without kernel
+    '''
+    tb_n0, tb_n1b = tunable.tensor_b_thread_lengths[2], tunable.tensor_b_thread_lengths[3]
+    if tunable.allow_lds_reorder and _need_reverse_order(tb_n0, tb_n1b):
+        return IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N1B_N0
+    return IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B
+
+def igemm_fwd_gtc_get_length_n_continuous_out(tunable):
+    '''
+    number of gemm_n continuous in output, every run start from multiple of it. used as vector_write_out limit.
+    only n1b is continuous in memory, and when nxe is 0 host make sure b (ho*wo) is multiple of nxb.
+    when nxe is not 0, b is padded to nxb, and every pixel have its own flag, hence no vector.
+    function of tunable, hence sequencer can check vector_write_out without kernel.
+    '''
+    nb_n1b = tunable.tensor_b_thread_lengths[3] * tunable.tensor_b_cluster_lengths[3]
+    if tunable.nxe != 0 or igemm_fwd_gtc_get_lds_gemm_n_order(tunable) != IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B:
+        return 1
+    return math.gcd(tunable.nxb, nb_n1b)
+
 def _find_non_1_index_in_list(list_object):
     result_list = list()
     for idx, item in enumerate(list_object):
@@ -406,6 +434,7 @@ class igemm_fwd_gtc_t(mc_base_t):
         assert type(tunable) is igemm_gtc_tunable_parameter_t
         mc_base_t.__init__(self, mc)
         self.tunable = tunable
+        self.mc.inline_macro = self.tunable.macro_inline == 1     # must be set before any macro is created
         self.global_load_in = self.global_load_in_t(mc, self)
         self.global_load_wei = self.global_load_wei_t(mc, self)
         self.shared_store_in = self.shared_store_in_t(mc, self)
@@ -464,7 +493,6 @@ class igemm_fwd_gtc_t(mc_base_t):
             ctrl_coalescing_store_xdlops.coalescing_groups = self.coalescing_store_groups
             ctrl_coalescing_store_xdlops.data_byte = amdgpu_precision_data_byte(self.tunable.precision)
 
-            ctrl_coalescing_store_xdlops.vector_write_out = 1                      # TODO: some cases this can be set to other value
             ctrl_coalescing_store_xdlops.block_size = self.tunable.block_size
         
             gemm_m_order, gemm_n_order = self.get_lds_gemm_m_gemm_n_order()
@@ -474,6 +502,7 @@ class igemm_fwd_gtc_t(mc_base_t):
                 # we may consider not suppor this mode
                 ctrl_coalescing_store_xdlops.gemm_m_order = IGEMM_COALESCING_GEMM_M_ORDER_M1_M0
             ctrl_coalescing_store_xdlops.adjust_optimal_coalescing_groups()        # in m1_m0 order, must adjust 
+            ctrl_coalescing_store_xdlops.adjust_optimal_vector_write_out(self.get_length_n_continuous_out(), self.tunable.vector_write_out)
             self.coalescing_store = igemm_coalescing_store_xdlops_t(mc, ctrl_coalescing_store_xdlops)
 
 
@@ -500,29 +529,25 @@ class igemm_fwd_gtc_t(mc_base_t):
         return self._get_deferred()
     
     def get_lds_gemm_m_gemm_n_order(self):
-        def need_reverse_order(x0, x1):
-            if x0 != 1 and x1 == 1:
-                return True
-            if x0 > x1:
-                return True
-            return False
-
         ta_c0, ta_c1e, ta_k0, ta_k1, tb_c0, tb_c1e, tb_n0, tb_n1b = self.get_thread_lengths()
 
-        gemm_n_order = IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B
-        if self.tunable.allow_lds_reorder:
-            if need_reverse_order(tb_n0, tb_n1b):
-                gemm_n_order = IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N1B_N0
-                assert False, "maybe not correct"
+        gemm_n_order = igemm_fwd_gtc_get_lds_gemm_n_order(self.tunable)
+        assert gemm_n_order == IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_N_N0_N1B, "maybe not correct"
 
         gemm_m_order = IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_M_K0_K1
         if self.tunable.allow_lds_reorder:
-            if need_reverse_order(ta_k0, ta_k1):
+            if _need_reverse_order(ta_k0, ta_k1):
                 gemm_m_order = IGEMM_FWD_GTC_LDS_STORE_ORDER_GEMM_M_K1_K0
                 assert False, "maybe not correct"
 
         return gemm_m_order, gemm_n_order
 
+    def get_length_n_continuous_out(self):
+        '''
+        number of gemm_n continuous in output, see igemm_fwd_gtc_get_length_n_continuous_out()
+        '''
+        return igemm_fwd_gtc_get_length_n_continuous_out(self.tunable)
+
 
     class global_load_in_t(mc_base_t):
         def __init__(self, mc, outer):
@@ -549,7 +574,7 @@ class igemm_fwd_gtc_t(mc_base_t):
                         #self._emit(f"s_mov_b64 exec, -1")
                         pass
                     else:
-                        self._emit(f".v_clear_nc {v.v_gld_b()}, {m_in_2d_global_load.ctrl.length_d0 * m_in_2d_global_load.ctrl.length_d1}")
+                        self._emit(macro_c_clear_t(self.mc)(v.v_gld_b(), f"{m_in_2d_global_load.ctrl.length_d0 * m_in_2d_global_load.ctrl.length_d1}"))
                         self._emit(f"v_cmp_eq_u32 vcc, 1, v[{v.v_in_flag()}]")
                         self._emit(f"s_and_saveexec_b64 s[{s.s_tmp(4)}:{s.s_tmp(5)}], vcc")
                 if self.outer.tunable.precache_soffset:
@@ -811,7 +836,9 @@ class igemm_fwd_gtc_t(mc_base_t):
             mc_base_t.__init__(self, mc)
             self.outer = outer
             is_vgpr_acc_c = outer.tunable.fma_type != IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS
-            vseq = gpr_sequencer_t()
+            is_gpr_pack = outer.tunable.gpr_pack and not is_vgpr_acc_c
+            vseq = gpr_allocator_t(granularity = 2)
+            live_p, live_l, live_pl = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_PROLOGUE_LOOP
             wei_data_per_vgpr        = 1 
             if outer.tunable.precision == "fp32":
                 wei_data_per_vgpr    = 1
@@ -820,6 +847,10 @@ class igemm_fwd_gtc_t(mc_base_t):
             if is_vgpr_acc_c:
                 self.v_c             = sym_t("v_c"            ,vseq(outer.tunable.num_vgpr_accumulate_c))
                 v_c_num              = vseq()
+            elif is_gpr_pack:
+                # v_c is only used by coalescing store, and can share with any vgpr not live in epilogue
+                v_c_coalescing_num   = outer.tunable.num_agpr_accumulate_c // outer.coalescing_store_groups
+                self.v_c             = sym_t("v_c"            ,vseq(v_c_coalescing_num, live=GPR_LIVE_EPILOGUE), f"coalescing:{v_c_coalescing_num}")
             else:
                 
                 v_c_resuable_num     = outer.tunable.num_vgpr_accumulate_a + outer.tunable.num_vgpr_accumulate_b + \
@@ -832,35 +863,37 @@ class igemm_fwd_gtc_t(mc_base_t):
                 self.v_c             = sym_t("v_c"            ,vseq(v_c_needed), f"coalescing:{v_c_coalescing_num}, needed:{v_c_needed}, resuable:{v_c_resuable_num}")
 
             
-            self.v_a                 = sym_t("v_a"            ,vseq(outer.tunable.num_vgpr_accumulate_a))
-            self.v_b                 = sym_t("v_b"            ,vseq(outer.tunable.num_vgpr_accumulate_b))
-            self.v_gld_a             = sym_t("v_gld_a"        ,vseq(outer.tunable.num_vgpr_global_load_a // wei_data_per_vgpr))
-            self.v_gld_b             = sym_t("v_gld_b"        ,vseq(outer.tunable.num_vgpr_global_load_b))
-            self.v_sst_a_os          = sym_t("v_sst_a_os"     ,vseq(1))
-            self.v_sst_b_os          = sym_t("v_sst_b_os"     ,vseq(1))
-            self.v_sld_a_os          = sym_t("v_sld_a_os"     ,vseq(1))
-            self.v_sld_b_os          = sym_t("v_sld_b_os"     ,vseq(1))
-            self.v_in_os             = sym_t("v_in_os"        ,vseq(1))
-            self.v_in_os_base        = sym_t("v_in_os_base"   ,vseq(1))
+            self.v_a                 = sym_t("v_a"            ,vseq(outer.tunable.num_vgpr_accumulate_a, live=live_l))
+            self.v_b                 = sym_t("v_b"            ,vseq(outer.tunable.num_vgpr_accumulate_b, live=live_l))
+            self.v_gld_a             = sym_t("v_gld_a"        ,vseq(outer.tunable.num_vgpr_global_load_a // wei_data_per_vgpr, live=live_pl))
+            self.v_gld_b             = sym_t("v_gld_b"        ,vseq(outer.tunable.num_vgpr_global_load_b, live=live_pl))
+            self.v_sst_a_os          = sym_t("v_sst_a_os"     ,vseq(1, live=live_pl))
+            self.v_sst_b_os          = sym_t("v_sst_b_os"     ,vseq(1, live=live_pl))
+            self.v_sld_a_os          = sym_t("v_sld_a_os"     ,vseq(1, live=live_pl))
+            self.v_sld_b_os          = sym_t("v_sld_b_os"     ,vseq(1, live=live_pl))
+            self.v_in_os             = sym_t("v_in_os"        ,vseq(1, live=live_pl))
+            self.v_in_os_base        = sym_t("v_in_os_base"   ,vseq(1, live=live_pl))
             if outer.tunable.nxe != 0:
-                self.v_in_flag       = sym_t("v_in_flag"      ,vseq(1))
-            self.v_wei_os            = sym_t("v_wei_os"       ,vseq(1))
+                self.v_in_flag       = sym_t("v_in_flag"      ,vseq(1, live=live_pl))
+            self.v_wei_os            = sym_t("v_wei_os"       ,vseq(1, live=live_pl))
 
-            self.v_gtc_ta_ik1        = sym_t("v_gtc_ta_ik1"   ,vseq(1))
-            self.v_gtc_ta_ik0        = sym_t("v_gtc_ta_ik0"   ,vseq(1))
-            self.v_gtc_ta_ic1e       = sym_t("v_gtc_ta_ic1e"  ,vseq(1))
-            self.v_gtc_ta_ic0        = sym_t("v_gtc_ta_ic0"   ,vseq(1))
+            self.v_gtc_ta_ik1        = sym_t("v_gtc_ta_ik1"   ,vseq(1, live=live_p))
+            self.v_gtc_ta_ik0        = sym_t("v_gtc_ta_ik0"   ,vseq(1, live=live_p))
+            self.v_gtc_ta_ic1e       = sym_t("v_gtc_ta_ic1e"  ,vseq(1, live=live_p))
             if IGEMM_GTC_FEAT_USE_BUFFER_LOAD_OOB == 1 and self.outer.tunable.nxe != 0:
-                self.v_in_flag_prev      = sym_t("v_in_flag_prev" ,self.v_gtc_ta_ic0.value)
+                self.v_gtc_ta_ic0    = sym_t("v_gtc_ta_ic0"   ,vseq(1, live=live_pl))
+                self.v_in_flag_prev  = sym_t("v_in_flag_prev" ,self.v_gtc_ta_ic0.value)
+            else:
+                self.v_gtc_ta_ic0    = sym_t("v_gtc_ta_ic0"   ,vseq(1, live=live_p))
 
-            self.v_gtc_tb_in1b       = sym_t("v_gtc_tb_in1b"  ,vseq(1))
-            self.v_gtc_tb_in0        = sym_t("v_gtc_tb_in0"   ,vseq(1))
-            self.v_gtc_tb_ic1e       = sym_t("v_gtc_tb_ic1e"  ,vseq(1))
+            self.v_gtc_tb_in1b       = sym_t("v_gtc_tb_in1b"  ,vseq(1, live=live_p))
+            self.v_gtc_tb_in0        = sym_t("v_gtc_tb_in0"   ,vseq(1, live=live_p))
+            self.v_gtc_tb_ic1e       = sym_t("v_gtc_tb_ic1e"  ,vseq(1, live=live_p if outer.tunable.nxe != 0 else live_pl))
             # self.v_gtc_tb_ic0        = sym_t("v_gtc_tb_ic0"   ,vseq(1))
-            self.v_gtc_tb_in1        = sym_t("v_gtc_tb_in1"   ,vseq(1))
-            self.v_gtc_tb_ib         = sym_t("v_gtc_tb_ib"    ,vseq(1))
+            self.v_gtc_tb_in1        = sym_t("v_gtc_tb_in1"   ,vseq(1, live=live_p))
+            self.v_gtc_tb_ib         = sym_t("v_gtc_tb_ib"    ,vseq(1, live=live_p))
             if outer.tunable.nxe != 0:
-                self.v_gtc_tb_ic1     = sym_t("v_gtc_tb_ic1"  ,vseq(1))
+                self.v_gtc_tb_ic1     = sym_t("v_gtc_tb_ic1"  ,vseq(1, live=live_pl))
 
             self.v_co_sst            = sym_t("v_co_sst"       ,vseq(1))
             self.v_co_sld            = sym_t("v_co_sld"       ,vseq(1))
@@ -868,36 +901,42 @@ class igemm_fwd_gtc_t(mc_base_t):
             self.v_out_os            = sym_t("v_out_os"       ,vseq(1))
             if outer.tunable.nxe != 0:
                 self.v_out_flag      = sym_t("v_out_flag"     ,vseq(1))
-            self.v_out_in0           = sym_t("v_out_in0"      ,vseq(1))
-            self.v_out_in1b          = sym_t("v_out_in1b"     ,vseq(1))
-            self.v_out_in1           = sym_t("v_out_in1"      ,vseq(1))
-
-            self.v_in_iho           = sym_t("v_in_iho"        ,vseq(1))
-            self.v_in_iwo           = sym_t("v_in_iwo"        ,vseq(1))
-            self.v_in_ihi           = sym_t("v_in_ihi"        ,vseq(1))
-            self.v_in_iwi           = sym_t("v_in_iwi"        ,vseq(1))
+            self.v_out_in0           = sym_t("v_out_in0"      ,vseq(1, live=live_p))
+            self.v_out_in1b          = sym_t("v_out_in1b"     ,vseq(1, live=live_p))
+            self.v_out_in1           = sym_t("v_out_in1"      ,vseq(1, live=live_p))
+
+            live_in_index            = live_pl if outer.tunable.nxe != 0 else live_p
+            self.v_in_iho           = sym_t("v_in_iho"        ,vseq(1, live=live_in_index))
+            self.v_in_iwo           = sym_t("v_in_iwo"        ,vseq(1, live=live_in_index))
+            self.v_in_ihi           = sym_t("v_in_ihi"        ,vseq(1, live=live_in_index))
+            self.v_in_iwi           = sym_t("v_in_iwi"        ,vseq(1, live=live_in_index))
             if outer.tunable.nxe != 0:
-                self.v_in_iy            = sym_t("v_in_iy"     ,vseq(1))
-                self.v_in_ix            = sym_t("v_in_ix"     ,vseq(1))
+                self.v_in_iy            = sym_t("v_in_iy"     ,vseq(1, live=live_pl))
+                self.v_in_ix            = sym_t("v_in_ix"     ,vseq(1, live=live_pl))
 
             self.v_move_slice_k_ic1  = sym_t("v_move_slice_k_ic1" , self.v_gtc_tb_ic1.value if outer.tunable.nxe != 0 else self.v_gtc_tb_ic1e.value)
             if outer.tunable.nxe != 0:
                 self.v_move_slice_k_iy = sym_t("v_move_slice_k_iy", self.v_in_iy.value)
                 self.v_move_slice_k_ix = sym_t("v_move_slice_k_ix", self.v_in_ix.value)
 
-            self.v_gemm_in       = sym_t("v_gemm_in"      , vseq(1))
-            self.v_gemm_im       = sym_t("v_gemm_im"      , vseq(1))
+            self.v_gemm_in       = sym_t("v_gemm_in"      , vseq(1, live=live_p))
+            self.v_gemm_im       = sym_t("v_gemm_im"      , vseq(1, live=live_p))
 
-            self.v_out_iho        = sym_t("v_out_iho" ,vseq(1))
-            self.v_out_iwo        = sym_t("v_out_iwo" ,vseq(1))
+            self.v_out_iho        = sym_t("v_out_iho" ,vseq(1, live=live_p))
+            self.v_out_iwo        = sym_t("v_out_iwo" ,vseq(1, live=live_p))
             self.v_co_sub_m_index = sym_t("v_co_sub_m_index" ,vseq(1))
-            self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1))
+            self.v_co_sub_n_index = sym_t("v_co_sub_n_index" ,vseq(1, live=live_p))
 
             self.v_cur_k          = sym_t("v_cur_k" ,vseq(1))
 
             self.v_tmp           = sym_t("v_tmp"          ,vseq(6, 2))
             if IGEMM_FWD_GTC_DEBUG == 1:
                 self.v_dbg           = sym_t("v_dbg"          ,vseq(2, 2))
+            self.gpr_allocator   = None
+            if is_gpr_pack:
+                vseq.reserve(0, 1, GPR_LIVE_PROLOGUE)       # v0 is local id when kernel start
+                vseq.pack(self)
+                self.gpr_allocator = vseq
             total_vgpr           = vseq()
             if outer.tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
                 # if xdlops agpr is larger than vgpr usage, must change vgpr count to agpr
@@ -2296,6 +2335,9 @@ class igemm_fwd_gtc_t(mc_base_t):
             fctrl.lds_buffer_num              = self.tunable.lds_buffer_num
             fctrl.local_prefetch_num          = self.tunable.local_prefetch_num
             fctrl.interleave                  = self.tunable.fma_interleave
+            fctrl.scheduler_type              = SCHEDULER_TYPE_LIST if self.tunable.scheduler == 'list' else SCHEDULER_TYPE_SIMPLE_INTERLEAVE
+            fctrl.symbol_table                = sym_get_table(self.sgpr, self.vgpr, self.agpr)
+            fctrl.gpr_extent                  = {'v' : self.vgpr.gpr_allocator.get_extent(GPR_LIVE_LOOP)} if self.vgpr.gpr_allocator else None
 
             # functor
             fctrl.global_load_a_functor       = self.global_load_wei
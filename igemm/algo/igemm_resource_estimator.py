@@ -0,0 +1,402 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from ..codegen import *
+from .utility import *
+from .igemm_base import *
+from .igemm_fwd_gtc import IGEMM_FWD_GTC_DEBUG
+from .igemm_wrw_gtc import IGEMM_WRW_GTC_DEBUG
+
+IGEMM_RESOURCE_VGPR_LIMIT = 256
+IGEMM_RESOURCE_AGPR_LIMIT = 256
+
+def _gld_length_d0_d1(thread_copy_dims):
+    '''
+    length_d0, length_d1 of the 2d global load, same as get_macro_global_load() of each direction
+    '''
+    thread_copy_index = [idx for idx, item in enumerate(thread_copy_dims) if item != 1]
+    if len(thread_copy_index) == 2:
+        return thread_copy_dims[thread_copy_index[0]], thread_copy_dims[thread_copy_index[1]]
+    elif len(thread_copy_index) == 1:
+        return 1, thread_copy_dims[thread_copy_index[0]]
+    return 1, thread_copy_dims[-1]
+
+def _gld_num_precache_soffset(length_d0, length_d1, vector_d1):
+    '''
+    same as macro_igemm_2d_global_load_precache_soffset_t.get_num_precache_soffset(),
+    first 3 issues, (0,0), (0,1), (1,0), do not need a soffset
+    '''
+    n_d1 = length_d1 // vector_d1
+    cnt = length_d0 * n_d1 - 1
+    if n_d1 > 1:
+        cnt -= 1
+    if length_d0 > 1:
+        cnt -= 1
+    return cnt
+
+class igemm_resource_estimator_t(object):
+    '''
+    sgpr/vgpr/agpr/lds usage of a gtc kernel, computed from tunable only.
+    this follow the same allocation sequence of kernel_sgpr_t/kernel_vgpr_t/kernel_agpr_t in
+    igemm_fwd_gtc_t/igemm_bwd_gtc_t/igemm_wrw_gtc_t, but without constructing the kernel.
+    any change of those allocators should be reflected here, unittest_resource_estimator() will check.
+    '''
+    def __init__(self, tunable):
+        assert type(tunable) is igemm_gtc_tunable_parameter_t
+        self.tunable = tunable
+        self.is_xdlops = tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS
+        self.coalescing_store_groups = igemm_next_pow2(tunable.coalescing_store_groups)
+        if tunable.direction == 'fwd':
+            self.sgpr, self.vgpr = self.get_sgpr_vgpr_fwd()
+        elif tunable.direction == 'bwd':
+            self.sgpr, self.vgpr = self.get_sgpr_vgpr_bwd()
+        elif tunable.direction == 'wrw':
+            self.sgpr, self.vgpr = self.get_sgpr_vgpr_wrw()
+        else:
+            assert False, f"unsupported direction:{tunable.direction}"
+        self.agpr = tunable.num_agpr_accumulate_c if self.is_xdlops else 0
+        self.lds = tunable.lds_total
+
+    def get_sgpr_vgpr_fwd(self):
+        t = self.tunable
+        nxe = t.nxe != 0
+        ta_c0, ta_c1e, ta_k0, ta_k1 = t.tensor_a_thread_lengths
+        tb_c0, tb_c1e, tb_n0, tb_n1b = t.tensor_b_thread_lengths
+
+        sseq = gpr_sequencer_t()
+        sseq(2 + 1 + 1 + 4 * 3 + 5)         # s_ka ... s_c
+        if nxe:
+            sseq(10)                        # s_ho ... s_x
+        sseq(1)                             # s_group
+        if nxe:
+            sseq(1)                         # s_wei_stride_c
+            if ta_c0 != 1:
+                sseq(1)
+            sseq(1)                         # s_wei_stride_k
+        if ta_k0 != 1:
+            sseq(1)
+        if not nxe:
+            sseq(1)                         # s_stride_hw
+        sseq(2)                             # s_in_stride_c, s_in_stride_n
+        if tb_c0 != 1:
+            sseq(1)
+        if tb_n0 != 1:
+            sseq(1)
+        sseq(2)                             # s_out_stride_k, s_out_stride_n
+        if t.gemm_n_unmerge_cluster:
+            sseq(1)
+        sseq(2 + 4 + 1)                     # s_in_stride_c_c1 ... s_move_slice_k_c1e
+        if nxe:
+            sseq(2)
+        sseq(1)                             # s_gemm_k_num_c1
+        if t.precache_soffset:
+            data_bytes = amdgpu_precision_data_byte(t.precision)
+            # one vgpr can hold one fp32 pixel or 2 fp16/bf16 pixel
+            wei_vector_d1 = utility_gcd(ta_c1e, 4 * (4 // data_bytes)) if ta_c1e != 1 else 1
+            in_vector_d1 = utility_gcd(tb_n1b, 4 * (4 // data_bytes)) if tb_n1b != 1 else 1
+            sseq(_gld_num_precache_soffset(*_gld_length_d0_d1([ta_k0, ta_k1, ta_c0, ta_c1e]), wei_vector_d1))
+            sseq(_gld_num_precache_soffset(*_gld_length_d0_d1([tb_c0, tb_c1e, tb_n0, tb_n1b]), in_vector_d1))
+        sseq(1)                             # s_k_padded
+        sseq(6, 2)                          # s_tmp
+
+        wei_data_per_vgpr = 2 if t.precision != "fp32" and ta_c1e > 1 else 1
+        if self.is_xdlops and t.gpr_pack:
+            return sseq(), self.get_vgpr_packed_fwd(wei_data_per_vgpr)
+        vseq = gpr_sequencer_t()
+        if self.is_xdlops:
+            v_c_resuable_num = t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                                t.num_vgpr_global_load_a // wei_data_per_vgpr + \
+                                t.num_vgpr_global_load_b + (18 if nxe else 16)
+            v_c_coalescing_num = t.num_agpr_accumulate_c // self.coalescing_store_groups
+            vseq(max(v_c_coalescing_num - v_c_resuable_num, 0))
+        else:
+            vseq(t.num_vgpr_accumulate_c)
+        vseq(t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                t.num_vgpr_global_load_a // wei_data_per_vgpr + t.num_vgpr_global_load_b)
+        vseq(6)                             # v_sst_a_os ... v_in_os_base
+        if nxe:
+            vseq(1)                         # v_in_flag
+        vseq(1 + 4 + 5)                     # v_wei_os, v_gtc_ta_*, v_gtc_tb_*
+        if nxe:
+            vseq(1)                         # v_gtc_tb_ic1
+        vseq(2 + 1)                         # v_co_sst, v_co_sld, v_out_os
+        if nxe:
+            vseq(1)                         # v_out_flag
+        vseq(3 + 4)                         # v_out_in0 ... v_in_iwi
+        if nxe:
+            vseq(2)                         # v_in_iy, v_in_ix
+        vseq(2 + 4 + 1)                     # v_gemm_in ... v_cur_k
+        vseq(6, 2)                          # v_tmp
+        if IGEMM_FWD_GTC_DEBUG == 1:
+            vseq(2, 2)
+        return sseq(), self.get_total_vgpr(vseq())
+
+    def get_sgpr_vgpr_bwd(self):
+        t = self.tunable
+        nxe = t.nxe != 0
+        t_k0, t_k1e, t_c0, t_c1 = t.tensor_a_thread_lengths
+        _, _, t_n0, t_n1b = t.tensor_b_thread_lengths
+
+        sseq = gpr_sequencer_t(46 if nxe else 22)
+        if not nxe:
+            sseq(2)                         # s_out_stride_k, s_stride_hw
+        if t_k0 != 1:
+            sseq(1)
+        if not nxe:
+            sseq(1)                         # s_out_stride_n
+        if t_n0 != 1:
+            sseq(1)
+        if t.gemm_m_unmerge_cluster == 1:
+            sseq(1)
+        sseq(1)                             # s_in_stride_c
+        if t.gemm_n_unmerge_cluster == 1:
+            sseq(1)
+        if not nxe:
+            sseq(1)                         # s_in_stride_n
+        if nxe:
+            sseq(1)                         # s_wei_stride_c
+        if t_c0 != 1:
+            sseq(1)
+        sseq(1)                             # s_wei_stride_k
+        if t_k0 != 1:
+            sseq(1)
+        if not nxe:
+            sseq(4 + 1)                     # s_out_stride_k_k1 ... s_move_slice_k_k1
+        sseq(4)                             # s_block_gtc_*
+        if t.precache_soffset:
+            out_vector_d1 = igemm_gcd(t_n1b, 4) if t_n1b != 1 else 1
+            wei_vector_d1 = igemm_gcd(t_c1, 4) if not nxe else 1
+            sseq(_gld_num_precache_soffset(*_gld_length_d0_d1([t_k0, t_k1e, t_n0, t_n1b]), out_vector_d1))
+            sseq(_gld_num_precache_soffset(*_gld_length_d0_d1([t_k0, t_k1e, t_c0, t_c1]), wei_vector_d1))
+            sseq(1)                         # s_c_padded
+        sseq(6, 2)                          # s_tmp
+
+        if self.is_xdlops and t.gpr_pack:
+            return sseq(), self.get_vgpr_packed_bwd()
+        vseq = gpr_sequencer_t()
+        if self.is_xdlops:
+            v_c_resuable_num = t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                                t.num_vgpr_global_load_a + t.num_vgpr_global_load_b + 8
+            v_c_coalescing_num = t.num_agpr_accumulate_c // self.coalescing_store_groups
+            vseq(max(v_c_coalescing_num - v_c_resuable_num, 2))
+        else:
+            vseq(t.num_vgpr_accumulate_c)
+        v_c_num = vseq.get()
+        vseq(t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                t.num_vgpr_global_load_a + t.num_vgpr_global_load_b)
+        vseq(6 + 1 + 1 + 2 + 1 + 1)         # v_sst_a_os ... v_out_iwo, v_out_os, v_wei_os, v_co_*, v_in_os, v_gtc_ik1
+        if nxe:
+            vseq(2 + 1 + 4 + 1 + 1 + 1 + 2) # dslice, os_base, wei/dtile index, flags, v_gtc_dslice_*
+        # v_in_* and v_co_sub_*_index
+        num_in_index = 5 + 2 + (2 if nxe else 0)
+        if self.is_xdlops:
+            vseq(9 + num_in_index)          # v_gtc_ic0 ... v_gemm_im, reuse v_c if vgpr accumulate
+        elif v_c_num < 16:
+            vseq(num_in_index)
+        vseq(1)                             # v_cur_c
+        vseq(6, 2)                          # v_tmp
+        return sseq(), self.get_total_vgpr(vseq())
+
+    def get_sgpr_vgpr_wrw(self):
+        t = self.tunable
+        nxe = t.nxe != 0
+        t_n0, t_n1b, t_k0, t_k1 = t.tensor_a_thread_lengths
+        _, _, t_c0, t_c1e = t.tensor_b_thread_lengths
+
+        sseq = gpr_sequencer_t(30 + 1)
+        sseq(2 + 4 + 4 + 1)                 # s_gemmk_split ... s_wei_stride_c
+        if t.gemm_n_unmerge_cluster == 1:
+            sseq(1)
+        sseq(1)                             # s_wei_stride_k
+        if t.gemm_n_unmerge_cluster == 1:
+            sseq(1)
+        sseq(4 + 1 + 2)                     # s_out_stride_n_n1 ... s_move_slice_n_dswo
+        if nxe:
+            sseq(1)                         # s_dim_b
+        sseq(6 + 2)                         # s_block_gtc_*, s_gemm_k_num_dsho/dswo
+        if t.precache_soffset:
+            vector_d1 = igemm_gcd(t_n1b, 4) if t.nxb != 1 and not nxe else 1
+            for thread_copy_dims in ([t_n0, t_n1b, t_c0, t_c1e], [t_n0, t_n1b, t_k0, t_k1]):
+                length_d0, length_d1 = _gld_length_d0_d1(thread_copy_dims)
+                if len([d for d in thread_copy_dims if d != 1]) == 2 and t_n1b != 1:
+                    length_d0, length_d1 = 1, length_d1 * t_n1b
+                sseq(_gld_num_precache_soffset(length_d0, length_d1, vector_d1))
+        sseq(1)                             # s_sub_n
+        if IGEMM_WRW_GTC_DEBUG == 1:
+            sseq(2, 2)
+        sseq(1)                             # s_k_padded
+        sseq(6, 2)                          # s_tmp
+
+        if self.is_xdlops and t.gpr_pack:
+            return sseq(), self.get_vgpr_packed_wrw()
+        vseq = gpr_sequencer_t()
+        if self.is_xdlops:
+            v_c_resuable_num = t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                                t.num_vgpr_global_load_a + t.num_vgpr_global_load_b + 8
+            v_c_coalescing_num = t.num_agpr_accumulate_c // self.coalescing_store_groups
+            vseq(max(v_c_coalescing_num - v_c_resuable_num, 2))
+        else:
+            vseq(t.num_vgpr_accumulate_c)
+        v_c_num = vseq.get()
+        vseq(t.num_vgpr_accumulate_a + t.num_vgpr_accumulate_b + \
+                t.num_vgpr_global_load_a + t.num_vgpr_global_load_b)
+        vseq(12)                            # v_sst_a_os ... v_out_os_base
+        if nxe:
+            vseq(2)                         # v_in_flag, v_out_flag
+        vseq(2 + 3)                         # v_co_*, v_wei_flag, v_wei_os, v_gtc_ik1
+        if nxe:
+            vseq(2)                         # v_move_slice_n_in0, v_flag_n
+        vseq(2 + 2)                         # v_move_slice_n_idsho/idswo, v_wei_iy/ix
+        if self.is_xdlops:
+            vseq(9 + 5)                     # v_gtc_ic0 ... v_gemm_im, v_wei_ic*, v_co_sub_*_index
+        elif v_c_num < 16:
+            vseq(5)
+        vseq(1)                             # v_cur_k
+        vseq(8, 2)                          # v_tmp
+        return sseq(), self.get_total_vgpr(vseq())
+
+    def get_vgpr_packed(self, allocations):
+        '''
+        vgpr count when kernel_vgpr_t is packed by gpr_allocator_t, i.e. gpr_pack is on.
+        allocations is (step, alignment, live) of each vgpr symbol, in the same order of kernel_vgpr_t
+        '''
+        vseq = gpr_allocator_t(granularity = 2)
+        for step, alignment, live in allocations:
+            vseq(step, alignment, live)
+        vseq.reserve(0, 1, GPR_LIVE_PROLOGUE)       # v0 is local id when kernel start
+        vseq.pack()
+        return self.get_total_vgpr(vseq())
+
+    def get_vgpr_packed_fwd(self, wei_data_per_vgpr):
+        t = self.tunable
+        nxe = t.nxe != 0
+        P, L, E, PL, ALL = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_EPILOGUE, GPR_LIVE_PROLOGUE_LOOP, GPR_LIVE_ALL
+        v = [(t.num_agpr_accumulate_c // self.coalescing_store_groups, 0, E),
+                (t.num_vgpr_accumulate_a, 0, L), (t.num_vgpr_accumulate_b, 0, L),
+                (t.num_vgpr_global_load_a // wei_data_per_vgpr, 0, PL), (t.num_vgpr_global_load_b, 0, PL)]
+        v += [(1, 0, PL)] * (6 + (1 if nxe else 0) + 1)        # v_sst_a_os ... v_in_os_base, v_in_flag, v_wei_os
+        v += [(1, 0, P)] * 3                                    # v_gtc_ta_ik1, v_gtc_ta_ik0, v_gtc_ta_ic1e
+        v += [(1, 0, PL if IGEMM_GTC_FEAT_USE_BUFFER_LOAD_OOB == 1 and nxe else P)]    # v_gtc_ta_ic0
+        v += [(1, 0, P)] * 2 + [(1, 0, P if nxe else PL)] + [(1, 0, P)] * 2            # v_gtc_tb_*
+        if nxe:
+            v += [(1, 0, PL)]                                   # v_gtc_tb_ic1
+        v += [(1, 0, ALL)] * (3 + (1 if nxe else 0))           # v_co_sst, v_co_sld, v_out_os, v_out_flag
+        v += [(1, 0, P)] * 3                                    # v_out_in0, v_out_in1b, v_out_in1
+        v += [(1, 0, PL if nxe else P)] * 4                     # v_in_iho ... v_in_iwi
+        if nxe:
+            v += [(1, 0, PL)] * 2                               # v_in_iy, v_in_ix
+        v += [(1, 0, P)] * 4                                    # v_gemm_in ... v_out_iwo
+        v += [(1, 0, ALL), (1, 0, P), (1, 0, ALL)]              # v_co_sub_m_index, v_co_sub_n_index, v_cur_k
+        v += [(6, 2, ALL)]                                      # v_tmp
+        if IGEMM_FWD_GTC_DEBUG == 1:
+            v += [(2, 2, ALL)]
+        return self.get_vgpr_packed(v)
+
+    def get_vgpr_packed_bwd(self):
+        t = self.tunable
+        nxe = t.nxe != 0
+        P, L, E, PL, ALL = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_EPILOGUE, GPR_LIVE_PROLOGUE_LOOP, GPR_LIVE_ALL
+        v = [(t.num_agpr_accumulate_c // self.coalescing_store_groups, 0, E),
+                (t.num_vgpr_accumulate_a, 0, L), (t.num_vgpr_accumulate_b, 0, L),
+                (t.num_vgpr_global_load_a, 0, PL), (t.num_vgpr_global_load_b, 0, PL)]
+        v += [(1, 0, PL)] * (6 + 1 + 1 + (2 + 1 + 4 + 1 + 1 if nxe else 0))   # v_sst_a_os ... v_out_flag
+        v += [(1, 0, ALL)] * (2 + (1 if nxe else 0) + 1)       # v_co_sst, v_co_sld, v_in_flag, v_in_os
+        v += [(1, 0, PL)] * (1 + (2 if nxe else 0))             # v_gtc_ik1, v_gtc_dslice_iy, v_gtc_dslice_ix
+        v += [(1, 0, P)] * (9 + 5 + (2 if nxe else 0))          # v_gtc_ic0 ... v_gemm_im, v_in_*
+        v += [(1, 0, ALL), (1, 0, P), (1, 0, ALL)]              # v_co_sub_m_index, v_co_sub_n_index, v_cur_c
+        v += [(6, 2, ALL)]                                      # v_tmp
+        return self.get_vgpr_packed(v)
+
+    def get_vgpr_packed_wrw(self):
+        t = self.tunable
+        nxe = t.nxe != 0
+        P, L, E, PL, ALL = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_EPILOGUE, GPR_LIVE_PROLOGUE_LOOP, GPR_LIVE_ALL
+        v = [(t.num_agpr_accumulate_c // self.coalescing_store_groups, 0, E),
+                (t.num_vgpr_accumulate_a, 0, L), (t.num_vgpr_accumulate_b, 0, L),
+                (t.num_vgpr_global_load_a, 0, PL), (t.num_vgpr_global_load_b, 0, PL)]
+        v += [(1, 0, PL)] * 8                                   # v_sst_a_os ... v_in_os_base
+        v += [(1, 0, P)] * 2                                    # v_out_iho, v_out_iwo
+        v += [(1, 0, PL)] * (2 + (2 if nxe else 0))             # v_out_os, v_out_os_base, v_in_flag, v_out_flag
+        v += [(1, 0, ALL)] * 2 + [(1, 0, PL), (1, 0, ALL), (1, 0, P)]  # v_co_sst, v_co_sld, v_wei_flag, v_wei_os, v_gtc_ik1
+        if nxe:
+            v += [(1, 0, P), (1, 0, PL)]                        # v_move_slice_n_in0, v_flag_n
+        v += [(1, 0, PL)] * 4                                   # v_move_slice_n_idsho/idswo, v_wei_iy/ix
+        v += [(1, 0, P)] * (9 + 3)                              # v_gtc_ic0 ... v_gemm_im, v_wei_ic*
+        v += [(1, 0, ALL), (1, 0, P), (1, 0, ALL)]              # v_co_sub_m_index, v_co_sub_n_index, v_cur_k
+        v += [(8, 2, ALL)]                                      # v_tmp
+        return self.get_vgpr_packed(v)
+
+    def get_total_vgpr(self, total_vgpr):
+        if self.is_xdlops:
+            # if xdlops agpr is larger than vgpr usage, must change vgpr count to agpr
+            return max(total_vgpr, self.tunable.num_agpr_accumulate_c)
+        return total_vgpr
+
+    def get_sgpr_count(self):
+        return self.sgpr
+
+    def get_vgpr_count(self):
+        return self.vgpr
+
+    def get_agpr_count(self):
+        return self.agpr
+
+    def get_lds_size(self):
+        return self.lds
+
+    def is_valid(self, arch):
+        '''
+        if the kernel can be assembled at all
+        '''
+        return self.sgpr <= amdgpu_sgpr_limit(arch) and self.vgpr <= IGEMM_RESOURCE_VGPR_LIMIT and \
+                self.agpr <= IGEMM_RESOURCE_AGPR_LIMIT
+
+    def get_occupancy_limits(self, arch_detail):
+        '''
+        number of workgroups can be resident in one CU, limited by each of vgpr, agpr, lds and waves
+        '''
+        block_size = self.tunable.block_size
+        limits = dict()
+        granularity = arch_detail.vgpr_granularity
+        if arch_detail.unified_vgpr_file:
+            # agpr start after vgpr aligned to 4, both allocated together
+            num_gpr = igemm_next_mul(igemm_next_mul(self.vgpr, 4) + self.agpr, granularity)
+            limits['vgpr'] = (arch_detail.vgpr_per_cu + arch_detail.agpr_per_cu) // (num_gpr * block_size)
+        else:
+            limits['vgpr'] = arch_detail.vgpr_per_cu // (igemm_next_mul(self.vgpr, granularity) * block_size)
+            if self.agpr != 0:
+                limits['agpr'] = arch_detail.agpr_per_cu // (igemm_next_mul(self.agpr, granularity) * block_size)
+        if self.lds != 0:
+            limits['lds'] = arch_detail.lds_size // self.lds
+        limits['waves'] = arch_detail.max_waves_per_cu // (block_size // arch_detail.wavefront_size)
+        return limits
+
+    def get_occupancy(self, arch_detail):
+        '''
+        number of workgroups can be resident in one CU. return 0 if the kernel can not be launched
+        '''
+        return min(self.get_occupancy_limits(arch_detail).values())
@@ -98,6 +98,7 @@ class igemm_upsampling_clear_t(mc_base_t):
     def __init__(self, mc, tunable):
         mc_base_t.__init__(self, mc)
         self.tunable = tunable
+        self.mc.inline_macro = self.tunable.macro_inline == 1     # must be set before any macro is created
         self.karg = self.kernel_karg_t(mc, self)
         self.sgpr = self.kernel_sgpr_t(mc, self)
         self.vgpr = self.kernel_vgpr_t(mc, self)
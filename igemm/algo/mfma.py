@@ -53,7 +53,7 @@ class inst_mfma_t(object):
         # self.num_a_c_per_lanegroup = 4      # all xdlops instruction output agpr is 4 agpr per lanegroup.
         #assert arch_config.arch == AMDGPU_ARCH_GFX908 and arch_config.use_xdlops
 
-    def __call__(self, reg_d, reg_a, reg_b, reg_c, cbsz=0, abid=0, blgp=0):
+    def name(self):
         def src_datatype_string(data_type_string):
             if data_type_string == 'fp32':
                 return 'f32'
@@ -65,7 +65,14 @@ class inst_mfma_t(object):
 
         mfma_acc_type = 'f32' # TODO: int8 mfma accumulate type is i32
         mfma_trait = f'{self.m}x{self.n}x{self.k}' + src_datatype_string(inst_mfma_data_type_to_string(self.data_type))
-        mfma_inst = f'v_mfma_{mfma_acc_type}_{mfma_trait}'
+        return f'v_mfma_{mfma_acc_type}_{mfma_trait}'
+
+    def get_flop(self):
+        # per wave
+        return 2 * self.m * self.n * self.k * self.num_blocks
+
+    def __call__(self, reg_d, reg_a, reg_b, reg_c, cbsz=0, abid=0, blgp=0):
+        mfma_inst = self.name()
         cbsz_str = f"cbsz:{cbsz}" if cbsz != 0 else ""
         abid_str = f"abid:{abid}" if abid != 0 else ""
         blgp_str = f"blgp:{blgp}" if blgp != 0 else ""
@@ -95,6 +102,16 @@ v_mfma_f32_16x16x8bf16  = inst_mfma_t(16, 16, 8,  AMDGPU_PRECISION_BF16,  32,
 v_mfma_f32_32x32x2bf16  = inst_mfma_t(32, 32, 2,  AMDGPU_PRECISION_BF16,  64,   1,   1,  32,   2 )
 v_mfma_f32_32x32x4bf16  = inst_mfma_t(32, 32, 4,  AMDGPU_PRECISION_BF16,  64,   1,   1,  16,   1 )
 
+inst_mfma_list = [v_mfma_f32_4x4x1f32, v_mfma_f32_16x16x1f32, v_mfma_f32_16x16x4f32, v_mfma_f32_32x32x1f32, v_mfma_f32_32x32x2f32,
+                  v_mfma_f32_4x4x4f16, v_mfma_f32_16x16x4f16, v_mfma_f32_16x16x16f16, v_mfma_f32_32x32x4f16, v_mfma_f32_32x32x8f16,
+                  v_mfma_f32_4x4x2bf16, v_mfma_f32_16x16x2bf16, v_mfma_f32_16x16x8bf16, v_mfma_f32_32x32x2bf16, v_mfma_f32_32x32x4bf16]
+
+def inst_mfma_get_by_name(inst_name):
+    for mfma in inst_mfma_list:
+        if mfma.name() == inst_name:
+            return mfma
+    return None
+
 # class inst_composed_mfma_t(object):
 #     '''
 #     handy class to issue several mfma to form a wave wise mxn
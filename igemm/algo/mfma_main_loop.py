@@ -46,6 +46,9 @@ class ctrl_mfma_main_loop_t(object):
         self.lds_buffer_num              = 2
         self.local_prefetch_num          = 1
         self.interleave                  = False
+        self.scheduler_type              = SCHEDULER_TYPE_SIMPLE_INTERLEAVE
+        self.symbol_table                = None                  # label->value of kernel gpr symbol, used by list scheduler
+        self.gpr_extent                  = None                  # gpr range of packed kernel gpr, used by list scheduler
 
         # functor
         self.global_load_a_functor       = None
@@ -93,6 +96,15 @@ class mfma_main_loop_t(mc_base_t):
         f_move_slice_window_a = self.ctrl.move_slice_window_a_functor
         f_move_slice_window_b = self.ctrl.move_slice_window_b_functor
 
+        def do_interleave_fill(*functors):
+            '''
+            emit functors in order, as one fill mbb list of INTERLEAVE_PTN_N
+            '''
+            with self._deferred_context():
+                for f in functors:
+                    self._emit(f())
+            return self._get_deferred()
+
         v_a = self.ctrl.v_a
         v_b = self.ctrl.v_b
         a_c = self.ctrl.a_c
@@ -324,24 +336,25 @@ class mfma_main_loop_t(mc_base_t):
 
             if ((unroll_k // k_per_inst) // 2 - 1) != 0:
                 mbb_list_sub = [create_machine_basic_block(do_interleave_unroll_k_sub(), group_mbb_by_end_of_inst_op="v_mfma"),
-                            create_machine_basic_block(do_interleave_gload_and_move_slice_window())]
-                se_sub = create_scheduler(self.mc, mbb_list_sub)
+                            create_machine_basic_block(do_interleave_fill(f_gld_b, f_gld_a)),
+                            create_machine_basic_block(do_interleave_fill(f_move_slice_window_b, f_move_slice_window_a))]
+                se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                              create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
 
-                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
+                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1]))
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1))
             else:
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                              create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
                 self._emit(do_interleave_gload_and_move_slice_window())
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1))
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
                 self._emit(do_interleave_gload_and_move_slice_window())
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1))
 
@@ -737,7 +750,7 @@ class mfma_main_loop_t(mc_base_t):
             mbb_list_sub = [create_machine_basic_block(do_interleave_unroll_k_sub_lds_double_buffer(), group_mbb_by_end_of_inst_op="v_mfma"),
                             create_machine_basic_block(do_interleave_move_slice_window())]
 
-            se_sub = create_scheduler(self.mc, mbb_list_sub)
+            se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
             self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
 
             self._emit(f"; k iteration : {unroll_k - 2 * k_per_inst}")
@@ -840,7 +853,7 @@ class mfma_main_loop_t(mc_base_t):
             #    print(f'len x:{len(x)}')
             #    for y in x:
             #        y.dump()
-            se_last = create_scheduler(self.mc, mbb_list_last)
+            se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
             mbb_0_mfma_cnt_after_branch_to_start = 0 # if unroll_k_sub == 0 else 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
             self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
 
@@ -1203,17 +1216,6 @@ class mfma_main_loop_t(mc_base_t):
 
                 return self._get_deferred()
 
-            def do_interleave_gload_and_move_slice_window():
-                with self._deferred_context():
-                    if IGEMM_GTC_FEAT_BUFFER_LOAD_WITHOUT_INTERLEAVE == 1:
-                        pass
-                    else:
-                        self._emit(f_gld_b())
-                    self._emit(f_gld_a())
-                    self._emit(f_move_slice_window_b())
-                    self._emit(f_move_slice_window_a())
-                return self._get_deferred()
-
             def do_interleave_unroll_k_last():
                 with self._deferred_context():
                     unroll_k_sub = (unroll_k // k_per_inst) // 2 - 1
@@ -1311,16 +1313,17 @@ class mfma_main_loop_t(mc_base_t):
             self._emit(f_sld_a(v_a(repeat_m_thread_offset), v_sld_a_os(), lds_base_m + lds_gemm_k_pack * lds_width_m // 2 ))
 
             mbb_list_sub = [create_machine_basic_block(do_interleave_unroll_k_sub(), group_mbb_by_end_of_inst_op="v_mfma"),
-                            create_machine_basic_block(do_interleave_gload_and_move_slice_window())]
-            se_sub = create_scheduler(self.mc, mbb_list_sub)
+                            create_machine_basic_block(do_interleave_fill(*([f_gld_b] if IGEMM_GTC_FEAT_BUFFER_LOAD_WITHOUT_INTERLEAVE != 1 else []), f_gld_a)),
+                            create_machine_basic_block(do_interleave_fill(f_move_slice_window_b, f_move_slice_window_a))]
+            se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
 
             mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                             create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-            se_last = create_scheduler(self.mc, mbb_list_last)
+            se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
             if IGEMM_GTC_FEAT_BUFFER_LOAD_WITHOUT_INTERLEAVE == 1:
                 self._emit(f_gld_b())
-            self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
+            self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1]))
             mbb_0_mfma_cnt_after_branch_to_start = 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
             self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
 
@@ -1705,16 +1708,6 @@ class mfma_main_loop_t(mc_base_t):
 
             self._emit_empty_line()
 
-            def do_interleave_gload_and_move_slice_window():
-                with self._deferred_context():
-                    self._emit(f_move_slice_window_b())
-                    self._emit(f_move_slice_window_a())
-                    self._emit(f_gld_b())
-                    self._emit(f_gld_a())
-                return self._get_deferred()
-
-            #self._emit(do_interleave_gload_and_move_slice_window())
-
             def do_unroll_k_2x2_sub():
                 with self._deferred_context():
                     unroll_k_sub = unroll_k // k_per_inst - 1
@@ -1743,11 +1736,12 @@ class mfma_main_loop_t(mc_base_t):
 
             #self._emit(do_unroll_k_2x2_sub())
             mbb_list_sub = [create_machine_basic_block(do_unroll_k_2x2_sub(), group_mbb_by_end_of_inst_op="v_mfma"),
-                            create_machine_basic_block(do_interleave_gload_and_move_slice_window())]
+                            create_machine_basic_block(do_interleave_fill(f_move_slice_window_b, f_move_slice_window_a)),
+                            create_machine_basic_block(do_interleave_fill(f_gld_b, f_gld_a))]
 
-            se_sub = create_scheduler(self.mc, mbb_list_sub)
+            se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
 
-            self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
+            self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1]))
 
             self._emit(f"; last k_per_inst of unroll_k")
 
@@ -1777,7 +1771,7 @@ class mfma_main_loop_t(mc_base_t):
             mbb_list_last = [create_machine_basic_block(do_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                              create_machine_basic_block(do_shared_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-            se_last = create_scheduler(self.mc, mbb_list_last)
+            se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
             
             mbb_0_mfma_cnt_after_branch_to_start = 0#2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
             self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
@@ -2137,22 +2131,23 @@ class mfma_main_loop_t(mc_base_t):
 
             if (unroll_k // k_per_inst) // 2 - 1 != 0:
                 mbb_list_sub = [create_machine_basic_block(do_interleave_unroll_k_sub(), group_mbb_by_end_of_inst_op="v_mfma"),
-                                create_machine_basic_block(do_interleave_gload_and_move_slice_window())]
+                                create_machine_basic_block(do_interleave_fill(f_gld_b, f_gld_a)),
+                                create_machine_basic_block(do_interleave_fill(f_move_slice_window_b, f_move_slice_window_a))]
 
-                se_sub = create_scheduler(self.mc, mbb_list_sub)
+                se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
 
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                                 create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
-                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
+                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1]))
                 mbb_0_mfma_cnt_after_branch_to_start = 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
             else:
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                                 create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
                 self._emit(do_interleave_gload_and_move_slice_window())
                 mbb_0_mfma_cnt_after_branch_to_start = 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
@@ -2489,22 +2484,23 @@ class mfma_main_loop_t(mc_base_t):
 
             if (unroll_k // k_per_inst) // 2 - 1 != 0:
                 mbb_list_sub = [create_machine_basic_block(do_interleave_unroll_k_sub(), group_mbb_by_end_of_inst_op="v_mfma"),
-                                create_machine_basic_block(do_interleave_gload_and_move_slice_window())]
+                                create_machine_basic_block(do_interleave_fill(f_gld_b, f_gld_a)),
+                                create_machine_basic_block(do_interleave_fill(f_move_slice_window_b, f_move_slice_window_a))]
 
-                se_sub = create_scheduler(self.mc, mbb_list_sub)
+                se_sub = create_scheduler(self.mc, mbb_list_sub, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
 
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                                 create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
-                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_0))
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
+                self._emit(se_sub.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1]))
                 mbb_0_mfma_cnt_after_branch_to_start = 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
             else:
                 mbb_list_last = [create_machine_basic_block(do_interleave_unroll_k_last(), group_mbb_by_end_of_inst_op="v_mfma"),
                                 create_machine_basic_block(do_interleave_share_store(), group_mbb_by_end_of_inst_op="ds_write")]
 
-                se_last = create_scheduler(self.mc, mbb_list_last)
+                se_last = create_scheduler(self.mc, mbb_list_last, self.ctrl.scheduler_type, symbol_table=self.ctrl.symbol_table, gpr_extent=self.ctrl.gpr_extent)
                 self._emit(do_interleave_gload_and_move_slice_window())
                 mbb_0_mfma_cnt_after_branch_to_start = 2 * cxm.wave_step_m * cxm.wave_step_n - 1 # number of mfma not count into share store interleave slot, check do_interleave_unroll_k_last for last 2 mfma
                 self._emit(se_last.lower(interleave_pattern=INTERLEAVE_PTN_1, mbb_0_mfma_cnt_after_branch_to_start=mbb_0_mfma_cnt_after_branch_to_start))
@@ -2555,7 +2551,7 @@ class mfma_main_loop_t(mc_base_t):
         self._emit(f_sst_a())
         self._emit_empty_line()
 
-        self._emit(f".v_clear_acc_c {a_c()}, {cxm.total_acc_c()}")
+        self._emit(macro_acc_c_clear_t(self.mc)(a_c(), f"{cxm.total_acc_c()}"))
         self._emit(f"; make sure acc WAR harzard, at least 1 nop for src_c")
 
         # decrese k
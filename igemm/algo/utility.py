@@ -31,169 +31,195 @@ class macro_int_div_vv_t(macro_base_t):
     '''
     integer divide to compute `v_q = v_n / v_d`, v_q, v_n, v_d all vgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, v_q, v_n, v_d, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}'.format(self.name(), v_q, v_n, v_d, v_tmp4, s_tmp4)
-    def emit(self):
-        with self._emit_macro_indented(".macro {} v_q, v_n, v_d, v_tmp4, s_tmp4".format(self.name())):
-            self._emit("v_cvt_f32_u32     v[\\v_tmp4+0],   v[\\v_d]")
-            self._emit("v_rcp_f32         v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_f32         v[\\v_tmp4+0],   0x4f800000, v[\\v_tmp4+0]")
-            self._emit("v_cvt_u32_f32     v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   v[\\v_d],      v[\\v_tmp4+0]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+2],   v[\\v_d],      v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+3],   vcc, 0,     v[\\v_tmp4+1]")
-            self._emit("v_cmp_ne_i32      s[\\s_tmp4:\\s_tmp4+1], 0,          v[\\v_tmp4+2]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+1],   v[\\v_tmp4+3],   v[\\v_tmp4+1],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+1],   v[\\v_tmp4+1],   v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+0],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+0],   v[\\v_tmp4+0],   v[\\v_tmp4+2],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+0],   v[\\v_tmp4+0],   v[\\v_n]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   v[\\v_tmp4+0],   v[\\v_d]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        v[\\v_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_ge_u32      s[\\s_tmp4:\\s_tmp4+1], v[\\v_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_ge_u32      s[\\s_tmp4+2:\\s_tmp4+3], v[\\v_tmp4+2],   v[\\v_d]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+2],   vcc, 1, v[\\v_tmp4+0]")
-            self._emit("s_and_b64         s[\\s_tmp4+2:\\s_tmp4+3], s[\\s_tmp4:\\s_tmp4+1], s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+1],   vcc, -1,    v[\\v_tmp4+0]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+0],   v[\\v_tmp4+2],      s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+1],   v[\\v_tmp4+2],      s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_cmp_ne_i32      vcc,          0,          v[\\v_d]")
-            self._emit("v_cndmask_b32     v[\\v_q],      -1,         v[\\v_tmp4+2],      vcc")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("v_q")
+        self.declare_arg("v_n")
+        self.declare_arg("v_d")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        self._emit(f"v_cvt_f32_u32     v[{self.v_tmp4()}+0],   v[{self.v_d()}]")
+        self._emit(f"v_rcp_f32         v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_f32         v[{self.v_tmp4()}+0],   0x4f800000, v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cvt_u32_f32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   v[{self.v_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+2],   v[{self.v_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+3],   vcc, 0,     v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], 0,          v[{self.v_tmp4()}+2]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+3],   v[{self.v_tmp4()}+1],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+0],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0],   v[{self.v_n()}]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+0],   v[{self.v_d()}]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        v[{self.v_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ge_u32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], v[{self.v_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ge_u32      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3], v[{self.v_tmp4()}+2],   v[{self.v_d()}]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+2],   vcc, 1, v[{self.v_tmp4()}+0]")
+        self._emit(f"s_and_b64         s[{self.s_tmp4()}+2:{self.s_tmp4()}+3], s[{self.s_tmp4()}:{self.s_tmp4()}+1], s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+1],   vcc, -1,    v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      vcc,          0,          v[{self.v_d()}]")
+        self._emit(f"v_cndmask_b32     v[{self.v_q()}],      -1,         v[{self.v_tmp4()}+2],      vcc")
 
 class macro_int_div_rem_vv_t(macro_base_t):
     '''
     integer divide to compute `v_q = v_n / v_d, v_r = v_n % v_d`, v_r, v_q, v_n, v_d all vgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div_rem'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, v_r, v_q, v_n, v_d, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}, {}'.format(self.name(), v_r, v_q, v_n, v_d, v_tmp4, s_tmp4)
-    def emit(self):
-        int_div_vv = macro_int_div_vv_t(self.mc)
-        with self._emit_macro_indented(".macro {} v_r, v_q, v_n, v_d, v_tmp4, s_tmp4".format(self.name())):
-            self._emit(int_div_vv("\\v_q", "\\v_n", "\\v_d", "\\v_tmp4", "\\s_tmp4"))
-            self._emit(f"v_mul_lo_u32 v[\\v_tmp4], v[\\v_d], v[\\v_q]")
-            self._emit(f"v_sub_u32 v[\\v_r], v[\\v_n], v[\\v_tmp4]")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("v_r")
+        self.declare_arg("v_q")
+        self.declare_arg("v_n")
+        self.declare_arg("v_d")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        int_div_vv = macro_int_div_vv_t(self.mc, self.inline)
+        self._emit(int_div_vv(self.v_q(), self.v_n(), self.v_d(), self.v_tmp4(), self.s_tmp4()))
+        self._emit(f"v_mul_lo_u32 v[{self.v_tmp4()}], v[{self.v_d()}], v[{self.v_q()}]")
+        self._emit(f"v_sub_u32 v[{self.v_r()}], v[{self.v_n()}], v[{self.v_tmp4()}]")
 
 class macro_int_div_vs_t(macro_base_t):
     '''
     integer divide to compute `v_q = v_n / s_d`, v_q, v_n are vgpr, s_d is sgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div_vs'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, v_q, v_n, s_d, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}'.format(self.name(), v_q, v_n, s_d, v_tmp4, s_tmp4)
-    def emit(self):
-        with self._emit_macro_indented(".macro {} v_q, v_n, s_d, v_tmp4, s_tmp4".format(self.name())):
-            self._emit("v_cvt_f32_u32     v[\\v_tmp4+0],   s[\\s_d]")
-            self._emit("v_rcp_f32         v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_f32         v[\\v_tmp4+0],   0x4f800000, v[\\v_tmp4+0]")
-            self._emit("v_cvt_u32_f32     v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   s[\\s_d],      v[\\v_tmp4+0]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+2],   s[\\s_d],      v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+3],   vcc, 0,     v[\\v_tmp4+1]")
-            self._emit("v_cmp_ne_i32      s[\\s_tmp4:\\s_tmp4+1], 0,          v[\\v_tmp4+2]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+1],   v[\\v_tmp4+3],   v[\\v_tmp4+1],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+1],   v[\\v_tmp4+1],   v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+0],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+0],   v[\\v_tmp4+0],   v[\\v_tmp4+2],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+0],   v[\\v_tmp4+0],   v[\\v_n]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   s[\\s_d],     v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        v[\\v_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_ge_u32      s[\\s_tmp4:\\s_tmp4+1], v[\\v_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_le_u32      s[\\s_tmp4+2:\\s_tmp4+3],  s[\\s_d],    v[\\v_tmp4+2]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+2],   vcc, 1, v[\\v_tmp4+0]")
-            self._emit("s_and_b64         s[\\s_tmp4+2:\\s_tmp4+3], s[\\s_tmp4:\\s_tmp4+1], s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+1],   vcc, -1,    v[\\v_tmp4+0]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+0],   v[\\v_tmp4+2],      s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+1],   v[\\v_tmp4+2],      s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_cmp_ne_i32      vcc,          s[\\s_d],   0")
-            self._emit("v_cndmask_b32     v[\\v_q],      -1,         v[\\v_tmp4+2],      vcc")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("v_q")
+        self.declare_arg("v_n")
+        self.declare_arg("s_d")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        self._emit(f"v_cvt_f32_u32     v[{self.v_tmp4()}+0],   s[{self.s_d()}]")
+        self._emit(f"v_rcp_f32         v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_f32         v[{self.v_tmp4()}+0],   0x4f800000, v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cvt_u32_f32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   s[{self.s_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+2],   s[{self.s_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+3],   vcc, 0,     v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], 0,          v[{self.v_tmp4()}+2]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+3],   v[{self.v_tmp4()}+1],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+0],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0],   v[{self.v_n()}]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   s[{self.s_d()}],     v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        v[{self.v_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ge_u32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], v[{self.v_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_le_u32      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3],  s[{self.s_d()}],    v[{self.v_tmp4()}+2]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+2],   vcc, 1, v[{self.v_tmp4()}+0]")
+        self._emit(f"s_and_b64         s[{self.s_tmp4()}+2:{self.s_tmp4()}+3], s[{self.s_tmp4()}:{self.s_tmp4()}+1], s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+1],   vcc, -1,    v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      vcc,          s[{self.s_d()}],   0")
+        self._emit(f"v_cndmask_b32     v[{self.v_q()}],      -1,         v[{self.v_tmp4()}+2],      vcc")
 
 class macro_int_div_rem_vs_t(macro_base_t):
     '''
     integer divide to compute `v_q = v_n / s_d, v_r = v_n % s_d`, v_r, v_q, v_n are vgpr, s_d is sgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div_rem_vs'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, v_r, v_q, v_n, s_d, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}, {}'.format(self.name(), v_r, v_q, v_n, s_d, v_tmp4, s_tmp4)
-    def emit(self):
-        int_div_vs = macro_int_div_vs_t(self.mc)
-        with self._emit_macro_indented(".macro {} v_r, v_q, v_n, s_d, v_tmp4, s_tmp4".format(self.name())):
-            self._emit(int_div_vs("\\v_q", "\\v_n", "\\s_d", "\\v_tmp4", "\\s_tmp4"))
-            self._emit(f"v_mul_lo_u32 v[\\v_tmp4], s[\\s_d], v[\\v_q]")
-            self._emit(f"v_sub_u32 v[\\v_r], v[\\v_n], v[\\v_tmp4]")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("v_r")
+        self.declare_arg("v_q")
+        self.declare_arg("v_n")
+        self.declare_arg("s_d")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        int_div_vs = macro_int_div_vs_t(self.mc, self.inline)
+        self._emit(int_div_vs(self.v_q(), self.v_n(), self.s_d(), self.v_tmp4(), self.s_tmp4()))
+        self._emit(f"v_mul_lo_u32 v[{self.v_tmp4()}], s[{self.s_d()}], v[{self.v_q()}]")
+        self._emit(f"v_sub_u32 v[{self.v_r()}], v[{self.v_n()}], v[{self.v_tmp4()}]")
 
 class macro_int_div_ss_t(macro_base_t):
     '''
     integer divide to compute `s_q = s_n / s_d`, s_q, s_n, s_d all sgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div_ss'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, v_q, s_n, s_d, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}'.format(self.name(), v_q, s_n, s_d, v_tmp4, s_tmp4)
-    def emit(self):
-        with self._emit_macro_indented(".macro .v_u32_div_ss v_q, s_n, s_d, v_tmp4, s_tmp4"):
-            self._emit("v_cvt_f32_u32     v[\\v_tmp4+0],   s[\\s_d]")
-            self._emit("v_rcp_f32         v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_f32         v[\\v_tmp4+0],   0x4f800000, v[\\v_tmp4+0]")
-            self._emit("v_cvt_u32_f32     v[\\v_tmp4+0],   v[\\v_tmp4+0]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   s[\\s_d],      v[\\v_tmp4+0]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+2],   s[\\s_d],      v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+3],   vcc, 0,     v[\\v_tmp4+1]")
-            self._emit("v_cmp_ne_i32      s[\\s_tmp4:\\s_tmp4+1], 0,          v[\\v_tmp4+2]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+1],   v[\\v_tmp4+3],   v[\\v_tmp4+1],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+1],   v[\\v_tmp4+1],   v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+0],   vcc,        v[\\v_tmp4+0],   v[\\v_tmp4+1]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+0],   v[\\v_tmp4+0],   v[\\v_tmp4+2],   s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_mul_hi_u32      v[\\v_tmp4+0],   s[\\s_n],   v[\\v_tmp4+0]")
-            self._emit("v_mul_lo_u32      v[\\v_tmp4+1],   s[\\s_d],     v[\\v_tmp4+0]")
-            self._emit("v_sub_co_u32      v[\\v_tmp4+2],   vcc,        s[\\s_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_ge_u32      s[\\s_tmp4:\\s_tmp4+1], s[\\s_n],      v[\\v_tmp4+1]")
-            self._emit("v_cmp_le_u32      s[\\s_tmp4+2:\\s_tmp4+3],  s[\\s_d],    v[\\v_tmp4+2]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+2],   vcc, 1, v[\\v_tmp4+0]")
-            self._emit("s_and_b64         s[\\s_tmp4+2:\\s_tmp4+3], s[\\s_tmp4:\\s_tmp4+1], s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_add_co_u32      v[\\v_tmp4+1],   vcc, -1,    v[\\v_tmp4+0]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+0],   v[\\v_tmp4+2],      s[\\s_tmp4+2:\\s_tmp4+3]")
-            self._emit("v_cndmask_b32     v[\\v_tmp4+2],   v[\\v_tmp4+1],   v[\\v_tmp4+2],      s[\\s_tmp4:\\s_tmp4+1]")
-            self._emit("v_cmp_ne_i32      vcc,          s[\\s_d],   0")
-            self._emit("v_cndmask_b32     v[\\v_q],      -1,         v[\\v_tmp4+2],      vcc")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("v_q")
+        self.declare_arg("s_n")
+        self.declare_arg("s_d")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        self._emit(f"v_cvt_f32_u32     v[{self.v_tmp4()}+0],   s[{self.s_d()}]")
+        self._emit(f"v_rcp_f32         v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_f32         v[{self.v_tmp4()}+0],   0x4f800000, v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cvt_u32_f32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   s[{self.s_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+2],   s[{self.s_d()}],      v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+3],   vcc, 0,     v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], 0,          v[{self.v_tmp4()}+2]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+3],   v[{self.v_tmp4()}+1],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+0],   vcc,        v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],   s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_mul_hi_u32      v[{self.v_tmp4()}+0],   s[{self.s_n()}],   v[{self.v_tmp4()}+0]")
+        self._emit(f"v_mul_lo_u32      v[{self.v_tmp4()}+1],   s[{self.s_d()}],     v[{self.v_tmp4()}+0]")
+        self._emit(f"v_sub_co_u32      v[{self.v_tmp4()}+2],   vcc,        s[{self.s_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_ge_u32      s[{self.s_tmp4()}:{self.s_tmp4()}+1], s[{self.s_n()}],      v[{self.v_tmp4()}+1]")
+        self._emit(f"v_cmp_le_u32      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3],  s[{self.s_d()}],    v[{self.v_tmp4()}+2]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+2],   vcc, 1, v[{self.v_tmp4()}+0]")
+        self._emit(f"s_and_b64         s[{self.s_tmp4()}+2:{self.s_tmp4()}+3], s[{self.s_tmp4()}:{self.s_tmp4()}+1], s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_add_co_u32      v[{self.v_tmp4()}+1],   vcc, -1,    v[{self.v_tmp4()}+0]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+0],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}+2:{self.s_tmp4()}+3]")
+        self._emit(f"v_cndmask_b32     v[{self.v_tmp4()}+2],   v[{self.v_tmp4()}+1],   v[{self.v_tmp4()}+2],      s[{self.s_tmp4()}:{self.s_tmp4()}+1]")
+        self._emit(f"v_cmp_ne_i32      vcc,          s[{self.s_d()}],   0")
+        self._emit(f"v_cndmask_b32     v[{self.v_q()}],      -1,         v[{self.v_tmp4()}+2],      vcc")
 
 class macro_int_div_rem_ss_t(macro_base_t):
     '''
     integer divide to compute `s_q = s_n / s_d, s_r = s_n % s_d`, s_r, s_q, s_n, s_d all sgpr
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_u32_div_rem_ss'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-
-    def __call__(self, s_r, s_q, s_n, s_d, v_q, v_tmp4, s_tmp4):
-        return '{} {}, {}, {}, {}, {}, {}, {}'.format(self.name(), s_r, s_q, s_n, s_d, v_q, v_tmp4, s_tmp4) 
-
-    def emit(self):
-        int_div_ss = macro_int_div_ss_t(self.mc)
-        with self._emit_macro_indented(".macro {} s_r, s_q, s_n, s_d, v_q, v_tmp4, s_tmp4".format(self.name())):
-            self._emit(int_div_ss("\\v_q", "\\s_n", "\\s_d", "\\v_tmp4", "\\s_tmp4"))
-            self._emit(f"v_readfirstlane_b32 s[\\s_q], v[\\v_q]")
-            self._emit(f"s_mul_i32 s[\\s_tmp4], s[\\s_d], s[\\s_q]")
-            self._emit(f"s_sub_i32 s[\\s_r], s[\\s_n], s[\\s_tmp4]")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("s_r")
+        self.declare_arg("s_q")
+        self.declare_arg("s_n")
+        self.declare_arg("s_d")
+        self.declare_arg("v_q")
+        self.declare_arg("v_tmp4")
+        self.declare_arg("s_tmp4")
+    def expr(self):
+        int_div_ss = macro_int_div_ss_t(self.mc, self.inline)
+        self._emit(int_div_ss(self.v_q(), self.s_n(), self.s_d(), self.v_tmp4(), self.s_tmp4()))
+        self._emit(f"v_readfirstlane_b32 s[{self.s_q()}], v[{self.v_q()}]")
+        self._emit(f"s_mul_i32 s[{self.s_tmp4()}], s[{self.s_d()}], s[{self.s_q()}]")
+        self._emit(f"s_sub_i32 s[{self.s_r()}], s[{self.s_n()}], s[{self.s_tmp4()}]")
 
 
 class macro_mdiv_u32_ss_t(macro_base_t):
@@ -266,39 +292,50 @@ class macro_mdiv_u32_rem_vs_t(macro_base_t):
 
 
 class macro_c_clear_t(macro_base_t):
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_clear_nc'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, vid, num):
-        return '{} {}, {}'.format(self.name(), vid, num)
-    def emit(self):
-        with self._emit_macro_indented(".macro {} vid, num".format(self.name())):
-            self._emit("_v = \\vid")
-            self._emit(".rept \\num")
-            with self._indent_context():
-                self._emit("v_mov_b32 v[_v], 0")
-                self._emit("_v = _v + 1")
-            self._emit(".endr")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("vid")
+        self.declare_arg("num")
+    def expr(self):
+        if self.is_inline() and self.num().isdigit():
+            # unroll, so each v_mov_b32 is visible to scheduler and peephole
+            for i in range(int(self.num())):
+                self._emit(f"v_mov_b32 v[{self.vid(i)}], 0")
+            return
+        self._emit(f"_v = {self.vid()}")
+        self._emit(f".rept {self.num()}")
+        with self._indent_context():
+            self._emit("v_mov_b32 v[_v], 0")
+            self._emit("_v = _v + 1")
+        self._emit(".endr")
 
 class macro_acc_c_clear_t(macro_base_t):
     '''
     gfx908 RAW harzard attention!
     '''
+    call_delimiter = ', '
+    decl_delimiter = ', '
     def name(self):
         return '.v_clear_acc_c'
-    def __init__(self, mc):
-        macro_base_t.__init__(self, mc)
-    def __call__(self, a, num):
-        return '{} {}, {}'.format(self.name(), a, num)
-    def emit(self):
-        with self._emit_macro_indented(".macro {} a, num".format(self.name())):
-            self._emit("_a = \\a")
-            self._emit(".rept \\num")
-            with self._indent_context():
-                self._emit("v_accvgpr_write_b32 a[_a], 0")
-                self._emit("_a = _a + 1")
-            self._emit(".endr")
+    def __init__(self, mc, inline = False):
+        macro_base_t.__init__(self, mc, inline)
+        self.declare_arg("a")
+        self.declare_arg("num")
+    def expr(self):
+        if self.is_inline() and self.num().isdigit():
+            for i in range(int(self.num())):
+                self._emit(f"v_accvgpr_write_b32 a[{self.a(i)}], 0")
+            return
+        self._emit(f"_a = {self.a()}")
+        self._emit(f".rept {self.num()}")
+        with self._indent_context():
+            self._emit("v_accvgpr_write_b32 a[_a], 0")
+            self._emit("_a = _a + 1")
+        self._emit(".endr")
 
 class gpr_sequencer_t(object):
     def __init__(self, cnt = 0):
@@ -314,6 +351,107 @@ class gpr_sequencer_t(object):
     def get(self):
         return self.cnt
 
+GPR_LIVE_PROLOGUE   = 1 << 0        # index/offset calculation before main loop
+GPR_LIVE_LOOP       = 1 << 1        # main loop, including the finishing iterations after it
+GPR_LIVE_EPILOGUE   = 1 << 2        # write out of the result, from coalescing store
+GPR_LIVE_ALL        = GPR_LIVE_PROLOGUE | GPR_LIVE_LOOP | GPR_LIVE_EPILOGUE
+GPR_LIVE_PROLOGUE_LOOP = GPR_LIVE_PROLOGUE | GPR_LIVE_LOOP
+
+class gpr_alloc_block_t(object):
+    def __init__(self, offset, step, live, alignment):
+        self.offset = offset            # linear offset, as gpr_sequencer_t
+        self.step = step
+        self.live = live
+        self.alignment = alignment
+        self.packed_offset = offset
+
+    def is_overlap(self, offset, step, live):
+        return (self.live & live) != 0 and offset < self.packed_offset + self.step and self.packed_offset < offset + step
+
+class gpr_allocator_t(gpr_sequencer_t):
+    '''
+    gpr_sequencer_t with live range, a mask of GPR_LIVE_*, for each allocation.
+    allocations are laid out linearly first, then pack() place them so that allocations not live in
+    any common phase can share the same gpr, and relocate every symbol to the packed index.
+
+    consecutive allocations with the same live range move together as one block, hence a symbol can still be
+    accessed together with its neighbours, like s_load_dwordx4 of several sgpr. a block keeps its offset modulo
+    the max alignment of its allocations, where allocation of multiple gpr is at least aligned to granularity,
+    so register tuple alignment is not broken.
+    '''
+    def __init__(self, cnt = 0, granularity = 4):
+        gpr_sequencer_t.__init__(self, cnt)
+        self.base = cnt
+        self.granularity = granularity
+        self.blocks = list()
+        self.reserved = list()
+        self.symbols = dict()       # label -> block, after pack()
+
+    def __call__(self, step = 0, alignment = 0, live = GPR_LIVE_ALL):
+        # live range is continuous, e.g. gpr computed in prologue and used in epilogue is live in loop as well
+        live_bits = live // (live & -live) if live != 0 else 0
+        assert live_bits != 0 and (live_bits & (live_bits + 1)) == 0, f"live:{live} not continuous"
+        offset = gpr_sequencer_t.__call__(self, step, alignment)
+        # only allocation of multiple gpr may be used as register tuple, and need granularity
+        alignment = max(alignment, self.granularity if step > 1 else 1)
+        if step != 0:
+            if len(self.blocks) != 0 and self.blocks[-1].live == live:
+                last = self.blocks[-1]
+                last.step = offset + step - last.offset
+                last.alignment = max(last.alignment, alignment)
+            else:
+                self.blocks.append(gpr_alloc_block_t(offset, step, live, alignment))
+        return offset
+
+    def reserve(self, offset, step, live):
+        '''
+        gpr with a fixed index that no block live in the same phase can be placed on, e.g. v0 of local id
+        '''
+        self.reserved.append(gpr_alloc_block_t(offset, step, live, 1))
+
+    def find_block(self, offset):
+        for b in self.blocks:
+            if b.offset <= offset < b.offset + b.step:
+                return b
+        return None
+
+    def pack(self, *holders):
+        '''
+        first-fit every block, longer live range first, then earlier start of live range first, then allocation order.
+        after that, relocate each sym_t of holders allocated from this allocator. symbols not inside any block are left untouched.
+        '''
+        def block_order(ib):
+            i, b = ib
+            return (-bin(b.live).count('1'), b.live & -b.live, i)
+        placed = list(self.reserved)
+        for _, b in sorted(enumerate(self.blocks), key = block_order):
+            offset = self.base + (b.offset - self.base) % b.alignment
+            while True:
+                conflicts = [p for p in placed if p.is_overlap(offset, b.step, b.live)]
+                if len(conflicts) == 0:
+                    break
+                end = max(p.packed_offset + p.step for p in conflicts)
+                offset += ((end - offset + b.alignment - 1) // b.alignment) * b.alignment
+            b.packed_offset = offset
+            placed.append(b)
+        self.cnt = max([self.base] + [p.packed_offset + p.step for p in placed])
+
+        for holder in holders:
+            for v in vars(holder).values():
+                if type(v) is sym_t and type(v.label) is str:
+                    b = self.find_block(v.value)
+                    if b is None:
+                        continue
+                    v.value = v.value - b.offset + b.packed_offset
+                    self.symbols[v.label] = b
+
+    def get_extent(self, live = GPR_LIVE_ALL):
+        '''
+        after pack(), list of (start, end) gpr range of every block live in any phase of live. symbols of
+        different block may alias each other, so the range of a symbol can not be told from symbol value order
+        '''
+        return [(b.packed_offset, b.packed_offset + b.step) for b in self.blocks if b.live & live]
+
 
 def utility_list_to_string(arr):
     assert type(arr) is list
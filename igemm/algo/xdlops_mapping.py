@@ -28,6 +28,18 @@
 from ..codegen import *
 from .utility import *
 from .mfma import *
+import functools
+
+def _xdlops_mapping_derived(func):
+    '''
+    memoize a derived quantity of ctrl_xdlops_mapping_t, per mapping. mapping is not modified after construction
+    '''
+    @functools.wraps(func)
+    def wrapper(self):
+        if func.__name__ not in self._derived:
+            self._derived[func.__name__] = func(self)
+        return self._derived[func.__name__]
+    return wrapper
 
 class ctrl_xdlops_mapping_t(object):
     '''
@@ -111,7 +123,9 @@ class ctrl_xdlops_mapping_t(object):
         self.wave_step_m = wave_step_m
         self.wave_step_n = wave_step_n
         self.inst_mfma = inst_mfma
+        self._derived = dict()          # see _xdlops_mapping_derived()
 
+    @_xdlops_mapping_derived
     def acc_c_lengths(self):
         '''
         return agpr lengths for each dimension. from right to left is agpr index increase
@@ -127,14 +141,17 @@ class ctrl_xdlops_mapping_t(object):
     def composed_wave_tile_n(self):
         return self.wave_tile_n * self.wave_step_n
 
+    @_xdlops_mapping_derived
     def waves_per_m(self):
         ''' attention! not count repeat'''
         return self.macro_tile_m // (self.wave_repeat_m * self.wave_tile_m * self.wave_step_m)
 
+    @_xdlops_mapping_derived
     def waves_per_n(self):
         ''' attention! not count repeat'''
         return self.macro_tile_n // (self.wave_repeat_n * self.wave_tile_n * self.wave_step_n)
 
+    @_xdlops_mapping_derived
     def total_acc_c(self):
         def flatten(x):
             from functools import reduce
@@ -144,10 +161,12 @@ class ctrl_xdlops_mapping_t(object):
         assert total_c == flatten(self.acc_c_lengths())
         return total_c
 
+    @_xdlops_mapping_derived
     def acc_c_per_thread_n(self):
         t_nr, t_ns, t_nw, t_nb, t_nt = self.wave_repeat_n, self.wave_step_n, self.lanegroup_n_per_wave(), self.lanegroup_n_per_block(), self.lanegroup_n_per_thread()
         return t_nr, t_ns, t_nw, t_nb, t_nt
 
+    @_xdlops_mapping_derived
     def acc_c_per_thread_m(self):
         t_mr, t_ms, t_mw, t_mb, t_mt = self.wave_repeat_m, self.wave_step_m, self.lanegroup_m_per_wave(), self.lanegroup_m_per_block(), self.lanegroup_m_per_thread()
         return t_mr, t_ms, t_mw, t_mb, t_mt
@@ -184,6 +203,7 @@ class ctrl_xdlops_mapping_t(object):
     # each lanegroup is a 4x64 matrix, and expand into whole block, then wave
     # hence we group xdlops layout into 4 levels: per_thread->per_cluster->per_block->per_wave
     #
+    @_xdlops_mapping_derived
     def block_m_per_wave(self):
         ''' [among different thread] '''
         assert self.wave_tile_m % (self.lanegroup_m_per_thread() * self.lanegroup_m_per_cluster() * self.lanegroup_m_per_block()) == 0
@@ -194,21 +214,25 @@ class ctrl_xdlops_mapping_t(object):
         #print(f"lanegroup_m_per_wave={self.lanegroup_m_per_wave()}, lanegroup_n_per_wave={self.lanegroup_n_per_wave()}")
         return self.wave_tile_m // (self.lanegroup_m_per_thread() * self.lanegroup_m_per_cluster() * self.lanegroup_m_per_block()) 
 
+    @_xdlops_mapping_derived
     def block_n_per_wave(self):
         ''' [among different thread] '''
         assert self.wave_tile_n % (self.lanegroup_n_per_thread() * self.lanegroup_n_per_cluster() * self.lanegroup_n_per_block()) == 0
         assert self.inst_mfma.n == self.lanegroup_n_per_thread() * self.lanegroup_n_per_cluster() * self.lanegroup_n_per_block()
         return self.wave_tile_n // (self.lanegroup_n_per_thread() * self.lanegroup_n_per_cluster() * self.lanegroup_n_per_block())
 
+    @_xdlops_mapping_derived
     def block_k_per_wave(self):
         assert self.block_k() % self.lanegroup_k_per_thread() == 0
         return self.block_k() // self.lanegroup_k_per_thread()
 
+    @_xdlops_mapping_derived
     def block_m_per_lanegroup(self):
         ''' [among different thread] '''
         assert self.block_m_per_wave() % self.lanegroup_m_per_wave() == 0
         return self.block_m_per_wave() // self.lanegroup_m_per_wave()
 
+    @_xdlops_mapping_derived
     def block_n_per_lanegroup(self):
         ''' [among different thread] '''
         assert self.block_n_per_wave() % self.lanegroup_n_per_wave() == 0
@@ -222,6 +246,7 @@ class ctrl_xdlops_mapping_t(object):
         ''' [within thread] for xdlops, always 1 column per lanegroup'''
         return 1
 
+    @_xdlops_mapping_derived
     def lanegroup_k_per_thread(self):
         ''' [within thread] for xdlops, 
             fp32 1/
@@ -236,6 +261,7 @@ class ctrl_xdlops_mapping_t(object):
             return 2
         assert False
 
+    @_xdlops_mapping_derived
     def lanegroup_m_per_cluster(self):
         ''' [among different thread] for xdlops, always m per block as clusters. perthread agpr do not contain this'''
         return utility_gcd(self.inst_mfma.m//self.lanegroup_m_per_thread(), AMDGPU_WAVE_SIZE // self.inst_mfma.n )
@@ -244,6 +270,7 @@ class ctrl_xdlops_mapping_t(object):
         ''' [among different thread] for xdlops, always n per block as clusters. perthread agpr do not contain this'''
         return self.inst_mfma.n
 
+    @_xdlops_mapping_derived
     def lanegroup_m_per_block(self):
         ''' [within thread]  '''
         assert self.inst_mfma.m % (self.lanegroup_m_per_thread() * self.lanegroup_m_per_cluster()) == 0
@@ -253,11 +280,13 @@ class ctrl_xdlops_mapping_t(object):
         ''' [within thread]  '''
         return 1
 
+    @_xdlops_mapping_derived
     def lanegroup_m_per_wave(self):
         ''' [within thread] indeed descipbe agpr per thread within different blocks to form a wave tile '''
         assert self.inst_mfma.num_a_c % (self.lanegroup_n_per_thread() * self.lanegroup_n_per_block() * self.lanegroup_n_per_wave() * self.lanegroup_m_per_thread() * self.lanegroup_m_per_block()) == 0
         return self.inst_mfma.num_a_c // (self.lanegroup_n_per_thread() * self.lanegroup_n_per_block() * self.lanegroup_n_per_wave() * self.lanegroup_m_per_thread() * self.lanegroup_m_per_block())
 
+    @_xdlops_mapping_derived
     def lanegroup_n_per_wave(self):
         ''' [within thread] indeed descipbe agpr per thread within different blocks to form a wave tile '''
         assert self.inst_mfma.num_a_c % (self.lanegroup_m_per_thread() * self.lanegroup_m_per_block()) == 0
@@ -293,8 +322,8 @@ ctrl_xdlops_mapping_fp32 = [
         ctrl_xdlops_mapping_t( 256, 16 ,  64,  4 ,  1, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 16 , 256,  4 ,  64,  1, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x1f32),
 
-        #ctrl_xdlops_mapping_t( 256, 16 ,  64,  16,  2,  1,  1,  2,  1,  v_mfma_f32_16x16x1f32),     # TODO: this will fail in coalescing
-        #ctrl_xdlops_mapping_t( 16 , 256,  16,  64,  2,  1,  1,  1,  1,  v_mfma_f32_16x16x1f32),     # TODO: this will fail in coalescing
+        ctrl_xdlops_mapping_t( 256, 16 ,  64,  16,  1, 2,  1,  1,  2,  1,  v_mfma_f32_16x16x1f32),
+        ctrl_xdlops_mapping_t( 16 , 256,  16,  64,  1, 2,  1,  1,  1,  2,  v_mfma_f32_16x16x1f32),  # block narrower than n, see get_min_vector_write_out()
 
         ctrl_xdlops_mapping_t( 128, 128,  32,  32,  1, 4,  2,  2,  1,  1,  v_mfma_f32_16x16x1f32),
         ctrl_xdlops_mapping_t( 128, 128,  32,  32,  2, 4,  2,  2,  1,  1,  v_mfma_f32_32x32x2f32),
@@ -313,8 +342,8 @@ ctrl_xdlops_mapping_fp32 = [
         ctrl_xdlops_mapping_t( 64 , 64 ,  16,  16,  1, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 64 , 64 ,  16,  16,  4, 4,  2,  2,  1,  1,  v_mfma_f32_16x16x4f32),
         ctrl_xdlops_mapping_t( 64 , 64 ,  32,  32,  2, 4,  1,  1,  1,  1,  v_mfma_f32_32x32x2f32),  # this is not as good as 16x16x4
-        #ctrl_xdlops_mapping_t( 128, 16 ,  64,  4 ,  4,  1,  1,  2,  1,  v_mfma_f32_4x4x1f32),
-        #ctrl_xdlops_mapping_t( 16 , 128,  4 ,  64,  4,  1,  1,  1,  2,  v_mfma_f32_4x4x1f32),
+        ctrl_xdlops_mapping_t( 128, 16 ,  64,  4 ,  1, 4,  1,  1,  2,  1,  v_mfma_f32_4x4x1f32),
+        ctrl_xdlops_mapping_t( 16 , 128,  4 ,  64,  1, 4,  1,  1,  1,  2,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 128, 16 ,  64,  16,  1, 2,  1,  1,  1,  1,  v_mfma_f32_16x16x1f32),  # need re-design coalescing. or do irregular gemm
         ctrl_xdlops_mapping_t( 128, 16 ,  16,  16,  4, 4,  2,  1,  1,  1,  v_mfma_f32_16x16x4f32),  # need re-design coalescing. or do irregular gemm
         ctrl_xdlops_mapping_t( 16 , 128,  16,  64,  1, 2,  1,  1,  1,  1,  v_mfma_f32_16x16x1f32),  # need re-design coalescing. or do irregular gemm
@@ -325,8 +354,8 @@ ctrl_xdlops_mapping_fp32 = [
         ctrl_xdlops_mapping_t( 32 , 64 ,  16,  16,  4, 4,  1,  2,  1,  1,  v_mfma_f32_16x16x4f32),
         ctrl_xdlops_mapping_t( 32 , 32 ,  16,  16,  1, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 32 , 32 ,  16,  16,  4, 4,  1,  1,  1,  1,  v_mfma_f32_16x16x4f32),
-        #ctrl_xdlops_mapping_t( 256, 4  ,  64,  4 ,  4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),      # TODO: small/skinny gemm
-        #ctrl_xdlops_mapping_t( 4  , 256,  4 ,  64,  4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),      # TODO: small/skinny gemm
+        ctrl_xdlops_mapping_t( 256, 4  ,  64,  4 ,  1, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),   # coalescing store skip lds, see can_skip_coalescing()
+        ctrl_xdlops_mapping_t( 4  , 256,  4 ,  64,  1, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),   # coalescing store skip lds, see can_skip_coalescing()
         ctrl_xdlops_mapping_t( 64 , 16 ,  64,  4 ,  1, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 64 , 16 ,  16,  16,  4, 4,  1,  1,  1,  1,  v_mfma_f32_16x16x4f32),
         ctrl_xdlops_mapping_t( 64 , 16 ,  16,  16,  4, 2,  2,  1,  1,  1,  v_mfma_f32_16x16x4f32),
@@ -336,8 +365,8 @@ ctrl_xdlops_mapping_fp32 = [
         ctrl_xdlops_mapping_t( 64 , 16 ,  64,  4 ,  1, 2,  1,  1,  1,  2,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 16 , 64 ,  4 ,  64,  1, 2,  1,  1,  2,  1,  v_mfma_f32_4x4x1f32),
         # 2waves, block_size=128
-        #ctrl_xdlops_mapping_t( 128, 4  ,  64,  4 ,  2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),      # TODO: small/skinny gemm
-        #ctrl_xdlops_mapping_t( 4  , 128,  4 ,  64,  2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),      # TODO: small/skinny gemm
+        ctrl_xdlops_mapping_t( 128, 4  ,  64,  4 ,  1, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
+        ctrl_xdlops_mapping_t( 4  , 128,  4 ,  64,  1, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 64 , 8  ,  64,  4 ,  1, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 8  , 64 ,  4 ,  64,  1, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
         ctrl_xdlops_mapping_t( 32 , 16 ,  32,  8 ,  1, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x1f32),
@@ -368,6 +397,8 @@ ctrl_xdlops_mapping_fp16 = [
         ctrl_xdlops_mapping_t( 32 , 256,  4 ,  64,  4, 4,  2,  2,  2,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 256, 16 ,  64,  4 ,  4, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 16 , 256,  4 ,  64,  4, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x4f16),
+        ctrl_xdlops_mapping_t( 256, 16 ,  64,  16,  4, 2,  1,  1,  2,  1,  v_mfma_f32_16x16x4f16),
+        ctrl_xdlops_mapping_t( 16 , 256,  16,  64,  4, 2,  1,  1,  1,  2,  v_mfma_f32_16x16x4f16),  # block narrower than n, see get_min_vector_write_out()
 
         ctrl_xdlops_mapping_t( 128, 128,  32,  32,  4, 4,  2,  2,  1,  1,  v_mfma_f32_16x16x4f16),
         ctrl_xdlops_mapping_t( 128, 128,  32,  32,  8, 4,  2,  2,  1,  1,  v_mfma_f32_32x32x8f16),
@@ -386,6 +417,8 @@ ctrl_xdlops_mapping_fp16 = [
         ctrl_xdlops_mapping_t( 64 , 64 ,  16,  16,  4, 4,  2,  2,  1,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 64 , 64 ,  16,  16, 16, 4,  2,  2,  1,  1,  v_mfma_f32_16x16x16f16),
         ctrl_xdlops_mapping_t( 64 , 64 ,  16,  16, 16, 4,  1,  1,  2,  2,  v_mfma_f32_16x16x16f16),
+        ctrl_xdlops_mapping_t( 128, 16 ,  64,  4 ,  4, 4,  1,  1,  2,  1,  v_mfma_f32_4x4x4f16),
+        ctrl_xdlops_mapping_t( 16 , 128,  4 ,  64,  4, 4,  1,  1,  1,  2,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 128, 16 ,  64,  16,  4, 2,  1,  1,  1,  1,  v_mfma_f32_16x16x4f16),
         ctrl_xdlops_mapping_t( 16 , 128,  16,  64,  4, 2,  1,  1,  1,  1,  v_mfma_f32_16x16x4f16),
         ctrl_xdlops_mapping_t( 64 , 32 ,  32,  8 ,  4, 4,  1,  1,  1,  2,  v_mfma_f32_4x4x4f16),
@@ -394,7 +427,11 @@ ctrl_xdlops_mapping_fp16 = [
         ctrl_xdlops_mapping_t( 32 , 32 ,  16,  16, 16, 4,  1,  1,  1,  1,  v_mfma_f32_16x16x16f16),
         ctrl_xdlops_mapping_t( 64 , 16 ,  64,  4 ,  4, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 16 , 64 ,  4 ,  64,  4, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
+        ctrl_xdlops_mapping_t( 256, 4  ,  64,  4 ,  4, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),   # coalescing store skip lds, see can_skip_coalescing()
+        ctrl_xdlops_mapping_t( 4  , 256,  4 ,  64,  4, 4,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),   # coalescing store skip lds, see can_skip_coalescing()
         # 2 waves
+        ctrl_xdlops_mapping_t( 128, 4  ,  64,  4 ,  4, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
+        ctrl_xdlops_mapping_t( 4  , 128,  4 ,  64,  4, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 64 , 16 ,  64,  4 ,  4, 2,  1,  1,  1,  2,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 16 , 64 ,  4 ,  64,  4, 2,  1,  1,  2,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 64 , 8  ,  64,  4 ,  4, 2,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
@@ -408,48 +445,58 @@ ctrl_xdlops_mapping_fp16 = [
         ctrl_xdlops_mapping_t( 4  , 64,  4 ,  64,   4, 1,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16),
         ctrl_xdlops_mapping_t( 16 , 16,  16,  16,   4, 1,  1,  1,  1,  1,  v_mfma_f32_4x4x4f16)]
 
-def get_ctrl_xdlops_mapping(macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, precision, waves = 4):
+_ctrl_xdlops_mapping_index = dict()        # precision -> (number of mapping when built, index), see get_ctrl_xdlops_mapping_index()
+
+def get_ctrl_xdlops_mapping_list(precision):
     if type(precision) is str:
         precision = amdgpu_string_to_precision(precision)
-    ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp32
     if precision == AMDGPU_PRECISION_FP32:
-        ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp32
+        return ctrl_xdlops_mapping_fp32
     elif precision == AMDGPU_PRECISION_FP16:
-        ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp16
+        return ctrl_xdlops_mapping_fp16
     elif precision == AMDGPU_PRECISION_BF16:
         assert False, f"not support bf16 now"
     else:
         assert False, f"wrong data type"
 
-    target_mfma_tiling = list()
-    for t in ctrl_xdlops_mapping:
-        if t.macro_tile_m == macro_tile_m and t.macro_tile_n == macro_tile_n and t.wave_tile_m == wave_tile_m and t.wave_tile_n == wave_tile_n and t.waves == waves:
-            target_mfma_tiling.append(t)
+def get_ctrl_xdlops_mapping_index(precision):
+    '''
+    index of ctrl_xdlops_mapping_fp32/fp16, built once per precision, or again if mapping is appended to the list.
+    key -> mappings in the same order as the list, key is one of
+      (macro_tile_m, macro_tile_n)
+      (macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, waves)
+      (macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, wave_tile_k, wave_repeat_m, wave_repeat_n, wave_step_m, wave_step_n, waves)
+    '''
+    if type(precision) is str:
+        precision = amdgpu_string_to_precision(precision)
+    ctrl_xdlops_mapping = get_ctrl_xdlops_mapping_list(precision)
+    if precision not in _ctrl_xdlops_mapping_index or _ctrl_xdlops_mapping_index[precision][0] != len(ctrl_xdlops_mapping):
+        index = dict()
+        for t in ctrl_xdlops_mapping:
+            for key in ((t.macro_tile_m, t.macro_tile_n),
+                        (t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.waves),
+                        (t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.wave_tile_k,
+                            t.wave_repeat_m, t.wave_repeat_n, t.wave_step_m, t.wave_step_n, t.waves)):
+                index.setdefault(key, list()).append(t)
+        _ctrl_xdlops_mapping_index[precision] = (len(ctrl_xdlops_mapping), index)
+    return _ctrl_xdlops_mapping_index[precision][1]
+
+def get_ctrl_xdlops_mapping_from_macro_tile(macro_tile_m, macro_tile_n, precision):
+    '''
+    every mapping of this macro tile, empty list if none
+    '''
+    return list(get_ctrl_xdlops_mapping_index(precision).get((macro_tile_m, macro_tile_n), list()))
+
+def get_ctrl_xdlops_mapping(macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, precision, waves = 4):
+    target_mfma_tiling = get_ctrl_xdlops_mapping_index(precision).get((macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, waves), list())
 
     assert len(target_mfma_tiling) != 0, f"unsupported macro_tile_m:{macro_tile_m}, macro_tile_n:{macro_tile_n}, waves:{waves}"
     # TODO: we may have multiple match, aka multipl wave mapping/mfma for single 
     return target_mfma_tiling[0]
 
 def get_ctrl_xdlops_mapping_from_wave_tile(macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, wave_tile_k,  wave_repeat_m, wave_repeat_n, wave_step_m, wave_step_n, waves, precision):
-    if type(precision) is str:
-        precision = amdgpu_string_to_precision(precision)
-    ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp32
-    if precision == AMDGPU_PRECISION_FP32:
-        ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp32
-    elif precision == AMDGPU_PRECISION_FP16:
-        ctrl_xdlops_mapping = ctrl_xdlops_mapping_fp16
-    elif precision == AMDGPU_PRECISION_BF16:
-        assert False, f"not support bf16 now"
-    else:
-        assert False, f"wrong data type"
-    target_mfma_tiling = list()
-    for t in ctrl_xdlops_mapping:
-        if t.macro_tile_m == macro_tile_m and t.macro_tile_n == macro_tile_n and\
-                t.wave_tile_m == wave_tile_m and t.wave_tile_n == wave_tile_n and t.wave_tile_k == wave_tile_k and \
-                t.wave_repeat_m == wave_repeat_m and t.wave_repeat_n == wave_repeat_n and \
-                t.wave_step_m == wave_step_m and t.wave_step_n == wave_step_n and \
-                t.waves == waves:
-            target_mfma_tiling.append(t)
+    target_mfma_tiling = get_ctrl_xdlops_mapping_index(precision).get((macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, wave_tile_k,
+                                wave_repeat_m, wave_repeat_n, wave_step_m, wave_step_n, waves), list())
 
     assert len(target_mfma_tiling) != 0, f"unsupported wave_tile_m:{wave_tile_m}, wave_tile_n:{wave_tile_n}, wave_repeat_m:{wave_repeat_m},  wave_repeat_n:{wave_repeat_n}"
     # TODO: we may have multiple match, aka multipl wave mapping/mfma for single 
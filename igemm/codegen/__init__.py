@@ -32,3 +32,5 @@ from .mc import *
 from .mbb import *
 from .scheduler import *
 from .instruction import *
+from .waitcnt import *
+from .peephole import *
@@ -26,7 +26,9 @@
 # pylint: disable=maybe-no-member
 import os
 import subprocess
+import copy
 from .mc import *
+from .config_parser import config_parser_t
 
 AMDGPU_PRECISION_FP32   = (0 << 20)
 AMDGPU_PRECISION_FP16   = (1 << 20)
@@ -38,6 +40,7 @@ AMDGPU_CODEOBJECT_V3    = (1 << 28)
 AMDGPU_ARCH_GFX900      = 900
 AMDGPU_ARCH_GFX906      = 906
 AMDGPU_ARCH_GFX908      = 908
+AMDGPU_ARCH_GFX90A      = 910
 AMDGPU_ARCH_GFX1030     = 1030
 
 AMDGPU_WAVE_SIZE        = 64
@@ -61,6 +64,8 @@ def amdgpu_string_to_arch(amdgpu_arch_string):
         return AMDGPU_ARCH_GFX906
     if amdgpu_arch_string == 'gfx908':
         return AMDGPU_ARCH_GFX908
+    if amdgpu_arch_string == 'gfx90a':
+        return AMDGPU_ARCH_GFX90A
     if amdgpu_arch_string == 'gfx1030':
         return AMDGPU_ARCH_GFX1030
     assert False
@@ -72,6 +77,8 @@ def amdgpu_arch_to_string(amdgpu_arch_gfxxxx):
         return 'gfx906'
     if amdgpu_arch_gfxxxx == AMDGPU_ARCH_GFX908:
         return 'gfx908'
+    if amdgpu_arch_gfxxxx == AMDGPU_ARCH_GFX90A:
+        return 'gfx90a'
     if amdgpu_arch_gfxxxx == AMDGPU_ARCH_GFX1030:
         return 'gfx1030'
     assert False
@@ -151,10 +158,11 @@ def amdgpu_sgpr_limit(arch):
 
 class amdgpu_arch_detail_t(object):
     '''
-    probe or hard code
+    probe or hard code. value from amdgpu_arch_registry_t, see amdgpu_arch_detail.config
     '''
     def __init__(self):
         self.arch           = 0
+        self.sku            = ''
         self.num_cu         = 0
         self.simd_per_cu    = 0
         self.sclk_mhz       = 0
@@ -165,22 +173,47 @@ class amdgpu_arch_detail_t(object):
         self.l1_cache_line  = 0
         self.l2_size        = 0
         self.l2_cache_line  = 0
+        self.icache_size    = 0     # in byte, instruction cache seen by a CU
         self.mem_channels   = 0
         self.vgpr_per_cu    = 0
         self.sgpr_per_cu    = 0
         self.agpr_per_cu    = 0
+        self.vgpr_granularity   = 4     # vgpr/agpr are allocated in unit of this
+        self.unified_vgpr_file  = 0     # vgpr and agpr share vgpr_per_cu + agpr_per_cu
         self.wavefront_size = 64
         self.max_waves_per_cu       = 0
         self.fp32_fma_per_cycle     = 0
         self.memory_op_per_cycle    = 0     # read write
         self.memory_bus_width_bits  = 0    
+        self.xdlops_fp32_flop_per_cycle = 0     # per CU, 0 if no xdlops
+        self.xdlops_fp16_flop_per_cycle = 0
+        self.xdlops_bf16_flop_per_cycle = 0
+        self.mfma_cycle = dict()                # issue cycles of each mfma instruction, by name
 
     def theoretical_fp32_gflops(self):
         return self.num_cu * self.simd_per_cu * (self.sclk_mhz / 1000) * self.fp32_fma_per_cycle
 
+    def theoretical_gflops(self, precision, is_xdlops):
+        '''
+        peak of mfma if is_xdlops, otherwise of valu. fp16 valu is packed math, 2x of fp32
+        '''
+        if type(precision) is str:
+            precision = amdgpu_string_to_precision(precision)
+        if is_xdlops:
+            flop_per_cycle = {AMDGPU_PRECISION_FP32 : self.xdlops_fp32_flop_per_cycle,
+                              AMDGPU_PRECISION_FP16 : self.xdlops_fp16_flop_per_cycle,
+                              AMDGPU_PRECISION_BF16 : self.xdlops_bf16_flop_per_cycle}[precision]
+            return self.num_cu * (self.sclk_mhz / 1000) * flop_per_cycle
+        return self.theoretical_fp32_gflops() * (2 if precision == AMDGPU_PRECISION_FP16 else 1)
+
     def theoretical_bandwidth_gbps(self):
         return (self.mclk_mhz / 1000) * (self.memory_bus_width_bits / 8) * self.memory_op_per_cycle
 
+    def get_mfma_cycle(self, inst_name, default_cycle = 0):
+        if inst_name in self.mfma_cycle:
+            return self.mfma_cycle[inst_name]
+        return default_cycle
+
 def amdgpu_calculate_occupancy(arch_detail, vgpr_per_thread, block_size, lds_per_block):
     vgpr_per_block = vgpr_per_thread * block_size
     if vgpr_per_block > arch_detail.vgpr_per_cu:
@@ -200,27 +233,87 @@ def amdgpu_valid_occupancy_with_max_waves(arch_detail, block_size, occupancy):
     waves_per_block = block_size // arch_detail.wavefront_size
     return waves_per_block * occupancy <= arch_detail.max_waves_per_cu
 
+AMDGPU_ARCH_DETAIL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'amdgpu_arch_detail.config')
+AMDGPU_ARCH_DETAIL_ENV = 'IGEMM_ARCH_DETAIL'
+
+class amdgpu_arch_registry_t(object):
+    '''
+    arch detail of each arch and sku, loaded from config file with [amdgpu_arch], [amdgpu_sku], [amdgpu_mfma] sections.
+    file loaded later override key of same arch/sku, hence a board specific file only need to list the difference
+    '''
+    def __init__(self):
+        self.archs = dict()     # arch string -> dict of field
+        self.skus = dict()      # sku string -> dict of field, including 'arch'
+        self.mfmas = dict()     # arch string -> dict of mfma cycle
+
+    def load(self, config_file):
+        valid_fields = amdgpu_arch_detail_t().__dict__
+        for sec in config_parser_t(config_file)():
+            name = sec.get_name()
+            d = {k : v for k, v in sec.to_dict().items() if k != 'name'}
+            assert 'arch' in d, f"{config_file}:[{name}] has no arch"
+            arch = d.pop('arch')
+            if name == 'amdgpu_mfma':
+                self.mfmas.setdefault(arch, dict()).update(d)
+                continue
+            assert name in ('amdgpu_arch', 'amdgpu_sku'), f"{config_file}: unknown section [{name}]"
+            for k in d:
+                assert k in valid_fields and k not in ('arch', 'mfma_cycle'), f"{config_file}:[{name}] unknown field {k}"
+            if name == 'amdgpu_arch':
+                self.archs.setdefault(arch, dict()).update(d)
+            else:
+                assert 'sku' in d, f"{config_file}:[{name}] has no sku"
+                self.skus.setdefault(d['sku'], {'arch' : arch}).update(d)
+
+    def get_sku_list(self, arch = None):
+        if type(arch) is int:
+            arch = amdgpu_arch_to_string(arch)
+        sku_list = [self.archs[a]['sku'] for a in self.archs if arch is None or a == arch]
+        sku_list += [s for s in self.skus if (arch is None or self.skus[s]['arch'] == arch) and s not in sku_list]
+        return sku_list
+
+    def get_arch_detail(self, arch, sku = None):
+        '''
+        arch is string or AMDGPU_ARCH_*, sku None for the reference sku of this arch
+        '''
+        if type(arch) is int:
+            arch = amdgpu_arch_to_string(arch)
+        assert arch in self.archs, f"no arch detail for arch:{arch}"
+        fields = copy.deepcopy(self.archs[arch])
+        if sku is not None and sku != fields.get('sku'):
+            assert sku in self.skus and self.skus[sku]['arch'] == arch, f"no sku:{sku} for arch:{arch}"
+            fields.update({k : v for k, v in self.skus[sku].items() if k != 'arch'})
+        arch_detail = amdgpu_arch_detail_t()
+        for k, v in fields.items():
+            setattr(arch_detail, k, v)
+        arch_detail.arch = amdgpu_string_to_arch(arch)
+        arch_detail.mfma_cycle = dict(self.mfmas.get(arch, dict()))
+        return arch_detail
+
+_amdgpu_arch_registry = None
+
+def amdgpu_get_arch_registry():
+    '''
+    registry from AMDGPU_ARCH_DETAIL_FILE, then every file listed in env IGEMM_ARCH_DETAIL
+    '''
+    global _amdgpu_arch_registry
+    if _amdgpu_arch_registry is None:
+        registry = amdgpu_arch_registry_t()
+        registry.load(AMDGPU_ARCH_DETAIL_FILE)
+        for f in os.environ.get(AMDGPU_ARCH_DETAIL_ENV, '').split(os.pathsep):
+            if f != '':
+                registry.load(f)
+        _amdgpu_arch_registry = registry
+    return _amdgpu_arch_registry
+
+def amdgpu_get_arch_detail(arch, sku = None):
+    return amdgpu_get_arch_registry().get_arch_detail(arch, sku)
+
 def amdgpu_get_gfx906_60cu():
-    gfx906_60cu = amdgpu_arch_detail_t()
-    gfx906_60cu.arch            = AMDGPU_ARCH_GFX906
-    gfx906_60cu.num_cu          = 60
-    gfx906_60cu.simd_per_cu     = 64
-    gfx906_60cu.sclk_mhz        = 1725
-    gfx906_60cu.mclk_mhz        = 1000
-    gfx906_60cu.lds_size        = 65536
-    gfx906_60cu.lds_banks       = 32
-    gfx906_60cu.l1_size         = 16384
-    gfx906_60cu.l2_size         = 0
-    gfx906_60cu.mem_channels    = 0
-    gfx906_60cu.vgpr_per_cu     = 65536
-    gfx906_60cu.sgpr_per_cu     = 3200
-    gfx906_60cu.agpr_per_cu     = 0
-    gfx906_60cu.wavefront_size      = 64
-    gfx906_60cu.max_waves_per_cu    = 40
-    gfx906_60cu.fp32_fma_per_cycle  = 2
-    gfx906_60cu.memory_op_per_cycle = 2     # read write
-    gfx906_60cu.memory_bus_width_bits = 4096
-    return gfx906_60cu
+    return amdgpu_get_arch_detail(AMDGPU_ARCH_GFX906, 'mi50')
+
+def amdgpu_get_gfx908_120cu():
+    return amdgpu_get_arch_detail(AMDGPU_ARCH_GFX908, 'mi100')
 
 class amdgpu_arch_config_t(object):
     '''
@@ -25,6 +25,7 @@
 ################################################################################
 import os
 import subprocess
+import concurrent.futures
 
 from .amdgpu import *
 import os
@@ -116,6 +117,95 @@ class compile_asm_t(object):
             print('err:{}'.format(e))
             return False
 
+def _compile_run_cmd(cmd):
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr = subprocess.STDOUT)
+    try:
+        (out, _) = p.communicate()
+        if p.returncode != 0:
+            print('build fail:{}'.format(" ".join(cmd)))
+            print('{}'.format(out.decode('utf-8')))
+            return False
+        return True
+    except Exception as e:
+        print('fail to run cmd:{}'.format(" ".join(cmd)))
+        print('err:{}'.format(e))
+        return False
+
+class compile_assembler_t(object):
+    '''
+    assemble one asm source into relocatable object.
+    any callable with the same signature can be used instead, e.g. a stub on machine without rocm
+    '''
+    def __call__(self, arch_config, asm_file_name, target_object, include_dirs = list()):
+        arch_str = amdgpu_arch_to_string(arch_config.arch)
+        if _check_hip_clang():
+            cmd = ['/opt/rocm/llvm/bin/clang++']
+        else:
+            cmd = ['/opt/rocm/hcc/bin/clang']
+        cmd += ['-x', 'assembler']
+        cmd += ['-I{}'.format(d) for d in include_dirs]
+        cmd += ['-target', 'amdgcn--amdhsa']
+        cmd += ['-mcpu={}'.format(arch_str)]
+        if arch_config.code_object == AMDGPU_CODEOBJECT_V2:
+            cmd += ['-mno-code-object-v3']
+        cmd += ['-c', '{}'.format(asm_file_name)]
+        cmd += ['-o', '{}'.format(target_object)]
+        return _compile_run_cmd(cmd)
+
+class compile_linker_t(object):
+    '''
+    link relocatable objects into one code object.
+    any callable with the same signature can be used instead, e.g. a stub on machine without rocm
+    '''
+    def __call__(self, arch_config, object_file_names, target_hsaco):
+        if _check_hip_clang():
+            cmd = ['/opt/rocm/llvm/bin/ld.lld']
+        else:
+            cmd = ['/opt/rocm/hcc/bin/ld.lld']
+        cmd += ['-shared']
+        cmd += object_file_names
+        cmd += ['-o', '{}'.format(target_hsaco)]
+        return _compile_run_cmd(cmd)
+
+class compile_asm_parallel_t(object):
+    '''
+    assemble every asm source into its own object concurrently, then link them into target_hsaco.
+    each asm source must be self contained (macros, kernel descriptor), since they are assembled separately.
+    '''
+    def __init__(self, arch_config, asm_file_names, target_hsaco, assembler = None, linker = None, num_workers = None):
+        assert type(asm_file_names) is list and len(asm_file_names) != 0
+        self.arch_config = arch_config
+        self.asm_file_names = asm_file_names
+        self.target_hsaco = target_hsaco
+        self.assembler = assembler if assembler is not None else compile_assembler_t()
+        self.linker = linker if linker is not None else compile_linker_t()
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+
+    def get_object_file_name(self, asm_file_name):
+        return os.path.splitext(asm_file_name)[0] + '.o'
+
+    def compile(self, **kwargs):
+        '''
+        kwargs:
+            skip_assemble:  list, asm sources whose object is already up to date, only need link
+        '''
+        skip_assemble = kwargs['skip_assemble'] if 'skip_assemble' in kwargs else list()
+        object_file_names = [self.get_object_file_name(f) for f in self.asm_file_names]
+        jobs = [(f, o) for f, o in zip(self.asm_file_names, object_file_names) if f not in skip_assemble]
+
+        def assemble(job):
+            asm_file_name, object_file_name = job
+            include_dirs = [os.path.dirname(asm_file_name)] if os.path.dirname(asm_file_name) else list()
+            return self.assembler(self.arch_config, asm_file_name, object_file_name, include_dirs)
+
+        # every job is an external process, threads are enough to keep all cores busy
+        if len(jobs) != 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, min(self.num_workers, len(jobs)))) as executor:
+                results = list(executor.map(assemble, jobs))
+            if not all(results):
+                return False
+        return self.linker(self.arch_config, object_file_names, self.target_hsaco)
+
 class compile_disass_t(object):
     def __init__(self, mc, hsaco_file_name, target_disass = ''):
         self.hsaco_file_name = hsaco_file_name
@@ -31,7 +31,13 @@ class macro_base_t(mc_base_t):
     '''
     base class of a macro
     a macro can be inline-ed, which means no need to generate .macro ..... .endm and then call this macro
+    a macro is inline-ed if either constructed with inline, or the MC is in inline_macro mode
+
+    call_delimiter/decl_delimiter separate the args when invoke/declare this macro,
+    child class can overwrite them to keep the text of a legacy macro
     '''
+    call_delimiter = ','
+    decl_delimiter = ' '
     def __init__(self, mc, inline = False):
         mc_base_t.__init__(self, mc)
         self.arg_list = list()
@@ -39,7 +45,7 @@ class macro_base_t(mc_base_t):
     def name(self):
         return 'n/a macro'
     def is_inline(self):
-        return self.inline
+        return self.inline or self.mc.inline_macro
 
     def _declare_arg(self, arg_name):
         assert type(arg_name) is str
@@ -84,9 +90,9 @@ class macro_base_t(mc_base_t):
         else:
             for x in args:
                 assert type(x) is str, f'call this macro need parse in string!, {x}:{type(x)}'
-            return '{} {}'.format(self.name(), ','.join(args))
+            return '{} {}'.format(self.name(), self.call_delimiter.join(args))
 
     def emit(self):
         if not self.is_inline():
-            with self._emit_macro_indented(".macro {} {}".format(self.name(), ' '.join(self.arg_list))):
+            with self._emit_macro_indented(".macro {} {}".format(self.name(), self.decl_delimiter.join(self.arg_list))):
                 self.expr()
@@ -109,6 +109,153 @@ def create_mc_inst(inst_str):
     return mc_inst_t(inst_str)
 
 
+class mc_inst_analyzer_t(object):
+    '''
+    string based analysis of single inst, for pass working on emitted inst, like list_scheduler_t.
+    registers in inst string are symbolic, symbol_table (label->value, see sym_get_table()) is used
+    to resolve alias like v_tmp+4 and v_gld_b.
+    '''
+    RE_REG = re.compile(r'\b([vsa])\[([^\]]+)\]')
+    RE_REG_NUM = re.compile(r'\b([vsa])(\d+)\b')
+    RE_IDENT = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+    RE_TWO_DST = re.compile(r'^v_(add|sub|subrev|addc|subb|subbrev)_co_|^v_mad_(u64_u32|i64_i32)|^v_div_scale|^v_swap_b32')
+    OP_FENCE = ('s_branch', 's_cbranch', 's_barrier', 's_endpgm', 's_setpc', 's_swappc')
+    OP_SCC_USE = ('s_cselect', 's_cbranch_scc', 's_addc', 's_subb', 's_cmov')
+    OP_DST_READ = ('v_mfma', 'v_mac', 'v_fmac', 'v_writelane', 'v_swap', 's_cmov', 's_addk', 's_mulk', 's_bitset')
+    OP_SCC_NO_DEF = ('s_mov', 's_movk', 's_cmov', 's_cselect', 's_waitcnt', 's_nop', 's_setprio', 's_sleep',
+                    's_load', 's_buffer_load', 's_dcache', 's_getpc')
+
+    def __init__(self, symbol_table = None, gpr_extent = None):
+        self.symbol_table = symbol_table if symbol_table else dict()
+        self.gpr_extent = gpr_extent if gpr_extent else dict()  # 'v'/'s'/'a' -> list of (start, end), see gpr_allocator_t.get_extent()
+        self.eval_cache = dict()        # expr -> index, the same expr appear many times in a kernel
+
+    def _eval(self, expr):
+        '''
+        evaluate register index expression like v_gld_b+0+3, None if can not resolve
+        '''
+        if expr not in self.eval_cache:
+            self.eval_cache[expr] = self._eval_expr(expr)
+        return self.eval_cache[expr]
+
+    def _eval_expr(self, expr):
+        unknown = list()
+        def sub(m):
+            if m.group(0) in self.symbol_table:
+                return str(self.symbol_table[m.group(0)])
+            unknown.append(m.group(0))
+            return '0'
+        e = self.RE_IDENT.sub(sub, expr)
+        if unknown or re.search(r'[^0-9+\-*/() ]', e):
+            return None
+        return int(eval(e, {'__builtins__' : {}}))
+
+    def reg_extent(self, regs):
+        '''
+        expand every register to the whole symbol it belongs to, e.g. v_a+8 to v_a...v_b-1,
+        where symbol of v/s/a register is label with v_/s_/a_ prefix in symbol_table.
+        if gpr_extent is given for this register file, expand to every range containing it instead,
+        since packed symbols may alias and value order does not tell where a symbol ends
+        '''
+        extent = set()
+        for t, i in regs:
+            if t not in ('v', 's', 'a'):
+                extent.add((t, i))
+                continue
+            ranges = [r for r in self.gpr_extent.get(t, list()) if r[0] <= i < r[1]]
+            if ranges:
+                for lo, hi in ranges:
+                    extent |= set((t, x) for x in range(lo, hi))
+                continue
+            values = sorted(set(v for k, v in self.symbol_table.items() if k.startswith(t + '_') and type(v) is int))
+            lo = max([v for v in values if v <= i], default = i)
+            hi = min([v for v in values if v > i], default = i + 1)
+            extent |= set((t, x) for x in range(lo, hi))
+        return extent
+
+    def _operand_regs(self, operand):
+        regs = set()
+        for m in self.RE_REG.finditer(operand):
+            lo, hi = m.group(2).split(':') if ':' in m.group(2) else (m.group(2), m.group(2))
+            i_lo, i_hi = self._eval(lo), self._eval(hi)
+            if i_lo is None or i_hi is None:
+                return None
+            regs |= set((m.group(1), i) for i in range(i_lo, i_hi + 1))
+        for m in self.RE_REG_NUM.finditer(operand):
+            regs.add((m.group(1), int(m.group(2))))
+        for special in ('vcc', 'exec', 'm0'):
+            if re.search(r'\b' + special + r'(_lo|_hi)?\b', operand):
+                regs.add((special, 0))
+        return regs
+
+    def inst_info(self, inst_str):
+        '''
+        return (defs, uses, kind) of single inst, None if can not be analyzed.
+        kind is one of 'fence', 'mfma', 'ds', 'vmem', 'smem', 'waitcnt', 'other'
+        '''
+        istr = inst_str.split(';')[0].strip()
+        op = get_mc_inst_op(istr)
+        operands = [x.strip() for x in istr[len(op):].split(',')] if len(istr) > len(op) else []
+        defs, uses = set(), set()
+
+        if op.endswith(':') or op.startswith(self.OP_FENCE):
+            return defs, uses, 'fence'
+        if op.startswith('.v_clear_nc'):
+            base = self._eval(operands[0]) if len(operands) == 2 else None
+            if base is None:
+                return None
+            return set(('v', base + i) for i in range(int(operands[1], 0))), uses, 'other'
+        if op.startswith('.'):
+            return None
+        if op.startswith('s_waitcnt'):
+            return defs, uses, 'waitcnt'
+
+        regs = list()
+        for o in operands:
+            r = self._operand_regs(o)
+            if r is None:
+                return None
+            regs.append(r)
+
+        if op.startswith(('ds_write', 'buffer_store', 'global_store', 's_cmp', 's_bitcmp')):
+            num_dst = 0
+        elif self.RE_TWO_DST.match(op):
+            num_dst = 2
+        else:
+            num_dst = 1
+        for r in regs[:num_dst]:
+            defs |= r
+        for r in regs[num_dst:]:
+            uses |= r
+
+        if op.startswith(self.OP_DST_READ):
+            uses |= defs                        # accumulate into, or only update part of dst
+        if op.startswith('v_'):
+            uses.add(('exec', 0))
+            if op.startswith('v_cmpx'):
+                defs.add(('exec', 0))
+        if op.startswith('s_'):
+            if 'saveexec' in op:
+                defs.add(('exec', 0))
+                uses.add(('exec', 0))
+            if op.startswith(self.OP_SCC_USE):
+                uses.add(('scc', 0))
+            if not op.startswith(self.OP_SCC_NO_DEF):
+                defs.add(('scc', 0))
+
+        if op.startswith('v_mfma'):
+            kind = 'mfma'
+        elif op.startswith('ds_'):
+            kind = 'ds'
+        elif op.startswith(('buffer_', 'global_')):
+            kind = 'vmem'
+        elif op.startswith(('s_load', 's_buffer_load')):
+            kind = 'smem'
+        else:
+            kind = 'other'
+        return defs, uses, kind
+
+
 class machine_basic_block_t(object):
     '''
     machine basic block(mbb), sequence of mc_inst_t
@@ -25,6 +25,7 @@
 ################################################################################
 import sys
 import os
+import io
 import inspect
 from copy import deepcopy
 import subprocess
@@ -97,12 +98,46 @@ class _mc_indent_t(object):
     def get(self):
         return self.level
 
+MC_EMIT_BUFFER_CHUNKED = 1      # set to 0 to fall back to growing a single string with +=
+
+class _mc_string_buffer_t(object):
+    '''
+    legacy buffer, grow one string on every append. cost is quadratic to the number of lines
+    '''
+    def __init__(self):
+        self.buffer = ''
+    def append(self, s):
+        self.buffer += s
+    def get(self):
+        return self.buffer
+
+class _mc_chunked_buffer_t(object):
+    '''
+    store every append in a list, and only join them when content is requested.
+    joined result is kept as the single chunk, so repeated get() is cheap
+    '''
+    def __init__(self):
+        self.chunks = list()
+    def append(self, s):
+        self.chunks.append(s)
+    def get(self):
+        if len(self.chunks) == 0:
+            return ''
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0]
+
+def mc_create_buffer():
+    if MC_EMIT_BUFFER_CHUNKED:
+        return _mc_chunked_buffer_t()
+    return _mc_string_buffer_t()
+
 class mc_emit_to_string_t(object):
     def __init__(self, indent = _mc_indent_t(4)):
         self.indent = indent
-        self.string_buffer = ''
+        self.string_buffer = mc_create_buffer()
     def emit(self, s):
-        self.string_buffer += self.indent() + s + '\n'
+        self.string_buffer.append(self.indent() + s + '\n')
     def open(self):
         pass
     def close(self):
@@ -114,11 +149,27 @@ class mc_emit_to_string_t(object):
     def dec_indent(self):
         self.indent.dec()
     def get_buffer(self):
-        return self.string_buffer
+        return self.string_buffer.get()
     def set_indent(self, level):
         self.indent.set(level)
     def get_indent(self):
         return self.indent.get()
+    def hold(self):
+        '''
+        keep everything emitted after this in a separate buffer, until release()
+        '''
+        self.hold_buffer = self.string_buffer
+        self.string_buffer = mc_create_buffer()
+    def release(self):
+        '''
+        stop holding, return the held content, which can be put back later by emit_raw()
+        '''
+        held = self.string_buffer.get()
+        self.string_buffer = self.hold_buffer
+        self.hold_buffer = None
+        return held
+    def emit_raw(self, s):
+        self.string_buffer.append(s)
 
 class mc_emit_to_iostream_t(object):
     def __init__(self, indent = _mc_indent_t(4)):
@@ -140,14 +191,24 @@ class mc_emit_to_iostream_t(object):
     def get_indent(self):
         return self.indent.get()
 
+MC_EMIT_FILE_BUFFER_SIZE = 1 << 20     # large write buffer, flushed to disk only when it is full or file is closed
+
 class mc_emit_to_file_t(object):
+    '''
+    content is written into a temp file next to file_name, and renamed to file_name in close().
+    hence a crashed run never leaves a half-written file, only a stale *.tmp.
+    fsync is skipped unless durable is True, in which case both file and directory are synced
+    '''
     # TODO: exception check
-    def __init__(self, file_name, indent = _mc_indent_t(4)):
+    def __init__(self, file_name, indent = _mc_indent_t(4), durable = False):
         self.file_name = file_name
+        self.tmp_file_name = None
         self.f = None
         self.indent = indent
+        self.durable = durable
     def __del__(self):
-        self.close()
+        # never commit a file that is not explicitly closed, it may be incomplete
+        self.discard()
     def emit(self, s):
         if self.f:
             self.f.write(self.indent() + s + '\n')
@@ -184,22 +245,61 @@ class mc_emit_to_file_t(object):
 
     def open(self):
         if self.f == None:
+            # pid in the name, in case the same file is opened by different process
+            self.tmp_file_name = '{}.{}.tmp'.format(self.file_name, os.getpid())
             try:
-                self.f = open(self.file_name, "w")
+                self.f = open(self.tmp_file_name, "w", buffering = MC_EMIT_FILE_BUFFER_SIZE)
             except IOError as e:
-                print("can't open file:{}({})".format(self.file_name, e))
+                print("can't open file:{}({})".format(self.tmp_file_name, e))
                 sys.exit()
 
             self.emit_license()
             self.emit('; generated by igemm_codegen.py ({})'.format(mc_get_version()))
             self.emit(';')
-            os.fsync(self.f)
 
     def close(self):
         if self.f != None:
-            os.fsync(self.f)
+            self.f.flush()
+            if self.durable:
+                os.fsync(self.f.fileno())
+            self.f.close()
+            self.f = None
+            os.replace(self.tmp_file_name, self.file_name)
+            self.tmp_file_name = None
+            if self.durable:
+                dir_fd = os.open(os.path.dirname(os.path.abspath(self.file_name)), os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+    def discard(self):
+        '''
+        drop everything emitted since open(), target file is left untouched
+        '''
+        if self.f != None:
             self.f.close()
             self.f = None
+            if os.path.exists(self.tmp_file_name):
+                os.remove(self.tmp_file_name)
+            self.tmp_file_name = None
+    def hold(self):
+        '''
+        keep everything emitted after this in memory, until release()
+        '''
+        self.hold_f = self.f
+        self.f = io.StringIO()
+    def release(self):
+        '''
+        stop holding, return the held content, which can be put back later by emit_raw()
+        '''
+        held = self.f.getvalue()
+        self.f = self.hold_f
+        self.hold_f = None
+        return held
+    def emit_raw(self, s):
+        if self.f:
+            self.f.write(s)
     def indent_context(self,enter_func=None, exit_func=None):
         return _mc_indent_context_manager_t(self.indent,enter_func, exit_func)
     def inc_indent(self):
@@ -217,14 +317,14 @@ class mc_deferred_emit_t(object):
     '''
     def __init__(self, upper_emitter):
         self.indent = upper_emitter.indent  # manage the indent here
-        self.buffer = ''
+        self.buffer = mc_create_buffer()
         self.is_first_line = True
     def emit(self, s):
         if self.is_first_line:
-            self.buffer += s
+            self.buffer.append(s)
             self.is_first_line = False
         else:
-            self.buffer += '\n' + self.indent() + s
+            self.buffer.append('\n' + self.indent() + s)
 
     def open(self):
         pass
@@ -241,7 +341,7 @@ class mc_deferred_emit_t(object):
     def get_indent(self):
         return self.indent.get()
     def get_buffer(self):
-        return self.buffer
+        return self.buffer.get()
 
 class mc_asm_printer_t(object):
     '''
@@ -254,10 +354,8 @@ class mc_asm_printer_t(object):
         self.global_bucket = set()          # for uniqueness
         self.unique_emitter_dict = dict()
         self.arch_config = arch_config
+        self.inline_macro = False           # if True, every macro_base_t of this MC is expanded inline
 
-    def __del__(self):
-        self.emitter.close()
-    
     def close(self):
         self.emitter.close()
 
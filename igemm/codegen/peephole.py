@@ -0,0 +1,375 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+import re
+from .mbb import *
+
+PEEPHOLE_REMOVE = ''            # returned by rule to remove the inst
+PEEPHOLE_HAZARD_WINDOW = 5      # no inst is removed this close to a hazard sensitive inst, which may count on it as wait state
+PEEPHOLE_HAZARD_OP = ('s_nop', 'v_mfma', 'v_accvgpr', 'v_readlane', 'v_writelane', 'v_readfirstlane',
+                        's_setreg', 's_getreg', 's_setprio', 'v_cmpx')
+PEEPHOLE_REDUNDANT_WINDOW = 64  # how far to look back for the same inst
+PEEPHOLE_MAX_ROUND = 4          # every rule is applied to the whole text again, until nothing changed
+
+class peephole_inst_t(object):
+    '''
+    parsed inst of one line. kind is 'inst' for alu inst can be touched by rule, 'transparent' for inst that
+    does not touch any register, like s_waitcnt, 'mem' for memory op and mfma, 'barrier' for everything else,
+    like label, branch, macro, or inst with side effect. defs/uses is None if registers can not be resolved.
+    kills is part of defs that is surely written as a whole, while defs may over estimate, e.g. scc of s_mul_i32
+    '''
+    def __init__(self, op, operands, defs, uses, kind, kills = None):
+        self.op = op
+        self.operands = operands
+        self.defs = defs
+        self.uses = uses
+        self.kind = kind
+        self.kills = kills if kills is not None else set()
+
+class peephole_rule_t(object):
+    '''
+    base of peephole rule. __call__(pp, i) check inst of line i in peephole_pass_t pp, return None if not match,
+    PEEPHOLE_REMOVE to remove this inst, or a new inst string to replace it
+    '''
+    name = None
+    def __call__(self, pp, i):
+        return None
+
+    @staticmethod
+    def is_zero(operand):
+        try:
+            return int(operand, 0) == 0
+        except ValueError:
+            return False
+
+    @staticmethod
+    def to_mov(op, dst, src):
+        return ('s_mov_b32' if op.startswith('s_') else 'v_mov_b32') + f' {dst}, {src}'
+
+class peephole_rule_self_move_t(peephole_rule_t):
+    '''
+    v_mov_b32 v[x], v[x]  ->  (removed)
+    '''
+    name = 'self_move'
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if inst.op not in ('s_mov_b32', 's_mov_b64', 'v_mov_b32') or len(inst.operands) != 2 or inst.defs is None:
+            return None
+        if inst.defs != inst.uses - set([('exec', 0)]) or not pp.is_hazard_clear(i):
+            return None
+        return PEEPHOLE_REMOVE
+
+class peephole_rule_shift_zero_t(peephole_rule_t):
+    '''
+    s_lshl_b32 s[x], s[y], 0  ->  s_mov_b32 s[x], s[y]
+    v_lshlrev_b32 v[x], 0, v[y]  ->  v_mov_b32 v[x], v[y]
+    salu is only replaced if scc is not used before defined again, since s_mov does not write scc
+    '''
+    name = 'shift_zero'
+    SALU_OP = ('s_lshl_b32', 's_lshr_b32', 's_ashr_i32')
+    VALU_OP = ('v_lshlrev_b32', 'v_lshrrev_b32', 'v_ashrrev_i32')
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if len(inst.operands) != 3:
+            return None
+        if inst.op in self.SALU_OP and self.is_zero(inst.operands[2]) and pp.is_scc_dead_after(i):
+            return self.to_mov(inst.op, inst.operands[0], inst.operands[1])
+        if inst.op in self.VALU_OP and self.is_zero(inst.operands[1]):
+            return self.to_mov(inst.op, inst.operands[0], inst.operands[2])
+        return None
+
+class peephole_rule_add_zero_t(peephole_rule_t):
+    '''
+    s_add_u32 s[x], 0, s[y]  ->  s_mov_b32 s[x], s[y]
+    v_add_u32 v[x], v[y], 0  ->  v_mov_b32 v[x], v[y]
+    op write carry to vcc is not touched, and salu is only replaced if scc is not used before defined again
+    '''
+    name = 'add_zero'
+    COMMUTATIVE_OP = ('s_add_u32', 's_add_i32', 's_or_b32', 's_xor_b32', 'v_add_u32', 'v_or_b32', 'v_xor_b32')
+    NON_COMMUTATIVE_OP = ('s_sub_u32', 's_sub_i32', 'v_sub_u32')
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if len(inst.operands) != 3 or inst.op not in self.COMMUTATIVE_OP + self.NON_COMMUTATIVE_OP:
+            return None
+        dst, src0, src1 = inst.operands
+        if self.is_zero(src1):
+            src = src0
+        elif self.is_zero(src0) and inst.op in self.COMMUTATIVE_OP:
+            src = src1
+        else:
+            return None
+        if inst.op.startswith('s_') and not pp.is_scc_dead_after(i):
+            return None
+        return self.to_mov(inst.op, dst, src)
+
+class peephole_rule_redundant_t(peephole_rule_t):
+    '''
+    alu inst same as a previous one in the same straight-line code, and none of its source or destination,
+    including scc/vcc/exec, is written in between, e.g. back-to-back v_mov_b32 of the same value,
+    s_mov_b32 of the same constant, or s_lshl_b32 of the same stride into another sgpr.
+    inst reading its own destination, like s_lshl_b32 s[x], s[x], 2, is not redundant.
+    '''
+    name = 'redundant'
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if inst.defs is None or len(inst.defs & inst.uses) != 0 or not pp.is_hazard_clear(i):
+            return None
+        key = pp.get_inst_str(i)
+        touched = inst.defs | inst.uses
+        j, n = i - 1, 0
+        while j >= 0 and n < PEEPHOLE_REDUNDANT_WINDOW:
+            prev = pp.insts[j]
+            if prev is None:
+                j -= 1
+                continue
+            if prev.kind == 'barrier' or prev.defs is None:
+                return None
+            if prev.kind == 'inst' and pp.get_inst_str(j) == key:
+                return PEEPHOLE_REMOVE
+            if len(prev.defs & touched) != 0:
+                return None
+            j, n = j - 1, n + 1
+        return None
+
+class peephole_rule_copy_propagate_t(peephole_rule_t):
+    '''
+    v_mov_b32 v[x], v[y]            v_mov_b32 v[x], v[y]
+    v_lshlrev_b32 v[z], 2, v[x]  -> v_lshlrev_b32 v[z], 2, v[y]
+    source of alu inst is replaced by source of the copy, only from the same register file, hence operand
+    constraint is not changed. neither x, y, nor exec for valu, is written in between
+    '''
+    name = 'copy_propagate'
+    RE_SINGLE_REG = re.compile(r'^([vs])\[([^\]:]+)\]$')
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if inst.defs is None or pp.RE_TWO_DST.match(inst.op) or inst.op.startswith(('s_cmp', 's_bitcmp', 'v_mfma')):
+            return None
+        operands = list(inst.operands)
+        for k in range(1, len(operands)):
+            m = self.RE_SINGLE_REG.match(operands[k])
+            index = pp._eval(m.group(2)) if m else None
+            if index is None:
+                continue
+            src = self.find_copy_source(pp, i, (m.group(1), index))
+            if src is not None:
+                operands[k] = src
+        if operands == inst.operands:
+            return None
+        return inst.op + ' ' + ', '.join(operands)
+
+    def find_copy_source(self, pp, i, reg):
+        j = pp.find_def(i, reg)
+        if j is None:
+            return None
+        copy = pp.insts[j]
+        if copy.op not in ('s_mov_b32', 'v_mov_b32') or len(copy.operands) != 2 or copy.defs != set([reg]):
+            return None
+        m = self.RE_SINGLE_REG.match(copy.operands[1])
+        if m is None or m.group(1) != reg[0] or copy.operands[1] == copy.operands[0]:
+            return None
+        touched = copy.defs | copy.uses
+        for inst in pp.insts[j + 1 : i]:
+            if inst is not None and inst.defs is not None and len(inst.defs & touched) != 0:
+                return None
+        return copy.operands[1]
+
+class peephole_rule_dead_write_t(peephole_rule_t):
+    '''
+    alu inst whose every destination, including scc, is written again before any use in the same straight-line
+    code, e.g. copy left behind by copy_propagate. a destination reaching any label, branch or barrier is live.
+    inst writing special register other than scc is never removed, and after exec is changed, vgpr written
+    again is still live in lanes not active.
+    '''
+    name = 'dead_write'
+    def __call__(self, pp, i):
+        inst = pp.insts[i]
+        if inst.defs is None or len(inst.defs) == 0 or any(t not in ('v', 's', 'scc') for t, _ in inst.defs):
+            return None
+        if not pp.is_hazard_clear(i):
+            return None
+        live, is_exec_changed = set(inst.defs), False
+        for after in pp.insts[i + 1:]:
+            if after is None or after.kind == 'transparent':
+                continue
+            if after.kind == 'barrier' or after.defs is None or len(after.uses & live) != 0:
+                return None
+            is_exec_changed = is_exec_changed or ('exec', 0) in after.defs
+            live -= set(r for r in after.kills if not (is_exec_changed and r[0] == 'v'))
+            if len(live) == 0:
+                return PEEPHOLE_REMOVE
+        return None
+
+PEEPHOLE_RULE_REGISTRY = dict()     # name -> rule class, applied in order of registration
+
+def peephole_register_rule(rule_class):
+    assert issubclass(rule_class, peephole_rule_t) and rule_class.name not in PEEPHOLE_RULE_REGISTRY, \
+                f"rule {rule_class.name} already registered"
+    PEEPHOLE_RULE_REGISTRY[rule_class.name] = rule_class
+
+def peephole_get_rule_names():
+    return list(PEEPHOLE_RULE_REGISTRY.keys())
+
+peephole_register_rule(peephole_rule_self_move_t)
+peephole_register_rule(peephole_rule_shift_zero_t)
+peephole_register_rule(peephole_rule_add_zero_t)
+peephole_register_rule(peephole_rule_redundant_t)
+peephole_register_rule(peephole_rule_copy_propagate_t)
+peephole_register_rule(peephole_rule_dead_write_t)
+
+class peephole_pass_t(mc_inst_analyzer_t):
+    '''
+    post-emission pass to rewrite or remove alu inst by every rule in PEEPHOLE_RULE_REGISTRY, or those
+    listed in rules. work on straight-line code, any label, branch, macro or inst with side effect is a barrier
+    that no rule look across. a rewritten inst is checked by every rule again.
+    '''
+    TRANSPARENT_OP = ('s_waitcnt', 's_nop')
+    SCC_DEF_OP = ('s_add_', 's_sub_', 's_addc', 's_subb', 's_addk', 's_cmp', 's_bitcmp', 's_lshl', 's_lshr', 's_ashr',
+                    's_and_', 's_or_', 's_xor_', 's_andn2', 's_orn2', 's_nand', 's_nor', 's_xnor', 's_not', 's_bfe',
+                    's_min', 's_max', 's_abs', 's_bcnt', 's_wqm', 's_quadmask')
+    SIDE_EFFECT_OP = ('s_sendmsg', 's_dcache', 's_icache', 's_set', 's_get', 's_memtime', 's_memrealtime', 's_sleep',
+                        's_trap', 's_ttrace', 's_incperflevel', 's_decperflevel')
+
+    def __init__(self, symbol_table = None, rules = None):
+        mc_inst_analyzer_t.__init__(self, symbol_table)
+        rules = rules if rules is not None else peephole_get_rule_names()
+        for r in rules:
+            assert r in PEEPHOLE_RULE_REGISTRY, f"unknown peephole rule {r}"
+        self.rules = [PEEPHOLE_RULE_REGISTRY[r]() for r in rules]
+
+    def parse_line(self, line):
+        '''
+        return peephole_inst_t, or None if line is comment or empty
+        '''
+        istr = line.split(';')[0].strip()
+        if len(istr) == 0 or istr.startswith('//'):
+            return None
+        op = get_mc_inst_op(istr)
+        operands = [x.strip() for x in istr[len(op):].split(',')] if len(istr) > len(op) else []
+        if op.startswith(self.TRANSPARENT_OP):
+            return peephole_inst_t(op, operands, set(), set(), 'transparent')
+        if op.startswith(self.SIDE_EFFECT_OP):
+            return peephole_inst_t(op, operands, None, None, 'barrier')
+        info = self.inst_info(istr) if not op.startswith('.') else None
+        if info is None:
+            return peephole_inst_t(op, operands, None, None, 'barrier')
+        defs, uses, kind = info
+        if kind == 'fence':
+            return peephole_inst_t(op, operands, defs, uses, 'barrier')
+        kills = set(r for r in defs if r != ('scc', 0) or op.startswith(self.SCC_DEF_OP))
+        if op.endswith(('_sdwa', '_dpp')) or 'd16' in op or re.search(r'\b(op_sel|dst_sel|dst_unused)', istr):
+            kills = set()           # only part of dst is written
+        return peephole_inst_t(op, operands, defs, uses, 'inst' if kind == 'other' and op.startswith(('s_', 'v_')) else 'mem', kills)
+
+    def get_inst_str(self, i):
+        return ' '.join(self.lines[i].split(';')[0].split())
+
+    def is_hazard_clear(self, i):
+        '''
+        if the inst can be removed without shrinking wait states of a hazard sensitive inst nearby,
+        or of valu writing sgpr/vcc before it, which need wait states before read by vmem
+        '''
+        for step in (-1, 1):
+            j, n = i + step, 0
+            while 0 <= j < len(self.insts) and n < PEEPHOLE_HAZARD_WINDOW:
+                inst = self.insts[j]
+                if inst is not None:
+                    if inst.op.startswith(PEEPHOLE_HAZARD_OP):
+                        return False
+                    if step == -1 and inst.op.startswith('v_') and (inst.defs is None or \
+                                any(t in ('s', 'vcc') for t, _ in inst.defs)):
+                        return False
+                    n += 1
+                j += step
+        return True
+
+    def is_scc_dead_after(self, i):
+        '''
+        if scc written by inst i is defined again before any use. false if can not be proven in straight-line code
+        '''
+        for inst in self.insts[i + 1:]:
+            if inst is None or inst.kind == 'transparent':
+                continue
+            if inst.kind == 'barrier' or ('scc', 0) in inst.uses:
+                return False
+            if ('scc', 0) in inst.kills:
+                return True
+        return False
+
+    def find_def(self, i, reg):
+        '''
+        index of the nearest inst before i in the same straight-line code that write reg, None if not found
+        '''
+        for j in range(i - 1, -1, -1):
+            inst = self.insts[j]
+            if inst is None or inst.kind == 'transparent':
+                continue
+            if inst.kind == 'barrier' or inst.defs is None:
+                return None
+            if reg in inst.defs:
+                return j
+        return None
+
+    def rewrite_line(self, line, inst_str):
+        indent = line[:len(line) - len(line.lstrip())]
+        comment = ' ;' + line.split(';', 1)[1] if ';' in line else ''
+        return indent + inst_str + comment
+
+    def __call__(self, text):
+        '''
+        return optimized text. counters of this run are in num_inst/num_removed/num_rewritten, and
+        rule_count of rule name->number of inst matched
+        '''
+        self.lines = text.split('\n')
+        self.insts = [self.parse_line(line) for line in self.lines]
+        self.num_inst = len([inst for inst in self.insts if inst is not None and not inst.op.endswith(':')])
+        self.num_removed, self.num_rewritten = 0, 0
+        self.rule_count = dict((r.name, 0) for r in self.rules)
+
+        for _ in range(PEEPHOLE_MAX_ROUND):
+            changed = False
+            for i in range(len(self.lines)):
+                matched = True
+                while matched and self.insts[i] is not None and self.insts[i].kind == 'inst':
+                    matched = False
+                    for rule in self.rules:
+                        result = rule(self, i)
+                        if result is None:
+                            continue
+                        self.rule_count[rule.name] += 1
+                        changed = True
+                        if result == PEEPHOLE_REMOVE:
+                            self.num_removed += 1
+                            self.lines[i], self.insts[i] = None, None
+                        else:
+                            self.num_rewritten += 1
+                            self.lines[i] = self.rewrite_line(self.lines[i], result)
+                            self.insts[i] = self.parse_line(self.lines[i])
+                            matched = True
+                        break
+            if not changed:
+                break
+        return '\n'.join(line for line in self.lines if line is not None)
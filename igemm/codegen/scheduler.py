@@ -24,20 +24,26 @@
 # 
 ################################################################################
 
+import re
+import copy
 from .mc import *
 from .mbb import *
+from .amdgpu import *
 
 
 SCHEDULER_TYPE_SIMPLE_INTERLEAVE = 0
+SCHEDULER_TYPE_LIST = 1
 
 INTERLEAVE_PTN_0 = "mbb0 mfma and related share load, mbb1 global_load and move_slice_window"
 INTERLEAVE_PTN_1 = "mbb0 mfma, mbb1 share_store"
 INTERLEAVE_PTN_2 = "mbb0 global store, mbb 1 share store"
+INTERLEAVE_PTN_N = "mbb0 base, mbb1...N fill list each with budget per interval"
 
 class simple_interleave_scheduler_t(mc_base_t):
     '''
     2 mbb list, mbb_0 and mbb_1. interleave mbb_1 into first mbb list mbb_0
     mbb_0 is also base mbb
+    more than 2 mbb list (or INTERLEAVE_PTN_N), interleave every mbb_1...N into mbb_0, see lower_n_way()
     '''
     def __init__(self, mc, mbb_lists):
         mc_base_t.__init__(self, mc)
@@ -100,9 +106,12 @@ class simple_interleave_scheduler_t(mc_base_t):
                         return True
             return False
 
+        interleave_pattern = get_dict_with_default(options, "interleave_pattern", INTERLEAVE_PTN_0)
+        if interleave_pattern == INTERLEAVE_PTN_N or len(self.mbb_lists) > 2:
+            return self.lower_n_way(**options)
+
         assert len(self.mbb_lists) == 2, "currently only support 2 mbb list interleave together"
 
-        interleave_pattern = get_dict_with_default(options, "interleave_pattern", INTERLEAVE_PTN_0)
         start_position = get_dict_with_default(options, "start_position", 0)
         min_interval = get_dict_with_default(options, "min_interval", [1] * len(self.mbb_lists))
         max_interleave_space = get_dict_with_default(options, "max_interleave_space", 14)       # mfma 32x32 inst allow at most 14
@@ -246,13 +255,367 @@ class simple_interleave_scheduler_t(mc_base_t):
                     m0_idx += 1
             return self._get_deferred()
 
+    def lower_n_way(self, **options):
+        '''
+        mbb_lists[0] is base, every base mbb is an interval. after each base mbb, every fill list mbb_lists[1...N]
+        in turn emit at most its budget of mbb.
+        options:
+            start_position:           int,   0, or -1 to allow fill before first base mbb
+            per_interval:             list,  budget of mbb per interval, per mbb_lists[0], [1], ... None to decide by
+                                             *_per_interval below according to content of that list
+            start_after:              list,  per mbb_lists[0], [1], ... None, or index of another list that must be
+                                             drained before this list start, or tuple (index, num) that num of mbb of
+                                             that list must be emitted before this list start. this list start from
+                                             next interval, so two lists do not crowd into the shadow of one base mbb
+            global_mem_per_interval:  int,   budget of list contains global mem
+            share_mem_per_interval:   int,   budget of list contains share mem
+            arch_alu_per_interval:    int,   budget of other list
+        budget not given is evenly spread to the rest intervals after this list start, except global mem is
+        issued within first 2/3 of them (same as INTERLEAVE_PTN_0), to hide its latency earlier.
+        any budget is increased if the list can not be drained within base mbb.
+        '''
+        def get_dict_with_default(dictionary, key, default_value):
+            if key in dictionary:
+                return dictionary[key]
+            else:
+                return default_value
+
+        def mbb_list_kind(mbbs):
+            types = [mi.type() for mbb in mbbs for mi in mbb.mc_inst_list]
+            if MC_INST_TYPE_GLOBAL_MEM in types:
+                return "global_mem_per_interval"
+            if MC_INST_TYPE_SHARE_MEM in types:
+                return "share_mem_per_interval"
+            return "arch_alu_per_interval"
+
+        num_lists = len(self.mbb_lists)
+        start_position = get_dict_with_default(options, "start_position", 0)
+        per_interval = get_dict_with_default(options, "per_interval", [None] * num_lists)
+        start_after = get_dict_with_default(options, "start_after", [None] * num_lists)
+        assert start_position in (0, -1) and len(per_interval) == num_lists and len(start_after) == num_lists
+
+        # (list index, num of mbb) to wait before start, and budget, of every fill list
+        wait = [None] * num_lists
+        for k in range(1, num_lists):
+            if start_after[k] is not None:
+                j, num = start_after[k] if type(start_after[k]) in (tuple, list) else (start_after[k], len(self.mbb_lists[start_after[k]]))
+                assert 1 <= j < k, f"list {k} can only start after a previous fill list, not {j}"
+                wait[k] = (j, num)
+
+        num_slots = len(self.mbb_lists[0]) - start_position
+        start_slot = [0] * num_lists
+        budget = [0] * num_lists
+        for k in range(1, num_lists):
+            if wait[k] is not None:
+                j, num = wait[k]
+                start_slot[k] = start_slot[j] + (num + budget[j] - 1) // budget[j]
+            num_mbb = len(self.mbb_lists[k])
+            num_slots_left = max(num_slots - start_slot[k], 1)
+            even = (num_mbb + num_slots_left - 1) // num_slots_left
+            kind = mbb_list_kind(self.mbb_lists[k])
+            b = per_interval[k] if per_interval[k] is not None else get_dict_with_default(options, kind, None)
+            if b is None and kind == "global_mem_per_interval":
+                gmem_slots = max(int(num_slots_left * 2 / 3), 1)
+                b = 1
+                while (num_mbb + b - 1) // b >= gmem_slots and b < num_mbb:
+                    b += 1
+            budget[k] = max(b if b is not None else even, even, 1)
+
+        emitted = [0] * num_lists
+        def fill(k, max_num):
+            for _ in range(min(max_num, len(self.mbb_lists[k]) - emitted[k])):
+                self._emit(self.call_mbb(self.mbb_lists[k][emitted[k]]))
+                emitted[k] += 1
+
+        with self._deferred_context():
+            for i_slot in range(num_slots):
+                i_base = i_slot + start_position
+                if i_base >= 0:
+                    self._emit(self.call_mbb(self.mbb_lists[0][i_base]))
+                emitted_before = list(emitted)
+                for k in range(1, num_lists):
+                    if wait[k] is None or emitted_before[wait[k][0]] >= wait[k][1]:
+                        fill(k, budget[k])
+            for k in range(1, num_lists):
+                fill(k, len(self.mbb_lists[k]))
+            assert all(emitted[k] == len(self.mbb_lists[k]) for k in range(1, num_lists))
+        return self._get_deferred()
+
+
+LIST_SCHEDULER_LATENCY_DEFAULT = {
+    'issue'             : 4,        # issue cycle of every non-mfma instruction
+    'ds_latency'        : 64,
+    'lds_bytes_per_cycle' : 128,    # lds pipe busy cycle of ds instruction is wave_size * bytes / this
+    'vmem_latency'      : 500,
+    'smem_latency'      : 200,
+}
+
+class list_scheduler_t(simple_interleave_scheduler_t, mc_inst_analyzer_t):
+    '''
+    dependency-aware list scheduler. the interleaved order of simple_interleave_scheduler_t is taken as
+    baseline, then split into regions by fence mbb (branch, label, s_barrier, unbalanced exec write, or
+    any mbb whose operand can not be resolved). fence mbb never move. inside each region, mbb are reordered
+    following a dependency DAG, built from register RAW/WAR/WAW (vgpr/sgpr/agpr/vcc/exec/scc), and keeping
+    relative order of all lgkm related (ds_*, s_load, s_waitcnt lgkmcnt) and all vm related (buffer/global,
+    s_waitcnt vmcnt) mbb, so every s_waitcnt count still holds.
+
+    greedy pick the ready mbb with least modeled stall, then longest critical path, then baseline order.
+    greedy is tried with and without issuing a ready mfma first whenever matrix pipe is free, and a
+    region takes the one with least modeled cycles, or keeps baseline order if neither is better.
+
+    registers in inst string are symbolic, symbol_table (label->value, see sym_get_table()) is used
+    to resolve alias like v_tmp+4 and v_gld_b. mbb with label not in symbol_table is a fence.
+    gpr_extent (see gpr_allocator_t.get_extent()) is needed when gpr is packed, to find registers a
+    s_waitcnt may complete for memory op issued out of this scheduler.
+    '''
+    def __init__(self, mc, mbb_lists, **options):
+        simple_interleave_scheduler_t.__init__(self, mc, mbb_lists)
+        mc_inst_analyzer_t.__init__(self, options['symbol_table'] if 'symbol_table' in options else None,
+                                        options['gpr_extent'] if 'gpr_extent' in options else None)
+        self.latency = dict(LIST_SCHEDULER_LATENCY_DEFAULT)
+        if 'latency' in options:
+            self.latency.update(options['latency'])
+        self.baseline_cycles = 0            # modeled cycles of last lower(), for report
+        self.scheduled_cycles = 0
+        self._trace = None
+
+    def call_mbb(self, mbb):
+        if self._trace is not None:
+            self._trace.append(mbb)
+        return simple_interleave_scheduler_t.call_mbb(self, mbb)
+
+    def mbb_info(self, mbb):
+        '''
+        summary of a mbb as schedule node, None if this mbb is a fence
+        '''
+        defs, uses = set(), set()
+        lgkm, vm = False, False
+        wait = set()                        # counter waited by this mbb
+        mem_defs = {'lgkm' : set(), 'vm' : set()}
+        exec_written = False
+        for mi in mbb.mc_inst_list:
+            info = self.inst_info(mi())
+            if info is None or info[2] == 'fence':
+                return None
+            i_defs, i_uses, kind = info
+            exec_written = exec_written or ('exec', 0) in i_defs
+            defs |= i_defs
+            uses |= i_uses
+            if kind in ('ds', 'smem') or (kind == 'waitcnt' and 'lgkmcnt' in mi()):
+                lgkm = True
+            if kind == 'vmem' or (kind == 'waitcnt' and 'vmcnt' in mi()):
+                vm = True
+            if kind == 'waitcnt':
+                wait |= set(c for c in ('lgkm', 'vm') if c + 'cnt' in mi())
+            if kind in ('ds', 'smem', 'vmem'):
+                mem_defs['vm' if kind == 'vmem' else 'lgkm'] |= i_defs
+        if exec_written:
+            # only a balanced exec block can move, which restore exec at the end of this mbb
+            last = re.sub(' +', ' ', mbb.mc_inst(-1)())
+            if not last.startswith(('s_mov_b64 exec, -1', 's_or_b64 exec, exec')):
+                return None
+            defs.discard(('exec', 0))
+        return {'defs' : defs, 'uses' : uses, 'lgkm' : lgkm, 'vm' : vm, 'wait' : wait, 'mem_defs' : mem_defs}
+
+    def mfma_cycle(self, op):
+        m = re.match(r'v_mfma_\w+?_(\d+)x\d+x', op)
+        default_cycle = {4 : 8, 16 : 32, 32 : 64}.get(int(m.group(1)), 64) if m else 64
+        return amdgpu_get_arch_detail(self.mc.arch_config.arch).get_mfma_cycle(op, default_cycle)
+
+    class machine_state_t(object):
+        def __init__(self):
+            self.t = 0
+            self.mfma_free = 0
+            self.lds_free = 0
+            self.lgkm = list()          # completion time of outstanding lgkm op, in issue order
+            self.vm = list()
+
+        def copy(self):
+            s = copy.copy(self)
+            s.lgkm = list(self.lgkm)
+            s.vm = list(self.vm)
+            return s
+
+    def simulate_mbb(self, state, mbb):
+        '''
+        advance machine state by one mbb, return stall cycles
+        '''
+        lat = self.latency
+        def wait_cnt(queue, cnt, t):
+            if len(queue) > cnt:
+                t = max(t, queue[len(queue) - cnt - 1])
+                del queue[:len(queue) - cnt]
+            return t
+        stall = 0
+        for mi in mbb.mc_inst_list:
+            istr = mi().split(';')[0].strip()
+            op = get_mc_inst_op(istr)
+            t_issue = state.t
+            if op.startswith('v_mfma'):
+                t_issue = max(state.t, state.mfma_free)
+                state.mfma_free = t_issue + self.mfma_cycle(op)
+            elif op.startswith('s_waitcnt'):
+                m = re.search(r'lgkmcnt\((\d+)\)', istr)
+                if m:
+                    t_issue = wait_cnt(state.lgkm, int(m.group(1)), t_issue)
+                m = re.search(r'vmcnt\((\d+)\)', istr)
+                if m:
+                    t_issue = wait_cnt(state.vm, int(m.group(1)), t_issue)
+            elif op.startswith('ds_'):
+                m = re.match(r'^ds_(read|write)(2st64|2)?_[biu](\d+)', op)
+                ds_bytes = (int(m.group(3)) // 8) * (2 if m.group(2) else 1) if m else 4
+                pipe = AMDGPU_WAVE_SIZE * ds_bytes // lat['lds_bytes_per_cycle']
+                t_issue = max(state.t, state.lds_free)
+                state.lds_free = t_issue + pipe
+                state.lgkm.append(max(state.lgkm[-1] if state.lgkm else 0, t_issue + pipe + lat['ds_latency']))
+            elif op.startswith(('buffer_', 'global_')):
+                state.vm.append(max(state.vm[-1] if state.vm else 0, t_issue + lat['vmem_latency']))
+            elif op.startswith(('s_load', 's_buffer_load')):
+                state.lgkm.append(max(state.lgkm[-1] if state.lgkm else 0, t_issue + lat['smem_latency']))
+            stall += t_issue - state.t
+            state.t = t_issue + lat['issue']
+        return stall
+
+    def model_cycles(self, mbbs, state = None):
+        '''
+        cycle until every issued inst is done, including outstanding memory inst that later
+        s_waitcnt (maybe of next iteration) would wait for
+        '''
+        state = state.copy() if state is not None else self.machine_state_t()
+        for mbb in mbbs:
+            self.simulate_mbb(state, mbb)
+        return max([state.t, state.mfma_free] + state.lgkm[-1:] + state.vm[-1:])
+
+    def schedule_region(self, mbbs, state = None, mem_defs = None):
+        '''
+        reorder a list of mbb that has no fence inside, start from machine state, return new list.
+        mem_defs is counter->destination registers of memory op that may be completed by a s_waitcnt
+        inside this region, default is from this region only
+        '''
+        num = len(mbbs)
+        if num <= 1:
+            return mbbs
+        state_start = state if state is not None else self.machine_state_t()
+        infos = [self.mbb_info(m) for m in mbbs]
+        if mem_defs is None:
+            mem_defs = {'lgkm' : set(), 'vm' : set()}
+            for info in infos:
+                for c in mem_defs:
+                    mem_defs[c] |= info['mem_defs'][c]
+        preds = [set() for _ in range(num)]
+        succs = [set() for _ in range(num)]
+        for j in range(num):
+            for i in range(j):
+                a, b = infos[i], infos[j]
+                # a s_waitcnt act as a def of every memory op destination it may complete,
+                # hence a consumer of memory op never move above the wait before it
+                if (a['defs'] & b['uses']) or (a['uses'] & b['defs']) or (a['defs'] & b['defs']) or \
+                        (a['lgkm'] and b['lgkm']) or (a['vm'] and b['vm']) or \
+                        any((b['defs'] | b['uses']) & mem_defs[c] for c in a['wait']):
+                    preds[j].add(i)
+                    succs[i].add(j)
+
+        is_mfma = list()
+        weight = list()
+        for m in mbbs:
+            w = 0
+            have_mfma = False
+            for mi in m.mc_inst_list:
+                op = get_mc_inst_op(mi())
+                if op.startswith('v_mfma'):
+                    w += self.mfma_cycle(op)
+                    have_mfma = True
+                elif op.startswith('ds_read'):
+                    w += self.latency['ds_latency']
+                elif op.startswith(('buffer_load', 'global_load')):
+                    w += self.latency['vmem_latency']
+                else:
+                    w += self.latency['issue']
+            weight.append(w)
+            is_mfma.append(have_mfma)
+        critical_path = [0] * num
+        for i in reversed(range(num)):
+            critical_path[i] = weight[i] + max([critical_path[s] for s in succs[i]], default = 0)
+
+        def greedy(mfma_first):
+            state = state_start.copy()
+            order = list()
+            done = set()
+            while len(order) < num:
+                best_key, best_i, best_state = None, None, None
+                for i in range(num):
+                    if i in done or not preds[i] <= done:
+                        continue
+                    s = state.copy()
+                    stall = self.simulate_mbb(s, mbbs[i])
+                    mfma_ready = 0 if mfma_first and is_mfma[i] and state.mfma_free <= state.t else 1
+                    key = (mfma_ready, stall, -critical_path[i], i)
+                    if best_key is None or key < best_key:
+                        best_key, best_i, best_state = key, i, s
+                state = best_state
+                order.append(best_i)
+                done.add(best_i)
+            return [mbbs[i] for i in order]
+
+        # baseline first, so that it is kept if no better one
+        best_mbbs, best_cycles = mbbs, self.model_cycles(mbbs, state_start)
+        for mfma_first in (True, False):
+            new_mbbs = greedy(mfma_first)
+            new_cycles = self.model_cycles(new_mbbs, state_start)
+            if new_cycles < best_cycles:
+                best_mbbs, best_cycles = new_mbbs, new_cycles
+        return best_mbbs
+
+    def lower(self, **options):
+        '''
+        same options as simple_interleave_scheduler_t, which give the baseline order
+        '''
+        self._trace = list()
+        baseline = simple_interleave_scheduler_t.lower(self, **options)
+        trace = self._trace
+        self._trace = None
+
+        mem_defs = {'lgkm' : set(), 'vm' : set()}
+        for info in [self.mbb_info(mbb) for mbb in trace]:
+            if info is None:
+                continue
+            for c in mem_defs:
+                mem_defs[c] |= info['mem_defs'][c]
+        # memory op may also be issued out of this scheduler, like prefetch before main loop
+        mem_defs = dict((c, self.reg_extent(mem_defs[c])) for c in mem_defs)
+
+        state = self.machine_state_t()
+        scheduled = list()
+        region = list()
+        for mbb in trace + [None]:
+            if mbb is None or self.mbb_info(mbb) is None:
+                for m in self.schedule_region(region, state, mem_defs) + ([mbb] if mbb else []):
+                    self.simulate_mbb(state, m)
+                    scheduled.append(m)
+                region = list()
+            else:
+                region.append(mbb)
+
+        self.baseline_cycles = self.model_cycles(trace)
+        self.scheduled_cycles = self.model_cycles(scheduled)
+        if all(a is b for a, b in zip(trace, scheduled)):
+            return baseline
+
+        with self._deferred_context():
+            for mbb in scheduled:
+                self._emit(self.call_mbb(mbb))
+        return self._get_deferred()
+
 
-def create_scheduler(mc, mbb_lists, type = SCHEDULER_TYPE_SIMPLE_INTERLEAVE):
+def create_scheduler(mc, mbb_lists, type = SCHEDULER_TYPE_SIMPLE_INTERLEAVE, **options):
     '''
     mbb_lists: list of machine basic blocks, every element is also a list of mbb.
+    options:   forward to scheduler, e.g. symbol_table/latency of list_scheduler_t
     '''
     if type == SCHEDULER_TYPE_SIMPLE_INTERLEAVE:
         return simple_interleave_scheduler_t(mc, mbb_lists)
+    elif type == SCHEDULER_TYPE_LIST:
+        return list_scheduler_t(mc, mbb_lists, **options)
     else:
         # TODO might have other type of scheduler
         assert False, "unimplemented scheduler"
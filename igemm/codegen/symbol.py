@@ -93,3 +93,17 @@ class msym_t(object):
 
     def __call__(self, index = 0):
         return self.sym.expr(self.label_in_macro, index)
+
+def sym_get_table(*objs):
+    '''
+    collect label->value of every sym_t attribute of objs, e.g. kernel sgpr/vgpr/agpr holder.
+    used to resolve symbolic register inside inst string. indirect-indexed symbol is skipped
+    '''
+    table = dict()
+    for obj in objs:
+        if obj is None:
+            continue
+        for v in vars(obj).values():
+            if type(v) is sym_t and type(v.label) is str:
+                table[v.label] = v.value
+    return table
@@ -0,0 +1,389 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+import re
+from .mbb import *
+
+WAITCNT_MAX = {'vm' : 63, 'lgkm' : 15}     # gfx9 counter width
+
+# memory op class. 'ds' and 'load' return in issue order inside their counter, 'smem' and 'store' do not
+WAITCNT_OP_ORDERED = ('ds', 'load')
+
+class waitcnt_op_t(object):
+    '''
+    outstanding memory op. defs is the destination registers, which can not be touched until the op
+    complete. None if can not be resolved, which means any register.
+    '''
+    def __init__(self, line, cls, defs):
+        self.line = line
+        self.cls = cls
+        self.defs = defs
+
+    def touched_by(self, defs, uses):
+        if self.defs is None or defs is None or uses is None:
+            return self.defs is None or len(self.defs) != 0
+        return len(self.defs & (defs | uses)) != 0
+
+class waitcnt_counter_t(object):
+    '''
+    state of a single counter. ops is the possibly outstanding op, in issue order.
+    unknown is None if ops is all that can be outstanding, 'ordered' if there may be older in-order ops not
+    known (e.g. from other path of a join), or 'any' if which op is outstanding is not known at all.
+    '''
+    def __init__(self, ops = tuple(), unknown = None):
+        self.ops = ops
+        self.unknown = unknown
+
+    def __eq__(self, other):
+        return self.unknown == other.unknown and [op.line for op in self.ops] == [op.line for op in other.ops]
+
+    def is_ordered(self):
+        return self.unknown != 'any' and all(op.cls in WAITCNT_OP_ORDERED for op in self.ops)
+
+    def issue(self, op):
+        self.ops = self.ops + (op,)
+
+    def wait(self, cnt):
+        if cnt is None:
+            return
+        n = len(self.ops)
+        if cnt == 0:
+            self.ops, self.unknown = tuple(), None
+        elif not self.is_ordered():
+            if cnt < n or self.unknown is not None:
+                self.unknown = 'any'         # keep all ops as possibly outstanding
+        elif cnt < n or (cnt == n and self.unknown is not None):
+            self.ops, self.unknown = self.ops[n - cnt:], None
+
+    def join(self, other):
+        if self == other:
+            return waitcnt_counter_t(self.ops, self.unknown)
+        lines = [op.line for op in other.ops]
+        s = 0
+        while s < min(len(self.ops), len(other.ops)) and self.ops[len(self.ops) - 1 - s].line == lines[len(lines) - 1 - s]:
+            s += 1
+        dropped = self.ops[:len(self.ops) - s] + other.ops[:len(other.ops) - s]
+        unknown = 'any' if 'any' in (self.unknown, other.unknown) or \
+                    any(op.cls not in WAITCNT_OP_ORDERED for op in dropped) else 'ordered'
+        return waitcnt_counter_t(self.ops[len(self.ops) - s:], unknown)
+
+class waitcnt_state_t(object):
+    def __init__(self):
+        self.cnt = {'vm' : waitcnt_counter_t(), 'lgkm' : waitcnt_counter_t()}
+
+    def __eq__(self, other):
+        return self.cnt['vm'] == other.cnt['vm'] and self.cnt['lgkm'] == other.cnt['lgkm']
+
+    def copy(self):
+        state = waitcnt_state_t()
+        for c in self.cnt:
+            state.cnt[c] = waitcnt_counter_t(self.cnt[c].ops, self.cnt[c].unknown)
+        return state
+
+    def join(self, other):
+        if other is None:
+            return self.copy()
+        state = waitcnt_state_t()
+        for c in self.cnt:
+            state.cnt[c] = self.cnt[c].join(other.cnt[c])
+        return state
+
+    def wait(self, cnts):
+        for c in cnts:
+            self.cnt[c].wait(cnts[c])
+
+    def unknown(self):
+        for c in self.cnt:
+            self.cnt[c].unknown = 'any'
+
+    def pending(self):
+        return self.cnt['vm'].ops + self.cnt['lgkm'].ops
+
+class waitcnt_analysis_t(mc_inst_analyzer_t):
+    '''
+    parse emitted kernel text into items, and compute the outstanding memory op at entry of every label,
+    by a forward dataflow over branch/fall-through edges. kernel entry has nothing outstanding.
+
+    item is (kind, payload), kind is one of
+        'none'      comment, empty line
+        'label'     payload is label name
+        'branch'    payload is (target, is_conditional)
+        'end'       s_endpgm
+        'barrier'   s_barrier
+        'waitcnt'   payload is dict of counter->cnt, None if this counter is not waited
+        'mem'       payload is (counter, waitcnt_op_t, defs, uses)
+        'inst'      payload is (defs, uses), None if can not resolve
+        'unknown'   macro or inst that may issue memory op not understood, e.g. flat_*, setpc.
+                    macro in MACRO_NO_MEM is 'inst', with registers not resolved except .v_clear_nc
+    '''
+    RE_WAITCNT_FIELD = re.compile(r'(vmcnt|lgkmcnt|expcnt)\((\d+)\)')
+    OP_STORE = ('buffer_store', 'global_store', 'tbuffer_store', 'buffer_atomic', 'global_atomic')
+    MACRO_NO_MEM = ('.v_clear_nc', '.v_clear_acc_c', '.mdiv_u32', '.v_u32_div', '.v_fma')   # macro without memory op
+
+    def __init__(self, symbol_table = None):
+        mc_inst_analyzer_t.__init__(self, symbol_table)
+
+    def parse_line(self, line):
+        istr = line.split(';')[0].strip()
+        if len(istr) == 0 or istr.startswith('//'):
+            return ('none', None)
+        op = get_mc_inst_op(istr)
+        if op.endswith(':'):
+            return ('label', op[:-1])
+        if op.startswith(('s_branch', 's_cbranch')):
+            return ('branch', (istr[len(op):].strip(), op.startswith('s_cbranch')))
+        if op.startswith('s_endpgm'):
+            return ('end', None)
+        if op.startswith('s_barrier'):
+            return ('barrier', None)
+        if op.startswith('s_waitcnt'):
+            cnts = {'vm' : None, 'lgkm' : None}
+            for m in self.RE_WAITCNT_FIELD.finditer(istr):
+                if m.group(1) != 'expcnt':
+                    cnts[m.group(1)[:-3]] = int(m.group(2))
+            return ('waitcnt', cnts)
+        if op.startswith(('flat_', 's_setpc', 's_swappc', 's_sendmsg', 's_dcache')):
+            return ('unknown', None)
+
+        info = self.inst_info(istr)
+        if op.startswith('.'):
+            if not op.startswith(self.MACRO_NO_MEM):
+                return ('unknown', None)
+            return ('inst', info[:2] if info is not None else (None, None))
+        defs, uses = (info[0], info[1]) if info is not None else (None, None)
+
+        if op.startswith('ds_'):
+            return ('mem', ('lgkm', waitcnt_op_t(None, 'ds', defs), defs, uses))
+        if op.startswith(('s_load', 's_buffer_load', 's_memtime', 's_memrealtime')):
+            return ('mem', ('lgkm', waitcnt_op_t(None, 'smem', defs), defs, uses))
+        if op.startswith(('buffer_', 'global_', 'tbuffer_', 'image_', 'scratch_')):
+            if op.startswith(self.OP_STORE) and 'glc' not in istr:
+                # no return, registers are consumed at issue
+                uses = uses | defs if defs is not None and uses is not None else None
+                return ('mem', ('vm', waitcnt_op_t(None, 'store', set()), set(), uses))
+            return ('mem', ('vm', waitcnt_op_t(None, 'load', defs), defs, uses))
+        return ('inst', (defs, uses))
+
+    def parse(self, lines):
+        items = list()
+        for i, line in enumerate(lines):
+            kind, payload = self.parse_line(line)
+            if kind == 'mem':
+                payload[1].line = i
+            items.append((kind, payload))
+        return items
+
+    def transfer(self, state, item):
+        kind, payload = item
+        if kind == 'waitcnt':
+            state.wait(payload)
+        elif kind == 'mem':
+            state.cnt[payload[0]].issue(payload[1])
+        elif kind == 'unknown':
+            state.unknown()
+        elif kind == 'end' or (kind == 'branch' and not payload[1]):
+            # code after this is only reachable from a label, whose state is from label_states()
+            for c in state.cnt:
+                state.cnt[c] = waitcnt_counter_t(tuple(), 'ordered')
+
+    def label_states(self, items):
+        '''
+        return dict of label->state at entry of that label
+        '''
+        labels = dict((payload, i) for i, (kind, payload) in enumerate(items) if kind == 'label')
+        entry = dict()
+        worklist = [(0, waitcnt_state_t())]
+        while worklist:
+            start, state = worklist.pop()
+            i = start
+            while i < len(items):
+                kind, payload = items[i]
+                if kind == 'label' and i != start:
+                    break
+                self.transfer(state, items[i])
+                if kind == 'end':
+                    state = None
+                    break
+                if kind == 'branch':
+                    target, is_conditional = payload
+                    if target in labels:
+                        joined = state.join(entry.get(target))
+                        if entry.get(target) is None or not joined == entry[target]:
+                            entry[target] = joined
+                            worklist.append((labels[target], joined.copy()))
+                    if not is_conditional:
+                        state = None
+                        break
+                i += 1
+            if state is not None and i < len(items):
+                target = items[i][1]
+                joined = state.join(entry.get(target))
+                if entry.get(target) is None or not joined == entry[target]:
+                    entry[target] = joined
+                    worklist.append((i, joined.copy()))
+        return entry
+
+class waitcnt_relax_pass_t(waitcnt_analysis_t):
+    '''
+    post-emission pass to relax every s_waitcnt to the loosest count that is still correct.
+
+    outstanding vm and lgkm ops are tracked in issue order, together with their destination registers.
+    a wait is relaxed from cnt to a larger cnt only if every op that is no longer waited here
+    (the "tainted" op) is proven complete by a later s_waitcnt, before any inst touch its destination
+    registers, and before any label, branch, s_barrier or inst not understood. hence at every
+    control flow point the outstanding ops are exactly the same as before, and the pass is local
+    to straight-line code. s_waitcnt that wait nothing is removed.
+
+    counter holding op not returned in order (smem in lgkm, store in vm) is never relaxed.
+    '''
+    def __init__(self, symbol_table = None):
+        waitcnt_analysis_t.__init__(self, symbol_table)
+        self.num_waitcnt = 0
+        self.num_relaxed = 0
+        self.num_removed = 0
+
+    def is_covered(self, items, start, state, tainted):
+        '''
+        simulate from items[start] with state, return True if all tainted ops complete before hazard
+        '''
+        tainted = set(tainted)
+        for kind, payload in items[start:]:
+            if kind in ('label', 'branch', 'barrier', 'unknown'):
+                return False
+            if kind == 'end':
+                return True
+            if kind == 'waitcnt':
+                state.wait(payload)
+                tainted &= set(op.line for op in state.pending())
+                if len(tainted) == 0:
+                    return True
+            elif kind in ('mem', 'inst'):
+                defs, uses = payload[-2:]
+                for op in state.pending():
+                    if op.line in tainted and op.touched_by(defs, uses):
+                        return False
+                if kind == 'mem':
+                    state.cnt[payload[0]].issue(payload[1])
+        return False
+
+    def relax(self, items, i, state):
+        '''
+        return relaxed cnts of waitcnt at items[i]
+        '''
+        cnts = dict(items[i][1])
+        for c in ('vm', 'lgkm'):
+            counter = state.cnt[c]
+            if cnts[c] is None or not counter.is_ordered():
+                continue
+            n = len(counter.ops)
+            if cnts[c] >= n:
+                if counter.unknown is None:
+                    cnts[c] = None          # nothing to wait
+                continue
+            for relaxed in range(n, cnts[c], -1):
+                if relaxed > WAITCNT_MAX[c] and not (relaxed == n and counter.unknown is None):
+                    continue
+                trial = state.copy()
+                trial.wait(dict(cnts, **{c : relaxed}))
+                tainted = [op.line for op in counter.ops[n - relaxed : n - cnts[c]]]
+                if self.is_covered(items, i + 1, trial, tainted):
+                    cnts[c] = None if relaxed == n and counter.unknown is None else relaxed
+                    break
+        return cnts
+
+    def emit_waitcnt(self, line, cnts):
+        indent = line[:len(line) - len(line.lstrip())]
+        comment = ' ;' + line.split(';', 1)[1] if ';' in line else ''
+        fields = [f'vmcnt({cnts["vm"]})'] if cnts['vm'] is not None else []
+        fields += [m.group(0) for m in self.RE_WAITCNT_FIELD.finditer(line.split(';')[0]) if m.group(1) == 'expcnt']
+        fields += [f'lgkmcnt({cnts["lgkm"]})'] if cnts['lgkm'] is not None else []
+        if len(fields) == 0:
+            return None
+        return indent + 's_waitcnt ' + ' '.join(fields) + comment
+
+    def __call__(self, text):
+        '''
+        return relaxed text. counters of this run are in num_waitcnt/num_relaxed/num_removed
+        '''
+        lines = text.split('\n')
+        items = self.parse(lines)
+        entry = self.label_states(items)
+        self.num_waitcnt, self.num_relaxed, self.num_removed = 0, 0, 0
+
+        out = list()
+        state = waitcnt_state_t()
+        for i, (kind, payload) in enumerate(items):
+            if kind == 'label':
+                state = entry[payload].copy() if payload in entry else waitcnt_state_t()
+            if kind != 'waitcnt':
+                self.transfer(state, items[i])
+                out.append(lines[i])
+                continue
+            self.num_waitcnt += 1
+            cnts = self.relax(items, i, state)
+            state.wait(cnts)
+            if cnts == payload:
+                out.append(lines[i])
+                continue
+            self.num_relaxed += 1
+            relaxed_line = self.emit_waitcnt(lines[i], cnts)
+            if relaxed_line is None:
+                self.num_removed += 1
+            else:
+                out.append(relaxed_line)
+        return '\n'.join(out)
+
+class waitcnt_checker_t(waitcnt_analysis_t):
+    '''
+    static checker of s_waitcnt placement. report every inst touching destination registers of
+    a possibly outstanding memory op, and every s_barrier with a ds_write possibly outstanding.
+    op whose registers can not be resolved is not checked.
+    '''
+    def __call__(self, text):
+        '''
+        return list of (line_number, message), empty if no violation found
+        '''
+        lines = text.split('\n')
+        items = self.parse(lines)
+        entry = self.label_states(items)
+        violations = list()
+        state = waitcnt_state_t()
+        for i, (kind, payload) in enumerate(items):
+            if kind == 'label':
+                state = entry[payload].copy() if payload in entry else waitcnt_state_t()
+            if kind in ('mem', 'inst'):
+                defs, uses = payload[-2:]
+                if defs is not None and uses is not None:
+                    for op in state.pending():
+                        if op.defs is not None and op.defs & (defs | uses):
+                            violations.append((i, f'"{lines[i].strip()}" touch register of outstanding "{lines[op.line].strip()}"'))
+            if kind == 'barrier':
+                for op in state.cnt['lgkm'].ops:
+                    if op.cls == 'ds' and op.defs is not None and len(op.defs) == 0:
+                        violations.append((i, f's_barrier with outstanding "{lines[op.line].strip()}"'))
+            self.transfer(state, items[i])
+        return violations
@@ -0,0 +1,197 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+from .igemm_lane_replay import *
+from .igemm_global_coalescing_analyzer import *
+
+import re
+
+RE_TRACE_LDS_INST = re.compile(r'^ds_(read|write)_b(32|64|128)$')
+RE_TRACE_STORE_INST = re.compile(r'^buffer_(store|atomic)_(\w+)$')
+
+IGEMM_TRACE_LDS_DWORDS = 16384      # 64KB
+
+class igemm_coalescing_store_trace_t(object):
+    '''
+    every output element written by coalescing store of every workgroup, as (byte address, workgroup, tag),
+    tag is agpr index * block_size + lane that hold this element before coalescing store.
+    '''
+    def __init__(self):
+        self.name       = ''
+        self.data_byte  = 4
+        self.vector_write_out = 1
+        self.skip_lds   = False     # coalescing store without lds round trip, see can_skip_coalescing()
+        self.addr       = list()
+        self.workgroup  = list()
+        self.tag        = list()
+        self.num_unresolved = 0     # store inst whose address or data depends on value not known
+
+    def append(self, addr, workgroup, tag):
+        self.addr.extend(int(x) for x in addr)
+        self.workgroup.extend([workgroup] * len(addr))
+        self.tag.extend(int(x) for x in tag)
+
+    def get_map(self):
+        '''
+        byte address -> list of (workgroup, tag) written to it
+        '''
+        m = dict()
+        for a, w, t in zip(self.addr, self.workgroup, self.tag):
+            m.setdefault(a, list()).append((w, t))
+        return m
+
+    def is_written_exactly_once(self, num_elements):
+        '''
+        True if every element of output of num_elements is written once, and nothing outside
+        '''
+        return self.num_unresolved == 0 and sorted(self.addr) == [i * self.data_byte for i in range(num_elements)]
+
+class igemm_coalescing_store_tracer_t(igemm_global_coalescing_analyzer_t):
+    '''
+    replay every workgroup of a conv shape, tag every agpr at start of coalescing store, then follow tags through
+    accvgpr read, cvt/pack, lds and transpose, to every element written by buffer store.
+      - tag is unique 16bit value per agpr and lane, hence survive cvt to fp16 and pack. see igemm_coalescing_store_trace_t.
+      - lds is shared by lanes of workgroup, dword aligned ds_read/ds_write b32/b64/b128 are traced, exec is ignored for them.
+    tensor base is 0, so address is byte offset of element in output tensor.
+    '''
+    def __init__(self, arch_detail):
+        igemm_global_coalescing_analyzer_t.__init__(self, arch_detail)
+
+    def get_grid_size(self, tunable, conv_param):
+        '''
+        number of workgroups, gemm of one group should be multiple of macro tile, and no gemm_k_global_split
+        '''
+        p = conv_param
+        gemm_m, gemm_n = {'fwd' : (p.k // p.g, p.n * p.ho * p.wo),
+                          'bwd' : (p.c // p.g, p.n * p.hi * p.wi),
+                          'wrw' : (p.k // p.g, (p.c // p.g) * p.y * p.x)}[tunable.direction]
+        assert gemm_m % tunable.gemm_m_per_block == 0 and gemm_n % tunable.gemm_n_per_block == 0, \
+                f"gemm_m:{gemm_m}, gemm_n:{gemm_n} not multiple of macro tile {tunable.gemm_m_per_block}x{tunable.gemm_n_per_block}"
+        return p.g * (gemm_m // tunable.gemm_m_per_block) * (gemm_n // tunable.gemm_n_per_block)
+
+    def reset(self):
+        igemm_global_coalescing_analyzer_t.reset(self)
+        self.lds = np.zeros(IGEMM_TRACE_LDS_DWORDS, dtype = np.uint64)
+        self.lds_valid = np.zeros(IGEMM_TRACE_LDS_DWORDS, dtype = bool)
+        self.in_coalescing = False
+
+    def on_comment(self, comment):
+        if comment.startswith('; coalescing store') and not self.in_coalescing:
+            self.in_coalescing = True
+            a_c = self.analyzer.symbol_table['a_c']
+            lane = np.arange(self.block_size, dtype = np.uint64)
+            for i in range(self.num_agpr):
+                self.regs[('a', a_c + i)] = np.uint64(i * self.block_size) + lane
+
+    def _alu(self, op, a):
+        # tag is smaller than 16bit, so cvt to fp16 keep it, and pack put 2 tags in a dword
+        if op in ('v_cvt_f16_f32', 'v_cvt_f16_f32_e32'):
+            return a[0] & 0xffff
+        if op == 'v_pack_b32_f16':
+            return (a[0] & 0xffff) | ((a[1] & 0xffff) << 16)
+        return igemm_global_coalescing_analyzer_t._alu(self, op, a)
+
+    def _on_lds_inst(self, op, operands, modifiers):
+        m = RE_TRACE_LDS_INST.match(op)
+        if m is None:
+            return False
+        is_read, num_dwords = m.group(1) == 'read', int(m.group(2)) // 32
+        data = self._reg_range(operands[0] if is_read else operands[1])
+        addr = self.get_value(operands[1] if is_read else operands[0])
+        if data is None:
+            return False
+        if addr is None:
+            if not is_read:
+                self.lds_valid[:] = False       # any dword may be overwritten
+            return False
+        index = (addr + modifiers.get('offset', 0)) >> 2
+        for i in range(num_dwords):
+            reg = (data[0], data[1] + i)
+            if is_read:
+                if np.all(self.lds_valid[index + i]):
+                    self._write_reg(reg, self.lds[index + i])
+                else:
+                    self.regs.pop(reg, None)
+            else:
+                value = self.regs.get(reg)
+                self.lds[index + i] = value if value is not None else 0
+                self.lds_valid[index + i] = value is not None
+        return True
+
+    def _on_store_inst(self, op, operands, modifiers):
+        m = RE_TRACE_STORE_INST.match(op)
+        if m is None or m.group(2) not in IGEMM_BUFFER_DATA_BYTES:
+            return
+        data_bytes = IGEMM_BUFFER_DATA_BYTES[m.group(2)]
+        db = self.trace.data_byte
+        data = self._reg_range(operands[0])
+        lanes_addr = self.get_buffer_address(operands, modifiers)
+        values = [self.regs.get((data[0], data[1] + i)) for i in range((data_bytes + 3) // 4)] if data is not None else [None]
+        if lanes_addr is None or any(v is None for v in values):
+            self.trace.num_unresolved += 1
+            return
+        lanes, addr = lanes_addr
+        shift_hi = 16 if m.group(2).endswith('_hi') else 0
+        for i_e in range(data_bytes // db):
+            shift = np.uint64((i_e * db % 4) * 8 + shift_hi)
+            tag = (values[i_e * db // 4][lanes] >> shift) & np.uint64((1 << (8 * db)) - 1)
+            self.trace.append(addr + np.uint64(i_e * db), self.workgroup, tag)
+
+    def on_memory_inst(self, op, operands, modifiers):
+        if not self.in_coalescing:
+            return False
+        if op.startswith('ds_'):
+            return self._on_lds_inst(op, operands, modifiers) and op.startswith('ds_read')
+        self._on_store_inst(op, operands, modifiers)
+        return False
+
+    def trace_store(self, tunable, conv_param, workgroups = None):
+        '''
+        emit kernel body of this tunable, then replay every workgroup (or those in workgroups) with kernel argument of conv_param
+        '''
+        kernel, asm_text = self.emit_kernel(tunable)
+        table = self.analyzer.symbol_table
+        self.set_kernarg(tunable, conv_param)
+        self.num_agpr = tunable.num_agpr_accumulate_c
+        assert self.num_agpr * self.block_size <= 0x10000, "tag of agpr and lane should be within 16bit"
+        self.trace = igemm_coalescing_store_trace_t()
+        self.trace.name = kernel.name()
+        self.trace.data_byte = amdgpu_precision_data_byte(tunable.precision)
+        self.trace.vector_write_out = getattr(kernel.coalescing_store.ctrl, 'vector_write_out', 1)
+        self.trace.skip_lds = kernel.coalescing_store.ctrl.can_skip_coalescing()
+        self.report = igemm_global_coalescing_report_t()
+        if workgroups is None:
+            workgroups = range(self.get_grid_size(tunable, conv_param))
+        for workgroup in workgroups:
+            self.workgroup = workgroup
+            self.sgpr_init = {table['s_bx'] : workgroup}
+            if 's_by' in table:
+                self.sgpr_init[table['s_by']] = 0
+            self.replay(asm_text)
+        return self.trace
@@ -29,11 +29,15 @@ from .algo import *
 from .codegen import *
 
 import os
+import re
 import copy
+import time
 import multiprocessing as mp
 
 IGEMM_EMIT_KERNEL_PER_INC_FILE = 1
 IGEMM_EMIT_KERNEL_METADATA_PER_INC_FILE = 0     # it seems fail to find symbol if seperate metadata of different kernel using multiple .amdgpu_metadata
+                                                # with compile_per_inc_file, metadata of all kernels is assembled as a separate object instead
+IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY = 1     # only emit global macros invoked by kernels, which are then emitted before global macros
 
 class igemm_codegen_driver_t(mc_base_t):
     def __init__(self, mc, tunable_dicts):
@@ -69,37 +73,64 @@ class igemm_codegen_driver_t(mc_base_t):
             assert False, f"unknown direcrion? {tunable_dicts[0]['direction']}"
 
         self.kernel_list = kernel_list
+        self.inc_file_list = list()
+        self.per_inc_file_asm_list = list()
+        self.num_global_macro_skipped = 0
+        self.global_macro_bytes_skipped = 0
 
     def emit_hsa_header(self):
         hsa_header_t(self.mc).emit()
 
-    def _emit_fma_macro(self):
-        macro_v_fma_mxn_t(self.mc, 4, 4, 8).emit()
-        macro_v_fma_mxn_t(self.mc, 2, 4, 8).emit()
-        macro_v_fma_mxn_t(self.mc, 4, 2, 4).emit()
-        macro_v_fma_mxn_t(self.mc, 2, 2, 4).emit()
-
-    def emit_global_macro(self):
-        # emit global macro, independent of tunable
-        macro_int_div_vv_t(self.mc).emit()
-        macro_int_div_vs_t(self.mc).emit()
-        macro_int_div_ss_t(self.mc).emit()
-        macro_int_div_rem_vv_t(self.mc).emit()
-        macro_int_div_rem_vs_t(self.mc).emit()
-        macro_int_div_rem_ss_t(self.mc).emit()
+    def get_global_macros(self):
+        '''
+        global macro, independent of tunable
+        '''
+        macros = [macro_int_div_vv_t(self.mc), macro_int_div_vs_t(self.mc), macro_int_div_ss_t(self.mc),
+                    macro_int_div_rem_vv_t(self.mc), macro_int_div_rem_vs_t(self.mc), macro_int_div_rem_ss_t(self.mc)]
 
         if IGEMM_GTC_FEAT_MAGIC_DIVISION:
-            macro_mdiv_u32_ss_t(self.mc).emit()
-            macro_mdiv_u32_rem_ss_t(self.mc).emit()
-            macro_mdiv_u32_vs_t(self.mc).emit()
-            macro_mdiv_u32_rem_vs_t(self.mc).emit()
+            macros.extend([macro_mdiv_u32_ss_t(self.mc), macro_mdiv_u32_rem_ss_t(self.mc),
+                    macro_mdiv_u32_vs_t(self.mc), macro_mdiv_u32_rem_vs_t(self.mc)])
 
         # emit_write_4d_strided_t(self.mc).emit()
         if self.mc.arch_config.arch == AMDGPU_ARCH_GFX908 and self.mc.arch_config.use_xdlops:
-            macro_acc_c_clear_t(self.mc).emit()
-        macro_c_clear_t(self.mc).emit()
+            macros.append(macro_acc_c_clear_t(self.mc))
+        macros.append(macro_c_clear_t(self.mc))
         if self.mc.arch_config.arch == AMDGPU_ARCH_GFX908 and not self.mc.arch_config.use_dlops:
-            self._emit_fma_macro()
+            macros.extend([macro_v_fma_mxn_t(self.mc, 4, 4, 8), macro_v_fma_mxn_t(self.mc, 2, 4, 8),
+                    macro_v_fma_mxn_t(self.mc, 4, 2, 4), macro_v_fma_mxn_t(self.mc, 2, 2, 4)])
+        return macros
+
+    def emit_global_macro(self, referenced_texts = None):
+        '''
+        with referenced_texts, only macros invoked by them are emitted, also macros invoked inside an emitted macro.
+        a macro is invoked if its name is the first token of a line.
+        '''
+        macros = self.get_global_macros()
+        if referenced_texts is None:
+            for macro in macros:
+                macro.emit()
+            return
+
+        macro_text = dict()
+        for macro in macros:
+            self.mc.emitter.hold()
+            macro.emit()
+            macro_text[macro.name()] = self.mc.emitter.release()
+        re_first_token = re.compile(r'^[ \t]*(\.[A-Za-z_]\w*)', re.M)
+        referenced = set()
+        pending = [n for t in referenced_texts for n in set(re_first_token.findall(t)) if n in macro_text]
+        while pending:
+            name = pending.pop()
+            if name not in referenced:
+                referenced.add(name)
+                pending.extend(n for n in set(re_first_token.findall(macro_text[name])) if n in macro_text)
+
+        for macro in macros:
+            if macro.name() in referenced:
+                self.mc.emitter.emit_raw(macro_text[macro.name()])
+        self.num_global_macro_skipped = len(macros) - len(referenced)
+        self.global_macro_bytes_skipped = sum(len(t) for n, t in macro_text.items() if n not in referenced)
 
     def emit_igemm_macro(self):
         # igemm algorithm related macros
@@ -109,11 +140,99 @@ class igemm_codegen_driver_t(mc_base_t):
                 macro_list = kernel.get_kernel_macros()
                 # assert len(macro_list), ''
                 for macro in macro_list:
+                    if isinstance(macro, macro_base_t) and macro.is_inline():
+                        continue    # no .macro body for an inline-ed macro, let a non-inline one of same name be emitted
                     self.mc.insert_unique(macro.name(), macro)
         self.mc.emit_all_unique()
 
+    def estimate_kernel_emit_cost(self, kernel):
+        '''
+        relative cost to emit a kernel, roughly the number of fma/mfma in the unrolled main loop, plus the epilogue
+        '''
+        if type(kernel) is igemm_upsampling_clear_t:
+            return 1
+        tunable = kernel.tunable
+        if tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
+            unroll_k = tunable.gemm_k_per_block // tunable.wave_tile_k
+            return unroll_k * tunable.wave_repeat_m * tunable.wave_repeat_n * tunable.wave_step_m * tunable.wave_step_n + \
+                    tunable.num_agpr_accumulate_c
+        return tunable.gemm_k_per_block * tunable.gemm_m_repeat * tunable.gemm_n_repeat + tunable.num_vgpr_accumulate_c
+
+    def emit_one_kernel(self, kernel, kernel_cache = None):
+        '''
+        with kernel_cache, kernel text is taken from cache if hit, otherwise emitted into string then cached.
+        '''
+        if kernel_cache is None:
+            self._emit_one_kernel(kernel)
+            return
+        key = kernel_cache.kernel_key(kernel)
+        text = kernel_cache.get_kernel(key)
+        if text is None:
+            origin_emitter = kernel.mc.emitter
+            string_emitter = mc_emit_to_string_t(copy.copy(origin_emitter.indent))
+            kernel.mc.emitter = string_emitter
+            self._emit_one_kernel(kernel)
+            kernel.mc.emitter = origin_emitter
+            text = string_emitter.get_buffer()
+            kernel_cache.put_kernel(key, text)
+        if text.endswith('\n'):
+            text = text[:-1]
+        kernel._emit_front(text)    # text already contains indent
+
+    def _emit_kernel_body_post_pass(self, kernel):
+        '''
+        emit kernel body into string, run peephole_pass_t and/or waitcnt_relax_pass_t as tunable asked, then emit
+        '''
+        origin_emitter = kernel.mc.emitter
+        string_emitter = mc_emit_to_string_t(copy.copy(origin_emitter.indent))
+        kernel.mc.emitter = string_emitter
+        kernel.emit_kernel_body()
+        kernel.mc.emitter = origin_emitter
+        text = string_emitter.get_buffer()
+        if text.endswith('\n'):
+            text = text[:-1]
+        symbol_table = sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None))
+        if kernel.tunable.peephole:
+            peephole_pass = peephole_pass_t(symbol_table)
+            text = peephole_pass(text)
+            rule_count = ', '.join(f'{k}:{v}' for k, v in peephole_pass.rule_count.items() if v != 0)
+            kernel._emit(f'; peephole, {peephole_pass.num_removed} of {peephole_pass.num_inst} inst removed, {peephole_pass.num_rewritten} rewritten' + \
+                        (f' ({rule_count})' if rule_count else ''))
+        if kernel.tunable.waitcnt_relax:
+            relax_pass = waitcnt_relax_pass_t(symbol_table)
+            text = relax_pass(text)
+            kernel._emit(f'; waitcnt relax, {relax_pass.num_relaxed} of {relax_pass.num_waitcnt} s_waitcnt relaxed, {relax_pass.num_removed} removed')
+        kernel._emit_front(text)
+
+    def _emit_one_kernel(self, kernel):
+        if type(kernel) is not igemm_upsampling_clear_t:
+            kernel._emit(';----------------------------------------------------------')
+            kernel._emit('; starting of kernel {}'.format(kernel.name()))
+            kernel._emit(kernel.tunable.serialize())
+
+        kernel.emit_kernel_symbol()
+
+        kernel.emit_kernel_header()
+        with kernel._indent_context():
+            if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V2:
+                kernel.emit_kernel_amd_kernel_code_t()
+            if type(kernel) is not igemm_upsampling_clear_t and (kernel.tunable.peephole or kernel.tunable.waitcnt_relax):
+                self._emit_kernel_body_post_pass(kernel)
+            else:
+                kernel.emit_kernel_body()
+            kernel.emit_kernel_end()
+        if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V3:
+            kernel.emit_kernel_amd_kernel_code_t()
+        kernel.emit_kernel_footer()
+
     def emit_igemm_kernel(self, **options):
         is_multiprocess = True if "emit_kernel_mp" in options and options["emit_kernel_mp"] == True else False
+        kernel_cache = options["kernel_cache"] if "kernel_cache" in options else None
+        # per inc file emission need a file to include from. when emitting into memory (e.g. mc_emit_to_string_t),
+        # every kernel is emitted in place
+        is_kernel_per_inc_file = IGEMM_EMIT_KERNEL_PER_INC_FILE and type(self.mc.emitter) is mc_emit_to_file_t
+        if not is_kernel_per_inc_file:
+            is_multiprocess = False
         def get_kernel_per_inc_file_name(ker, origin_file_name):
             if type(ker) is igemm_upsampling_clear_t:
                 return os.path.join(os.path.dirname(origin_file_name), f"{ker.name()}.inc")
@@ -122,7 +241,7 @@ class igemm_codegen_driver_t(mc_base_t):
 
         # emit the kernel
         #emit_v4r1_dynamic_kernel(self.mc, self.tunable_dicts)
-        if IGEMM_EMIT_KERNEL_PER_INC_FILE:
+        if is_kernel_per_inc_file:
             origin_emitter = self.mc.emitter
             assert type(origin_emitter) is mc_emit_to_file_t
             emitter_per_inc_dict = dict()
@@ -134,12 +253,12 @@ class igemm_codegen_driver_t(mc_base_t):
         if is_multiprocess:
             kernel_per_inc_dict = dict()
             for kernel in self.kernel_list:
-                if IGEMM_EMIT_KERNEL_PER_INC_FILE:
+                if is_kernel_per_inc_file:
                     kpi_file_name = get_kernel_per_inc_file_name(kernel, origin_emitter.file_name)
                     if kpi_file_name not in emitter_per_inc_dict:
                         origin_emitter.emit(f".include \"{os.path.basename(kpi_file_name)}\"")
 
-                        kpi_emitter = mc_emit_to_file_t(kpi_file_name, copy.copy(origin_emitter.indent))
+                        kpi_emitter = mc_emit_to_file_t(kpi_file_name, copy.copy(origin_emitter.indent), origin_emitter.durable)
                         kernel.mc.emitter = kpi_emitter
                         # ATTENTION! never open file in one thread/process and use it in another thread/process
                         # kpi_emitter.open()
@@ -158,44 +277,64 @@ class igemm_codegen_driver_t(mc_base_t):
                 emitter.open()  # open/close file in same process
                 file_name = con_kernels[0].mc.emitter.file_name
                 for kernel in con_kernels:
-                    if type(kernel) is not igemm_upsampling_clear_t:
-                        kernel._emit(';----------------------------------------------------------')
-                        kernel._emit('; starting of kernel {}'.format(kernel.name()))
-                        kernel._emit(kernel.tunable.serialize())
                     assert file_name == kernel.mc.emitter.file_name
-
-                    kernel.emit_kernel_symbol()
-
-                    kernel.emit_kernel_header()
-                    with kernel._indent_context():
-                        if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V2:
-                            kernel.emit_kernel_amd_kernel_code_t()
-                        kernel.emit_kernel_body()
-                        kernel.emit_kernel_end()
-
-                    if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V3:
-                        kernel.emit_kernel_amd_kernel_code_t()
-                    kernel.emit_kernel_footer()
+                    self.emit_one_kernel(kernel, kernel_cache)
                 emitter.close() # open/close file in same process
 
+            # longest first, so that big kernels do not start at the tail and leave other workers idle
+            inc_file_list = sorted(kernel_per_inc_dict.keys(),
+                            key = lambda k: sum(self.estimate_kernel_emit_cost(ker) for ker in kernel_per_inc_dict[k]), reverse = True)
+            num_workers = options["emit_kernel_mp_workers"] if "emit_kernel_mp_workers" in options else os.cpu_count()
+            num_workers = max(1, min(num_workers, len(inc_file_list)))
+
+            # workers are forked after all emitters/kernels are prepared, only the index of inc file is passed through queue
+            mp_ctx = mp.get_context('fork')
+            work_queue = mp_ctx.Queue()
+            for idx in range(len(inc_file_list)):
+                work_queue.put(idx)
+            for _ in range(num_workers):
+                work_queue.put(None)
+            worker_files = [mp_ctx.Value('i', 0, lock = False) for _ in range(num_workers)]
+            worker_busy = [mp_ctx.Value('d', 0.0, lock = False) for _ in range(num_workers)]
+
+            def emit_worker(worker_id):
+                while True:
+                    idx = work_queue.get()
+                    if idx is None:
+                        break
+                    k = inc_file_list[idx]
+                    start = time.perf_counter()
+                    concurrent_emit_kernel(emitter_per_inc_dict[k], kernel_per_inc_dict[k])
+                    worker_busy[worker_id].value += time.perf_counter() - start
+                    worker_files[worker_id].value += 1
+
+            start = time.perf_counter()
             workers = list()
-            # mp.set_start_method('spawn')
-            for k, v in kernel_per_inc_dict.items():
-                worker = mp.Process(target=concurrent_emit_kernel, args=(emitter_per_inc_dict[k], v))
+            for worker_id in range(num_workers):
+                worker = mp_ctx.Process(target=emit_worker, args=(worker_id,))
                 worker.start()
                 workers.append(worker)
 
             for worker in workers:
                 worker.join()
+            elapsed = time.perf_counter() - start
+            for worker in workers:
+                assert worker.exitcode == 0, f"kernel emit worker {worker.name} fail with exit code {worker.exitcode}"
+
+            busy = [wb.value for wb in worker_busy]
+            print(f"[emit] {len(inc_file_list)} inc files by {num_workers} workers in {elapsed:.2f}s, " + \
+                    f"busy min/avg/max: {min(busy):.2f}/{sum(busy) / num_workers:.2f}/{max(busy):.2f}s")
+            for worker_id in range(num_workers):
+                print(f"    worker {worker_id:>3}: {worker_files[worker_id].value:>4} files, {worker_busy[worker_id].value:.2f}s")
 
         else:
             for kernel in self.kernel_list:
-                if IGEMM_EMIT_KERNEL_PER_INC_FILE:
+                if is_kernel_per_inc_file:
                     kpi_file_name = get_kernel_per_inc_file_name(kernel, origin_emitter.file_name)
                     if kpi_file_name not in emitter_per_inc_dict:
                         origin_emitter.emit(f".include \"{os.path.basename(kpi_file_name)}\"")
 
-                        kpi_emitter = mc_emit_to_file_t(kpi_file_name, copy.copy(origin_emitter.indent))
+                        kpi_emitter = mc_emit_to_file_t(kpi_file_name, copy.copy(origin_emitter.indent), origin_emitter.durable)
                         kernel.mc.emitter = kpi_emitter
                         kpi_emitter.open()
 
@@ -208,24 +347,10 @@ class igemm_codegen_driver_t(mc_base_t):
                         if IGEMM_EMIT_KERNEL_METADATA_PER_INC_FILE:
                             kinfo_per_inc_dict[kpi_file_name].append(kernel.get_kernel_info())
 
-                if type(kernel) is not igemm_upsampling_clear_t:
-                    kernel._emit(';----------------------------------------------------------')
-                    kernel._emit('; starting of kernel {}'.format(kernel.name()))
-                    kernel._emit(kernel.tunable.serialize())
-
-                kernel.emit_kernel_symbol()
-
-                kernel.emit_kernel_header()
-                with kernel._indent_context():
-                    if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V2:
-                        kernel.emit_kernel_amd_kernel_code_t()
-                    kernel.emit_kernel_body()
-                    kernel.emit_kernel_end()
-                if kernel.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V3:
-                    kernel.emit_kernel_amd_kernel_code_t()
-                kernel.emit_kernel_footer()
+                self.emit_one_kernel(kernel, kernel_cache)
 
-        if IGEMM_EMIT_KERNEL_PER_INC_FILE:
+        if is_kernel_per_inc_file:
+            self.inc_file_list = list(emitter_per_inc_dict.keys())
             for k, v in emitter_per_inc_dict.items():
                 if IGEMM_EMIT_KERNEL_METADATA_PER_INC_FILE:
                     self.mc.emitter = emitter_per_inc_dict[k]
@@ -240,27 +365,147 @@ class igemm_codegen_driver_t(mc_base_t):
         kernel_info_list = [kernel.get_kernel_info() for kernel in self.kernel_list]
         amdgpu_metadata_t(self.mc, kernel_info_list).emit()
 
+    def get_common_inc_file_name(self):
+        return os.path.splitext(self.mc.emitter.file_name)[0] + '_common.inc'
+
+    def get_metadata_asm_file_name(self):
+        return os.path.splitext(self.mc.emitter.file_name)[0] + '_metadata.s'
+
+    def emit_per_inc_file_asm(self):
+        '''
+        one self contained asm source per inc file, plus one for metadata of all kernels.
+        every source can be assembled into its own object, then link together.
+        '''
+        origin_emitter = self.mc.emitter
+        common_inc_file_name = os.path.basename(self.get_common_inc_file_name())
+        asm_list = list()
+        for inc_file_name in self.inc_file_list:
+            asm_file_name = os.path.splitext(inc_file_name)[0] + '.s'
+            asm_emitter = mc_emit_to_file_t(asm_file_name, copy.copy(origin_emitter.indent), origin_emitter.durable)
+            asm_emitter.open()
+            asm_emitter.emit(f".include \"{common_inc_file_name}\"")
+            asm_emitter.emit(f".include \"{os.path.basename(inc_file_name)}\"")
+            asm_emitter.close()
+            asm_list.append(asm_file_name)
+
+        metadata_emitter = mc_emit_to_file_t(self.get_metadata_asm_file_name(), copy.copy(origin_emitter.indent), origin_emitter.durable)
+        metadata_emitter.open()
+        self.mc.emitter = metadata_emitter
+        self.emit_metadata()
+        self.mc.emitter = origin_emitter
+        metadata_emitter.close()
+        asm_list.append(metadata_emitter.file_name)
+        self.per_inc_file_asm_list = asm_list
+
     def do_emit(self, **options):
+        is_compile_per_inc_file = True if "compile_per_inc_file" in options and options["compile_per_inc_file"] == True else False
+        is_referenced_macro_only = IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY and hasattr(self.mc.emitter, 'hold')
+        if is_compile_per_inc_file:
+            assert IGEMM_EMIT_KERNEL_PER_INC_FILE and type(self.mc.emitter) is mc_emit_to_file_t
+            assert self.mc.arch_config.code_object == AMDGPU_CODEOBJECT_V3, "only cov3 support link multiple objects"
+            # header and macros go to a common inc, which is included by every per inc file asm
+            origin_emitter = self.mc.emitter
+            common_emitter = mc_emit_to_file_t(self.get_common_inc_file_name(), copy.copy(origin_emitter.indent), origin_emitter.durable)
+            common_emitter.open()
+            self.mc.emitter = common_emitter
+
         self.emit_hsa_header()
-        self.emit_global_macro()
-        self.emit_igemm_macro()
-        self.emit_igemm_kernel(**options)
+        if is_referenced_macro_only:
+            # global macros referenced are only known after kernels are emitted, so igemm macros and kernels are
+            # held in memory, and put back after global macros
+            macro_emitter = self.mc.emitter
+            macro_emitter.hold()
+            self.emit_igemm_macro()
+            igemm_macro_text = macro_emitter.release()
+            if is_compile_per_inc_file:
+                self.mc.emitter = origin_emitter
+            kernel_emitter = self.mc.emitter
+            kernel_emitter.hold()
+            self.emit_igemm_kernel(**options)
+            kernel_text = kernel_emitter.release()
+            inc_file_text = list()
+            for inc_file_name in self.inc_file_list:
+                with open(inc_file_name, 'r') as f:
+                    inc_file_text.append(f.read())
+
+            self.mc.emitter = macro_emitter
+            self.emit_global_macro([igemm_macro_text, kernel_text] + inc_file_text)
+            macro_emitter.emit_raw(igemm_macro_text)
+            print(f"[macro] {self.num_global_macro_skipped} global macros not referenced, {self.global_macro_bytes_skipped} bytes skipped")
+        else:
+            self.emit_global_macro()
+            self.emit_igemm_macro()
+
+        if is_compile_per_inc_file:
+            self.mc.emitter = origin_emitter
+            common_emitter.close()
+            self._emit(f".include \"{os.path.basename(common_emitter.file_name)}\"")
+
+        if is_referenced_macro_only:
+            self.mc.emitter.emit_raw(kernel_text)
+        else:
+            self.emit_igemm_kernel(**options)
         if not IGEMM_EMIT_KERNEL_METADATA_PER_INC_FILE:
             self.emit_metadata()
+        if is_compile_per_inc_file:
+            self.emit_per_inc_file_asm()
+
+    def compile_per_inc_file(self, target_hsaco, kernel_cache, **options):
+        ass = compile_asm_parallel_t(self.mc.arch_config, self.per_inc_file_asm_list, target_hsaco,
+                    assembler = options["assembler"] if "assembler" in options else None,
+                    linker = options["linker"] if "linker" in options else None)
+        skip_assemble = list()
+        object_keys = dict()
+        if kernel_cache is not None:
+            for asm_file_name in self.per_inc_file_asm_list:
+                object_keys[asm_file_name] = kernel_cache.asm_key(asm_file_name, self.mc.arch_config)
+                if kernel_cache.get_object(object_keys[asm_file_name], ass.get_object_file_name(asm_file_name)):
+                    skip_assemble.append(asm_file_name)
+            print(f"[kernel cache] {len(skip_assemble)}/{len(self.per_inc_file_asm_list)} objects reused")
+        start = time.perf_counter()
+        rtn = ass.compile(skip_assemble = skip_assemble)
+        print(f"[asm] {len(self.per_inc_file_asm_list) - len(skip_assemble)} objects assembled and linked in {time.perf_counter() - start:.2f}s")
+        if rtn and kernel_cache is not None:
+            for asm_file_name in self.per_inc_file_asm_list:
+                if asm_file_name not in skip_assemble:
+                    kernel_cache.put_object(object_keys[asm_file_name], ass.get_object_file_name(asm_file_name))
+        return rtn
 
     def do_compile(self, **options):
-        ass = compile_asm_t(self.mc, self.mc.emitter.file_name)
-        rtn = ass.compile()
-        if not rtn:
-            assert False
+        kernel_cache = options["kernel_cache"] if "kernel_cache" in options else None
+        is_compile_per_inc_file = True if "compile_per_inc_file" in options and options["compile_per_inc_file"] == True else False
+        self.mc.close()     # asm source must be complete before hashing or assembling
+        asm_file_name = self.mc.emitter.file_name
+        target_hsaco = os.path.splitext(asm_file_name)[0] + '.hsaco'
+
+        if kernel_cache is not None:
+            hsaco_key = kernel_cache.asm_key(asm_file_name, self.mc.arch_config)
+        if kernel_cache is not None and kernel_cache.get_hsaco(hsaco_key, target_hsaco):
+            print(f"[kernel cache] reuse code object {target_hsaco}")
+        else:
+            if is_compile_per_inc_file:
+                rtn = self.compile_per_inc_file(target_hsaco, kernel_cache, **options)
+            else:
+                rtn = compile_asm_t(self.mc, asm_file_name, target_hsaco).compile()
+            if not rtn:
+                assert False
+            if kernel_cache is not None:
+                kernel_cache.put_hsaco(hsaco_key, target_hsaco)
 
         is_skip_disass = True if "compile_skip_disass" in options and options["compile_skip_disass"] == True else False
         if not is_skip_disass:
-            disass = compile_disass_t(self.mc, ass.target_hsaco)
+            disass = compile_disass_t(self.mc, target_hsaco)
             rtn = disass.compile()
             if not rtn:
                 assert False
 
     def __call__(self, **options):
+        kernel_cache = options["kernel_cache"] if "kernel_cache" in options else None
+        if kernel_cache is not None:
+            num_hit = len([k for k in self.kernel_list if kernel_cache.has_kernel(kernel_cache.kernel_key(k))])
         self.do_emit(**options)
+        if kernel_cache is not None:
+            print(f"[kernel cache] {num_hit}/{len(self.kernel_list)} kernels reused from {kernel_cache.cache_dir}")
         self.do_compile(**options)
+        if kernel_cache is not None:
+            kernel_cache.evict()
@@ -0,0 +1,250 @@
+################################################################################
+# 
+#  MIT License
+# 
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+# 
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+# 
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+# 
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+# 
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+from .perf_advisor import *
+
+import re
+import math
+
+# cycles of gfx908, rough number from microbenchmark, override by igemm_cycle_latency_t(dict)
+IGEMM_CYCLE_LATENCY_DEFAULT = {
+    'valu_issue'            : 4,        # wave64 on simd16
+    'salu_issue'            : 4,
+    'mfma_issue'            : 4,        # matrix core is busy for inst_mfma_t.cycle after issue
+    'ds_issue'              : 4,
+    'vmem_issue'            : 4,
+    'smem_issue'            : 4,
+    'branch'                : 16,
+    'barrier'               : 16,
+    'ds_latency'            : 64,
+    'vmem_load_latency'     : 500,
+    'vmem_store_latency'    : 500,
+    'smem_latency'          : 200,
+    'lds_bytes_per_cycle'   : 128,
+}
+
+class igemm_cycle_latency_t(object):
+    def __init__(self, latency_dict = None):
+        for k, v in IGEMM_CYCLE_LATENCY_DEFAULT.items():
+            setattr(self, k, v)
+        if latency_dict is not None:
+            for k, v in latency_dict.items():
+                assert k in IGEMM_CYCLE_LATENCY_DEFAULT, f"unknown latency key:{k}"
+                setattr(self, k, v)
+
+class igemm_cycle_estimate_t(object):
+    '''
+    one iteration of main loop, for a single wave
+    '''
+    def __init__(self):
+        self.cycles             = 0     # steady state, from loop head to next loop head
+        self.mfma_cycles        = 0     # matrix core busy
+        self.num_mfma           = 0
+        self.mfma_flop          = 0     # per wave
+        self.valu_cycles        = 0     # valu of this simd busy, exclude mfma
+        self.lds_cycles         = 0     # lds of this CU busy
+        self.num_inst           = 0
+        self.stall_lgkmcnt      = 0     # cycles waited in s_waitcnt lgkmcnt
+        self.stall_vmcnt        = 0     # cycles waited in s_waitcnt vmcnt
+        self.stall_mfma         = 0     # cycles waited for matrix core of previous mfma
+        self.unroll_k           = 0     # gemm_k per iteration
+
+    def get_mfma_utilization(self):
+        return self.mfma_cycles / self.cycles if self.cycles != 0 else 0.0
+
+class igemm_cycle_estimator_t(object):
+    '''
+    static, in order, single wave model of the main loop, with the code emitted for a tunable.
+      - mfma occupy matrix core for its cycle, other instruction can be issued meanwhile
+      - ds_* occupy lds for its bytes, and return in order. buffer_* return in order
+      - s_waitcnt wait until outstanding lgkm/vm instructions not larger than the count
+    loop body is simulated several passes, cycles are taken from the last pass so that the
+    in flight mfma and memory instruction of previous iteration are counted.
+    '''
+    def __init__(self, arch_detail, latency = None):
+        self.arch_detail = arch_detail
+        self.latency = latency if latency is not None else igemm_cycle_latency_t()
+
+    def get_loop_body(self, asm_text):
+        '''
+        instructions from L_*_mfma_body to the first s_branch back to it
+        '''
+        body = None
+        label_body = None
+        for line in asm_text.split('\n'):
+            line = line.split(';')[0].split('//')[0].strip()
+            if line == '':
+                continue
+            if body is None:
+                m = re.match(r'^(L_\S+_mfma_body):$', line)
+                if m:
+                    label_body = m.group(1)
+                    body = list()
+                continue
+            if line.endswith(':') or line.startswith('.') and not line.startswith('.v_'):
+                continue    # label or directive. .v_* is macro of valu
+            body.append(line)
+            if line == f's_branch {label_body}':
+                return body
+        assert False, "no mfma main loop found"
+
+    def _get_ds_bytes(self, op):
+        m = re.match(r'^ds_(read|write)(2st64|2)?_[biu](\d+)', op)
+        if m is None:
+            return 4
+        return (int(m.group(3)) // 8) * (2 if m.group(2) else 1)
+
+    def simulate(self, inst_list, num_pass = 2):
+        lat = self.latency
+        t = 0
+        mfma_free = 0
+        lds_free = 0
+        lgkm_queue = list()     # completion cycle, in order
+        vm_queue = list()
+        est = igemm_cycle_estimate_t()
+
+        def wait_queue(queue, cnt, t):
+            while len(queue) > 0 and queue[0] <= t:
+                queue.pop(0)
+            if len(queue) > cnt:
+                t = max(t, queue[len(queue) - cnt - 1])
+                del queue[:len(queue) - cnt]
+            return t
+
+        for i_pass in range(num_pass):
+            if i_pass == num_pass - 1:
+                est = igemm_cycle_estimate_t()
+                t_start = t
+            for inst in inst_list:
+                op = inst.split()[0]
+                est.num_inst += 1
+                if op.startswith('v_mfma'):
+                    mfma = inst_mfma_get_by_name(op)
+                    assert mfma is not None, f"unknown mfma:{op}"
+                    cycle = self.arch_detail.get_mfma_cycle(op, mfma.cycle)
+                    start = max(t, mfma_free)
+                    est.stall_mfma += start - t
+                    mfma_free = start + cycle
+                    est.mfma_cycles += cycle
+                    est.num_mfma += 1
+                    est.mfma_flop += mfma.get_flop()
+                    t = start + lat.mfma_issue
+                elif op.startswith('ds_'):
+                    pipe = self.arch_detail.wavefront_size * self._get_ds_bytes(op) // lat.lds_bytes_per_cycle
+                    start = max(t, lds_free)
+                    lds_free = start + pipe
+                    est.lds_cycles += pipe
+                    lgkm_queue.append(max(lgkm_queue[-1] if lgkm_queue else 0, start + pipe + lat.ds_latency))
+                    t = start + lat.ds_issue
+                elif op.startswith('buffer_') or op.startswith('global_'):
+                    latency = lat.vmem_store_latency if '_store' in op else lat.vmem_load_latency
+                    vm_queue.append(max(vm_queue[-1] if vm_queue else 0, t + latency))
+                    t += lat.vmem_issue
+                elif op.startswith('s_load') or op.startswith('s_buffer_load'):
+                    lgkm_queue.append(max(lgkm_queue[-1] if lgkm_queue else 0, t + lat.smem_latency))
+                    t += lat.smem_issue
+                elif op == 's_waitcnt':
+                    m = re.search(r'lgkmcnt\((\d+)\)', inst)
+                    if m:
+                        t_wait = wait_queue(lgkm_queue, int(m.group(1)), t)
+                        est.stall_lgkmcnt += t_wait - t
+                        t = t_wait
+                    m = re.search(r'vmcnt\((\d+)\)', inst)
+                    if m:
+                        t_wait = wait_queue(vm_queue, int(m.group(1)), t)
+                        est.stall_vmcnt += t_wait - t
+                        t = t_wait
+                    t += lat.salu_issue
+                elif op == 's_barrier':
+                    t += lat.barrier
+                elif op == 's_nop':
+                    t += int(inst.split()[1], 0) + 1
+                elif op == 's_branch' or op.startswith('s_cbranch'):
+                    t += lat.branch
+                elif op.startswith('s_'):
+                    t += lat.salu_issue
+                else:
+                    t += lat.valu_issue
+                    est.valu_cycles += lat.valu_issue
+        est.cycles = t - t_start
+        return est
+
+    def estimate_text(self, asm_text):
+        return self.simulate(self.get_loop_body(asm_text))
+
+    def estimate(self, tunable):
+        '''
+        emit kernel body of this tunable into string, then estimate main loop
+        '''
+        kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+        emitter = mc_emit_to_string_t()
+        mc = mc_asm_printer_t(emitter, amdgpu_arch_config_t({'arch' : self.arch_detail.arch}))
+        kernel_class(mc, tunable).emit_kernel_body()
+        est = self.estimate_text(emitter.get_buffer())
+        est.unroll_k = tunable.gemm_k_per_block
+        return est
+
+    def get_iteration_cycles(self, estimate, waves_per_cu):
+        '''
+        cycles for every resident wave to finish one iteration, and what limit it.
+        waves on same simd share matrix core and valu, waves on same CU share lds, and hide the stall of each other
+        '''
+        num_simd = self.arch_detail.simd_per_cu // 16       # simd_per_cu is in lanes
+        waves_per_simd = max(1, waves_per_cu // num_simd)
+        limits = {'latency' : estimate.cycles,
+                  'mfma'    : waves_per_simd * estimate.mfma_cycles,
+                  'valu'    : waves_per_simd * estimate.valu_cycles,
+                  'lds'     : waves_per_cu * estimate.lds_cycles}
+        limiter = max(limits, key = lambda k: limits[k])
+        return limits[limiter], limiter
+
+    def predict_tflops(self, tunable, conv_param, estimate):
+        '''
+        the lower of cycle of main loop, and memory bound of perf_advisor_t
+        '''
+        advisor = perf_advisor_t(self.arch_detail)
+        advice = advisor.advise(tunable, conv_param)
+        if advice.occupancy == 0 or estimate.cycles == 0:
+            return 0.0
+        iteration_cycles, _ = self.get_iteration_cycles(estimate, advice.waves_per_cu)
+
+        slots = advice.occupancy * self.arch_detail.num_cu
+        total_cycles = 0
+        for launch in advisor.get_launch_list(tunable, conv_param):
+            num_tiles = 0
+            num_iterations = 0
+            for gemm_m, gemm_n, gemm_k, num_gemm in launch:
+                num_tiles += num_gemm * ((gemm_m + tunable.gemm_m_per_block - 1) // tunable.gemm_m_per_block) * \
+                                        ((gemm_n + tunable.gemm_n_per_block - 1) // tunable.gemm_n_per_block)
+                num_iterations = max(num_iterations, (gemm_k + tunable.gemm_k_per_block - 1) // tunable.gemm_k_per_block)
+            total_cycles += ((num_tiles + slots - 1) // slots) * num_iterations * iteration_cycles
+        if total_cycles == 0:
+            return 0.0
+        tflops = advice.flop / (total_cycles / (self.arch_detail.sclk_mhz * 1e6)) / 1e12
+        return min(tflops, advice.memory_bound_tflops)
@@ -0,0 +1,198 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+from .igemm_lane_replay import *
+
+import re
+import math
+
+RE_BUFFER_INST = re.compile(r'^buffer_(load|store|atomic)_(\w+)$')
+IGEMM_BUFFER_DATA_BYTES = {'dword' : 4, 'dwordx2' : 8, 'dwordx3' : 12, 'dwordx4' : 16,
+                        'short' : 2, 'ushort' : 2, 'sshort' : 2, 'short_d16' : 2, 'short_d16_hi' : 2,
+                        'byte' : 1, 'ubyte' : 1, 'sbyte' : 1, 'byte_d16' : 1, 'byte_d16_hi' : 1,
+                        'add_f32' : 4, 'pk_add_f16' : 4, 'add' : 4}
+
+class igemm_global_access_t(object):
+    '''
+    one buffer inst issued by every wave of a workgroup. segment is counted per wave and summed
+    '''
+    def __init__(self):
+        self.inst           = ''
+        self.tensor         = ''        # in/wei/out, from name of buffer resource
+        self.is_store       = False
+        self.resolved       = True      # False if address depends on value not known
+        self.num_lanes      = 0         # active lanes
+        self.useful_bytes   = 0         # different byte accessed by active lanes
+        self.segments_64    = 0         # 64 byte aligned segment touched
+        self.segments_128   = 0
+
+    def fetched_bytes(self, segment_size = 64):
+        return self.segments_64 * 64 if segment_size == 64 else self.segments_128 * 128
+
+    def efficiency(self, segment_size = 64):
+        fetched = self.fetched_bytes(segment_size)
+        return self.useful_bytes / fetched if fetched != 0 else 1.0
+
+class igemm_global_coalescing_report_t(object):
+    def __init__(self):
+        self.name       = ''
+        self.accesses   = list()
+
+    def get_accesses(self, tensor = None, is_store = None):
+        return [a for a in self.accesses if a.resolved and (tensor is None or a.tensor == tensor) and \
+                    (is_store is None or a.is_store == is_store)]
+
+    def get_tensors(self):
+        tensors = list()
+        for a in self.accesses:
+            if a.tensor not in tensors:
+                tensors.append(a.tensor)
+        return tensors
+
+    def num_unresolved(self):
+        return len([a for a in self.accesses if not a.resolved])
+
+    def efficiency(self, tensor = None, is_store = None, segment_size = 64):
+        accesses = self.get_accesses(tensor, is_store)
+        fetched = sum(a.fetched_bytes(segment_size) for a in accesses)
+        return sum(a.useful_bytes for a in accesses) / fetched if fetched != 0 else 1.0
+
+class igemm_global_coalescing_analyzer_t(igemm_lane_replay_t):
+    '''
+    replay the kernel body with kernel argument of a conv shape, to get per-lane address of every buffer load/store,
+    then count the 64/128 byte segments each wave touch. efficiency is useful byte over byte of segments.
+      - workgroup 0 is replayed, with tensor base at address 0. see igemm_lane_replay_t for how register is evaluated.
+      - lanes masked by exec, or out of range of the buffer resource (vgpr offset + soffset + offset >= num_records), are not counted.
+      - for bwd, the kernel argument is the one of first gemm (dtile_iy/dtile_ix = 0).
+    '''
+    def __init__(self, arch_detail):
+        igemm_lane_replay_t.__init__(self, arch_detail)
+
+    def get_kernarg(self, tunable, conv_param):
+        '''
+        label -> value of kernel argument, as set by host driver. magic number is not needed, see _replay_mdiv()
+        '''
+        p = conv_param
+        karg = {'k_p_in' : 0, 'k_p_wei' : 0, 'k_p_out' : 0, 'k_hi' : p.hi, 'k_wi' : p.wi, 'k_n' : p.n,
+                'k_k' : p.k // p.g, 'k_c' : p.c // p.g, 'k_ho' : p.ho, 'k_wo' : p.wo,
+                'k_stride_h' : p.sy, 'k_stride_w' : p.sx, 'k_dilation_h' : p.dy, 'k_dilation_w' : p.dx,
+                'k_pad_h' : p.py, 'k_pad_w' : p.px, 'k_y' : p.y, 'k_x' : p.x, 'k_group' : p.g}
+        if tunable.direction == 'wrw':
+            karg['k_gemm_k_global_split'] = tunable.gemm_k_global_split
+        if tunable.direction == 'bwd':
+            gcd_h, gcd_w = math.gcd(p.sy, p.dy), math.gcd(p.sx, p.dx)
+            y_tilda, x_tilda = p.sy // gcd_h, p.sx // gcd_w
+            h_tilda = p.ho + (p.dy * (p.y - 1) + p.sy - 1) // p.sy
+            w_tilda = p.wo + (p.dx * (p.x - 1) + p.sx - 1) // p.sx
+            h_tilda_left = max(0, p.py - p.dy * (y_tilda - 1)) // p.sy
+            w_tilda_left = max(0, p.px - p.dx * (x_tilda - 1)) // p.sx
+            h_tilda_right = min(h_tilda, (p.py + p.hi - 1 + p.sy - 1) // p.sy + 1)
+            w_tilda_right = min(w_tilda, (p.px + p.wi - 1 + p.sx - 1) // p.sx + 1)
+            karg.update({'k_dtile_iy' : 0, 'k_dtile_ix' : 0, 'k_dtile_dy' : p.dy // gcd_h, 'k_dtile_dx' : p.dx // gcd_w,
+                'k_dtile_y' : y_tilda, 'k_dtile_x' : x_tilda, 'k_dtile_h' : h_tilda, 'k_dtile_w' : w_tilda,
+                'k_dslice_y' : (p.y + y_tilda - 1) // y_tilda, 'k_dslice_x' : (p.x + x_tilda - 1) // x_tilda,
+                'k_dslice_h' : h_tilda_right - h_tilda_left, 'k_dslice_w' : w_tilda_right - w_tilda_left,
+                'k_dslice_h_left' : h_tilda_left, 'k_dslice_w_left' : w_tilda_left})
+        return karg
+
+    def _tensor_name(self, srsrc):
+        m = re.match(r'^s\[s_p_(\w+?)(\+\d+)?:', srsrc)
+        return m.group(1) if m else srsrc
+
+    def get_buffer_address(self, operands, modifiers):
+        '''
+        (lanes, address) of a buffer inst, lanes active in exec and in range of buffer resource, address of these lanes.
+        None if address depends on value not known
+        '''
+        srsrc = self._reg_range(operands[2])
+        base = self.regs.get(('s', srsrc[1])) if srsrc is not None else None
+        num_records = self.regs.get(('s', srsrc[1] + 2)) if srsrc is not None else None
+        soffset = self.get_value(operands[3]) if len(operands) > 3 else 0
+        offset = self.get_value(operands[1]) if 'offen' in modifiers else 0
+        if base is None or soffset is None or offset is None:
+            return None
+        offset = offset + soffset + modifiers.get('offset', 0)
+        active = self.masks['exec']
+        if num_records is not None:
+            active = active & (offset < num_records)
+        lanes = np.nonzero(active)[0]
+        return lanes, (base + offset)[lanes]
+
+    def on_memory_inst(self, op, operands, modifiers):
+        m = RE_BUFFER_INST.match(op)
+        if m is None or m.group(2) not in IGEMM_BUFFER_DATA_BYTES:
+            return
+        access = igemm_global_access_t()
+        access.inst = ' '.join([op, ', '.join(operands)])
+        access.tensor = self._tensor_name(operands[2])
+        access.is_store = m.group(1) != 'load'
+        self.report.accesses.append(access)
+
+        lanes_addr = self.get_buffer_address(operands, modifiers)
+        if lanes_addr is None:
+            access.resolved = False
+            return
+        lanes, addr = lanes_addr
+        data_bytes = IGEMM_BUFFER_DATA_BYTES[m.group(2)]
+        wave = (lanes // self.wave_size).astype(np.uint64) << np.uint64(40)
+        byte = (addr[:, None] + np.arange(data_bytes, dtype = np.uint64)[None, :]).reshape(-1)
+        byte_of_wave = np.repeat(wave, data_bytes) | byte
+        access.num_lanes = len(lanes)
+        access.useful_bytes = len(np.unique(byte_of_wave))
+        access.segments_64 = len(np.unique(byte_of_wave >> np.uint64(6)))
+        access.segments_128 = len(np.unique(byte_of_wave >> np.uint64(7)))
+
+    def analyze_text(self, asm_text):
+        self.report = igemm_global_coalescing_report_t()
+        self.replay(asm_text)
+        return self.report
+
+    def set_kernarg(self, tunable, conv_param):
+        '''
+        kernarg of conv_param for kernel last emitted by emit_kernel()
+        '''
+        table = self.analyzer.symbol_table
+        self.kernarg = dict()
+        for label, value in self.get_kernarg(tunable, conv_param).items():
+            if label in table:
+                self.kernarg[table[label]] = value
+                if label.startswith('k_p_'):
+                    self.kernarg[table[label] + 4] = 0      # high dword of pointer
+
+    def analyze(self, tunable, conv_param):
+        '''
+        emit kernel body of this tunable, with every macro inline-ed, then replay with kernel argument of conv_param
+        '''
+        kernel, asm_text = self.emit_kernel(tunable)
+        table = self.analyzer.symbol_table
+        self.set_kernarg(tunable, conv_param)
+        self.sgpr_init = {table[s] : 0 for s in ('s_bx', 's_by') if s in table}
+        report = self.analyze_text(asm_text)
+        report.name = kernel.name()
+        return report
@@ -0,0 +1,250 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+
+import re
+import copy
+
+# gfx9 encoding, in byte. 32bit encoding can be followed by one literal dword
+IGEMM_INST_SIZE_32         = 4     # sop1/sop2/sopc/sopk/sopp, vop1/vop2/vopc
+IGEMM_INST_SIZE_64         = 8     # smem, vop3/vop3p, ds, mubuf/mtbuf, flat/global, or vop with dpp/sdwa
+IGEMM_INST_SIZE_LITERAL    = 4
+
+# valu only encoded as vop3 even with 2 source
+IGEMM_INST_VOP3_ONLY = ('v_mul_lo_u32', 'v_mul_hi_u32', 'v_mul_lo_i32', 'v_mul_hi_i32', 'v_add_i32', 'v_sub_i32',
+                        'v_add_i16', 'v_sub_i16', 'v_bfm_b32', 'v_bcnt_u32_b32', 'v_mbcnt_lo_u32_b32', 'v_mbcnt_hi_u32_b32',
+                        'v_lshlrev_b64', 'v_lshrrev_b64', 'v_ashrrev_i64', 'v_add_f64', 'v_mul_f64', 'v_min_f64', 'v_max_f64',
+                        'v_ldexp_f64', 'v_ldexp_f32', 'v_readlane_b32', 'v_writelane_b32', 'v_cvt_pkrtz_f16_f32',
+                        'v_cvt_pknorm_i16_f32', 'v_cvt_pknorm_u16_f32', 'v_cvt_pk_u16_u32', 'v_cvt_pk_i16_i32',
+                        'v_pack_b32_f16', 'v_trig_preop_f64')
+IGEMM_INST_VOP3P_PREFIX = ('v_pk_', 'v_mfma', 'v_accvgpr_', 'v_dot', 'v_mad_mix', 'v_fma_mix')
+IGEMM_INST_VOP2_LITERAL = ('v_madmk_f32', 'v_madak_f32', 'v_fmamk_f32', 'v_fmaak_f32')      # always with a literal
+IGEMM_INST_SOPP = ('s_nop', 's_endpgm', 's_branch', 's_cbranch_', 's_waitcnt', 's_barrier', 's_setprio', 's_sleep',
+                        's_sendmsg', 's_trap', 's_icache_inv', 's_set_gpr_idx_off', 's_set_gpr_idx_mode', 's_setkill')
+IGEMM_INST_SOPK = ('s_movk_i32', 's_cmovk_i32', 's_cmpk_', 's_addk_i32', 's_mulk_i32', 's_getreg_b32', 's_setreg_b32')
+IGEMM_INST_SMEM = ('s_load_', 's_buffer_load_', 's_store_', 's_buffer_store_', 's_dcache_', 's_memtime', 's_memrealtime',
+                        's_atomic_', 's_buffer_atomic_', 's_scratch_')
+IGEMM_INST_64_PREFIX = ('ds_', 'buffer_', 'tbuffer_', 'flat_', 'global_', 'scratch_')
+
+IGEMM_INST_SPECIAL_REG = ('vcc', 'vcc_lo', 'vcc_hi', 'exec', 'exec_lo', 'exec_hi', 'm0', 'scc', 'off', 'flat_scratch',
+                        'flat_scratch_lo', 'flat_scratch_hi', 'xnack_mask', 'lds_direct')
+
+# float value of inline constant, and their bit pattern as 32bit operand
+IGEMM_INST_INLINE_FLOAT = (0.5, -0.5, 1.0, -1.0, 2.0, -2.0, 4.0, -4.0)
+IGEMM_INST_INLINE_FLOAT_BITS = (0x3f000000, 0xbf000000, 0x3f800000, 0xbf800000, 0x40000000, 0xc0000000,
+                        0x40800000, 0xc0800000, 0x3e22f983)
+
+class igemm_code_size_t(object):
+    '''
+    encoded size of a kernel, and of its main loop from L_*_body to L_*_finishing label
+    '''
+    def __init__(self):
+        self.name               = ''
+        self.total_bytes        = 0
+        self.num_inst           = 0
+        self.num_literal        = 0
+        self.loop_bytes         = 0     # 0 if no main loop found
+        self.loop_num_inst      = 0
+        self.loop_num_literal   = 0
+        self.icache_budget      = 0
+
+    def is_over_budget(self):
+        return self.loop_bytes > self.icache_budget
+
+class igemm_icache_estimator_t(object):
+    '''
+    static estimation of instruction encoding size, as the assembler would choose the shortest encoding
+      - vop2/vopc need the 2nd source be vgpr and carry/mask be vcc, otherwise promoted to vop3
+      - sop/vop1/vop2/vopc with a source not inline constant take one more literal dword
+      - symbols in operand are resolved by symbol_table, unknown symbol is taken as literal
+    code is emitted with macro_inline, so every macro is expanded and measured.
+    '''
+    def __init__(self, arch_detail, icache_budget = None, symbol_table = None):
+        self.arch_detail = arch_detail
+        self.icache_budget = icache_budget if icache_budget is not None else arch_detail.icache_size
+        self.symbol_table = symbol_table if symbol_table is not None else dict()
+
+    def _split_operands(self, operand_str):
+        '''
+        return operands and trailing modifiers, like "v[0], v[1] offset:16" -> ['v[0]', 'v[1]'], ['offset:16']
+        '''
+        if operand_str == '':
+            return list(), list()
+        operands, depth, current = list(), 0, ''
+        for c in operand_str:
+            if c in '[(':
+                depth += 1
+            elif c in '])':
+                depth -= 1
+            if c == ',' and depth == 0:
+                operands.append(current.strip())
+                current = ''
+            else:
+                current += c
+        tail = current.split()
+        operands.append(tail[0] if len(tail) > 0 else '')
+        return operands, tail[1:]
+
+    def _is_register(self, operand):
+        operand = operand.lstrip('-')      # neg of a register
+        if re.match(r'^(s|v|a|ttmp)(\[.*\]|\d+)$', operand):
+            return True
+        return operand in IGEMM_INST_SPECIAL_REG or operand.startswith('src_')
+
+    def _get_value(self, operand):
+        '''
+        value of an immediate operand, or None if can not be resolved
+        '''
+        try:
+            return int(operand, 0)
+        except ValueError:
+            pass
+        try:
+            return float(operand)
+        except ValueError:
+            pass
+        expr = re.sub(r'[A-Za-z_]\w*', lambda m: str(self.symbol_table[m.group(0)]) if m.group(0) in self.symbol_table else '@', operand)
+        if '@' in expr or not re.match(r'^[\d\s+\-*/()x]+$', expr):
+            return None
+        try:
+            return int(eval(expr.replace('/', '//')))
+        except Exception:
+            return None
+
+    def is_literal(self, operand):
+        if self._is_register(operand):
+            return False
+        value = self._get_value(operand)
+        if value is None:
+            return True
+        if type(value) is float:
+            return value not in IGEMM_INST_INLINE_FLOAT
+        bits = value & 0xffffffff
+        signed = bits - (1 << 32) if bits & 0x80000000 else bits      # e.g. 0xffffffff is -1
+        return not (-16 <= signed <= 64 or bits in IGEMM_INST_INLINE_FLOAT_BITS)
+
+    def _is_vgpr(self, operand):
+        return re.match(r'^v(\[.*\]|\d+)$', operand) is not None
+
+    def get_inst_size(self, inst):
+        '''
+        return (size in byte, has literal) of an instruction string, without comment
+        '''
+        op, _, operand_str = inst.strip().partition(' ')
+        operands, modifiers = self._split_operands(operand_str.strip())
+
+        if op.startswith(IGEMM_INST_64_PREFIX) or op.startswith(IGEMM_INST_SMEM) or op == 's_setreg_imm32_b32':
+            return IGEMM_INST_SIZE_64, False
+        if op.startswith(IGEMM_INST_SOPP) or op.startswith(IGEMM_INST_SOPK):
+            return IGEMM_INST_SIZE_32, False
+        srcs = operands[1:]
+        if op.startswith('s_'):
+            has_literal = any(self.is_literal(o) for o in srcs)
+            return IGEMM_INST_SIZE_32 + (IGEMM_INST_SIZE_LITERAL if has_literal else 0), has_literal
+
+        assert op.startswith('v_'), f"unknown instruction:{inst}"
+        if op.startswith(IGEMM_INST_VOP3P_PREFIX):
+            return IGEMM_INST_SIZE_64, False
+        if op in IGEMM_INST_VOP2_LITERAL:
+            return IGEMM_INST_SIZE_32 + IGEMM_INST_SIZE_LITERAL, True
+        if any(o.startswith(('neg(', 'abs(', '|', '-|')) or (o.startswith('-') and self._is_register(o)) for o in srcs):
+            return IGEMM_INST_SIZE_64, False
+        if len(modifiers) > 0:
+            return IGEMM_INST_SIZE_64, False        # dpp/sdwa take one more dword, clamp/omod/op_sel only in vop3
+
+        is_vop3 = False
+        if op in IGEMM_INST_VOP3_ONLY:
+            is_vop3 = True
+        elif op.startswith(('v_cmp_', 'v_cmpx_')):
+            is_vop3 = operands[0] != 'vcc' or not self._is_vgpr(srcs[-1])
+        elif op.startswith(('v_add_co_u32', 'v_sub_co_u32', 'v_subrev_co_u32')):
+            is_vop3 = len(operands) != 4 or operands[1] != 'vcc' or not self._is_vgpr(operands[3])
+            srcs = operands[2:]
+        elif op.startswith(('v_addc_co_u32', 'v_subb_co_u32', 'v_subbrev_co_u32')):
+            is_vop3 = len(operands) != 5 or operands[1] != 'vcc' or operands[4] != 'vcc' or not self._is_vgpr(operands[3])
+            srcs = operands[2:4]
+        elif op.startswith('v_cndmask_b32'):
+            is_vop3 = len(operands) != 4 or operands[3] != 'vcc' or not self._is_vgpr(operands[2])
+            srcs = operands[1:3]
+        elif len(srcs) == 2:
+            is_vop3 = not self._is_vgpr(srcs[1])
+        elif len(srcs) > 2:
+            is_vop3 = True
+        if is_vop3:
+            return IGEMM_INST_SIZE_64, False
+        has_literal = any(self.is_literal(o) for o in srcs)
+        return IGEMM_INST_SIZE_32 + (IGEMM_INST_SIZE_LITERAL if has_literal else 0), has_literal
+
+    def estimate_text(self, asm_text):
+        '''
+        sum size of every instruction, and of those between main loop body label and finishing label
+        '''
+        size = igemm_code_size_t()
+        size.icache_budget = self.icache_budget
+        in_loop, label_finishing = False, None
+        for line in asm_text.split('\n'):
+            line = line.split(';')[0].split('//')[0].strip()
+            if line == '':
+                continue
+            if line.endswith(':'):
+                m = re.match(r'^(L_\S+)_(mfma|fma)_body:$', line)
+                if m and label_finishing is None:
+                    in_loop, label_finishing = True, f'{m.group(1)}_{m.group(2)}_finishing:'
+                elif line == label_finishing:
+                    in_loop = False
+                continue
+            if line.startswith('.'):
+                assert not line.startswith(('.v_', '.mdiv_', '.rept')), f"macro can not be measured, emit with macro_inline:{line}"
+                continue    # directive
+            if re.match(r'^[A-Za-z_]\w*\s*=', line):
+                continue    # symbol assignment
+            inst_bytes, has_literal = self.get_inst_size(line)
+            size.total_bytes += inst_bytes
+            size.num_inst += 1
+            size.num_literal += 1 if has_literal else 0
+            if in_loop:
+                size.loop_bytes += inst_bytes
+                size.loop_num_inst += 1
+                size.loop_num_literal += 1 if has_literal else 0
+        return size
+
+    def estimate(self, tunable):
+        '''
+        emit kernel body of this tunable, with every macro inline-ed, then estimate
+        '''
+        tunable = copy.copy(tunable)
+        tunable.macro_inline = 1
+        kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+        emitter = mc_emit_to_string_t()
+        mc = mc_asm_printer_t(emitter, amdgpu_arch_config_t({'arch' : self.arch_detail.arch}))
+        kernel = kernel_class(mc, tunable)
+        kernel.emit_kernel_body()
+        size = self.estimate_text(emitter.get_buffer())
+        size.name = kernel.name()
+        return size
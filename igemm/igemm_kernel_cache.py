@@ -0,0 +1,208 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+
+import os
+import re
+import shutil
+import hashlib
+
+IGEMM_KERNEL_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'igemmgen')
+IGEMM_KERNEL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+class igemm_generator_digest_t(object):
+    '''
+    digest of all python source of this package, together with git revision.
+    git revision alone will not change with local modifications, hence hash the source as well
+    '''
+    def __init__(self):
+        self.digest = None
+    def __call__(self):
+        if self.digest is None:
+            h = hashlib.sha1()
+            h.update(mc_get_version().encode('utf-8'))
+            root = os.path.dirname(os.path.abspath(__file__))
+            for dir_path, dir_names, file_names in sorted(os.walk(root)):
+                dir_names.sort()
+                for fn in sorted(file_names):
+                    if not fn.endswith('.py'):
+                        continue
+                    with open(os.path.join(dir_path, fn), 'rb') as f:
+                        h.update(fn.encode('utf-8'))
+                        h.update(f.read())
+            self.digest = h.hexdigest()
+        return self.digest
+
+igemm_generator_digest = igemm_generator_digest_t()
+
+class igemm_kernel_cache_t(object):
+    '''
+    content addressed on-disk cache, shared across igemm_codegen.py runs.
+    entry is a single file, <cache_dir>/<key[:2]>/<key><suffix>.
+      - kernel text, key from tunable, arch, code object and generator version
+      - assembled code object or per kernel file object, key from the full assembly source
+    least recently used entries are evicted when total size is larger than max_bytes.
+    every write goes to a temp file then rename, so it is safe to be used by multiple processes
+    '''
+    KERNEL_SUFFIX = '.inc'
+    HSACO_SUFFIX = '.hsaco'
+    OBJECT_SUFFIX = '.o'
+
+    def __init__(self, cache_dir = IGEMM_KERNEL_CACHE_DIR, max_bytes = IGEMM_KERNEL_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hit = 0
+        self.miss = 0
+        os.makedirs(self.cache_dir, exist_ok = True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)      # mtime is used as last access time for LRU
+        except OSError:
+            pass
+
+    def _put_atomic(self, path, write_func):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            write_func(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("fail to write kernel cache:{}({})".format(path, e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def kernel_key(self, kernel):
+        arch_config = kernel.mc.arch_config
+        h = hashlib.sha1()
+        for part in (type(kernel).__name__, kernel.name(), kernel.tunable.serialize(),
+                    amdgpu_arch_to_string(arch_config.arch), amdgpu_codeobj_to_string(arch_config.code_object),
+                    igemm_generator_digest()):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def asm_key(self, asm_file_name, arch_config):
+        '''
+        hash of the top level asm file, together with every file it .include
+        '''
+        h = hashlib.sha1()
+        h.update(amdgpu_arch_to_string(arch_config.arch).encode('utf-8'))
+        h.update(amdgpu_codeobj_to_string(arch_config.code_object).encode('utf-8'))
+        with open(asm_file_name, 'rb') as f:
+            content = f.read()
+        h.update(content)
+        asm_dir = os.path.dirname(asm_file_name)
+        for inc_file in re.findall(rb'^\s*\.include\s+"([^"]+)"', content, re.MULTILINE):
+            with open(os.path.join(asm_dir, inc_file.decode('utf-8')), 'rb') as f:
+                h.update(inc_file)
+                h.update(f.read())
+        return h.hexdigest()
+
+    def has_kernel(self, key):
+        return os.path.exists(self._path(key, self.KERNEL_SUFFIX))
+
+    def get_kernel(self, key):
+        path = self._path(key, self.KERNEL_SUFFIX)
+        try:
+            with open(path, 'r') as f:
+                text = f.read()
+        except OSError:
+            self.miss += 1
+            return None
+        self._touch(path)
+        self.hit += 1
+        return text
+
+    def put_kernel(self, key, text):
+        def write_text(tmp_path):
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+        self._put_atomic(self._path(key, self.KERNEL_SUFFIX), write_text)
+
+    def _get_file(self, key, suffix, target):
+        path = self._path(key, suffix)
+        if not os.path.exists(path):
+            return False
+        try:
+            shutil.copyfile(path, target)
+        except OSError:
+            return False
+        self._touch(path)
+        return True
+
+    def _put_file(self, key, suffix, source):
+        self._put_atomic(self._path(key, suffix), lambda tmp_path: shutil.copyfile(source, tmp_path))
+
+    def get_hsaco(self, key, target_hsaco):
+        '''
+        copy cached code object to target_hsaco, return False if not cached
+        '''
+        return self._get_file(key, self.HSACO_SUFFIX, target_hsaco)
+
+    def put_hsaco(self, key, hsaco):
+        self._put_file(key, self.HSACO_SUFFIX, hsaco)
+
+    def get_object(self, key, target_object):
+        '''
+        copy cached relocatable object to target_object, return False if not cached
+        '''
+        return self._get_file(key, self.OBJECT_SUFFIX, target_object)
+
+    def put_object(self, key, obj):
+        self._put_file(key, self.OBJECT_SUFFIX, obj)
+
+    def evict(self):
+        '''
+        remove least recently used entries until total size is within max_bytes.
+        return number of bytes removed
+        '''
+        entries = list()
+        total_bytes = 0
+        for dir_path, _, file_names in os.walk(self.cache_dir):
+            for fn in file_names:
+                path = os.path.join(dir_path, fn)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total_bytes += st.st_size
+        removed_bytes = 0
+        for _, size, path in sorted(entries):
+            if total_bytes - removed_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed_bytes += size
+            except OSError:
+                pass
+        return removed_bytes
@@ -0,0 +1,467 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+
+import re
+import copy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IGEMM_REPLAY_MEMORY_PREFIX = ('ds_', 'buffer_', 'tbuffer_', 'global_', 'flat_', 'scratch_')
+IGEMM_REPLAY_FLAG_MODIFIER = ('offen', 'idxen', 'glc', 'slc', 'lds', 'nv', 'addr64', 'gds')
+IGEMM_REPLAY_INT_DIV_INSTS = 25       # length of macro_int_div_{vv,vs,ss}_t
+
+RE_REPLAY_CMP = re.compile(r'^v_cmp(x)?_(eq|ne|lt|le|gt|ge)_(u32|i32)$')
+RE_REPLAY_SLOAD = re.compile(r'^s_load_dword(x(\d+))?$')
+
+class igemm_lane_replay_t(object):
+    '''
+    replay emitted kernel body in program order, every register is a vector over lanes of the workgroup.
+      - v0 is thread id. sgpr is the same for lanes of a wave, sgpr_init give value at kernel start, e.g. workgroup id.
+      - s_load from kernel argument take value from kernarg (byte offset -> value), missing one is unknown.
+      - only integer salu/valu used to compute address are evaluated, any other inst make its dst unknown.
+      - exec/vcc are tracked as lane mask for v_cmp, v_cndmask and exec save/restore. valu only write lanes active in exec.
+      - branch is ignored, so main loop body is replayed once.
+    magic division is solved by the divisor of the remainder following it, since magic number comes from host.
+    integer division by float reciprocal is solved as a whole, since float alu is not evaluated.
+    subclass get every memory inst by on_memory_inst(), and every comment line by on_comment().
+    dst of a load is made unknown after on_memory_inst(), unless it return True to keep the value it set.
+    '''
+    def __init__(self, arch_detail, block_size = None, symbol_table = None):
+        assert np is not None, "lane replay need numpy"
+        self.arch_detail = arch_detail
+        self.wave_size = arch_detail.wavefront_size
+        self.block_size = block_size if block_size is not None else self.wave_size
+        self.analyzer = mc_inst_analyzer_t(symbol_table)
+        self.kernarg = dict()           # byte offset -> value
+        self.sgpr_init = dict()         # sgpr index -> value
+
+    def reset(self):
+        self.regs = dict()          # ('v'/'s', index) -> np array over lanes, missing key is unknown
+        self.regs[('v', 0)] = np.arange(self.block_size, dtype = np.uint64)
+        for index, value in self.sgpr_init.items():
+            self.regs[('s', index)] = np.full(self.block_size, value & 0xffffffff, dtype = np.uint64)
+        self.masks = {'exec' : np.ones(self.block_size, dtype = bool)}      # 'vcc'/'exec'/('s', index) -> lane mask
+
+    def emit_kernel(self, tunable):
+        '''
+        emit kernel body of this tunable with every macro inline-ed, return kernel and asm text.
+        symbol table of registers and kernel argument is updated for this kernel
+        '''
+        tunable = copy.copy(tunable)
+        tunable.macro_inline = 1
+        kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+        emitter = mc_emit_to_string_t()
+        mc = mc_asm_printer_t(emitter, amdgpu_arch_config_t({'arch' : self.arch_detail.arch}))
+        kernel = kernel_class(mc, tunable)
+        kernel.emit_kernel_body()
+        self.block_size = tunable.block_size
+        self.analyzer = mc_inst_analyzer_t(sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None), getattr(kernel, 'karg', None)))
+        return kernel, emitter.get_buffer()
+
+    def on_comment(self, comment):
+        pass
+
+    def on_memory_inst(self, op, operands, modifiers):
+        pass
+
+    def _reg_index(self, operand):
+        '''
+        (type, index) of a single 32bit vgpr/sgpr/agpr operand, None if not a register or a register range
+        '''
+        m = re.match(r'^([vsa])\[([^\]:]+)\]$', operand) or re.match(r'^([vs])(\d+)$', operand)
+        if m is None:
+            return None
+        index = self.analyzer._eval(m.group(2))
+        return None if index is None else (m.group(1), index)
+
+    def _reg_range(self, operand):
+        '''
+        (type, first index, number of register) of a register or register range operand, None if not resolved
+        '''
+        m = re.match(r'^([vsa])\[([^\]:]+):([^\]]+)\]$', operand)
+        if m is None:
+            reg = self._reg_index(operand)
+            return None if reg is None else (reg[0], reg[1], 1)
+        lo, hi = self.analyzer._eval(m.group(2)), self.analyzer._eval(m.group(3))
+        return None if lo is None or hi is None else (m.group(1), lo, hi - lo + 1)
+
+    def get_value(self, operand):
+        '''
+        value over lanes of a register or immediate operand, None if unknown
+        '''
+        reg = self._reg_index(operand)
+        if reg is not None:
+            return self.regs.get(reg)
+        if re.match(r'^([vsa])(\[|\d)', operand) or operand in ('vcc', 'vcc_lo', 'vcc_hi', 'exec', 'm0', 'scc', 'off'):
+            return None
+        try:
+            value = int(operand, 0)
+        except ValueError:
+            value = self.analyzer._eval(operand)
+        if value is None:
+            return None
+        return np.full(self.block_size, value & 0xffffffff, dtype = np.uint64)
+
+    def _write_reg(self, dst, value):
+        '''
+        vgpr only take value of lanes active in exec, lanes not active keep old value
+        '''
+        exec_mask = self.masks['exec']
+        if dst[0] in ('v', 'a') and not np.all(exec_mask):
+            old = self.regs.get(dst)
+            if old is None:
+                self.regs.pop(dst, None)
+                return
+            value = np.where(exec_mask, value, old)
+        self.regs[dst] = value
+
+    def _mask_key(self, operand):
+        if operand in ('vcc', 'exec'):
+            return operand
+        reg = self._reg_range(operand)
+        return None if reg is None or reg[0] != 's' else ('s', reg[1])
+
+    def get_mask(self, operand):
+        '''
+        lane mask of vcc/exec/sgpr pair, or inline constant. None if unknown
+        '''
+        if operand in ('-1', '0'):
+            return np.full(self.block_size, operand == '-1', dtype = bool)
+        key = self._mask_key(operand)
+        return None if key is None else self.masks.get(key)
+
+    def _set_mask(self, operand, mask):
+        key = self._mask_key(operand)
+        if key == 'exec' and mask is None:
+            mask = np.ones(self.block_size, dtype = bool)       # exec not known, take every lane as active
+        if key is None:
+            return
+        if mask is None:
+            self.masks.pop(key, None)
+        else:
+            self.masks[key] = mask
+
+    def split_operands(self, operand_str):
+        '''
+        "v[0], v[1] offset:16" -> ['v[0]', 'v[1]'], {'offset' : 16}. modifier may also be separated by comma
+        '''
+        operands, modifiers = list(), dict()
+        for o in operand_str.split(','):
+            rest = list()
+            for token in o.split():
+                m = re.match(r'^([a-z_]\w*):([^\]]+)$', token)
+                if token in IGEMM_REPLAY_FLAG_MODIFIER:
+                    modifiers[token] = 1
+                elif m is None:
+                    rest.append(token)
+                else:
+                    value = self.analyzer._eval(m.group(2))
+                    modifiers[m.group(1)] = value if value is not None else 0
+            if len(rest) > 0:
+                operands.append(' '.join(rest))
+        return operands, modifiers
+
+    def _alu(self, op, a):
+        '''
+        evaluate integer alu of 32bit lanes, a is list of source value. return None if op not supported
+        '''
+        def sh(x):
+            return x & 31
+        def u24(x):
+            return x & 0xffffff
+        def i24(x):
+            return ((x & 0xffffff).astype(np.int64) - ((x & 0x800000).astype(np.int64) << 1)).astype(np.uint64)
+        def perm(x, y, s):
+            # byte select of {x, y}, 0-7 byte, 8-11 sign of odd byte, 12 zero, other 0xff
+            xy = (x << np.uint64(32)) | y
+            d = np.zeros_like(x)
+            for i in range(4):
+                sel = (s >> np.uint64(8 * i)) & np.uint64(0xff)
+                byte = (xy >> (np.minimum(sel, 7) * np.uint64(8))) & np.uint64(0xff)
+                sign = ((xy >> ((np.clip(sel, 8, 11) - np.uint64(8)) * np.uint64(16) + np.uint64(15))) & np.uint64(1)) * np.uint64(0xff)
+                byte = np.where(sel < 8, byte, np.where(sel < 12, sign, np.where(sel == 12, 0, 0xff)).astype(np.uint64))
+                d = d | (byte << np.uint64(8 * i))
+            return d
+        alu = {
+            'v_mov_b32'         : lambda: a[0],
+            's_mov_b32'         : lambda: a[0],
+            'v_and_b32'         : lambda: a[0] & a[1],
+            's_and_b32'         : lambda: a[0] & a[1],
+            'v_or_b32'          : lambda: a[0] | a[1],
+            's_or_b32'          : lambda: a[0] | a[1],
+            'v_xor_b32'         : lambda: a[0] ^ a[1],
+            's_xor_b32'         : lambda: a[0] ^ a[1],
+            'v_lshlrev_b32'     : lambda: a[1] << sh(a[0]),
+            'v_lshrrev_b32'     : lambda: a[1] >> sh(a[0]),
+            's_lshl_b32'        : lambda: a[0] << sh(a[1]),
+            's_lshr_b32'        : lambda: a[0] >> sh(a[1]),
+            'v_add_u32'         : lambda: a[0] + a[1],
+            'v_add_nc_u32'      : lambda: a[0] + a[1],
+            'v_add_i32'         : lambda: a[0] + a[1],
+            's_add_u32'         : lambda: a[0] + a[1],
+            's_add_i32'         : lambda: a[0] + a[1],
+            'v_sub_u32'         : lambda: a[0] - a[1],
+            'v_sub_i32'         : lambda: a[0] - a[1],
+            's_sub_u32'         : lambda: a[0] - a[1],
+            's_sub_i32'         : lambda: a[0] - a[1],
+            'v_subrev_u32'      : lambda: a[1] - a[0],
+            'v_add_co_u32'      : lambda: a[0] + a[1],
+            'v_sub_co_u32'      : lambda: a[0] - a[1],
+            'v_subrev_co_u32'   : lambda: a[1] - a[0],
+            'v_mul_u32_u24'     : lambda: u24(a[0]) * u24(a[1]),
+            'v_mul_lo_u32'      : lambda: a[0] * a[1],
+            's_mul_i32'         : lambda: a[0] * a[1],
+            'v_mul_hi_u32'      : lambda: (a[0] * a[1]) >> 32,
+            's_mul_hi_u32'      : lambda: (a[0] * a[1]) >> 32,
+            'v_mul_i32_i24'     : lambda: i24(a[0]) * i24(a[1]),
+            'v_mad_u32_u24'     : lambda: u24(a[0]) * u24(a[1]) + a[2],
+            'v_mad_i32_i24'     : lambda: i24(a[0]) * i24(a[1]) + a[2],
+            'v_lshl_or_b32'     : lambda: (a[0] << sh(a[1])) | a[2],
+            'v_lshl_add_u32'    : lambda: (a[0] << sh(a[1])) + a[2],
+            'v_add_lshl_u32'    : lambda: (a[0] + a[1]) << sh(a[2]),
+            'v_add3_u32'        : lambda: a[0] + a[1] + a[2],
+            'v_and_or_b32'      : lambda: (a[0] & a[1]) | a[2],
+            'v_or3_b32'         : lambda: a[0] | a[1] | a[2],
+            'v_bfe_u32'         : lambda: (a[0] >> sh(a[1])) & ((np.uint64(1) << sh(a[2])) - np.uint64(1)),
+            'v_perm_b32'        : lambda: perm(a[0], a[1], a[2]),
+            'v_accvgpr_read_b32': lambda: a[0],
+            'v_accvgpr_write_b32' : lambda: a[0],
+            's_bfe_u32'         : lambda: (a[0] >> sh(a[1])) & ((np.uint64(1) << ((a[1] >> 16) & 0x7f)) - np.uint64(1)),
+        }
+        if op not in alu:
+            return None
+        return alu[op]() & 0xffffffff
+
+    def _signed(self, x):
+        return x.astype(np.int64) - ((x & 0x80000000).astype(np.int64) << 1)
+
+    def _execute_mask(self, op, operands):
+        '''
+        inst on lane mask, return True if handled
+        '''
+        m = RE_REPLAY_CMP.match(op)
+        if m:
+            a, b = [self.get_value(o) for o in operands[-2:]]
+            mask = None
+            if a is not None and b is not None:
+                if m.group(3) == 'i32':
+                    a, b = self._signed(a), self._signed(b)
+                mask = {'eq' : a == b, 'ne' : a != b, 'lt' : a < b, 'le' : a <= b, 'gt' : a > b, 'ge' : a >= b}[m.group(2)]
+                mask = mask & self.masks['exec']
+            self._set_mask(operands[0] if len(operands) == 3 else 'vcc', mask)
+            if m.group(1):
+                self._set_mask('exec', mask)
+            return True
+        if op == 'v_cndmask_b32' and len(operands) == 4:
+            a, b, mask = self.get_value(operands[1]), self.get_value(operands[2]), self.get_mask(operands[3])
+            dst = self._reg_index(operands[0])
+            if dst is not None:
+                if a is None or b is None or mask is None:
+                    self.regs.pop(dst, None)
+                else:
+                    self._write_reg(dst, np.where(mask, b, a))
+            return True
+        if op == 's_and_saveexec_b64':
+            src = self.get_mask(operands[1])
+            self._set_mask(operands[0], self.masks['exec'])
+            self._set_mask('exec', None if src is None else src & self.masks['exec'])
+            return True
+        if op in ('s_mov_b64', 's_not_b64', 's_and_b64', 's_or_b64', 's_andn2_b64', 's_xor_b64') and self._mask_key(operands[0]) is not None:
+            srcs = [self.get_mask(o) for o in operands[1:]]
+            mask = None
+            if all(s is not None for s in srcs):
+                mask = {'s_mov_b64'     : lambda: srcs[0],
+                        's_not_b64'     : lambda: ~srcs[0],
+                        's_and_b64'     : lambda: srcs[0] & srcs[1],
+                        's_or_b64'      : lambda: srcs[0] | srcs[1],
+                        's_andn2_b64'   : lambda: srcs[0] & ~srcs[1],
+                        's_xor_b64'     : lambda: srcs[0] ^ srcs[1]}[op]()
+            self._set_mask(operands[0], mask)
+            reg = self._reg_range(operands[0])
+            if reg is not None:
+                self.regs.pop(('s', reg[1]), None)
+                self.regs.pop(('s', reg[1] + 1), None)
+            return True
+        return False
+
+    def _execute_sload(self, op, operands):
+        '''
+        s_load from kernel argument pointer, return True if handled
+        '''
+        m = RE_REPLAY_SLOAD.match(op)
+        if m is None or len(operands) != 3:
+            return False
+        dst, base = self._reg_range(operands[0]), self._reg_range(operands[1])
+        offset = self.get_value(operands[2])
+        num_dwords = int(m.group(2)) if m.group(2) else 1
+        if dst is None:
+            return False
+        is_karg = base is not None and base[1] == self.analyzer.symbol_table.get('s_ka', 0) and offset is not None
+        for i in range(num_dwords):
+            self.regs.pop(('s', dst[1] + i), None)
+            if is_karg and int(offset[0]) + 4 * i in self.kernarg:
+                self.regs[('s', dst[1] + i)] = np.full(self.block_size, self.kernarg[int(offset[0]) + 4 * i] & 0xffffffff, dtype = np.uint64)
+        return True
+
+    def _replay_mdiv(self, insts, i):
+        '''
+        magic division of macro_mdiv_u32_*_t, mul_hi/add/lshr for quotient, optionally mul/sub for remainder.
+        quotient is numer // denom if remainder follow, or 0 if numer is 0 (like workgroup id 0).
+        return number of inst consumed, 0 if not resolved
+        '''
+        ops = [x[0] for x in insts[i : i + 5]]
+        is_v = ops[0] == 'v_mul_hi_u32'
+        if ops[:3] != (['v_mul_hi_u32', 'v_add_u32', 'v_lshrrev_b32'] if is_v else ['s_mul_hi_u32', 's_add_u32', 's_lshr_b32']):
+            return 0
+        mul_hi, add, lshr = [x[1] for x in insts[i : i + 3]]
+        tmp, numer = self._reg_index(mul_hi[0]), self._reg_index(mul_hi[2])
+        if numer is None or tmp is None or [self._reg_index(o) for o in add] != [tmp, tmp, numer] or \
+                self._reg_index(lshr[2 if is_v else 1]) != tmp:
+            return 0
+        quot = self._reg_index(lshr[0])
+        n = self.regs.get(numer)
+        if n is None or quot is None:
+            return 0
+        if ops[3:5] == (['v_mul_lo_u32', 'v_sub_u32'] if is_v else ['s_mul_i32', 's_sub_u32']):
+            mul, sub = insts[i + 3][1], insts[i + 4][1]
+            d = self.get_value(mul[1])
+            if self._reg_index(mul[0]) == tmp and self._reg_index(mul[2]) == quot and \
+                    [self._reg_index(o) for o in sub[1:]] == [numer, tmp] and d is not None and np.all(d != 0):
+                rem = self._reg_index(sub[0])
+                self._write_reg(tmp, (n // d) * d)
+                self._write_reg(quot, n // d)
+                if rem is not None:
+                    self._write_reg(rem, n % d)
+                return 5
+        if np.all(n == 0):
+            self._write_reg(tmp, n)
+            self._write_reg(quot, n)
+            return 3
+        return 0
+
+    def _replay_int_div(self, insts, i):
+        '''
+        integer division of macro_int_div_{vv,vs,ss}_t, float reciprocal then refined by mul_hi/cmp/cndmask.
+        quotient is numer // denom, or 0xffffffff if denom is 0. return number of inst consumed, 0 if not resolved
+        '''
+        ops = [x[0] for x in insts[i : i + IGEMM_REPLAY_INT_DIV_INSTS]]
+        if len(ops) != IGEMM_REPLAY_INT_DIV_INSTS or ops[1:4] != ['v_rcp_f32', 'v_mul_f32', 'v_cvt_u32_f32'] or \
+                ops[13] != 'v_mul_hi_u32' or ops[-1] != 'v_cndmask_b32':
+            return 0
+        tmp = self._reg_index(insts[i][1][0])
+        numer = [o for o in insts[i + 13][1][1:] if self._reg_index(o) != tmp]
+        quot = self._reg_index(insts[i + IGEMM_REPLAY_INT_DIV_INSTS - 1][1][0])
+        n = self.get_value(numer[0]) if len(numer) == 1 else None
+        d = self.get_value(insts[i][1][1])
+        if n is None or d is None or quot is None:
+            return 0
+        for op, operands, _ in insts[i : i + IGEMM_REPLAY_INT_DIV_INSTS - 1]:
+            self._clobber(op, operands)       # tmp of the macro
+        self._write_reg(quot, np.where(d != 0, n // np.maximum(d, 1), 0xffffffff).astype(np.uint64))
+        return IGEMM_REPLAY_INT_DIV_INSTS
+
+    def _execute(self, op, operands):
+        '''
+        update register value of one non-memory inst
+        '''
+        if len(operands) == 0 or self._execute_mask(op, operands) or self._execute_sload(op, operands):
+            return
+        if op == 'v_swap_b32':
+            a, b = [self._reg_index(o) for o in operands]
+            if a is not None and b is not None:
+                va, vb = self.regs.get(a), self.regs.get(b)
+                for dst, value in ((a, vb), (b, va)):
+                    if value is None:
+                        self.regs.pop(dst, None)
+                    else:
+                        self._write_reg(dst, value)
+                return
+        num_dst = 2 if op.startswith(('v_add_co_', 'v_sub_co_', 'v_subrev_co_')) else 1
+        srcs = [self.get_value(o) for o in operands[num_dst:]]
+        dst = self._reg_index(operands[0])
+        value = None
+        if op == 'v_readfirstlane_b32':
+            if srcs[0] is not None:
+                value = np.repeat(srcs[0].reshape(-1, self.wave_size)[:, 0], self.wave_size)
+        elif len(srcs) > 0 and all(s is not None for s in srcs):
+            value = self._alu(op, srcs)
+        if dst is not None and value is not None:
+            self._write_reg(dst, value)
+            return
+        self._clobber(op, operands)
+
+    def _clobber(self, op, operands):
+        '''
+        make dst of this inst unknown
+        '''
+        info = self.analyzer.inst_info(' '.join([op, ', '.join(operands)]))
+        if info is None:
+            return
+        for reg in info[0]:
+            self.regs.pop(reg, None)
+            if reg[0] == 's':
+                self.masks.pop(reg, None)
+                self.masks.pop(('s', reg[1] - 1), None)
+            elif reg[0] in ('vcc', 'exec'):
+                self._set_mask(reg[0], None)
+
+    def replay(self, asm_text):
+        self.reset()
+        insts = list()          # (op, operands, modifiers), op is None for comment
+        for line in asm_text.split('\n'):
+            if line.strip().startswith(';'):
+                insts.append((None, line.strip(), None))
+                continue
+            line = line.split(';')[0].split('//')[0].strip()
+            assert not line.startswith(('.v_', '.mdiv_')), f"macro can not be replayed, emit with macro_inline:{line}"
+            if line == '' or line.endswith(':') or line.startswith('.') or re.match(r'^[A-Za-z_]\w*\s*=', line):
+                continue    # label, directive or symbol assignment
+            op, _, operand_str = line.partition(' ')
+            operands, modifiers = self.split_operands(operand_str)
+            insts.append((op, operands, modifiers))
+        i = 0
+        while i < len(insts):
+            op, operands, modifiers = insts[i]
+            if op is None:
+                self.on_comment(operands)
+            elif op.startswith(IGEMM_REPLAY_MEMORY_PREFIX):
+                if not self.on_memory_inst(op, operands, modifiers) and not op.startswith(('ds_write', 'buffer_store', 'buffer_atomic', 'global_store', 'flat_store', 'scratch_store')):
+                    self._clobber(op, operands)
+            else:
+                consumed = self._replay_mdiv(insts, i) if op.endswith('mul_hi_u32') else \
+                            self._replay_int_div(insts, i) if op == 'v_cvt_f32_u32' else 0
+                if consumed > 0:
+                    i += consumed
+                    continue
+                self._execute(op, operands)
+            i += 1
@@ -0,0 +1,153 @@
+################################################################################
+#
+#  MIT License
+#
+#  Copyright (c) 2020-2021 Advanced Micro Devices, Inc.
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+#
+################################################################################
+# pylint: disable=maybe-no-member
+
+from .codegen import *
+from .algo import *
+from .igemm_lane_replay import *
+
+import re
+
+IGEMM_LDS_PHASE_MAIN_LOOP_SST   = 'main_loop_sst'
+IGEMM_LDS_PHASE_MAIN_LOOP_SLD   = 'main_loop_sld'
+IGEMM_LDS_PHASE_COALESCING_SST  = 'coalescing_sst'
+IGEMM_LDS_PHASE_COALESCING_SLD  = 'coalescing_sld'
+IGEMM_LDS_PHASES = (IGEMM_LDS_PHASE_MAIN_LOOP_SST, IGEMM_LDS_PHASE_MAIN_LOOP_SLD,
+                        IGEMM_LDS_PHASE_COALESCING_SST, IGEMM_LDS_PHASE_COALESCING_SLD)
+
+IGEMM_LDS_BYTES_PER_CYCLE = 128     # 32 banks x 4 byte, lanes of one issue are served in group of this many byte
+
+RE_LDS_INST = re.compile(r'^ds_(read|write)(2st64|2)?_[biu](\d+)(_d16(_hi)?)?$')
+
+class igemm_lds_phase_stat_t(object):
+    def __init__(self):
+        self.num_inst       = 0     # ds inst replayed
+        self.num_unresolved = 0     # ds inst whose address depends on value not known, e.g. kernarg
+        self.cycles         = 0
+        self.ideal_cycles   = 0     # cycles if no bank conflict
+
+    def conflict_cycles(self):
+        return self.cycles - self.ideal_cycles
+
+class igemm_lds_bank_report_t(object):
+    '''
+    bank conflict of every ds inst issued once by every wave of a workgroup, per phase
+    '''
+    def __init__(self):
+        self.name   = ''
+        self.phases = {p : igemm_lds_phase_stat_t() for p in IGEMM_LDS_PHASES}
+
+    def cycles(self):
+        return sum(s.cycles for s in self.phases.values())
+
+    def ideal_cycles(self):
+        return sum(s.ideal_cycles for s in self.phases.values())
+
+    def conflict_cycles(self):
+        return self.cycles() - self.ideal_cycles()
+
+class igemm_lds_bank_simulator_t(igemm_lane_replay_t):
+    '''
+    replay the kernel body to get per-lane lds address of every ds_read/ds_write, then count bank conflict.
+    see igemm_lane_replay_t for how register is evaluated. exec mask is ignored, every lane access lds.
+      - lanes of an issue are served in group of 128 byte, e.g. 32 lanes for b32, 16 for b64, 8 for b128.
+        read2/write2 is served as two issues, one for each offset.
+        group take as many cycles as the max number of different dword accessed in one bank, the same dword is broadcast.
+    ds inst after the "; coalescing store" comment is counted as coalescing store, otherwise main loop.
+    '''
+    def __init__(self, arch_detail, block_size = None, symbol_table = None):
+        igemm_lane_replay_t.__init__(self, arch_detail, block_size, symbol_table)
+        self.num_banks = arch_detail.lds_banks
+
+    def _lds_dwords(self, op, operands, modifiers):
+        '''
+        list of dword index accessed by every lane, one for each address of a ds inst, in shape (block_size, dwords_per_lane).
+        None if address unknown, or not an inst accessing lds bank
+        '''
+        m = RE_LDS_INST.match(op)
+        if m is None:
+            return None
+        is_read, st, bits = m.group(1) == 'read', m.group(2), int(m.group(3))
+        addr = self.get_value(operands[1] if is_read else operands[0])
+        if addr is None:
+            return None
+        bytes_per_addr = max(bits // 8, 1)
+        if st is None:
+            addrs = [addr + modifiers.get('offset', 0)]
+        else:
+            stride = bytes_per_addr * (64 if st == '2st64' else 1)
+            addrs = [addr + modifiers.get('offset0', 0) * stride, addr + modifiers.get('offset1', 0) * stride]
+        return [np.stack([(a >> 2) + i for i in range((bytes_per_addr + 3) // 4)], axis = 1) for a in addrs]
+
+    def count_cycles(self, dwords):
+        '''
+        cycles and ideal cycles of one ds issue by every wave, dwords is in shape (block_size, dwords_per_lane)
+        '''
+        dwords_per_lane = dwords.shape[1]
+        lanes_per_group = max(IGEMM_LDS_BYTES_PER_CYCLE // (4 * dwords_per_lane), 1)
+        num_groups = (dwords.shape[0] + lanes_per_group - 1) // lanes_per_group
+        group = np.repeat(np.arange(dwords.shape[0], dtype = np.uint64) // lanes_per_group, dwords_per_lane)
+        key = np.unique((group << np.uint64(32)) | dwords.reshape(-1))      # same dword in a group is broadcast
+        bank_of_group = (key >> np.uint64(32)) * self.num_banks + (key & 0xffffffff) % self.num_banks
+        count = np.bincount(bank_of_group.astype(np.int64), minlength = num_groups * self.num_banks)
+        cycles = int(count.reshape(num_groups, self.num_banks).max(axis = 1).sum())
+        return cycles, num_groups
+
+    def on_comment(self, comment):
+        if comment.startswith('; coalescing store'):
+            self.in_coalescing = True
+
+    def on_memory_inst(self, op, operands, modifiers):
+        if RE_LDS_INST.match(op) is None:
+            return
+        is_read = op.startswith('ds_read')
+        phase = {(False, False) : IGEMM_LDS_PHASE_MAIN_LOOP_SST, (False, True) : IGEMM_LDS_PHASE_MAIN_LOOP_SLD,
+                 (True, False) : IGEMM_LDS_PHASE_COALESCING_SST, (True, True) : IGEMM_LDS_PHASE_COALESCING_SLD}[(self.in_coalescing, is_read)]
+        stat = self.report.phases[phase]
+        stat.num_inst += 1
+        dwords = self._lds_dwords(op, operands, modifiers)
+        if dwords is None:
+            stat.num_unresolved += 1
+            return
+        for d in dwords:
+            cycles, ideal_cycles = self.count_cycles(d)
+            stat.cycles += cycles
+            stat.ideal_cycles += ideal_cycles
+
+    def simulate_text(self, asm_text):
+        self.report = igemm_lds_bank_report_t()
+        self.in_coalescing = False
+        self.replay(asm_text)
+        return self.report
+
+    def simulate(self, tunable):
+        '''
+        emit kernel body of this tunable, with every macro inline-ed, then replay
+        '''
+        kernel, asm_text = self.emit_kernel(tunable)
+        report = self.simulate_text(asm_text)
+        report.name = kernel.name()
+        return report
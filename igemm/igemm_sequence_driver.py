@@ -33,6 +33,8 @@ from .igemm_host_driver import igemm_host_driver
 import os
 import copy
 import math
+import time
+import multiprocessing as mp
 
 
 def igemm_sequence_get_config_file_name(direction, arch_str, out_dir):
@@ -58,25 +60,60 @@ def igemm_sequence_is_cgt(t0, t1, t2, t3, c0, c1, c2, c3):
     return (c0 * c1) >= (t0 * t1) and (c2 * c3) >= (t2 * t3)
 
 
-def igemm_sequence_is_tunable_resource_valid(direction, mc, tunable):
-    if direction == 'fwd':
-        igemm = igemm_fwd_gtc_t(mc, tunable)
-    elif direction == 'bwd':
-        igemm = igemm_bwd_gtc_t(mc, tunable)
-    elif direction == 'wrw':
-        igemm = igemm_wrw_gtc_t(mc, tunable)
+# shard function of current search, set before forking workers, hence inherited by them
+# and only the shard index need to be pickled. only one search can be in flight at a time
+_igemm_sequence_shard_func = None
 
-    if igemm.sgpr.s_end.value > amdgpu_sgpr_limit(mc.arch_config.arch):
+def _igemm_sequence_run_shard(idx):
+    return _igemm_sequence_shard_func(idx)
+
+def igemm_sequence_map_shards(shard_func, num_shards, num_workers):
+    '''
+    return [shard_func(0), shard_func(1), ...] computed by a pool of forked workers, in shard order
+    '''
+    global _igemm_sequence_shard_func
+    assert _igemm_sequence_shard_func is None, "nested shard search is not supported"
+    _igemm_sequence_shard_func = shard_func
+    try:
+        with mp.get_context('fork').Pool(num_workers) as pool:
+            return pool.map(_igemm_sequence_run_shard, range(num_shards), chunksize = 1)
+    finally:
+        _igemm_sequence_shard_func = None
+
+def igemm_sequence_is_tunable_resource_valid(direction, mc, tunable, least_occupancy = 0):
+    assert direction == tunable.direction
+    resource = igemm_resource_estimator_t(tunable)
+    if not resource.is_valid(mc.arch_config.arch):
+        return False
+
+    if least_occupancy and resource.get_occupancy(amdgpu_get_arch_detail(mc.arch_config.arch)) < least_occupancy:
         return False
 
     return True
 
+def igemm_sequence_is_tunable_coalescing_valid(direction, tunable, ctrl_coalescing_store_xdlops):
+    '''
+    block narrower than gemm_n_per_block (like 16x256 by 2 waves) need vector_write_out of gemm_n_per_block // block_size
+    to cover gemm_n in coalescing store, legal only if kernel store gemm_n continuous enough, see get_legal_vector_write_out()
+    '''
+    assert direction == tunable.direction
+    min_vector_write_out = tunable.gemm_n_per_block // tunable.block_size
+    if min_vector_write_out <= 1:
+        return True
+    length_n_continuous = {'fwd' : igemm_fwd_gtc_get_length_n_continuous_out,
+                           'bwd' : igemm_bwd_gtc_get_length_n_continuous_out,
+                           'wrw' : igemm_wrw_gtc_get_length_n_continuous_out}[direction](tunable)
+    legal = ctrl_coalescing_store_xdlops.get_legal_vector_write_out(length_n_continuous)
+    if tunable.vector_write_out != 'auto':
+        legal = [vwo for vwo in legal if vwo <= tunable.vector_write_out]
+    return any(vwo >= min_vector_write_out for vwo in legal)
+
 class igemm_sequence_xdlops_t(mc_base_t):
     def __init__(self, mc, config):
         mc_base_t.__init__(self, mc)
         self.config = config
 
-    def __call__(self):
+    def __call__(self, **driver_options):
         '''
         return all tunables
         '''
@@ -89,11 +126,7 @@ class igemm_sequence_xdlops_t(mc_base_t):
         # print("options:{},{}, lmk:{}".format("options" in config, options, options["lmk"] if "lmk" in options else 0))
 
         def search_xdlops_mapping_from_m_n(macro_tile_m, macro_tile_n):
-            valid_mapping_list = []
-            for ctrl in ctrl_xdlops_mapping_fp32:
-                if ctrl.macro_tile_m == macro_tile_m and \
-                    ctrl.macro_tile_n == macro_tile_n:
-                    valid_mapping_list.append(ctrl)
+            valid_mapping_list = get_ctrl_xdlops_mapping_from_macro_tile(macro_tile_m, macro_tile_n, AMDGPU_PRECISION_FP32)
             # assert len(valid_mapping_list) != 0, f"no macro_tile hit for {macro_tile_m}x{macro_tile_n}"
             return valid_mapping_list
 
@@ -382,8 +415,10 @@ class igemm_sequence_xdlops_t(mc_base_t):
 
             return sub_configs
 
-        def gen_all_configs():
-            tunable_dicts = []
+        def gen_all_shards():
+            # each shard is a (gemm_m_per_block, gemm_n_per_block, xdlops_mapping, gemm_k_per_block) to be searched,
+            # in the same order as serial search
+            shards = []
             for gemm_m_per_block in gemm_m_per_block_list:
                 for gemm_n_per_block in gemm_n_per_block_list:
                     xdlops_mapping_list = search_xdlops_mapping_from_m_n(gemm_m_per_block, gemm_n_per_block)
@@ -396,61 +431,86 @@ class igemm_sequence_xdlops_t(mc_base_t):
                             if "lmk" in options:
                                 if gemm_k_per_block // xdlops_mapping.wave_tile_k < options["lmk"]:
                                     continue
-                            block_size = xdlops_mapping.waves * amdgpu_wave_size(self.mc.arch_config.arch)
-                            sub_configs = search_xdlops_sub_configs(
-                                                        config["current_direction"],
-                                                        gemm_m_per_block,
-                                                        gemm_n_per_block,
-                                                        gemm_k_per_block,
-                                                        block_size)
-                            if len(sub_configs) == 0:
-                                continue
-                            for sub_config in sub_configs:
-                                tensor_a_thread_lengths, tensor_a_cluster_lengths, \
-                                        tensor_b_thread_lengths, tensor_b_cluster_lengths, nxb, nxe, gemm_k_global_split = sub_config
-                                # populate the dict
-                                tunable_dict = dict()
-                                tunable_dict["arch"]                        =   'gfx908'
-                                tunable_dict["gemm_m_per_block"]            =   gemm_m_per_block
-                                tunable_dict["gemm_n_per_block"]            =   gemm_n_per_block
-                                tunable_dict["gemm_k_per_block"]            =   gemm_k_per_block
-                                tunable_dict["wave_tile_m"]                 =   xdlops_mapping.wave_tile_m
-                                tunable_dict["wave_step_m"]                 =   xdlops_mapping.wave_step_m
-                                tunable_dict["wave_repeat_m"]               =   xdlops_mapping.wave_repeat_m
-                                tunable_dict["wave_tile_n"]                 =   xdlops_mapping.wave_tile_n
-                                tunable_dict["wave_step_n"]                 =   xdlops_mapping.wave_step_n
-                                tunable_dict["wave_repeat_n"]               =   xdlops_mapping.wave_repeat_n
-                                tunable_dict["wave_tile_k"]                 =   xdlops_mapping.wave_tile_k
-                                tunable_dict["tensor_a_thread_lengths"]     =   tensor_a_thread_lengths
-                                tunable_dict["tensor_a_cluster_lengths"]    =   tensor_a_cluster_lengths
-                                tunable_dict["tensor_b_thread_lengths"]     =   tensor_b_thread_lengths
-                                tunable_dict["tensor_b_cluster_lengths"]    =   tensor_b_cluster_lengths
-                                tunable_dict['direction']                   =   config["current_direction"]
-                                tunable_dict['precision']                   =   config["precision"]
-                                tunable_dict['nxb']                         =   nxb
-                                tunable_dict['nxe']                         =   nxe
-                                if config["current_direction"] == 'wrw':
-                                    tunable_dict['gemm_k_global_split']     =   gemm_k_global_split
-
-                                # post constrain, coalescing constrain
-                                tentative_tunable = igemm_gtc_tunable_parameter_t(tunable_dict)
-                                tentative_ctrl_coalescing_store_xdlops = ctrl_coalescing_store_xdlops_t()
-                                tentative_ctrl_coalescing_store_xdlops.cxm = xdlops_mapping
-                                tentative_ctrl_coalescing_store_xdlops.coalescing_groups = tentative_tunable.coalescing_store_groups
-                                tentative_ctrl_coalescing_store_xdlops.data_byte = amdgpu_precision_data_byte(tentative_tunable.precision)
-                                tentative_ctrl_coalescing_store_xdlops.vector_write_out = 1                      # TODO: some cases this can be set to other value
-                                tentative_ctrl_coalescing_store_xdlops.block_size = tentative_tunable.block_size
-                                if tentative_ctrl_coalescing_store_xdlops.get_length_m_max_groups() % \
-                                        tentative_ctrl_coalescing_store_xdlops.coalescing_groups != 0:
-                                    continue
-
-                                if not igemm_sequence_is_tunable_resource_valid(config["current_direction"], self.mc, tentative_tunable):
-                                    continue
-
-                                tunable_dicts.append(tunable_dict)
+                            shards.append((gemm_m_per_block, gemm_n_per_block, xdlops_mapping, gemm_k_per_block))
+            return shards
 
+        def gen_shard_configs(shard):
+            gemm_m_per_block, gemm_n_per_block, xdlops_mapping, gemm_k_per_block = shard
+            tunable_dicts = []
+            block_size = xdlops_mapping.waves * amdgpu_wave_size(self.mc.arch_config.arch)
+            sub_configs = search_xdlops_sub_configs(
+                                        config["current_direction"],
+                                        gemm_m_per_block,
+                                        gemm_n_per_block,
+                                        gemm_k_per_block,
+                                        block_size)
+            for sub_config in sub_configs:
+                tensor_a_thread_lengths, tensor_a_cluster_lengths, \
+                        tensor_b_thread_lengths, tensor_b_cluster_lengths, nxb, nxe, gemm_k_global_split = sub_config
+                # populate the dict
+                tunable_dict = dict()
+                tunable_dict["arch"]                        =   'gfx908'
+                tunable_dict["gemm_m_per_block"]            =   gemm_m_per_block
+                tunable_dict["gemm_n_per_block"]            =   gemm_n_per_block
+                tunable_dict["gemm_k_per_block"]            =   gemm_k_per_block
+                tunable_dict["wave_tile_m"]                 =   xdlops_mapping.wave_tile_m
+                tunable_dict["wave_step_m"]                 =   xdlops_mapping.wave_step_m
+                tunable_dict["wave_repeat_m"]               =   xdlops_mapping.wave_repeat_m
+                tunable_dict["wave_tile_n"]                 =   xdlops_mapping.wave_tile_n
+                tunable_dict["wave_step_n"]                 =   xdlops_mapping.wave_step_n
+                tunable_dict["wave_repeat_n"]               =   xdlops_mapping.wave_repeat_n
+                tunable_dict["wave_tile_k"]                 =   xdlops_mapping.wave_tile_k
+                tunable_dict["tensor_a_thread_lengths"]     =   tensor_a_thread_lengths
+                tunable_dict["tensor_a_cluster_lengths"]    =   tensor_a_cluster_lengths
+                tunable_dict["tensor_b_thread_lengths"]     =   tensor_b_thread_lengths
+                tunable_dict["tensor_b_cluster_lengths"]    =   tensor_b_cluster_lengths
+                tunable_dict['direction']                   =   config["current_direction"]
+                tunable_dict['precision']                   =   config["precision"]
+                tunable_dict['nxb']                         =   nxb
+                tunable_dict['nxe']                         =   nxe
+                if config["current_direction"] == 'wrw':
+                    tunable_dict['gemm_k_global_split']     =   gemm_k_global_split
+                if "coalescing_store_groups" in config:
+                    tunable_dict['coalescing_store_groups'] =   config["coalescing_store_groups"]
+                if "vector_write_out" in config:
+                    tunable_dict['vector_write_out']        =   config["vector_write_out"]
+
+                # post constrain, coalescing constrain
+                tentative_tunable = igemm_gtc_tunable_parameter_t(tunable_dict)
+                tentative_ctrl_coalescing_store_xdlops = ctrl_coalescing_store_xdlops_t()
+                tentative_ctrl_coalescing_store_xdlops.cxm = xdlops_mapping
+                tentative_ctrl_coalescing_store_xdlops.coalescing_groups = tentative_tunable.coalescing_store_groups
+                tentative_ctrl_coalescing_store_xdlops.data_byte = amdgpu_precision_data_byte(tentative_tunable.precision)
+                tentative_ctrl_coalescing_store_xdlops.vector_write_out = 1                      # groups check below not depend on it
+                tentative_ctrl_coalescing_store_xdlops.block_size = tentative_tunable.block_size
+                tentative_ctrl_coalescing_store_xdlops.gemm_k_global_split = tentative_tunable.gemm_k_global_split
+                if tentative_ctrl_coalescing_store_xdlops.get_length_m_max_groups() % \
+                        tentative_ctrl_coalescing_store_xdlops.coalescing_groups != 0:
+                    continue
+                if not igemm_sequence_is_tunable_coalescing_valid(config["current_direction"], tentative_tunable,
+                                                                    tentative_ctrl_coalescing_store_xdlops):
+                    continue
+
+                if not igemm_sequence_is_tunable_resource_valid(config["current_direction"], self.mc, tentative_tunable,
+                                                                    options["occ"] if "occ" in options else 0):
+                    continue
+
+                tunable_dicts.append(tunable_dict)
             return tunable_dicts
 
+        def gen_all_configs():
+            shards = gen_all_shards()
+            num_workers = driver_options["seq_enum_workers"] if "seq_enum_workers" in driver_options else os.cpu_count()
+            num_workers = max(1, min(num_workers, len(shards)))
+            start = time.perf_counter()
+            if num_workers == 1:
+                shard_configs = [gen_shard_configs(shard) for shard in shards]
+            else:
+                shard_configs = igemm_sequence_map_shards(lambda idx: gen_shard_configs(shards[idx]), len(shards), num_workers)
+            print(f"[{config['current_direction']}] enumerate {len(shards)} shards by {num_workers} workers in {time.perf_counter() - start:.2f}s")
+            # concatenate in shard order, result is the same as serial search regardless of worker count
+            return [td for tds in shard_configs for td in tds]
+
         tunable_dicts = gen_all_configs()
         if len(tunable_dicts) == 0:
             print(f"no config generated")
@@ -458,7 +518,10 @@ class igemm_sequence_xdlops_t(mc_base_t):
         print(f"[{config['current_direction']}] total configs:{len(tunable_dicts)}")
         #for td in tunable_dicts:
         #    print(igemm_gtc_tunable_parameter_t(td).serialize())
-        igemm_codegen_driver_t(self.mc, tunable_dicts)(emit_kernel_mp=True, compile_skip_disass=True)
+        kernel_cache = driver_options["kernel_cache"] if "kernel_cache" in driver_options else None
+        compile_per_inc_file = driver_options["compile_per_inc_file"] if "compile_per_inc_file" in driver_options else False
+        igemm_codegen_driver_t(self.mc, tunable_dicts)(emit_kernel_mp=True, compile_skip_disass=True,
+                                    kernel_cache=kernel_cache, compile_per_inc_file=compile_per_inc_file)
         #serialize_all_configs(tunable_dicts)
         return tunable_dicts
 
@@ -478,7 +541,7 @@ class igemm_sequence_driver_t(mc_base_t):
         code_object = get_dict_with_default(options, 'code_object', 'cov3')
 
         if self.mc.arch_config.arch == 908:
-            tunable_dicts = igemm_sequence_xdlops_t(self.mc, self.config)()
+            tunable_dicts = igemm_sequence_xdlops_t(self.mc, self.config)(**options)
         else:
             assert False
         
@@ -501,6 +564,7 @@ def igemm_sequence_driver(**options):
     code_object = get_dict_with_default(options, 'code_object', 'cov3')
     config_content = get_dict_with_default(options, 'config_content', None)
     out_dir = get_dict_with_default(options, 'out_dir', 'out')
+    durable = get_dict_with_default(options, 'durable', False)
 
     arch_config = amdgpu_arch_config_t({
         'arch'          :   amdgpu_string_to_arch( arch ),
@@ -514,7 +578,7 @@ def igemm_sequence_driver(**options):
     def sequece_one_direction(direction, config, **options):
         asm_file = f'igemm_{direction}_gtc_{arch}.s'
         asm_target = os.path.join(out_dir, asm_file)
-        emitter = mc_emit_to_file_t(asm_target)
+        emitter = mc_emit_to_file_t(asm_target, durable=durable)
         mc = mc_asm_printer_t(emitter, arch_config)
         igemm_sequence_driver_t(mc, config)(**options)
 
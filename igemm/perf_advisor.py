@@ -25,10 +25,115 @@
 ################################################################################
 # pylint: disable=maybe-no-member
 
-class perf_advisor_t(object):
+from .codegen import *
+from .algo import *
+
+import math
+
+class perf_advice_t(object):
     '''
-    for amdgpu
+    result of perf_advisor_t, for one kernel with one conv shape
     '''
     def __init__(self):
-        pass
-    def advise_occupancy():
+        self.occupancy              = 0     # workgroups per CU
+        self.waves_per_cu           = 0
+        self.limiter                = ''    # vgpr/agpr/lds/waves, the resource limit occupancy
+        self.grid_size              = 0     # workgroups of all launches
+        self.flop                   = 0     # useful flop of the conv
+        self.bytes                  = 0     # each tensor read/write from dram once
+        self.arithmetic_intensity   = 0.0   # flop per byte
+        self.tile_efficiency        = 0.0   # useful flop / flop issued, padding of tile and tail round of workgroups
+        self.compute_bound_tflops   = 0.0
+        self.memory_bound_tflops    = 0.0
+        self.predicted_tflops       = 0.0
+        self.bound                  = ''    # compute/memory
+
+class perf_advisor_t(object):
+    '''
+    for amdgpu. a roofline model, predicted throughput is the lower of
+      - peak of mfma/valu, scaled by tile efficiency
+      - dram bandwidth x arithmetic intensity
+    '''
+    def __init__(self, arch_detail):
+        self.arch_detail = arch_detail
+
+    def get_launch_list(self, tunable, conv_param):
+        '''
+        return list of launch, each launch is list of (gemm_m, gemm_n, gemm_k, num_gemm) run concurrently
+        '''
+        p = conv_param
+        def pad_b(b):
+            return b if tunable.nxe == 0 else igemm_next_mul(b, tunable.nxb)
+        if tunable.direction == 'fwd':
+            return [[(p.k // p.g, p.n * pad_b(p.ho * p.wo), (p.c // p.g) * p.y * p.x, p.g)]]
+        if tunable.direction == 'wrw':
+            num_split = 1 << tunable.gemm_k_global_split
+            return [[(p.k // p.g, (p.c // p.g) * p.y * p.x, (p.n * p.ho * p.wo + num_split - 1) // num_split, p.g * num_split)]]
+        if tunable.direction == 'bwd':
+            y_tilda = p.sy // math.gcd(p.sy, p.dy)
+            x_tilda = p.sx // math.gcd(p.sx, p.dx)
+            h_tilda = p.ho + (p.dy * (p.y - 1) + p.sy - 1) // p.sy
+            w_tilda = p.wo + (p.dx * (p.x - 1) + p.sx - 1) // p.sx
+            h_tilda_left = max(0, p.py - p.dy * (y_tilda - 1)) // p.sy
+            w_tilda_left = max(0, p.px - p.dx * (x_tilda - 1)) // p.sx
+            h_tilda_right = min(h_tilda, (p.py + p.hi - 1 + p.sy - 1) // p.sy + 1)
+            w_tilda_right = min(w_tilda, (p.px + p.wi - 1 + p.sx - 1) // p.sx + 1)
+            gemm_n = p.n * pad_b((h_tilda_right - h_tilda_left) * (w_tilda_right - w_tilda_left))
+            gemms = list()
+            for i_y_tilda in range(y_tilda):
+                for i_x_tilda in range(x_tilda):
+                    y_dot_slice = (p.y - i_y_tilda + y_tilda - 1) // y_tilda
+                    x_dot_slice = (p.x - i_x_tilda + x_tilda - 1) // x_tilda
+                    if y_dot_slice <= 0 or x_dot_slice <= 0:
+                        continue
+                    gemms.append((p.c // p.g, gemm_n, (p.k // p.g) * y_dot_slice * x_dot_slice, p.g))
+            return [gemms] if tunable.multihead else [[g] for g in gemms]
+        assert False, f"unsupported direction:{tunable.direction}"
+
+    def advise_occupancy(self, tunable):
+        '''
+        return workgroups per CU, and the resource limit it
+        '''
+        limits = igemm_resource_estimator_t(tunable).get_occupancy_limits(self.arch_detail)
+        limiter = min(limits, key = lambda k: limits[k])
+        return limits[limiter], limiter
+
+    def advise(self, tunable, conv_param):
+        p = conv_param
+        advice = perf_advice_t()
+        advice.occupancy, advice.limiter = self.advise_occupancy(tunable)
+        advice.waves_per_cu = advice.occupancy * (tunable.block_size // self.arch_detail.wavefront_size)
+
+        data_byte = amdgpu_precision_data_byte(tunable.precision)
+        advice.flop = 2 * p.n * p.k * (p.c // p.g) * p.ho * p.wo * p.y * p.x
+        advice.bytes = data_byte * (p.n * p.c * p.hi * p.wi + p.k * (p.c // p.g) * p.y * p.x + p.n * p.k * p.ho * p.wo)
+        advice.arithmetic_intensity = advice.flop / advice.bytes
+
+        # every round, occupancy x num_cu workgroups are in flight. the last round may be partially filled
+        slots = max(advice.occupancy, 1) * self.arch_detail.num_cu
+        issued_flop = 0
+        for launch in self.get_launch_list(tunable, conv_param):
+            num_tiles = 0
+            tile_flop = 0
+            for gemm_m, gemm_n, gemm_k, num_gemm in launch:
+                num_tiles += num_gemm * ((gemm_m + tunable.gemm_m_per_block - 1) // tunable.gemm_m_per_block) * \
+                                        ((gemm_n + tunable.gemm_n_per_block - 1) // tunable.gemm_n_per_block)
+                tile_flop = max(tile_flop, 2 * tunable.gemm_m_per_block * tunable.gemm_n_per_block * \
+                                        igemm_next_mul(gemm_k, tunable.gemm_k_per_block))
+            advice.grid_size += num_tiles
+            issued_flop += ((num_tiles + slots - 1) // slots) * slots * tile_flop
+        advice.tile_efficiency = advice.flop / issued_flop if issued_flop != 0 else 0.0
+
+        peak_gflops = self.arch_detail.theoretical_gflops(tunable.precision, tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS)
+        advice.compute_bound_tflops = peak_gflops * advice.tile_efficiency / 1000
+        advice.memory_bound_tflops = self.arch_detail.theoretical_bandwidth_gbps() * advice.arithmetic_intensity / 1000
+        if advice.occupancy == 0:
+            advice.predicted_tflops = 0.0
+            advice.bound = advice.limiter
+        elif advice.compute_bound_tflops <= advice.memory_bound_tflops:
+            advice.predicted_tflops = advice.compute_bound_tflops
+            advice.bound = 'compute'
+        else:
+            advice.predicted_tflops = advice.memory_bound_tflops
+            advice.bound = 'memory'
+        return advice
@@ -33,7 +33,7 @@ OUT_DIR='out'
 
 def igemm_flatten(args, config_content):
     asm_target = os.path.join(args.dir, os.path.splitext(os.path.basename(args.config_file))[0] + '.s')
-    emitter = mc_emit_to_file_t(asm_target)
+    emitter = mc_emit_to_file_t(asm_target, durable=args.fsync)
     sec_root = config_content.get_section('codegen')[0]
     arch = amdgpu_arch_config_t({
         'arch'          :   amdgpu_string_to_arch( sec_root['arch'] ),
@@ -47,11 +47,16 @@ def igemm_flatten(args, config_content):
     for td in tunable_dicts:
         td['arch'] = sec_root['arch']       # append arch to each section
 
-    igemm_codegen_driver_t(mc, tunable_dicts)()
+    igemm_codegen_driver_t(mc, tunable_dicts)(kernel_cache=igemm_get_kernel_cache(args), compile_per_inc_file=args.parallel_asm)
 
     # os.chmod(asm_target, 0x777)
 
 
+def igemm_get_kernel_cache(args):
+    if args.no_cache:
+        return None
+    return igemm_kernel_cache_t(args.cache_dir, args.cache_size * 1024 * 1024)
+
 def igemm_out_tunable_param(output_file, config_content):
     sec_root = config_content.get_section('codegen')[0]
     list_emitter = mc_emit_to_file_t(output_file)
@@ -76,6 +81,12 @@ if __name__ == '__main__':
     parser.add_argument("config_file", help="config file as input")
     parser.add_argument("-d", "--dir", help="directory of output files", default = OUT_DIR)
     parser.add_argument("-output", nargs='?', const='tunable_parameter_list.txt', help="output tunable parameter list")
+    parser.add_argument("--fsync", action="store_true", help="fsync every generated .s/.inc file before it is renamed in place")
+    parser.add_argument("--cache-dir", help="directory of kernel cache shared across runs", default = IGEMM_KERNEL_CACHE_DIR)
+    parser.add_argument("--cache-size", type=int, help="max size of kernel cache in MB, least recently used are evicted", default = IGEMM_KERNEL_CACHE_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--parallel-asm", action="store_true", help="assemble every kernel .inc as its own object in parallel, then link into .hsaco")
+    parser.add_argument("--no-cache", action="store_true", help="always generate and assemble every kernel from scratch")
+    parser.add_argument("--seq-workers", type=int, help="number of processes to enumerate configs in seq mode", default = os.cpu_count())
     args = parser.parse_args()
 
     config_parser = config_parser_t(args.config_file)
@@ -100,6 +111,8 @@ if __name__ == '__main__':
 
     if config_content.get_section('codegen')[0]['mode'] in ('seq', 'sequencer'):
         igemm_sequence_driver(arch=arch, code_object=code_object,
-                            config_content=config_content, out_dir=args.dir )
+                            config_content=config_content, out_dir=args.dir, durable=args.fsync,
+                            kernel_cache=igemm_get_kernel_cache(args), compile_per_inc_file=args.parallel_asm,
+                            seq_enum_workers=args.seq_workers )
 
 
@@ -0,0 +1,103 @@
+################################################################################
+# 
+#  MIT License
+# 
+#  Copyright (c) 2020 Advanced Micro Devices, Inc.
+# 
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+# 
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+# 
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+# 
+################################################################################
+from __future__ import print_function
+import argparse
+import sys, os
+
+from igemm import *
+
+def igemm_perf_advisor(args, config_content):
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        print(f"only flat config is supported, current mode:{sec_root['mode']}")
+        sys.exit(1)
+    if args.arch_detail is not None:
+        amdgpu_get_arch_registry().load(args.arch_detail)
+    arch_detail = amdgpu_get_arch_detail(sec_root['arch'], args.sku)
+    advisor = perf_advisor_t(arch_detail)
+    if args.cycle:
+        latency = igemm_cycle_latency_t({kv.split('=')[0] : int(kv.split('=')[1]) for kv in args.latency})
+        cycle_estimator = igemm_cycle_estimator_t(arch_detail, latency)
+
+    rows = list()
+    for sec in config_content:
+        if not sec.get_name().startswith('igemm_'):
+            continue
+        td = sec.to_dict()
+        td['arch'] = sec_root['arch']
+        tunable = igemm_gtc_tunable_parameter_t(td)
+        conv_param = conv_param_t(args.n, args.g, args.c, args.H, args.W, args.k, args.y, args.x,
+                            args.p, args.q, args.u, args.v, args.l, args.j, 0, 0, tunable.direction, tunable.precision)
+        a = advisor.advise(tunable, conv_param)
+        row = f"{igemm_gtc_encode_kernel_name(tunable):<100} {a.occupancy:>3} {a.limiter:>7} {a.waves_per_cu:>5} {a.grid_size:>8} " + \
+                f"{a.arithmetic_intensity:>7.1f} {a.tile_efficiency:>5.2f} {a.compute_bound_tflops:>8.2f} " + \
+                f"{a.memory_bound_tflops:>8.2f} {a.predicted_tflops:>8.2f} {a.bound:>7}"
+        predicted_tflops = a.predicted_tflops
+        if args.cycle:
+            est = cycle_estimator.estimate(tunable)
+            iteration_cycles, iteration_limiter = cycle_estimator.get_iteration_cycles(est, a.waves_per_cu)
+            predicted_tflops = cycle_estimator.predict_tflops(tunable, conv_param, est)
+            row += f" {est.cycles:>8} {est.get_mfma_utilization():>5.2f} {iteration_limiter:>7} {predicted_tflops:>8.2f}"
+        rows.append((predicted_tflops, row))
+
+    if args.sort:
+        rows.sort(key = lambda r: r[0], reverse = True)
+    title = f"{'kernel':<100} {'occ':>3} {'limiter':>7} {'waves':>5} {'grid':>8} {'AI':>7} {'eff':>5} " + \
+            f"{'compute':>8} {'memory':>8} {'predict':>8} {'bound':>7}"
+    if args.cycle:
+        title += f" {'cyc/iter':>8} {'mfma':>5} {'loop':>7} {'cyc_pred':>8}"
+    print(title)
+    for _, row in rows:
+        print(row)
+
+if __name__ == '__main__':
+    # conv shape arguments are the same as MIOpenDriver, and default value
+    parser = argparse.ArgumentParser(description="occupancy and roofline of every kernel in config file, for a conv shape. throughput in TFLOPS")
+    parser.add_argument("config_file", help="config file as input")
+    parser.add_argument("--sku", default=None, help="sku of the arch in config file, e.g. mi100, default the reference sku of the arch")
+    parser.add_argument("--cycle", action="store_true", help="emit each kernel, and estimate cycles of main loop to predict throughput")
+    parser.add_argument("--latency", action="append", default=[], help="override latency of cycle estimator, e.g. --latency ds_latency=100, see IGEMM_CYCLE_LATENCY_DEFAULT")
+    parser.add_argument("--sort", action="store_true", help="sort kernels by predicted throughput")
+    parser.add_argument("--arch-detail", default=None, help="extra arch detail file, to override or add sku, same format as igemm/codegen/amdgpu_arch_detail.config")
+    parser.add_argument("-n", type=int, default=100, help="batch size")
+    parser.add_argument("-c", type=int, default=3, help="input channels")
+    parser.add_argument("-H", type=int, default=32, help="input height")
+    parser.add_argument("-W", type=int, default=32, help="input width")
+    parser.add_argument("-k", type=int, default=32, help="output channels")
+    parser.add_argument("-y", type=int, default=3, help="filter height")
+    parser.add_argument("-x", type=int, default=3, help="filter width")
+    parser.add_argument("-p", type=int, default=0, help="pad height")
+    parser.add_argument("-q", type=int, default=0, help="pad width")
+    parser.add_argument("-u", type=int, default=1, help="stride height")
+    parser.add_argument("-v", type=int, default=1, help="stride width")
+    parser.add_argument("-l", type=int, default=1, help="dilation height")
+    parser.add_argument("-j", type=int, default=1, help="dilation width")
+    parser.add_argument("-g", type=int, default=1, help="group count")
+    args = parser.parse_args()
+
+    config_parser = config_parser_t(args.config_file)
+    config_content = config_parser()
+    igemm_perf_advisor(args, config_content)
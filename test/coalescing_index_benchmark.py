@@ -0,0 +1,89 @@
+# micro benchmark of index tables of xdlops coalescing store (get_m_index_per_group, get_m_index_per_group_m1_m0,
+# get_co_sub_m_index), built as emitting every xdlops kernel of config/*.config do, by python loop or numpy, with or
+# without cache. tables of every mode are checked to be the same. run from top directory:
+#   python3 test/coalescing_index_benchmark.py [config_file ...]
+import sys, os, glob, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+import igemm.algo.coalescing_store
+
+CONFIG_DIR = 'config'
+MODES = [('python', 0, 0), ('numpy', 1, 0), ('python+cache', 0, 1), ('numpy+cache', 1, 1)]   # name, numpy, cache
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    arch = amdgpu_arch_config_t({
+        'arch'          :   amdgpu_string_to_arch( sec_root['arch'] ),
+        'code_object'   :   amdgpu_string_to_codeobj( sec_root['code_object']) })
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return arch, tunable_dicts
+
+def get_xdlops_ctrls(arch, tunable_dicts):
+    '''
+    ctrl_coalescing_store_xdlops_t of every xdlops kernel, as constructed by kernel
+    '''
+    ctrls = list()
+    for td in tunable_dicts:
+        try:
+            tunable = igemm_gtc_tunable_parameter_t(td)
+            if tunable.fma_type != IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
+                continue
+            kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+            kernel = kernel_class(mc_asm_printer_t(mc_emit_to_string_t(), arch), tunable)
+        except Exception as e:
+            continue    # tunable not valid for this codegen
+        ctrls.append(kernel.coalescing_store.ctrl)
+    return ctrls
+
+def build_index_tables(ctrls, use_numpy, use_cache):
+    '''
+    every table a kernel use during emit, get_co_sub_m_index() is used by init_co_sub_m_index() and a comment
+    '''
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_NUMPY = use_numpy
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_CACHE = use_cache
+    igemm.algo.coalescing_store._coalescing_index_cache.clear()
+    tables = list()
+    start = time.perf_counter()
+    for ctrl in ctrls:
+        m_index_per_group = ctrl.get_m_index_per_group() if ctrl.gemm_m_order == IGEMM_COALESCING_GEMM_M_ORDER_M0_M1 else \
+                                ctrl.get_m_index_per_group_m1_m0()
+        tables.append((m_index_per_group, ctrl.get_co_sub_m_index(), ctrl.get_co_sub_m_index()))
+    elapsed = time.perf_counter() - start
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_NUMPY = 1
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_CACHE = 1
+    return elapsed, tables
+
+def run_coalescing_index_benchmark(config_files):
+    if np is None:
+        print("numpy not installed, numpy mode is the same as python")
+    print(f"{'config':<40} {'kernels':>7} " + ' '.join(f"{name + '(ms)':>16}" for name, _, _ in MODES) + f" {'speedup':>8}")
+    total = [0.0] * len(MODES)
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        ctrls = get_xdlops_ctrls(arch, tunable_dicts)
+        if len(ctrls) == 0:
+            continue
+        results = [build_index_tables(ctrls, use_numpy, use_cache) for _, use_numpy, use_cache in MODES]
+        assert all(tables == results[0][1] for _, tables in results), f"{config_file}, index table differ between modes"
+        for i, (elapsed, _) in enumerate(results):
+            total[i] += elapsed
+        print(f"{os.path.basename(config_file):<40} {len(ctrls):>7} " + ' '.join(f"{elapsed * 1000:>16.1f}" for elapsed, _ in results) + \
+                f" {results[0][0] / results[-1][0]:>7.1f}x", flush=True)
+    if total[-1] != 0:
+        print(f"{'total':<40} {'':>7} " + ' '.join(f"{t * 1000:>16.1f}" for t in total) + f" {total[0] / total[-1]:>7.1f}x")
+
+if __name__ == '__main__':
+    config_files = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_coalescing_index_benchmark(config_files)
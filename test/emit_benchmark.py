@@ -0,0 +1,53 @@
+# micro benchmark of emitting every config/*.config into memory, with legacy
+# string buffer (+=) and chunked buffer. run from top directory:
+#   python3 test/emit_benchmark.py [config_file ...]
+import sys, os, glob, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+import igemm.codegen.mc
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    arch = amdgpu_arch_config_t({
+        'arch'          :   amdgpu_string_to_arch( sec_root['arch'] ),
+        'code_object'   :   amdgpu_string_to_codeobj( sec_root['code_object']) })
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return arch, tunable_dicts
+
+def emit_to_memory(arch, tunable_dicts, chunked):
+    igemm.codegen.mc.MC_EMIT_BUFFER_CHUNKED = chunked
+    mc = mc_asm_printer_t(mc_emit_to_string_t(), arch)
+    driver = igemm_codegen_driver_t(mc, tunable_dicts)
+    start = time.perf_counter()
+    driver.do_emit()
+    buffer = mc.emitter.get_buffer()
+    return time.perf_counter() - start, buffer
+
+def run_emit_benchmark(config_files):
+    print(f"{'config':<40} {'kernels':>7} {'lines':>9} {'string(s)':>10} {'chunked(s)':>10} {'speedup':>8}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+            if tunable_dicts is None or len(tunable_dicts) == 0:
+                continue
+            t_string, buf_string = emit_to_memory(arch, tunable_dicts, 0)
+            t_chunked, buf_chunked = emit_to_memory(arch, tunable_dicts, 1)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        assert buf_string == buf_chunked, f"emitted content mismatch for {config_file}"
+        print(f"{os.path.basename(config_file):<40} {len(tunable_dicts):>7} {buf_chunked.count(chr(10)):>9} " + \
+                f"{t_string:>10.3f} {t_chunked:>10.3f} {t_string / t_chunked:>7.2f}x", flush=True)
+    igemm.codegen.mc.MC_EMIT_BUFFER_CHUNKED = 1
+
+if __name__ == '__main__':
+    config_files = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_emit_benchmark(config_files)
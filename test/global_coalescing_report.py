@@ -0,0 +1,84 @@
+# global memory coalescing of every kernel in config/*.config for one conv shape, replayed by igemm_global_coalescing_analyzer_t.
+# efficiency is useful byte over byte of 64/128 byte segments touched by every wave, summed over every buffer load/store
+# issued once by workgroup 0, and shown per tensor as load or store. kernels with nxe=0 are skipped if the shape is not 1x1,
+# stride 1, pad 0. kernels below the threshold are listed. need numpy.
+# run from top directory:
+#   python3 test/global_coalescing_report.py [-v] [-s n,g,c,hi,wi,k,y,x,py,px,sy,sx,dy,dx] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+DEFAULT_SHAPE = [64, 1, 256, 28, 28, 256, 3, 3, 1, 1, 1, 1, 1, 1]
+EFFICIENCY_THRESHOLD = 0.5      # 64 byte segment
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return amdgpu_string_to_arch(sec_root['arch']), tunable_dicts
+
+def is_shape_applicable(tunable, shape):
+    n, g, c, hi, wi, k, y, x, py, px, sy, sx, dy, dx = shape
+    if tunable.nxe == 0:
+        return y == 1 and x == 1 and py == 0 and px == 0 and sy == 1 and sx == 1
+    return True
+
+def get_efficiency_str(report):
+    items = list()
+    for tensor in report.get_tensors():
+        for is_store in (False, True):
+            if len(report.get_accesses(tensor, is_store)) == 0:
+                continue
+            items.append(f"{tensor}_{'st' if is_store else 'ld'}:{report.efficiency(tensor, is_store):.2f}/{report.efficiency(tensor, is_store, 128):.2f}")
+    return ' '.join(items)
+
+def run_global_coalescing_report(config_files, shape, verbose):
+    print(f"shape n,g,c,hi,wi,k,y,x,py,px,sy,sx,dy,dx:{','.join(str(s) for s in shape)}, efficiency as 64B/128B segment")
+    print(f"{'config':<40} {'kernels':>7} {'low':>5} {'eff_64':>7} {'eff_128':>7} {'unresolved':>10}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        analyzer = igemm_global_coalescing_analyzer_t(amdgpu_get_arch_detail(arch))
+        reports = list()
+        for td in tunable_dicts:
+            try:
+                tunable = igemm_gtc_tunable_parameter_t(td)
+                if not is_shape_applicable(tunable, shape):
+                    continue
+                conv_param = conv_param_t(*shape, 0, 0, tunable.direction, tunable.precision)
+                reports.append(analyzer.analyze(tunable, conv_param))
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+        if len(reports) == 0:
+            continue
+        low = [r for r in reports if r.efficiency() < EFFICIENCY_THRESHOLD]
+        print(f"{os.path.basename(config_file):<40} {len(reports):>7} {len(low):>5} " + \
+                f"{sum(r.efficiency() for r in reports) / len(reports):>7.2f} {sum(r.efficiency(segment_size = 128) for r in reports) / len(reports):>7.2f} " + \
+                f"{sum(r.num_unresolved() for r in reports):>10}", flush=True)
+        for r in (reports if verbose else low):
+            print(f"    {r.name} {get_efficiency_str(r)}" + (f" ({r.num_unresolved()} unresolved)" if r.num_unresolved() else ''))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    verbose = '-v' in args
+    shape = DEFAULT_SHAPE
+    if '-s' in args:
+        i = args.index('-s')
+        shape = [int(s) for s in args[i + 1].split(',')]
+        assert len(shape) == 14, "shape is n,g,c,hi,wi,k,y,x,py,px,sy,sx,dy,dx"
+        args = args[:i] + args[i + 2:]
+    config_files = [f for f in args if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_global_coalescing_report(config_files, shape, verbose)
@@ -0,0 +1,73 @@
+# size of emitted asm when only referenced global macros are emitted, against emitting every global macro, for
+# every config/*.config. assemble time is also measured if rocm assembler is found, otherwise shown as n/a.
+# run from top directory:
+#   python3 test/global_macro_benchmark.py [config_file ...]
+import sys, os, glob, time, shutil, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+import igemm.igemm_codegen_driver
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    arch = amdgpu_arch_config_t({
+        'arch'          :   amdgpu_string_to_arch( sec_root['arch'] ),
+        'code_object'   :   amdgpu_string_to_codeobj( sec_root['code_object']) })
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return arch, tunable_dicts
+
+def has_assembler():
+    return os.path.exists('/opt/rocm/llvm/bin/clang++') or os.path.exists('/opt/rocm/hcc/bin/clang')
+
+def emit_and_assemble(arch, tunable_dicts, config_file, referenced_only):
+    '''
+    return total bytes of .s and .inc, emit time, assemble time (None if no assembler)
+    '''
+    igemm.igemm_codegen_driver.IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY = referenced_only
+    out_dir = tempfile.mkdtemp()
+    try:
+        asm_file_name = os.path.join(out_dir, os.path.splitext(os.path.basename(config_file))[0] + '.s')
+        mc = mc_asm_printer_t(mc_emit_to_file_t(asm_file_name), arch)
+        driver = igemm_codegen_driver_t(mc, tunable_dicts)
+        start = time.perf_counter()
+        driver.do_emit()
+        mc.close()
+        t_emit = time.perf_counter() - start
+        num_bytes = sum(os.path.getsize(f) for f in glob.glob(os.path.join(out_dir, '*.s')) + glob.glob(os.path.join(out_dir, '*.inc')))
+        t_asm = None
+        if has_assembler():
+            start = time.perf_counter()
+            assert compile_asm_t(mc, asm_file_name).compile(), f"fail to assemble {asm_file_name}"
+            t_asm = time.perf_counter() - start
+        return num_bytes, t_emit, t_asm
+    finally:
+        shutil.rmtree(out_dir, ignore_errors = True)
+        igemm.igemm_codegen_driver.IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY = 1
+
+def run_global_macro_benchmark(config_files):
+    print(f"{'config':<40} {'kernels':>7} {'bytes':>10} {'referenced':>10} {'saved':>7} {'emit(s)':>7} {'asm(s)':>7} {'asm_ref(s)':>10} {'asm_saved':>9}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+            if tunable_dicts is None or len(tunable_dicts) == 0:
+                continue
+            bytes_all, _, asm_all = emit_and_assemble(arch, tunable_dicts, config_file, 0)
+            bytes_ref, t_emit, asm_ref = emit_and_assemble(arch, tunable_dicts, config_file, 1)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        asm_str = lambda t: 'n/a' if t is None else f"{t:.2f}"
+        asm_saved = 'n/a' if asm_all is None else f"{asm_all - asm_ref:.2f}"
+        print(f"{os.path.basename(config_file):<40} {len(tunable_dicts):>7} {bytes_all:>10} {bytes_ref:>10} {bytes_all - bytes_ref:>7} " + \
+                f"{t_emit:>7.2f} {asm_str(asm_all):>7} {asm_str(asm_ref):>10} {asm_saved:>9}", flush=True)
+
+if __name__ == '__main__':
+    config_files = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_global_macro_benchmark(config_files)
@@ -0,0 +1,60 @@
+# vgpr saved by packing with gpr_allocator_t (gpr_pack=1) against linear layout (gpr_pack=0) for every kernel in
+# config/*.config, and how many kernels get more workgroups resident per CU from it.
+# run from top directory:
+#   python3 test/gpr_alloc_benchmark.py [-v] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return sec_root['arch'], tunable_dicts
+
+def run_gpr_alloc_benchmark(config_files, verbose):
+    print(f"{'config':<40} {'kernels':>7} {'vgpr':>7} {'packed':>7} {'saved':>6} {'max':>4} {'occ_up':>6}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+            arch_detail = amdgpu_get_arch_detail(arch) if arch is not None else None
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        num, vgpr_linear, vgpr_packed, max_saved, num_occupancy_up = 0, 0, 0, 0, 0
+        for td in tunable_dicts:
+            try:
+                resource = list()
+                for gpr_pack in (0, 1):
+                    td['gpr_pack'] = gpr_pack
+                    resource.append(igemm_resource_estimator_t(igemm_gtc_tunable_parameter_t(td)))
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+            linear, packed = resource[0].get_vgpr_count(), resource[1].get_vgpr_count()
+            occupancy = [r.get_occupancy(arch_detail) for r in resource]
+            if verbose:
+                print(f"    {igemm_gtc_encode_kernel_name(resource[1].tunable)} vgpr:{linear}->{packed} occupancy:{occupancy[0]}->{occupancy[1]}")
+            num += 1
+            vgpr_linear += linear
+            vgpr_packed += packed
+            max_saved = max(max_saved, linear - packed)
+            num_occupancy_up += 1 if occupancy[1] > occupancy[0] else 0
+        if num == 0:
+            continue
+        print(f"{os.path.basename(config_file):<40} {num:>7} {vgpr_linear:>7} {vgpr_packed:>7} {vgpr_linear - vgpr_packed:>6} {max_saved:>4} {num_occupancy_up:>6}", flush=True)
+
+if __name__ == '__main__':
+    verbose = '-v' in sys.argv[1:]
+    config_files = [f for f in sys.argv[1:] if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_gpr_alloc_benchmark(config_files, verbose)
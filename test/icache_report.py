@@ -0,0 +1,60 @@
+# instruction cache footprint of every kernel in config/*.config, estimated by igemm_icache_estimator_t.
+# main loop is from L_*_mfma_body (or L_*_fma_body) to L_*_mfma_finishing label, kernels whose main loop
+# is larger than the budget are listed. budget default to icache_size of the arch.
+# run from top directory:
+#   python3 test/icache_report.py [-v] [--budget bytes] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return amdgpu_string_to_arch(sec_root['arch']), tunable_dicts
+
+def run_icache_report(config_files, budget, verbose):
+    print(f"{'config':<40} {'kernels':>7} {'budget':>7} {'over':>5} {'loop_max':>9} {'loop_avg':>9} {'total_max':>9} {'literal':>8}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        estimator = igemm_icache_estimator_t(amdgpu_get_arch_detail(arch), budget)
+        sizes = list()
+        for td in tunable_dicts:
+            try:
+                sizes.append(estimator.estimate(igemm_gtc_tunable_parameter_t(td)))
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+        if len(sizes) == 0:
+            continue
+        over = [s for s in sizes if s.is_over_budget()]
+        print(f"{os.path.basename(config_file):<40} {len(sizes):>7} {estimator.icache_budget:>7} {len(over):>5} " + \
+                f"{max(s.loop_bytes for s in sizes):>9} {sum(s.loop_bytes for s in sizes) // len(sizes):>9} " + \
+                f"{max(s.total_bytes for s in sizes):>9} {sum(s.num_literal for s in sizes):>8}", flush=True)
+        for s in (sizes if verbose else over):
+            print(f"    {'OVER ' if s.is_over_budget() else ''}{s.name} loop:{s.loop_bytes}B/{s.loop_num_inst}inst " + \
+                    f"total:{s.total_bytes}B/{s.num_inst}inst literal:{s.num_literal}")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    verbose = '-v' in args
+    budget = None
+    if '--budget' in args:
+        budget = int(args[args.index('--budget') + 1], 0)
+        del args[args.index('--budget') : args.index('--budget') + 2]
+    config_files = [f for f in args if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_icache_report(config_files, budget, verbose)
@@ -0,0 +1,56 @@
+# lds bank conflict of every kernel in config/*.config, simulated by igemm_lds_bank_simulator_t.
+# cycles are summed over every ds inst issued once by every wave of a workgroup, and shown as cycles/ideal
+# per phase, main loop sst/sld and coalescing store sst/sld. kernels with conflict are listed. need numpy.
+# run from top directory:
+#   python3 test/lds_bank_report.py [-v] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return amdgpu_string_to_arch(sec_root['arch']), tunable_dicts
+
+def run_lds_bank_report(config_files, verbose):
+    print(f"{'config':<40} {'kernels':>7} {'conflict':>8} " + ' '.join(f"{p:>16}" for p in IGEMM_LDS_PHASES) + f" {'unresolved':>10}")
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        simulator = igemm_lds_bank_simulator_t(amdgpu_get_arch_detail(arch))
+        reports = list()
+        for td in tunable_dicts:
+            try:
+                reports.append(simulator.simulate(igemm_gtc_tunable_parameter_t(td)))
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+        if len(reports) == 0:
+            continue
+        conflict = [r for r in reports if r.conflict_cycles() > 0]
+        phase_str = ' '.join(f"{str(sum(r.phases[p].cycles for r in reports)) + '/' + str(sum(r.phases[p].ideal_cycles for r in reports)):>16}" for p in IGEMM_LDS_PHASES)
+        print(f"{os.path.basename(config_file):<40} {len(reports):>7} {len(conflict):>8} {phase_str} " + \
+                f"{sum(s.num_unresolved for r in reports for s in r.phases.values()):>10}", flush=True)
+        for r in (reports if verbose else conflict):
+            print(f"    {r.name} " + ' '.join(f"{p}:{s.cycles}/{s.ideal_cycles}" + (f"({s.num_unresolved} unresolved)" if s.num_unresolved else '') \
+                    for p, s in r.phases.items()))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    verbose = '-v' in args
+    config_files = [f for f in args if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_lds_bank_report(config_files, verbose)
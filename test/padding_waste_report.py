@@ -0,0 +1,65 @@
+# analytic padding waste of small-channel conv layers, where gemm_m or gemm_n is only 4~16, by the xdlops macro tile of
+# least waste for each number of waves, before and after skinny/small tiles (256x4, 4x256, 128x16 ...) are enabled.
+# waste is 1 - gemm_m * gemm_n / (padded gemm_m * padded gemm_n), padded to multiple of macro tile. run from top directory:
+#   python3 test/padding_waste_report.py [fp32|fp16]
+import sys, os, math
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+# (macro_tile_m, macro_tile_n, wave_tile_m, wave_tile_n, waves) of mappings enabled with skinny tiles, not counted as before
+SKINNY_MAPPINGS = [(256, 16, 64, 16, 2), (16, 256, 16, 64, 2), (128, 16, 64, 4, 4), (16, 128, 4, 64, 4),
+                    (256, 4, 64, 4, 4), (4, 256, 4, 64, 4), (128, 4, 64, 4, 2), (4, 128, 4, 64, 2)]
+
+#        name,                  n,  c,    hi,  wi,  k,   y, x, stride, pad
+LAYERS = [('res5 3x3, n1',       1,  512,  4,   4,   512, 3, 3, 1, 1),
+          ('res5 1x1, n1',       1,  1024, 2,   2,   256, 1, 1, 1, 0),
+          ('res5 3x3, n4',       4,  256,  2,   2,   256, 3, 3, 1, 1),
+          ('head 1x1, k4',       32, 256,  14,  14,  4,   1, 1, 1, 0),
+          ('head 1x1, k8',       16, 64,   28,  28,  8,   1, 1, 1, 0),
+          ('head 3x3, k16',      8,  128,  56,  56,  16,  3, 3, 1, 1),
+          ('stem 7x7, c3',       32, 3,    224, 224, 64,  7, 7, 2, 3),
+          ('stem 3x3, c4',       16, 4,    112, 112, 32,  3, 3, 1, 1)]
+
+def get_gemm_m_n(direction, n, c, hi, wi, k, y, x, stride, pad):
+    ho = (hi + 2 * pad - y) // stride + 1
+    wo = (wi + 2 * pad - x) // stride + 1
+    return {'fwd' : (k, n * ho * wo), 'bwd' : (c, n * hi * wi), 'wrw' : (k, c * y * x)}[direction]
+
+def get_waste(gemm_m, gemm_n, cxm):
+    padded_m = math.ceil(gemm_m / cxm.macro_tile_m) * cxm.macro_tile_m
+    padded_n = math.ceil(gemm_n / cxm.macro_tile_n) * cxm.macro_tile_n
+    return 1 - gemm_m * gemm_n / (padded_m * padded_n)
+
+def get_least_waste_mapping(gemm_m, gemm_n, mappings):
+    '''
+    mapping of least waste, larger macro tile first if the same, hence less workgroups
+    '''
+    return min(mappings, key = lambda cxm : (get_waste(gemm_m, gemm_n, cxm), -cxm.macro_tile_m * cxm.macro_tile_n))
+
+def run_padding_waste_report(precision):
+    if type(precision) is str:
+        precision = amdgpu_string_to_precision(precision)
+    mappings = get_ctrl_xdlops_mapping_list(precision)
+    before = [cxm for cxm in mappings if (cxm.macro_tile_m, cxm.macro_tile_n, cxm.wave_tile_m, cxm.wave_tile_n, cxm.waves) not in SKINNY_MAPPINGS]
+    directions = ['fwd', 'bwd', 'wrw'] if precision == AMDGPU_PRECISION_FP32 else ['fwd']      # only fwd support fp16
+    print(f"{'layer':<18} {'dir':<4} {'gemm_m':>7} {'gemm_n':>7} {'waves':>5} {'before':>9} {'waste':>7} {'after':>9} {'waste':>7}")
+    sum_before, sum_after, num = 0.0, 0.0, 0
+    for name, *layer in LAYERS:
+        for direction in directions:
+            gemm_m, gemm_n = get_gemm_m_n(direction, *layer)
+            if min(gemm_m, gemm_n) > 16:
+                continue        # not a small channel gemm
+            for waves in sorted(set(cxm.waves for cxm in mappings), reverse = True):
+                cxm_before = get_least_waste_mapping(gemm_m, gemm_n, [cxm for cxm in before if cxm.waves == waves])
+                cxm_after = get_least_waste_mapping(gemm_m, gemm_n, [cxm for cxm in mappings if cxm.waves == waves])
+                waste_before, waste_after = get_waste(gemm_m, gemm_n, cxm_before), get_waste(gemm_m, gemm_n, cxm_after)
+                sum_before, sum_after, num = sum_before + waste_before, sum_after + waste_after, num + 1
+                print(f"{name:<18} {direction:<4} {gemm_m:>7} {gemm_n:>7} {waves:>5} " + \
+                        f"{str(cxm_before.macro_tile_m) + 'x' + str(cxm_before.macro_tile_n):>9} {waste_before:>7.1%} " + \
+                        f"{str(cxm_after.macro_tile_m) + 'x' + str(cxm_after.macro_tile_n):>9} {waste_after:>7.1%}")
+    if num != 0:
+        print(f"{'average':<18} {'':<4} {'':>7} {'':>7} {'':>5} {'':>9} {sum_before / num:>7.1%} {'':>9} {sum_after / num:>7.1%}")
+
+if __name__ == '__main__':
+    run_padding_waste_report(sys.argv[1] if len(sys.argv) > 1 else AMDGPU_PRECISION_FP32)
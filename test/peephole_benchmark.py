@@ -0,0 +1,61 @@
+# instructions removed and rewritten by peephole_pass_t for every kernel in config/*.config, with count of each
+# rule. only kernel body is counted, same as what is emitted with peephole=1.
+# run from top directory:
+#   python3 test/peephole_benchmark.py [-v] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_kernel_body_text(tunable, arch):
+    emitter = mc_emit_to_string_t()
+    kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+    kernel = kernel_class(mc_asm_printer_t(emitter, amdgpu_arch_config_t({'arch' : amdgpu_string_to_arch(arch)})), tunable)
+    kernel.emit_kernel_body()
+    return emitter.get_buffer(), sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None))
+
+def run_peephole_benchmark(config_files, verbose):
+    rule_names = peephole_get_rule_names()
+    print(f"{'config':<40} {'kernels':>7} {'inst':>8} {'removed':>7} {'rewritten':>9} " + ' '.join([f"{r:>14}" for r in rule_names]))
+    for config_file in config_files:
+        try:
+            config_content = config_parser_t(config_file)()
+            sec_root = config_content.get_section('codegen')[0]
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if sec_root['mode'] not in ('flat', 'flatten'):
+            continue
+        num, num_inst, num_removed, num_rewritten = 0, 0, 0, 0
+        rule_count = {r : 0 for r in rule_names}
+        for sec in config_content:
+            if not (sec.get_name().startswith('igemm_') and sec.get_name().endswith('_gtc')):
+                continue
+            td = sec.to_dict()
+            td['arch'] = sec_root['arch']
+            try:
+                text, symbol_table = get_kernel_body_text(igemm_gtc_tunable_parameter_t(td), sec_root['arch'])
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+            peephole_pass = peephole_pass_t(symbol_table)
+            peephole_pass(text)
+            if verbose:
+                print(f"    {igemm_gtc_encode_kernel_name(igemm_gtc_tunable_parameter_t(td))} inst:{peephole_pass.num_inst} removed:{peephole_pass.num_removed} rewritten:{peephole_pass.num_rewritten}")
+            num += 1
+            num_inst += peephole_pass.num_inst
+            num_removed += peephole_pass.num_removed
+            num_rewritten += peephole_pass.num_rewritten
+            for r in rule_names:
+                rule_count[r] += peephole_pass.rule_count[r]
+        if num == 0:
+            continue
+        print(f"{os.path.basename(config_file):<40} {num:>7} {num_inst:>8} {num_removed:>7} {num_rewritten:>9} " + ' '.join([f"{rule_count[r]:>14}" for r in rule_names]), flush=True)
+
+if __name__ == '__main__':
+    verbose = '-v' in sys.argv[1:]
+    config_files = [f for f in sys.argv[1:] if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_peephole_benchmark(config_files, verbose)
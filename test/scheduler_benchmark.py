@@ -0,0 +1,72 @@
+# static cost comparison of main loop scheduled by simple_interleave_scheduler_t and list_scheduler_t,
+# for every xdlops kernel in config/*.config, with cycles per iteration from igemm_cycle_estimator_t.
+# run from top directory:
+#   python3 test/scheduler_benchmark.py [-v] [config_file ...]
+import sys, os, glob, math
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return amdgpu_string_to_arch(sec_root['arch']), tunable_dicts
+
+def estimate_cycles(estimator, tunable_dict, scheduler):
+    td = dict(tunable_dict)
+    td['scheduler'] = scheduler
+    return estimator.estimate(igemm_gtc_tunable_parameter_t(td)).cycles
+
+def run_scheduler_benchmark(config_files, verbose):
+    print(f"{'config':<40} {'kernels':>7} {'better':>7} {'same':>7} {'worse':>7} {'simple':>9} {'list':>9} {'geomean':>8}")
+    total_log_ratio, total_kernels = 0.0, 0
+    for config_file in config_files:
+        try:
+            arch, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None or arch not in (AMDGPU_ARCH_GFX908, AMDGPU_ARCH_GFX90A):
+            continue
+        estimator = igemm_cycle_estimator_t(amdgpu_get_arch_detail(arch))
+        better, same, worse, sum_simple, sum_list, log_ratio, num = 0, 0, 0, 0, 0, 0.0, 0
+        for td in tunable_dicts:
+            if get_igemm_gtc_fma_type(td) != IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS:
+                continue
+            try:
+                c_simple = estimate_cycles(estimator, td, 'simple')
+                c_list = estimate_cycles(estimator, td, 'list')
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+            if verbose:
+                name = igemm_gtc_encode_kernel_name(igemm_gtc_tunable_parameter_t(td))
+                print(f"    {name} simple:{c_simple} list:{c_list}")
+            better += 1 if c_list < c_simple else 0
+            same += 1 if c_list == c_simple else 0
+            worse += 1 if c_list > c_simple else 0
+            sum_simple += c_simple
+            sum_list += c_list
+            log_ratio += math.log(c_list / c_simple)
+            num += 1
+        if num == 0:
+            continue
+        total_log_ratio += log_ratio
+        total_kernels += num
+        print(f"{os.path.basename(config_file):<40} {num:>7} {better:>7} {same:>7} {worse:>7} " + \
+                f"{sum_simple:>9} {sum_list:>9} {math.exp(log_ratio / num):>8.4f}", flush=True)
+    if total_kernels != 0:
+        print(f"total {total_kernels} kernels, geomean cycles list/simple:{math.exp(total_log_ratio / total_kernels):.4f}")
+
+if __name__ == '__main__':
+    verbose = '-v' in sys.argv[1:]
+    config_files = [f for f in sys.argv[1:] if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_scheduler_benchmark(config_files, verbose)
@@ -4,6 +4,45 @@ import math
 def get_default_mc():
     return mc_asm_printer_t(mc_emit_to_string_t(), amdgpu_arch_config_t(None))
 
+def get_config_kernels(pattern = '*gfx908*.config', variants = None, emit = True):
+    '''
+    walk igemm_*_gtc sections of every flat config/<pattern>, yield (config_file, tunable, kernel, text), text is the kernel
+    body if emit. with variants, a list of dict updated to the section, tunable, kernel and text are tuples of each variant.
+    a section can not be constructed is skipped and counted, the rest of its config is still walked
+    '''
+    import os, glob
+    kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}
+    num_skipped = 0
+    for config_file in sorted(glob.glob(os.path.join('config', pattern))):
+        config_content = config_parser_t(config_file)()
+        sec_root = config_content.get_section('codegen')[0]
+        if sec_root['mode'] not in ('flat', 'flatten'):
+            continue
+        for sec in config_content:
+            if not (sec.get_name().startswith('igemm_') and sec.get_name().endswith('_gtc')):
+                continue
+            kernels = list()
+            try:
+                for variant in (variants or [dict()]):
+                    td = sec.to_dict()
+                    td.update(variant)
+                    td['arch'] = sec_root['arch']
+                    tunable = igemm_gtc_tunable_parameter_t(td)
+                    emitter = mc_emit_to_string_t()
+                    mc = mc_asm_printer_t(emitter, amdgpu_arch_config_t({
+                            'arch'          :   amdgpu_string_to_arch(sec_root['arch']),
+                            'code_object'   :   amdgpu_string_to_codeobj(sec_root['code_object'])}))
+                    kernel = kernel_class[tunable.direction](mc, tunable)
+                    if emit:
+                        kernel.emit_kernel_body()
+                    kernels.append((tunable, kernel, emitter.get_buffer()))
+            except Exception as e:
+                print(f"{config_file} skip kernel can not be constructed, {type(e).__name__}:{e}")
+                num_skipped += 1
+                continue
+            yield (config_file, *kernels[0]) if variants is None else (config_file, *zip(*kernels))
+    print(f"{num_skipped} kernels skipped")
+
 def unittest_share_memory():
     v_dst = sym_t('v_dst')
     v_sld = sym_t('v_sld')
@@ -270,6 +309,961 @@ def unittest_thread_mapping():
     mc.emit(thread_mapping( 'v_gemm_in', 'v_gemm_im', 'v_tid_shifter', 'v_tmp'))
     print(mc.emitter.get_buffer())
 
+def unittest_compile_per_inc_file():
+    '''
+    per inc file assemble and link, with stub assembler/linker so no rocm is needed.
+    stub assembler expand .include into the object, stub linker concatenate objects.
+    '''
+    import os, re, tempfile
+    def stub_expand(asm_file_name, include_dirs):
+        content = ''
+        for line in open(asm_file_name).read().split('\n'):
+            m = re.match(r'^\s*\.include\s+"([^"]+)"', line)
+            if m:
+                content += stub_expand(os.path.join(include_dirs[0], m.group(1)), include_dirs)
+            else:
+                content += line + '\n'
+        return content
+    def stub_assembler(arch_config, asm_file_name, target_object, include_dirs = list()):
+        with open(target_object, 'w') as f:
+            f.write(stub_expand(asm_file_name, include_dirs))
+        return True
+    def stub_linker(arch_config, object_file_names, target_hsaco):
+        with open(target_hsaco, 'w') as f:
+            for o in object_file_names:
+                f.write(open(o).read())
+        return True
+
+    config_content = config_parser_t(os.path.join('config', 'igemm_fwd_gtc_gfx908_multi_k.config'))()
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = 'gfx908'
+    out_dir = tempfile.mkdtemp()
+    mc = mc_asm_printer_t(mc_emit_to_file_t(os.path.join(out_dir, 'igemm_fwd_gtc_gfx908.s')), amdgpu_arch_config_t({'arch' : AMDGPU_ARCH_GFX908}))
+    driver = igemm_codegen_driver_t(mc, tunable_dicts)
+    driver(compile_per_inc_file=True, compile_skip_disass=True, assembler=stub_assembler, linker=stub_linker)
+
+    hsaco = open(os.path.join(out_dir, 'igemm_fwd_gtc_gfx908.hsaco')).read()
+    assert len(driver.per_inc_file_asm_list) == len(driver.inc_file_list) + 1
+    assert hsaco.count('.amdgpu_metadata') == 1, "only one metadata should be in the linked code object"
+    for kernel in driver.kernel_list:
+        assert hsaco.count(f'.amdhsa_kernel {kernel.name()}\n') == 1, f"kernel {kernel.name()} should be in exactly one object"
+    print(f"{len(driver.kernel_list)} kernels, {len(driver.per_inc_file_asm_list)} objects linked into {out_dir}")
+
+def unittest_resource_estimator():
+    '''
+    analytic sgpr/vgpr/agpr/lds should be the same as kernel allocator, for every kernel in config/*.config
+    '''
+    num_checked = 0
+    for config_file, tunable, kernel, _ in get_config_kernels('*.config', emit = False):
+        resource = igemm_resource_estimator_t(tunable)
+        expected = (kernel.sgpr.get_count(), kernel.vgpr.get_count(),
+                    kernel.agpr.get_count() if tunable.fma_type == IGEMM_GTC_TUNABLE_FMA_TYPE_XDLOPS else 0, tunable.lds_total)
+        estimated = (resource.get_sgpr_count(), resource.get_vgpr_count(), resource.get_agpr_count(), resource.get_lds_size())
+        assert expected == estimated, f"{config_file}, {kernel.name()}, sgpr/vgpr/agpr/lds expected:{expected}, estimated:{estimated}"
+        num_checked += 1
+    print(f"{num_checked} kernels checked")
+
+def unittest_arch_registry():
+    '''
+    every sku should carry a full detail, and an override file should only touch listed keys
+    '''
+    import os, tempfile
+    registry = amdgpu_get_arch_registry()
+    for arch in ('gfx906', 'gfx908', 'gfx90a'):
+        for sku in registry.get_sku_list(arch):
+            d = amdgpu_get_arch_detail(arch, sku)
+            assert d.sku == sku and amdgpu_arch_to_string(d.arch) == arch
+            assert d.num_cu > 0 and d.sclk_mhz > 0 and d.lds_size > 0 and d.lds_banks > 0 and d.vgpr_per_cu > 0
+            assert (d.xdlops_fp32_flop_per_cycle > 0) == (len(d.mfma_cycle) > 0), f"{arch}:{sku} xdlops peak and mfma table mismatch"
+            print(f"{arch}:{sku} fp32 {d.theoretical_gflops('fp32', len(d.mfma_cycle) > 0):.0f} GFLOPS, {d.theoretical_bandwidth_gbps():.0f} GB/s")
+
+    mi100 = amdgpu_get_arch_detail('gfx908', 'mi100')
+    assert mi100.get_mfma_cycle('v_mfma_f32_32x32x2f32') == 64
+    assert round(mi100.theoretical_gflops('fp16', True)) == 184566
+
+    local_registry = amdgpu_arch_registry_t()
+    local_registry.load(AMDGPU_ARCH_DETAIL_FILE)
+    with tempfile.NamedTemporaryFile('w', suffix='.config', delete=False) as f:
+        f.write("[amdgpu_sku]\narch = 'gfx908'\nsku = 'mi100_lowclk'\nsclk_mhz = 1200\n")
+    local_registry.load(f.name)
+    os.remove(f.name)
+    d = local_registry.get_arch_detail(AMDGPU_ARCH_GFX908, 'mi100_lowclk')
+    assert d.sclk_mhz == 1200 and d.num_cu == mi100.num_cu and d.mfma_cycle == mi100.mfma_cycle
+
+def unittest_cycle_estimator():
+    '''
+    mfma keep matrix core busy, s_waitcnt wait for the in order ds/buffer return. and every kernel in config can be estimated
+    '''
+    arch_detail = amdgpu_get_arch_detail('gfx908')
+    latency = igemm_cycle_latency_t({'ds_latency' : 100, 'vmem_load_latency' : 1000})
+    estimator = igemm_cycle_estimator_t(arch_detail, latency)
+    asm = '''
+L_test_mfma_body:
+    buffer_load_dword v[0], v[1], s[0:3], 0 offen offset:0
+    ds_read_b32 v[2], v[3]
+    s_waitcnt lgkmcnt(0)
+    v_mfma_f32_32x32x2f32 a[0:15], v[2], v[2], a[0:15]
+    v_mfma_f32_32x32x2f32 a[16:31], v[2], v[2], a[16:31]     ; wait for previous mfma
+    s_waitcnt vmcnt(0)
+    s_branch L_test_mfma_body
+'''
+    est = estimator.simulate(estimator.get_loop_body(asm), num_pass = 1)
+    assert est.num_inst == 7 and est.num_mfma == 2 and est.mfma_cycles == 128
+    assert est.stall_lgkmcnt == 100 + 2 - 4, f"ds issue at 4, lds busy 2 cycles, return at 106, stall {est.stall_lgkmcnt}"
+    assert est.stall_mfma == 64 - 4, f"second mfma should wait first one, stall {est.stall_mfma}"
+    assert est.cycles == 1000 + latency.salu_issue + latency.branch, f"buffer load issue at 0, return at 1000, cycles {est.cycles}"
+
+    num_checked = 0
+    for config_file, tunable, kernel, text in get_config_kernels():
+        est = estimator.estimate_text(text)
+        assert est.num_mfma > 0 and est.cycles >= est.mfma_cycles, f"{config_file}, {kernel.name()}"
+        num_checked += 1
+    print(f"{num_checked} kernels estimated")
+
+def unittest_interleave_n_way():
+    '''
+    every fill list emit its budget after each base mbb, and a list with start_after wait the interval after its dependency
+    '''
+    mc = mc_asm_printer_t(mc_emit_to_string_t(), amdgpu_arch_config_t({'arch' : AMDGPU_ARCH_GFX908}))
+    mbb_lists = [create_machine_basic_block('\n'.join([f'v_mfma_f32_32x32x2f32 a[{16*i}:{16*i+15}], v[0], v[1], a[{16*i}:{16*i+15}]' for i in range(5)]),
+                                            group_mbb_by_end_of_inst_op="v_mfma"),
+                 create_machine_basic_block('\n'.join([f'buffer_load_dword v[{10+i}], v[2], s[0:3], 0 offen offset:0' for i in range(2)])),
+                 create_machine_basic_block('\n'.join([f'v_add_u32 v[2], {i}, v[2]' for i in range(4)])),
+                 create_machine_basic_block('\n'.join([f'ds_write_b32 v[3], v[{20+i}] offset:{4*i}' for i in range(3)]))]
+    se = create_scheduler(mc, mbb_lists)
+    text = se.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, 1, None], arch_alu_per_interval=1, share_mem_per_interval=2)
+    ops = [get_mc_inst_op(l) for l in text.split('\n') if l.strip() != '']
+    # global mem 1 per interval, share mem 2 per interval. alu start the interval after last global mem,
+    # and need 2 per interval to finish 4 within the 3 intervals left
+    expected = ['v_mfma', 'buffer_load', 'ds_write', 'ds_write',
+                'v_mfma', 'buffer_load', 'ds_write',
+                'v_mfma', 'v_add', 'v_add',
+                'v_mfma', 'v_add', 'v_add',
+                'v_mfma']
+    assert len(ops) == len(expected) and all(o.startswith(e) for o, e in zip(ops, expected)), f"{ops}"
+
+    # without budget, alu is evenly spread, and start only after given number of global mem
+    se = create_scheduler(mc, mbb_lists[:3])
+    text = se.lower(interleave_pattern=INTERLEAVE_PTN_N, start_after=[None, None, (1, 1)])
+    ops = [get_mc_inst_op(l) for l in text.split('\n') if l.strip() != '']
+    assert ops == ['v_mfma_f32_32x32x2f32', 'buffer_load_dword', 'v_mfma_f32_32x32x2f32', 'buffer_load_dword', 'v_add_u32',
+                    'v_mfma_f32_32x32x2f32', 'v_add_u32', 'v_mfma_f32_32x32x2f32', 'v_add_u32', 'v_mfma_f32_32x32x2f32', 'v_add_u32'], f"{ops}"
+
+def unittest_list_scheduler():
+    '''
+    list scheduler only swap independent inst, and keep fence in place. every swapped pair of main loop
+    inst of kernels in config is checked again, balanced exec block is moved as a whole so exec is not checked
+    '''
+    mc = mc_asm_printer_t(mc_emit_to_string_t(), amdgpu_arch_config_t({'arch' : AMDGPU_ARCH_GFX908}))
+    symbol_table = {'v_a' : 0, 'v_b' : 4, 'v_gld' : 8, 'v_os' : 16, 'v_tmp' : 17, 'v_sld_os' : 20, 'a_c' : 0, 's_p' : 0}
+    mbb_0 = create_machine_basic_block('''
+        ds_read_b32 v[v_a], v[v_sld_os]
+        ds_read_b32 v[v_b], v[v_sld_os] offset:256
+        s_waitcnt lgkmcnt(0)
+        v_mfma_f32_32x32x2f32 a[a_c+0:a_c+15], v[v_a], v[v_b], a[a_c+0:a_c+15]
+        v_mfma_f32_32x32x2f32 a[a_c+16:a_c+31], v[v_a], v[v_b+1], a[a_c+16:a_c+31]
+        v_mfma_f32_32x32x2f32 a[a_c+32:a_c+47], v[v_a+1], v[v_b], a[a_c+32:a_c+47]
+        v_mfma_f32_32x32x2f32 a[a_c+48:a_c+63], v[v_a+1], v[v_b+1], a[a_c+48:a_c+63]
+    ''', group_mbb_by_end_of_inst_op="v_mfma")
+    mbb_1 = create_machine_basic_block('''
+        v_add_u32 v[v_tmp], 64, v[v_os]
+        buffer_load_dwordx4 v[v_gld+0:v_gld+3], v[v_tmp], s[s_p:s_p+3], 0 offen offset:0
+        v_add_u32 v[v_os], 128, v[v_os]
+        buffer_load_dwordx4 v[v_gld+4:v_gld+7], v[v_os], s[s_p:s_p+3], 0 offen offset:0
+        s_barrier
+        v_add_u32 v[v_sld_os], 512, v[v_sld_os]
+    ''')
+    def get_inst(text):
+        return [l.split(';')[0].strip() for l in text.split('\n') if l.split(';')[0].strip() != '']
+    simple = get_inst(create_scheduler(mc, [mbb_0, mbb_1]).lower(interleave_pattern=INTERLEAVE_PTN_0))
+    se = create_scheduler(mc, [mbb_0, mbb_1], SCHEDULER_TYPE_LIST, symbol_table=symbol_table)
+    scheduled = get_inst(se.lower(interleave_pattern=INTERLEAVE_PTN_0))
+    assert sorted(simple) == sorted(scheduled) and se.scheduled_cycles <= se.baseline_cycles
+
+    # packed v_tmp alias v_a+2, extent of v_a+3 should still be the whole v_a
+    packed = mc_inst_analyzer_t({'v_a' : 0, 'v_tmp' : 2, 'v_b' : 4}, {'v' : [(0, 4), (2, 3), (4, 8)]})
+    assert packed.reg_extent({('v', 3)}) == set(('v', x) for x in range(4))
+    assert scheduled.index('v_add_u32 v[v_tmp], 64, v[v_os]') < scheduled.index('buffer_load_dwordx4 v[v_gld+0:v_gld+3], v[v_tmp], s[s_p:s_p+3], 0 offen offset:0')
+    assert scheduled.index('v_add_u32 v[v_os], 128, v[v_os]') > scheduled.index('v_add_u32 v[v_tmp], 64, v[v_os]')
+    assert scheduled.index('s_barrier') == simple.index('s_barrier'), "fence should not move"
+    assert scheduled.index('v_add_u32 v[v_sld_os], 512, v[v_sld_os]') > scheduled.index('ds_read_b32 v[v_b], v[v_sld_os] offset:256')
+
+    def check_swap(se, simple, scheduled):
+        '''
+        every inst pair in different order should be independent
+        '''
+        def occurrence(insts):
+            cnt = dict()
+            keys = list()
+            for i in insts:
+                cnt[i] = cnt.get(i, 0) + 1
+                keys.append((i, cnt[i]))
+            return keys
+        k_simple, k_scheduled = occurrence(simple), occurrence(scheduled)
+        assert sorted(k_simple) == sorted(k_scheduled)
+        position = {k : i for i, k in enumerate(k_scheduled)}
+        info = dict()
+        for k in k_simple:
+            inst_info = se.inst_info(k[0])
+            assert inst_info is not None and inst_info[2] != 'fence' or position[k] == k_simple.index(k), f"{k[0]} should not move"
+            if inst_info is not None:
+                d, u, kind = inst_info
+                lgkm = kind in ('ds', 'smem') or 'lgkmcnt' in k[0]
+                vm = kind == 'vmem' or 'vmcnt' in k[0]
+                info[k] = (d - {('exec', 0)}, u - {('exec', 0)}, lgkm, vm)
+        for i in range(len(k_simple)):
+            for j in range(i + 1, len(k_simple)):
+                a, b = k_simple[i], k_simple[j]
+                if position[a] < position[b]:
+                    continue
+                (da, ua, la, va), (db, ub, lb, vb) = info[a], info[b]
+                assert not ((da & ub) or (ua & db) or (da & db) or (la and lb) or (va and vb)), f"dependent inst swapped: {a[0]} <-> {b[0]}"
+    check_swap(se, simple, scheduled)
+
+    arch_detail = amdgpu_get_arch_detail('gfx908')
+    estimator = igemm_cycle_estimator_t(arch_detail)
+    num_checked = 0
+    for config_file, tunables, kernels, texts in get_config_kernels(variants = [{'scheduler' : 'simple'}, {'scheduler' : 'list'}]):
+        kernel = kernels[1]
+        loop_body = [estimator.get_loop_body(text.replace(k.name(), 'kernel')) for k, text in zip(kernels, texts)]
+        se = list_scheduler_t(kernel.mc, [], symbol_table=sym_get_table(kernel.sgpr, kernel.vgpr, kernel.agpr))
+        check_swap(se, loop_body[0], loop_body[1])
+        # consumer of memory op never move above the s_waitcnt it relies on
+        checker = waitcnt_checker_t(se.symbol_table)
+        assert len(checker(texts[1])) <= len(checker(texts[0])), f"{kernel.name()} waitcnt violation"
+        num_checked += 1
+    print(f"{num_checked} kernels checked")
+
+def unittest_waitcnt_relax():
+    '''
+    s_waitcnt is only relaxed when every op not waited any more is proven complete before its
+    destination is touched, and before any control flow. kernels in config are checked by waitcnt_checker_t
+    '''
+    symbol_table = {'v_a' : 0, 'v_b' : 4, 'v_gld' : 8, 'v_os' : 16, 'v_tmp' : 17, 'v_sld_os' : 20, 'a_c' : 0,
+                    's_p' : 0, 's_ka' : 4, 's_tmp' : 8}
+    relax_pass = waitcnt_relax_pass_t(symbol_table)
+    checker = waitcnt_checker_t(symbol_table)
+    def ops_of(text):
+        return [l.strip() for l in text.split('\n') if l.strip() != '']
+
+    # lgkmcnt(0) only need the first ds_read, vmcnt(0) wait nothing used before next full wait
+    text = '''
+        ds_read_b32 v[v_a], v[v_sld_os]
+        ds_read_b32 v[v_b], v[v_sld_os] offset:256
+        ds_read_b32 v[v_b+1], v[v_sld_os] offset:512
+        buffer_load_dword v[v_gld], v[v_os], s[s_p:s_p+3], 0 offen offset:0
+        s_waitcnt lgkmcnt(0)
+        v_mov_b32 v[v_tmp], v[v_a]
+        s_waitcnt lgkmcnt(1)
+        v_mov_b32 v[v_tmp], v[v_b]
+        s_waitcnt vmcnt(0) lgkmcnt(0)
+        v_add_u32 v[v_tmp], v[v_b+1], v[v_gld]
+        s_endpgm
+    '''
+    relaxed = relax_pass(text)
+    assert ops_of(relaxed) == ['ds_read_b32 v[v_a], v[v_sld_os]', 'ds_read_b32 v[v_b], v[v_sld_os] offset:256',
+                    'ds_read_b32 v[v_b+1], v[v_sld_os] offset:512', 'buffer_load_dword v[v_gld], v[v_os], s[s_p:s_p+3], 0 offen offset:0',
+                    's_waitcnt lgkmcnt(2)', 'v_mov_b32 v[v_tmp], v[v_a]',
+                    's_waitcnt lgkmcnt(1)', 'v_mov_b32 v[v_tmp], v[v_b]',
+                    's_waitcnt vmcnt(0) lgkmcnt(0)', 'v_add_u32 v[v_tmp], v[v_b+1], v[v_gld]', 's_endpgm'], f"{relaxed}"
+    assert relax_pass.num_waitcnt == 3 and relax_pass.num_relaxed == 1 and relax_pass.num_removed == 0
+    assert len(checker(text)) == 0 and len(checker(relaxed)) == 0
+
+    # wait that cover nothing outstanding is removed
+    text = '''
+        ds_read_b32 v[v_a], v[v_sld_os]
+        s_waitcnt lgkmcnt(0)
+        ds_write_b32 v[v_sld_os], v[v_a]
+        s_waitcnt lgkmcnt(1)
+        v_mov_b32 v[v_tmp], v[v_a]
+    '''
+    relaxed = relax_pass(text)
+    assert relax_pass.num_removed == 1 and not any(l.startswith('s_waitcnt lgkmcnt(1)') for l in ops_of(relaxed)), f"{relaxed}"
+
+    # no relax across barrier and label, nor with smem outstanding
+    for fence in ('s_barrier', 'L_loop:', 's_cbranch_scc0 L_end'):
+        text = f'''
+            ds_read_b32 v[v_a], v[v_sld_os]
+            ds_read_b32 v[v_b], v[v_sld_os] offset:256
+            s_waitcnt lgkmcnt(0)
+            v_mov_b32 v[v_tmp], v[v_a]
+            {fence}
+            v_mov_b32 v[v_tmp], v[v_b]
+        L_end:
+            s_endpgm
+        '''
+        assert relax_pass(text) == text, f"{fence}"
+    text = '''
+        s_load_dwordx2 s[s_ka:s_ka+1], s[s_p:s_p+1], 0
+        s_load_dword s[s_tmp], s[s_p:s_p+1], 8
+        s_waitcnt lgkmcnt(0)
+        s_mov_b32 s[s_tmp+1], s[s_ka]
+        s_waitcnt lgkmcnt(0)
+        s_mov_b32 s[s_tmp+1], s[s_tmp]
+    '''
+    relaxed = relax_pass(text)
+    assert ops_of(relaxed).count('s_waitcnt lgkmcnt(0)') == 1 and relax_pass.num_removed == 1, f"{relaxed}"
+    text = '''
+        ds_read_b64 v[v_a:v_a+1], v[v_sld_os]
+        ds_read_b32 v[v_b], v[v_sld_os] offset:256
+        s_waitcnt lgkmcnt(0)
+        v_mov_b32 v[v_tmp], v[v_a]
+        s_waitcnt lgkmcnt(0)
+        v_mov_b32 v[v_tmp], v[v_b]
+    '''
+    assert ops_of(relax_pass(text))[2] == 's_waitcnt lgkmcnt(1)' and relax_pass.num_removed == 0
+
+    # out of order use is caught by checker
+    text = '''
+        ds_read_b32 v[v_a], v[v_sld_os]
+        ds_read_b32 v[v_b], v[v_sld_os] offset:256
+        s_waitcnt lgkmcnt(1)
+        v_mov_b32 v[v_tmp], v[v_b]
+    '''
+    assert len(checker(text)) == 1
+
+    num_checked, num_waitcnt, num_relaxed = 0, 0, 0
+    for config_file, tunable, kernel, text in get_config_kernels():
+        symbol_table = sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None))
+        relax_pass = waitcnt_relax_pass_t(symbol_table)
+        checker = waitcnt_checker_t(symbol_table)
+        relaxed = relax_pass(text)
+        # no new violation, compared by message since removed s_waitcnt shift line number. some multi_k kernel
+        # already has s_barrier with outstanding ds_write before relax
+        existing = set(m for _, m in checker(text))
+        violations = [v for v in checker(relaxed) if v[1] not in existing]
+        assert violations == [], f"{kernel.name()} waitcnt violation after relax, {violations}"
+        num_checked, num_waitcnt, num_relaxed = num_checked + 1, num_waitcnt + relax_pass.num_waitcnt, num_relaxed + relax_pass.num_relaxed
+    print(f"{num_checked} kernels checked, {num_relaxed} of {num_waitcnt} s_waitcnt relaxed")
+
+def unittest_gpr_allocator():
+    '''
+    gpr not live in any common phase share the same index, and a block keep its alignment. for every gfx908 kernel packed
+    by gpr_allocator_t, each vgpr symbol should only be accessed in the live range and inside the extent of its block,
+    and v0 of local id only be read in prologue
+    '''
+    import re
+    P, L, E = GPR_LIVE_PROLOGUE, GPR_LIVE_LOOP, GPR_LIVE_EPILOGUE
+    class holder_t(object):
+        pass
+    vseq = gpr_allocator_t(granularity = 2)
+    h = holder_t()
+    h.v_c       = sym_t("v_c"    , vseq(8, live=E))
+    h.v_a       = sym_t("v_a"    , vseq(4, live=L))
+    h.v_gld     = sym_t("v_gld"  , vseq(4, live=P|L))
+    h.v_os      = sym_t("v_os"   , vseq(1, live=P|L))
+    h.v_idx     = sym_t("v_idx"  , vseq(1, live=P))
+    h.v_tmp     = sym_t("v_tmp"  , vseq(4, 2))
+    h.v_alias   = sym_t("v_alias", h.v_idx.value)
+    assert vseq() == 22
+    try:
+        vseq(1, live=P|E)
+        assert False, "live range of prologue and epilogue should also cover loop"
+    except AssertionError as e:
+        assert 'not continuous' in str(e)
+    vseq.reserve(0, 1, P)
+    vseq.pack(h)
+    # v_tmp live in all phase is placed first after v0, v_gld/v_os move together, v_c reuse v_gld/v_os/v_a
+    packed = {k : v.value for k, v in vars(h).items()}
+    assert packed == {'v_c' : 6, 'v_a' : 12, 'v_gld' : 6, 'v_os' : 10, 'v_idx' : 1, 'v_tmp' : 2, 'v_alias' : 1}, f"{packed}"
+    assert vseq() == 16
+
+    re_sym = re.compile(r'\b(v_[A-Za-z0-9_]+)((?:\+\d+)*)')
+    re_v0 = re.compile(r'\bv0\b|\bv\[0[\]:]')
+    num_checked, num_vgpr_linear, num_vgpr_packed = 0, 0, 0
+    for config_file, tunables, kernels, texts in get_config_kernels(variants = [{'gpr_pack' : 0}, {'gpr_pack' : 1}]):
+        kernel = kernels[1]
+        vgpr_count = [k.vgpr.get_count() for k in kernels]
+        assert vgpr_count[1] <= vgpr_count[0], f"{kernel.name()} packed vgpr {vgpr_count[1]} more than linear {vgpr_count[0]}"
+        allocator = kernel.vgpr.gpr_allocator
+        phase = 0       # 0:prologue, 1:loop, 2:epilogue, same bit as GPR_LIVE_*
+        for line in texts[1].split('\n'):
+            if line.startswith('; coalescing store'):
+                phase = 2
+            inst = line.split(';')[0].strip()
+            if phase == 0 and re.match(r'L_\S+_body:', inst):
+                phase = 1
+            assert phase == 0 or not re_v0.search(inst), f"{kernel.name()}, local id read after prologue, {inst}"
+            for label, offset in re_sym.findall(inst):
+                if label not in allocator.symbols:
+                    continue
+                b = allocator.symbols[label]
+                index = getattr(kernel.vgpr, label).value + sum(int(x) for x in offset.split('+')[1:])
+                assert b.live & (1 << phase), f"{kernel.name()}, {label} not live in phase {phase}, {inst}"
+                assert b.packed_offset <= index < b.packed_offset + b.step, f"{kernel.name()}, {label}{offset} out of block, {inst}"
+        num_checked, num_vgpr_linear, num_vgpr_packed = num_checked + 1, num_vgpr_linear + vgpr_count[0], num_vgpr_packed + vgpr_count[1]
+    print(f"{num_checked} kernels checked, vgpr {num_vgpr_linear} -> {num_vgpr_packed}")
+
+def unittest_peephole():
+    '''
+    each rule of peephole_pass_t on string level. for every gfx908 kernel, memory op, label, branch and macro
+    should stay the same after the pass, and no s_waitcnt violation be introduced
+    '''
+    symbol_table = {'v_a' : 0, 'v_b' : 1, 'v_tmp' : 4, 'v_os' : 8, 's_p' : 0, 's_x' : 4, 's_y' : 5, 's_tmp' : 8}
+    def run(rules, text):
+        peephole_pass = peephole_pass_t(symbol_table, rules)
+        return [l.split(';')[0].strip() for l in peephole_pass(text).split('\n') if l.strip() != ''], peephole_pass
+
+    # self_move, not removed close to s_nop that may count on it as wait state
+    out, pp = run(['self_move'], 'v_mov_b32 v[v_a], v[v_a]\nv_add_u32 v[v_b], 1, v[v_a]')
+    assert out == ['v_add_u32 v[v_b], 1, v[v_a]'] and pp.num_removed == 1 and pp.rule_count['self_move'] == 1
+    out, pp = run(['self_move'], 'v_mov_b32 v[v_a], v[v_a]\ns_nop 1\nv_add_u32 v[v_b], 1, v[v_a]')
+    assert pp.num_removed == 0
+
+    # shift_zero, salu only if scc is not used before defined again
+    out, pp = run(['shift_zero'], 's_lshl_b32 s[s_tmp], s[s_x], 0\ns_add_u32 s[s_y], s[s_y], 1\nv_lshlrev_b32 v[v_tmp], 0, v[v_a]')
+    assert out == ['s_mov_b32 s[s_tmp], s[s_x]', 's_add_u32 s[s_y], s[s_y], 1', 'v_mov_b32 v[v_tmp], v[v_a]'], f"{out}"
+    out, pp = run(['shift_zero'], 's_lshr_b32 s[s_tmp], s[s_x], 0\ns_mul_i32 s[s_y], s[s_y], 3\ns_cbranch_scc0 L_end\nL_end:')
+    assert pp.num_rewritten == 0, "s_mul_i32 does not write scc"
+
+    # add_zero, carry out to scc or vcc is kept
+    out, pp = run(['add_zero'], 'v_add_u32 v[v_b], v[v_a], 0\nv_sub_u32 v[v_tmp], 0, v[v_a]\nv_add_co_u32 v[v_os], vcc, 0, v[v_a]')
+    assert out == ['v_mov_b32 v[v_b], v[v_a]', 'v_sub_u32 v[v_tmp], 0, v[v_a]', 'v_add_co_u32 v[v_os], vcc, 0, v[v_a]'], f"{out}"
+    out, pp = run(['add_zero'], 's_add_u32 s[s_tmp], 0, s[s_x]\ns_addc_u32 s[s_tmp+1], s[s_y], 0')
+    assert pp.num_rewritten == 0
+
+    # redundant, not if any of source, destination, or exec is written in between, or inst reading its own dst
+    out, pp = run(['redundant'], 's_mov_b32 s[s_tmp], 16\nv_mov_b32 v[v_b], v[v_a]\ns_waitcnt lgkmcnt(0)\nv_mov_b32 v[v_b], v[v_a]\ns_mov_b32 s[s_tmp], 16')
+    assert out == ['s_mov_b32 s[s_tmp], 16', 'v_mov_b32 v[v_b], v[v_a]', 's_waitcnt lgkmcnt(0)'] and pp.num_removed == 2, f"{out}"
+    for between in ('v_add_u32 v[v_a], 1, v[v_a]', 's_mov_b64 exec, -1', 'L_loop:'):
+        out, pp = run(['redundant'], f'v_mov_b32 v[v_b], v[v_a]\n{between}\nv_mov_b32 v[v_b], v[v_a]')
+        assert pp.num_removed == 0, f"{between}"
+    out, pp = run(['redundant'], 's_lshl_b32 s[s_x], s[s_x], 2\ns_lshl_b32 s[s_x], s[s_x], 2')
+    assert pp.num_removed == 0
+
+    # copy_propagate, only from the same register file, and source not written in between
+    out, pp = run(['copy_propagate'], 'v_mov_b32 v[v_tmp], v[v_a]\nv_lshlrev_b32 v[v_b], 2, v[v_tmp]')
+    assert out[1] == 'v_lshlrev_b32 v[v_b], 2, v[v_a]', f"{out}"
+    for text in ('v_mov_b32 v[v_tmp], v[v_a]\nv_add_u32 v[v_a], 1, v[v_a]\nv_lshlrev_b32 v[v_b], 2, v[v_tmp]',
+                    'v_mov_b32 v[v_tmp], s[s_x]\nv_lshlrev_b32 v[v_b], 2, v[v_tmp]',
+                    'v_mov_b32 v[v_tmp], v[v_a]\ns_and_saveexec_b64 s[s_tmp:s_tmp+1], vcc\nv_lshlrev_b32 v[v_b], 2, v[v_tmp]'):
+        out, pp = run(['copy_propagate'], text)
+        assert pp.num_rewritten == 0, f"{text}"
+
+    # dead_write, not across label, nor if a vgpr is written again after exec changed, nor if read by v_mac
+    out, pp = run(['dead_write'], 'v_mov_b32 v[v_tmp], v[v_a]\nv_mov_b32 v[v_tmp], 0\nds_write_b32 v[v_os], v[v_tmp]')
+    assert out == ['v_mov_b32 v[v_tmp], 0', 'ds_write_b32 v[v_os], v[v_tmp]'], f"{out}"
+    for text in ('v_mov_b32 v[v_tmp], v[v_a]\nL_loop:\nv_mov_b32 v[v_tmp], 0',
+                    'v_mov_b32 v[v_tmp], v[v_a]\ns_and_saveexec_b64 s[s_tmp:s_tmp+1], vcc\nv_mov_b32 v[v_tmp], 0',
+                    'v_mov_b32 v[v_tmp], v[v_a]\nv_mac_f32 v[v_tmp], v[v_a], v[v_b]'):
+        out, pp = run(['dead_write'], text)
+        assert pp.num_removed == 0, f"{text}"
+
+    # all rules together, the pad b chain of bwd
+    out, pp = run(None, '''
+        s_add_u32 s[s_tmp], 0, s[s_x]
+        s_lshr_b32 s[s_tmp+1], s[s_tmp], 0
+        s_lshl_b32 s[s_y], s[s_tmp+1], 0
+        s_mul_i32 s[s_tmp], s[s_y], 3
+        s_mov_b32 s[s_tmp+1], 0
+        s_cmp_eq_u32 s[s_tmp], 0
+    ''')
+    assert out == ['s_mov_b32 s[s_y], s[s_x]', 's_mul_i32 s[s_tmp], s[s_x], 3', 's_mov_b32 s[s_tmp+1], 0', 's_cmp_eq_u32 s[s_tmp], 0'], f"{out}"
+    assert pp.num_removed == 2 and pp.num_inst == 6
+
+    num_checked, num_inst, num_removed = 0, 0, 0
+    for config_file, tunable, kernel, text in get_config_kernels():
+        symbol_table = sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None))
+        peephole_pass = peephole_pass_t(symbol_table)
+        optimized = peephole_pass(text)
+        def not_alu(t):
+            insts = [peephole_pass.parse_line(l) for l in t.split('\n')]
+            return [l.split(';')[0].strip() for l, inst in zip(t.split('\n'), insts) if inst is not None and inst.kind != 'inst']
+        assert not_alu(text) == not_alu(optimized), f"{kernel.name()} non alu inst changed"
+        checker = waitcnt_checker_t(symbol_table)
+        existing = set(m for _, m in checker(text))
+        violations = [v for v in checker(optimized) if v[1] not in existing]
+        assert violations == [], f"{kernel.name()} waitcnt violation after peephole, {violations}"
+        num_checked, num_inst, num_removed = num_checked + 1, num_inst + peephole_pass.num_inst, num_removed + peephole_pass.num_removed
+    print(f"{num_checked} kernels checked, {num_removed} of {num_inst} inst removed")
+
+def unittest_global_macro_referenced():
+    '''
+    only global macros invoked by kernels are emitted, each defined before first use. other than
+    unreferenced global macros, content is the same as emitting every global macro
+    '''
+    import os, re, tempfile
+    import igemm.igemm_codegen_driver as igemm_codegen_driver
+    config_content = config_parser_t(os.path.join('config', 'igemm_bwd_gtc_gfx908.config'))()
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:8]
+    for td in tunable_dicts:
+        td['arch'] = 'gfx908'
+    def emit(referenced_only):
+        igemm_codegen_driver.IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY = referenced_only
+        out_dir = tempfile.mkdtemp()
+        mc = mc_asm_printer_t(mc_emit_to_file_t(os.path.join(out_dir, 'igemm_bwd_gtc_gfx908.s')), amdgpu_arch_config_t({'arch' : AMDGPU_ARCH_GFX908}))
+        driver = igemm_codegen_driver_t(mc, tunable_dicts)
+        driver.do_emit()
+        mc.close()
+        def expand(file_name):
+            lines = list()
+            for line in open(file_name).read().split('\n'):
+                m = re.match(r'^\s*\.include\s+"([^"]+)"', line)
+                lines.extend(expand(os.path.join(out_dir, m.group(1))) if m else [line])
+            return lines
+        return driver, expand(os.path.join(out_dir, 'igemm_bwd_gtc_gfx908.s'))
+    try:
+        driver, lines = emit(1)
+        _, lines_all = emit(0)
+    finally:
+        igemm_codegen_driver.IGEMM_EMIT_GLOBAL_MACRO_REFERENCED_ONLY = 1
+
+    names = [m.name() for m in driver.get_global_macros()]
+    defined, invoked = dict(), dict()
+    for i, line in enumerate(lines):
+        tokens = line.split()
+        if len(tokens) >= 2 and tokens[0] == '.macro' and tokens[1] in names:
+            defined[tokens[1]] = i
+        elif len(tokens) >= 1 and tokens[0] in names and tokens[0] not in invoked:
+            invoked[tokens[0]] = i
+    assert set(defined.keys()) == set(invoked.keys()), f"defined:{sorted(defined.keys())}, invoked:{sorted(invoked.keys())}"
+    for n in invoked:
+        assert defined[n] < invoked[n], f"{n} used before defined"
+    assert driver.num_global_macro_skipped == len(names) - len(defined)
+    skipped = [n for n in names if n not in defined]
+    def drop_macro(lines, skipped):
+        kept, dropping = list(), False
+        for line in lines:
+            tokens = line.split()
+            if len(tokens) >= 2 and tokens[0] == '.macro' and tokens[1] in skipped:
+                dropping = True
+            if not dropping:
+                kept.append(line)
+            if dropping and len(tokens) >= 1 and tokens[0] == '.endm':
+                dropping = False
+        return [l for l in kept if l.strip() != '']
+    assert drop_macro(lines_all, skipped) == [l for l in lines if l.strip() != '']
+    print(f"{len(defined)} of {len(names)} global macros emitted, {driver.global_macro_bytes_skipped} bytes skipped")
+
+def unittest_macro_inline():
+    '''
+    with inline_macro of MC, every macro_base_t is expanded at the call site and no .macro is emitted,
+    otherwise the text of legacy macro is unchanged
+    '''
+    import os, re
+    def get_mc(inline_macro):
+        mc = mc_asm_printer_t(mc_emit_to_string_t(), amdgpu_arch_config_t({'arch' : AMDGPU_ARCH_GFX908}))
+        mc.inline_macro = inline_macro
+        return mc
+
+    mc = get_mc(False)
+    div_rem_vs = macro_int_div_rem_vs_t(mc)
+    assert div_rem_vs('v_a', 'v_b', 'v_c', 's_d', 'v_tmp', 's_tmp') == '.v_u32_div_rem_vs v_a, v_b, v_c, s_d, v_tmp, s_tmp'
+    div_rem_vs.emit()
+    text = mc.emitter.get_buffer()
+    assert '.macro .v_u32_div_rem_vs v_r, v_q, v_n, s_d, v_tmp4, s_tmp4' in text
+    assert '.v_u32_div_vs \\v_q, \\v_n, \\s_d, \\v_tmp4, \\s_tmp4' in text
+    assert macro_c_clear_t(mc)('v_c', '16') == '.v_clear_nc v_c, 16'
+    assert macro_v_fma_mxn_t(mc, 2, 2, 4)('v_c', 'v_a', 'v_b') == '.v_fma_2x2_s4 v_c,v_a,v_b'
+
+    mc = get_mc(True)
+    div_rem_vs = macro_int_div_rem_vs_t(mc)
+    lines = [l.strip() for l in div_rem_vs('v_a', 'v_b', 'v_c', 's_d', 'v_tmp', 's_tmp').split('\n') if l.strip() != '']
+    assert len(lines) == 27 and all(not l.startswith('.') for l in lines), f"{lines}"
+    assert lines[0] == 'v_cvt_f32_u32     v[v_tmp+0],   s[s_d]'
+    assert lines[-3] == 'v_cndmask_b32     v[v_b],      -1,         v[v_tmp+2],      vcc'
+    assert lines[-1] == 'v_sub_u32 v[v_a], v[v_c], v[v_tmp]'
+    div_rem_vs.emit()
+    assert mc.emitter.get_buffer() == ''
+    lines = macro_c_clear_t(mc)('v_c', '3').split('\n')
+    assert [l.strip() for l in lines if l.strip() != ''] == ['v_mov_b32 v[v_c], 0', 'v_mov_b32 v[v_c+1], 0', 'v_mov_b32 v[v_c+2], 0']
+    assert '.rept num_c' in macro_acc_c_clear_t(mc)('a_c', 'num_c')
+    lines = macro_v_fma_mxn_t(mc, 2, 2, 4)('v_c+8', 'v_a', 'v_b').split('\n')
+    assert len(lines) == 4 and lines[3] == 'v_mac_f32 v[v_c+8+5], v[v_a+1], v[v_b+1]', f"{lines}"
+
+    # kernel body in macro_inline mode has no macro invocation left, and s_waitcnt is still satisfied
+    config_content = config_parser_t(os.path.join('config', 'igemm_fwd_gtc_gfx908.config'))()
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:8]
+    for td in tunable_dicts:
+        td['arch'] = 'gfx908'
+        num_inst = dict()
+        for macro_inline in (0, 1):
+            td['macro_inline'] = macro_inline
+            tunable = igemm_gtc_tunable_parameter_t(td)
+            mc = get_mc(False)
+            kernel = igemm_fwd_gtc_t(mc, tunable)
+            kernel.emit_kernel_body()
+            text = mc.emitter.get_buffer()
+            num_inst[macro_inline] = len(re.findall(r'^\s*[a-z]', text, re.M))
+            if macro_inline:
+                calls = re.findall(r'^\s*(\.(?:v_|mdiv_|igemm_)\w*)', text, re.M)
+                assert len(calls) == 0, f"{tunable.gemm_m_per_block}x{tunable.gemm_n_per_block}, {calls[:4]}"
+                violations = waitcnt_checker_t(sym_get_table(kernel.sgpr, kernel.vgpr, kernel.agpr))(text)
+                assert len(violations) == 0, f"{violations[:4]}"
+        assert num_inst[1] > num_inst[0]
+        print(f"{tunable.gemm_m_per_block}x{tunable.gemm_n_per_block}x{tunable.gemm_k_per_block}, {num_inst[0]} -> {num_inst[1]} inst after inline")
+
+def unittest_icache_estimator():
+    '''
+    encoding size follow the vop2/vop3 promotion and literal rule, main loop is counted from body to finishing label
+    '''
+    import os
+    estimator = igemm_icache_estimator_t(amdgpu_get_arch_detail('gfx908'), symbol_table = {'lds_single_size' : 16384, 'lds_buffer_num' : 2})
+    expected = {'s_mov_b32 s[s_tmp], 64'                        : (4, False),
+                's_mov_b32 s[s_tmp], 0xffffffff'                : (4, False),
+                's_mul_i32 s[s_tmp], 65, s[s_a]'                : (8, True),
+                's_add_u32 s[s_tmp], s[s_a], lds_single_size'   : (8, True),
+                's_add_u32 s[s_tmp], s[s_a], unknown_size'      : (8, True),
+                's_mul_i32 s[s_tmp], s[s_a], lds_buffer_num*4'  : (4, False),
+                's_waitcnt lgkmcnt(0)'                          : (4, False),
+                's_load_dwordx4 s[0:3], s[4:5], 0+k_p_in'       : (8, False),
+                'v_add_u32 v[v_a], s[s_b], v[v_c]'              : (4, False),
+                'v_add_u32 v[v_a], v[v_c], s[s_b]'              : (8, False),
+                'v_add_u32 v[v_a], 0x3f800000, v[v_c]'          : (4, False),
+                'v_add_u32 v[v_a], 256, v[v_c]'                 : (8, True),
+                'v_mul_lo_u32 v[v_a], v[v_b], v[v_c]'           : (8, False),
+                'v_cmp_eq_u32 vcc, 1, v[v_a]'                   : (4, False),
+                'v_cmp_eq_u32 s[0:1], 1, v[v_a]'                : (8, False),
+                'v_cndmask_b32 v[v_a], v[v_b], v[v_c], vcc'     : (4, False),
+                'v_cndmask_b32 v[v_a], v[v_b], v[v_c], s[0:1]'  : (8, False),
+                'v_add_co_u32 v[v_a], vcc, -1, v[v_b]'          : (4, False),
+                'v_mov_b32 v[v_a], 1.5'                         : (8, True),
+                'v_mac_f32 v[v_a], -v[v_b], v[v_c]'             : (8, False),
+                'v_mfma_f32_32x32x2f32 a[0:15], v[0], v[1], a[0:15]' : (8, False),
+                'ds_read_b128 v[0:3], v[4] offset:256'          : (8, False),
+                'buffer_load_dword v[0], v[1], s[0:3], 0 offen offset:0' : (8, False)}
+    for inst, (inst_bytes, has_literal) in expected.items():
+        assert estimator.get_inst_size(inst) == (inst_bytes, has_literal), f"{inst}, {estimator.get_inst_size(inst)}"
+
+    asm = '''
+    s_mov_b32 s[0], 0x100
+L_test_mfma_body:
+    ds_read_b32 v[2], v[3]          ; 8
+    s_waitcnt lgkmcnt(0)            ; 4
+    v_add_u32 v[3], 0x200, v[3]     ; 8, with literal
+    s_branch L_test_mfma_body       ; 4
+L_test_mfma_finishing:
+    s_endpgm
+'''
+    size = estimator.estimate_text(asm)
+    assert (size.loop_bytes, size.loop_num_inst, size.loop_num_literal) == (24, 4, 1)
+    assert (size.total_bytes, size.num_inst, size.num_literal) == (36, 6, 2)
+    assert not size.is_over_budget()
+
+    config_content = config_parser_t(os.path.join('config', 'igemm_fwd_gtc_gfx908.config'))()
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:8]
+    small_estimator = igemm_icache_estimator_t(amdgpu_get_arch_detail('gfx908'), icache_budget = 1024)
+    for td in tunable_dicts:
+        td['arch'] = 'gfx908'
+        tunable = igemm_gtc_tunable_parameter_t(td)
+        size = estimator.estimate(tunable)
+        assert tunable.macro_inline == 0
+        assert 0 < size.loop_bytes < size.total_bytes and size.icache_budget == 65536 and not size.is_over_budget()
+        assert small_estimator.estimate(tunable).is_over_budget() == (size.loop_bytes > 1024)
+        print(f"{size.name}, loop:{size.loop_bytes}B/{size.loop_num_inst}inst, total:{size.total_bytes}B/{size.num_inst}inst")
+
+def unittest_lds_bank_simulator():
+    '''
+    per lane lds address is replayed from thread id, cycles counted per 128 byte group of lanes
+    '''
+    import os
+    simulator = igemm_lds_bank_simulator_t(amdgpu_get_arch_detail('gfx908'), block_size = 128, symbol_table = {'v_os' : 1, 'v_tmp' : 2, 's_tmp' : 0})
+    asm = '''
+    v_lshlrev_b32 v[v_os], 2, v0
+    ds_write_b32 v[v_os], v[v_tmp]                          ; 2 groups of 32 lanes per wave, no conflict
+    ds_write2st64_b32 v[v_os], v[v_tmp], v[v_tmp+1], offset0:0, offset1:1
+    v_lshlrev_b32 v[v_tmp+2], 3, v0
+    ds_read_b32 v[v_tmp], v[v_tmp+2] offset:128             ; stride 2 dword, 2 way conflict
+    v_mov_b32 v[v_tmp+3], 0
+    ds_read_b32 v[v_tmp], v[v_tmp+3]                        ; broadcast
+    v_lshlrev_b32 v[v_tmp+2], 4, v0
+    ds_read_b128 v[v_tmp:v_tmp+3], v[v_tmp+2]               ; 8 groups of 8 lanes per wave, no conflict
+    v_and_b32 v[v_tmp+4], 15, v0
+    v_lshl_or_b32 v[v_tmp+4], v[v_tmp+4], 7, 0
+    ds_read_b64 v[v_tmp:v_tmp+1], v[v_tmp+4]                ; stride 32 dword, 16 lanes in one bank pair
+    ; coalescing store, mapping:test
+    s_load_dword s[s_tmp], s[0:1], 0
+    s_waitcnt lgkmcnt(0)
+    v_mov_b32 v[v_tmp+5], s[s_tmp]
+    ds_write_b128 v[v_tmp+5], v[v_tmp:v_tmp+3]              ; address from kernarg
+    v_mad_u32_u24 v[v_tmp+5], v0, 8, 4
+    ds_read_b64 v[v_tmp:v_tmp+1], v[v_tmp+5]
+'''
+    report = simulator.simulate_text(asm)
+    stat = report.phases[IGEMM_LDS_PHASE_MAIN_LOOP_SST]
+    assert (stat.num_inst, stat.num_unresolved, stat.cycles, stat.ideal_cycles) == (2, 0, 12, 12)
+    stat = report.phases[IGEMM_LDS_PHASE_MAIN_LOOP_SLD]
+    assert (stat.num_inst, stat.num_unresolved, stat.cycles, stat.ideal_cycles) == (4, 0, 8 + 4 + 16 + 128, 4 + 4 + 16 + 8)
+    stat = report.phases[IGEMM_LDS_PHASE_COALESCING_SST]
+    assert (stat.num_inst, stat.num_unresolved, stat.cycles) == (1, 1, 0)
+    stat = report.phases[IGEMM_LDS_PHASE_COALESCING_SLD]
+    assert (stat.num_inst, stat.num_unresolved, stat.conflict_cycles()) == (1, 0, 0)
+    assert report.conflict_cycles() == 4 + 120
+
+    config_content = config_parser_t(os.path.join('config', 'igemm_fwd_gtc_gfx908.config'))()
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:8]
+    simulator = igemm_lds_bank_simulator_t(amdgpu_get_arch_detail('gfx908'))
+    for td in tunable_dicts:
+        td['arch'] = 'gfx908'
+        report = simulator.simulate(igemm_gtc_tunable_parameter_t(td))
+        for phase, stat in report.phases.items():
+            assert stat.num_inst > 0 and stat.num_unresolved == 0 and stat.cycles >= stat.ideal_cycles > 0, f"{report.name}, {phase}"
+        print(f"{report.name}, " + ', '.join(f"{p}:{s.cycles}/{s.ideal_cycles}" for p, s in report.phases.items()))
+
+def unittest_global_coalescing_analyzer():
+    '''
+    per lane buffer address is replayed from thread id and kernel argument, segments counted per wave
+    '''
+    import os
+    analyzer = igemm_global_coalescing_analyzer_t(amdgpu_get_arch_detail('gfx908'))
+    analyzer.block_size = 128
+    analyzer.analyzer = mc_inst_analyzer_t({'s_ka' : 0, 's_p_in' : 4, 's_p_out' : 8, 'v_os' : 1, 'v_tmp' : 2})
+    analyzer.kernarg = {0 : 0x1000, 4 : 0}
+    asm = '''
+    s_load_dwordx2 s[s_p_in:s_p_in+1], s[s_ka:s_ka+1], 0
+    s_mov_b32 s[s_p_in+2], 1024
+    s_mov_b32 s[s_p_out], 0
+    s_mov_b32 s[s_p_out+2], 0xffffffff
+    s_waitcnt lgkmcnt(0)
+    v_lshlrev_b32 v[v_os], 2, v0
+    buffer_load_dword v[v_tmp], v[v_os], s[s_p_in:s_p_in+3], 0 offen offset:0     ; contiguous
+    v_lshlrev_b32 v[v_os], 4, v0
+    buffer_load_dword v[v_tmp], v[v_os], s[s_p_in:s_p_in+3], 0 offen offset:0     ; stride 16 byte, second wave out of num_records
+    v_lshlrev_b32 v[v_os], 3, v0
+    v_cmpx_gt_u32 vcc, 32, v0
+    buffer_store_dwordx2 v[v_tmp:v_tmp+1], v[v_os], s[s_p_out:s_p_out+3], 0 offen offset:8     ; half wave
+    s_mov_b64 exec, -1
+    buffer_load_dword v[v_tmp], v[v_tmp+7], s[s_p_in:s_p_in+3], 0 offen offset:0     ; address unknown
+'''
+    report = analyzer.analyze_text(asm)
+    assert report.get_tensors() == ['in', 'out'] and report.num_unresolved() == 1
+    a = [(x.num_lanes, x.useful_bytes, x.segments_64, x.segments_128) for x in report.get_accesses()]
+    assert a == [(128, 512, 8, 4), (64, 256, 16, 8), (32, 256, 5, 3)], f"{a}"
+    assert report.efficiency('in', False) == 768 / (24 * 64) and report.efficiency('out', True, 128) == 256 / (3 * 128)
+
+    shapes = {'1x1' : [64, 1, 256, 28, 28, 256, 1, 1, 0, 0, 1, 1, 1, 1], '3x3' : [64, 1, 256, 28, 28, 256, 3, 3, 1, 1, 1, 1, 1, 1]}
+    for direction in ('fwd', 'bwd', 'wrw'):
+        config_content = config_parser_t(os.path.join('config', f'igemm_{direction}_gtc_gfx908.config'))()
+        tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:4]
+        for td in tunable_dicts:
+            td['arch'] = 'gfx908'
+            tunable = igemm_gtc_tunable_parameter_t(td)
+            for shape_name, shape in shapes.items():
+                if shape_name != '1x1' and tunable.nxe == 0:
+                    continue
+                conv_param = conv_param_t(*shape, 0, 0, tunable.direction, tunable.precision)
+                analyzer = igemm_global_coalescing_analyzer_t(amdgpu_get_arch_detail('gfx908'))
+                report = analyzer.analyze(tunable, conv_param)
+                assert report.num_unresolved() == 0 and len(report.get_tensors()) == 3, f"{report.name}, {shape_name}"
+                for tensor in report.get_tensors():
+                    assert 0 < report.efficiency(tensor, segment_size = 128) <= report.efficiency(tensor) <= 1, f"{report.name}, {shape_name}, {tensor}"
+                print(f"{report.name}, {shape_name}, " + ', '.join(f"{t}:{report.efficiency(t):.2f}/{report.efficiency(t, segment_size = 128):.2f}" for t in report.get_tensors()))
+
+def unittest_coalescing_store_cost_model():
+    '''
+    inst count of cost model should be the same as emitted coalescing store, and 'auto' never lose occupancy
+    '''
+    import os
+    arch_detail = amdgpu_get_arch_detail('gfx908')
+    for direction in ('fwd', 'bwd', 'wrw'):
+        config_content = config_parser_t(os.path.join('config', f'igemm_{direction}_gtc_gfx908.config'))()
+        tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:4]
+        for td in tunable_dicts:
+            td['arch'] = 'gfx908'
+            tunable = igemm_gtc_tunable_parameter_t(td)
+            td['coalescing_store_groups'] = 'auto'
+            tunable_auto = igemm_gtc_tunable_parameter_t(td)
+            assert "coalescing_store_groups    = 'auto'" in tunable_auto.serialize_as_section()
+            assert igemm_resource_estimator_t(tunable_auto).get_occupancy(arch_detail) >= \
+                    igemm_resource_estimator_t(tunable).get_occupancy(arch_detail)
+
+            ctrl = ctrl_coalescing_store_xdlops_t()
+            ctrl.cxm = get_ctrl_xdlops_mapping(tunable.gemm_m_per_block, tunable.gemm_n_per_block, tunable.wave_tile_m, tunable.wave_tile_n,
+                                tunable.precision, tunable.block_size // AMDGPU_WAVE_SIZE)
+            ctrl.data_byte = amdgpu_precision_data_byte(tunable.precision)
+            ctrl.block_size = tunable.block_size
+            model = coalescing_store_cost_model_t(ctrl)
+            legal_groups = model.get_legal_groups()
+            assert legal_groups[0] == 1 and tunable.coalescing_store_groups in legal_groups and tunable_auto.coalescing_store_groups in legal_groups
+            for groups in legal_groups:
+                if tunable.get_coalescing_store_lds_buffer_num(groups) * tunable.lds_single > arch_detail.lds_size:
+                    continue        # rejected by tunable, c matrix of one group not fit in lds
+                td['coalescing_store_groups'] = groups
+                tunable_groups = igemm_gtc_tunable_parameter_t(td)
+                kernel, asm = igemm_lane_replay_t(arch_detail).emit_kernel(tunable_groups)
+                ctrl.vector_write_out = kernel.coalescing_store.ctrl.vector_write_out
+                cost = model.get_cost(groups)
+                assert tunable_groups.coalescing_store_groups == groups and tunable_groups.lds_total >= cost.lds_bytes
+                assert cost.lds_bytes * groups == model.get_cost(1).lds_bytes and cost.num_barrier == 2 * groups
+
+                asm = asm[asm.index('; coalescing store'):]
+                emitted = tuple(asm.count(i) for i in ('s_barrier', 'v_accvgpr_read', 'ds_write', 'ds_read')) + (asm.count('buffer_store') + asm.count('buffer_atomic'),)
+                expected = (cost.num_barrier, cost.num_accvgpr_read, cost.num_ds_write, cost.num_ds_read, cost.num_buffer_store)
+                assert emitted == expected, f"{kernel.name()}, groups:{groups}, emitted:{emitted}, expected:{expected}"
+            print(f"{kernel.name()}, groups:{tunable.coalescing_store_groups}, auto:{tunable_auto.coalescing_store_groups}, " + \
+                    f"legal:{legal_groups}, {model.select(lds_budget = tunable.lds_total).serialize()}")
+
+def unittest_coalescing_store_vector_write_out():
+    '''
+    coalescing store with vector_write_out > 1 should write every output element once, from the same agpr and lane as vector_write_out 1
+    '''
+    import os
+    arch_detail = amdgpu_get_arch_detail('gfx908')
+    for config_file in ('igemm_fwd_gtc_gfx908.config', 'igemm_bwd_gtc_gfx908.config', 'igemm_wrw_gtc_gfx908.config', 'igemm_fwd_gtc_gfx908_fp16.config'):
+        config_content = config_parser_t(os.path.join('config', config_file))()
+        tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')][:4]
+        num_vector = 0
+        for td in tunable_dicts:
+            td['arch'] = 'gfx908'
+            tunable = igemm_gtc_tunable_parameter_t(td)
+            if tunable.nxe != 0 and tunable.direction != 'wrw':
+                continue        # vector_write_out is 1 for fwd/bwd with nxe != 0
+            gemm_m, gemm_n, nxb = tunable.gemm_m_per_block, tunable.gemm_n_per_block, tunable.nxb
+            if tunable.direction == 'fwd':
+                shape = [2 * gemm_n // nxb, 1, 64, 1, nxb, 2 * gemm_m, 1, 1, 0, 0, 1, 1, 1, 1]
+            elif tunable.direction == 'bwd':
+                shape = [2 * gemm_n // nxb, 1, 2 * gemm_m, 1, nxb, 64, 1, 1, 0, 0, 1, 1, 1, 1]
+            else:
+                shape = [2, 1, 2 * gemm_n, 4, 4, 2 * gemm_m] + ([1, 1, 0, 0] if tunable.nxe == 0 else [3, 3, 1, 1]) + [1, 1, 1, 1]
+            conv_param = conv_param_t(*shape, 0, 0, tunable.direction, tunable.precision)
+            num_elements = {'fwd' : conv_param.n * conv_param.k * conv_param.ho * conv_param.wo,
+                            'bwd' : conv_param.n * conv_param.c * conv_param.hi * conv_param.wi,
+                            'wrw' : conv_param.k * conv_param.c * conv_param.y * conv_param.x}[tunable.direction]
+            traces = dict()
+            for vector_write_out in ('auto', 1):
+                td['vector_write_out'] = vector_write_out
+                trace = igemm_coalescing_store_tracer_t(arch_detail).trace_store(igemm_gtc_tunable_parameter_t(td), conv_param)
+                assert trace.is_written_exactly_once(num_elements), f"{trace.name}, vector_write_out:{trace.vector_write_out}"
+                traces[vector_write_out] = trace
+            trace = traces['auto']
+            assert trace.get_map() == traces[1].get_map(), f"{trace.name}, vector_write_out:{trace.vector_write_out}"
+            num_vector += 1 if trace.vector_write_out != 1 else 0
+            print(f"{trace.name}, vector_write_out:{trace.vector_write_out}, {len(trace.addr)} element written once")
+        assert num_vector > 0, f"{config_file}, no vector_write_out > 1 chosen"
+
+def unittest_coalescing_store_index_table():
+    '''
+    index table of xdlops coalescing store by numpy should be the same as python loop, and a cached table modified by caller
+    should not change the next one
+    '''
+    import copy
+    import igemm.algo.coalescing_store
+    num_checked = 0
+    for precision, mappings in (('fp32', ctrl_xdlops_mapping_fp32), ('fp16', ctrl_xdlops_mapping_fp16)):
+        for cxm in mappings:
+            for gemm_m_order in (IGEMM_COALESCING_GEMM_M_ORDER_M0_M1, IGEMM_COALESCING_GEMM_M_ORDER_M1_M0):
+                ctrl = ctrl_coalescing_store_xdlops_t()
+                ctrl.cxm = cxm
+                ctrl.block_size = cxm.block_size()
+                ctrl.data_byte = amdgpu_precision_data_byte(precision)
+                ctrl.gemm_m_order = gemm_m_order
+                ctrl.gemm_m_m0_m1 = [4, cxm.macro_tile_m // 4]
+                for groups in coalescing_store_cost_model_t(ctrl).get_legal_groups():
+                    ctrl.coalescing_groups = groups
+                    for vector_write_out in ctrl.get_legal_vector_write_out(cxm.macro_tile_n):
+                        ctrl.vector_write_out = vector_write_out
+                        tables = list()
+                        for use_numpy, use_cache in ((0, 0), (1, 0), (1, 1), (1, 1)):
+                            igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_NUMPY = use_numpy
+                            igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_CACHE = use_cache
+                            table = (ctrl.get_m_index_per_group(), ctrl.get_m_index_per_group_m1_m0(), ctrl.get_co_sub_m_index())
+                            tables.append(copy.deepcopy(table))
+                            table[0][0][0][0] = -1      # caller modify it
+                        assert all(t == tables[0] for t in tables), f"{cxm.serialize()}, groups:{groups}, vector_write_out:{vector_write_out}"
+                        assert all(type(m) is int for m in tables[0][2]), f"{cxm.serialize()}"
+                        num_checked += 1
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_NUMPY = 1
+    igemm.algo.coalescing_store.IGEMM_COALESCING_INDEX_CACHE = 1
+    print(f"{num_checked} index table checked")
+
+def unittest_xdlops_mapping_index():
+    '''
+    indexed xdlops mapping lookup should return the first match of linear search, and derived quantity is the same as uncached
+    '''
+    for precision, mappings in (('fp32', ctrl_xdlops_mapping_fp32), ('fp16', ctrl_xdlops_mapping_fp16)):
+        for t in mappings:
+            wave_tile_key = (t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.wave_tile_k, t.wave_repeat_m, t.wave_repeat_n, t.wave_step_m, t.wave_step_n, t.waves)
+            expected = [x for x in mappings if (x.macro_tile_m, x.macro_tile_n, x.wave_tile_m, x.wave_tile_n, x.wave_tile_k,
+                            x.wave_repeat_m, x.wave_repeat_n, x.wave_step_m, x.wave_step_n, x.waves) == wave_tile_key][0]
+            assert get_ctrl_xdlops_mapping_from_wave_tile(*wave_tile_key, precision) is expected
+            expected = [x for x in mappings if (x.macro_tile_m, x.macro_tile_n, x.wave_tile_m, x.wave_tile_n, x.waves) == \
+                            (t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.waves)][0]
+            assert get_ctrl_xdlops_mapping(t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, precision, t.waves) is expected
+            assert get_ctrl_xdlops_mapping_from_macro_tile(t.macro_tile_m, t.macro_tile_n, precision) == \
+                            [x for x in mappings if x.macro_tile_m == t.macro_tile_m and x.macro_tile_n == t.macro_tile_n]
+
+            uncached = ctrl_xdlops_mapping_t(t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.wave_tile_k, t.waves,
+                            t.wave_repeat_m, t.wave_repeat_n, t.wave_step_m, t.wave_step_n, t.inst_mfma)
+            assert uncached.serialize() == t.serialize() and uncached.total_acc_c() == t.total_acc_c()
+            assert (uncached.acc_c_per_thread_m(), uncached.acc_c_per_thread_n(), uncached.block_m_per_lanegroup(), uncached.block_n_per_lanegroup()) == \
+                    (t.acc_c_per_thread_m(), t.acc_c_per_thread_n(), t.block_m_per_lanegroup(), t.block_n_per_lanegroup())
+    assert get_ctrl_xdlops_mapping_from_macro_tile(3, 5, 'fp32') == []
+
+    # index is built again if a mapping is appended
+    t = ctrl_xdlops_mapping_fp32[0]
+    extra = ctrl_xdlops_mapping_t(t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, t.wave_tile_k, 2,
+                            t.wave_repeat_m, t.wave_repeat_n, t.wave_step_m, t.wave_step_n, t.inst_mfma)
+    ctrl_xdlops_mapping_fp32.append(extra)
+    try:
+        assert get_ctrl_xdlops_mapping(t.macro_tile_m, t.macro_tile_n, t.wave_tile_m, t.wave_tile_n, 'fp32', 2) is extra
+    finally:
+        ctrl_xdlops_mapping_fp32.pop()
+    assert len(get_ctrl_xdlops_mapping_from_macro_tile(t.macro_tile_m, t.macro_tile_n, 'fp32')) == \
+            len([x for x in ctrl_xdlops_mapping_fp32 if x.macro_tile_m == t.macro_tile_m and x.macro_tile_n == t.macro_tile_n])
+
+def unittest_coalescing_store_skinny_xdlops():
+    '''
+    skinny and small xdlops tiles should write every output element once, the same with or without the lds round trip
+    of coalescing store, and 256x4/4x256 should skip lds
+    '''
+    import igemm.algo.coalescing_store
+    arch_detail = amdgpu_get_arch_detail('gfx908')
+    #     direction, precision, mt_m, mt_n, wt_m, wt_n, waves, k, ta, ca, tb, cb
+    cases = [('fwd', 'fp32', 256, 4  , 64, 4 , 4, 64, [1, 64, 1, 1], [1, 1, 1, 256], [1, 1, 1, 1], [1, 64, 1, 4]),
+             ('fwd', 'fp32', 4  , 256, 4 , 64, 4, 64, [1, 1, 1, 1], [1, 64, 1, 4], [1, 64, 1, 1], [1, 1, 1, 256]),
+             ('fwd', 'fp32', 128, 4  , 64, 4 , 2, 32, [1, 32, 1, 1], [1, 1, 1, 128], [1, 1, 1, 1], [1, 32, 1, 4]),
+             ('fwd', 'fp32', 4  , 128, 4 , 64, 2, 32, [1, 1, 1, 1], [1, 32, 1, 4], [1, 32, 1, 1], [1, 1, 1, 128]),
+             ('fwd', 'fp32', 256, 16 , 64, 16, 2, 16, [1, 16, 2, 1], [1, 1, 1, 128], [1, 2, 1, 1], [1, 8, 1, 16]),
+             ('fwd', 'fp32', 16 , 256, 16, 64, 2, 16, [1, 2, 1, 1], [1, 8, 1, 16], [1, 16, 2, 1], [1, 1, 1, 128]),
+             ('fwd', 'fp32', 128, 16 , 64, 4 , 4, 16, [1, 8, 1, 1], [1, 2, 1, 128], [1, 1, 1, 1], [1, 16, 1, 16]),
+             ('fwd', 'fp32', 16 , 128, 4 , 64, 4, 16, [1, 1, 1, 1], [1, 16, 1, 16], [1, 8, 1, 1], [1, 2, 1, 128]),
+             ('fwd', 'fp16', 256, 4  , 64, 4 , 4, 64, [1, 64, 1, 1], [1, 1, 1, 256], [1, 1, 1, 1], [1, 64, 1, 4]),
+             ('fwd', 'fp16', 4  , 256, 4 , 64, 4, 64, [1, 1, 1, 1], [1, 64, 1, 4], [1, 64, 1, 1], [1, 1, 1, 256]),
+             ('fwd', 'fp16', 16 , 256, 16, 64, 2, 16, [1, 2, 1, 1], [1, 8, 1, 16], [1, 16, 2, 1], [1, 1, 1, 128]),
+             ('bwd', 'fp32', 256, 4  , 64, 4 , 4, 64, [1, 16, 4, 1], [1, 4, 1, 64], [1, 1, 1, 1], [1, 64, 1, 4]),
+             ('bwd', 'fp32', 16 , 128, 4 , 64, 4, 16, [1, 1, 1, 1], [1, 16, 1, 16], [1, 8, 1, 1], [1, 2, 1, 128]),
+             ('wrw', 'fp32', 4  , 256, 4 , 64, 4, 64, [1, 1, 1, 1], [1, 64, 1, 4], [1, 64, 1, 1], [1, 1, 1, 256]),
+             ('wrw', 'fp32', 256, 16 , 64, 16, 2, 16, [1, 8, 4, 1], [1, 2, 1, 64], [1, 2, 1, 1], [1, 8, 1, 16])]
+    for direction, precision, mt_m, mt_n, wt_m, wt_n, waves, k, ta, ca, tb, cb in cases:
+        cxm = get_ctrl_xdlops_mapping(mt_m, mt_n, wt_m, wt_n, precision, waves)
+        td = {'gemm_m_per_block' : mt_m, 'gemm_n_per_block' : mt_n, 'gemm_k_per_block' : k,
+                'wave_tile_m' : cxm.wave_tile_m, 'wave_step_m' : cxm.wave_step_m, 'wave_repeat_m' : cxm.wave_repeat_m,
+                'wave_tile_n' : cxm.wave_tile_n, 'wave_step_n' : cxm.wave_step_n, 'wave_repeat_n' : cxm.wave_repeat_n,
+                'wave_tile_k' : cxm.wave_tile_k, 'tensor_a_thread_lengths' : ta, 'tensor_a_cluster_lengths' : ca,
+                'tensor_b_thread_lengths' : tb, 'tensor_b_cluster_lengths' : cb, 'direction' : direction,
+                'precision' : precision, 'nxb' : 4 if direction == 'fwd' else 1, 'nxe' : 0, 'arch' : 'gfx908'}
+        if direction == 'wrw':
+            td['gemm_k_global_split'] = 0
+        tunable = igemm_gtc_tunable_parameter_t(td)
+        if direction == 'fwd':
+            shape = [2 * mt_n // tunable.nxb, 1, 64, 1, tunable.nxb, 2 * mt_m, 1, 1, 0, 0, 1, 1, 1, 1]
+        elif direction == 'bwd':
+            shape = [2 * mt_n, 1, 2 * mt_m, 1, 1, 64, 1, 1, 0, 0, 1, 1, 1, 1]
+        else:
+            shape = [2, 1, 2 * mt_n, 4, 4, 2 * mt_m, 1, 1, 0, 0, 1, 1, 1, 1]
+        conv_param = conv_param_t(*shape, 0, 0, direction, precision)
+        num_elements = {'fwd' : conv_param.n * conv_param.k * conv_param.ho * conv_param.wo,
+                        'bwd' : conv_param.n * conv_param.c * conv_param.hi * conv_param.wi,
+                        'wrw' : conv_param.k * conv_param.c * conv_param.y * conv_param.x}[direction]
+        traces = dict()
+        for skip_lds in (1, 0):
+            igemm.algo.coalescing_store.IGEMM_COALESCING_SKIP_LDS = skip_lds
+            try:
+                trace = igemm_coalescing_store_tracer_t(arch_detail).trace_store(tunable, conv_param)
+            finally:
+                igemm.algo.coalescing_store.IGEMM_COALESCING_SKIP_LDS = 1
+            assert trace.is_written_exactly_once(num_elements), f"{trace.name}, skip_lds:{trace.skip_lds}"
+            traces[skip_lds] = trace
+        trace = traces[1]
+        assert trace.get_map() == traces[0].get_map(), f"{trace.name}, skip_lds:{trace.skip_lds}"
+        assert not traces[0].skip_lds
+        if max(mt_m, mt_n) == 256 and min(mt_m, mt_n) == 4:
+            assert trace.skip_lds, f"{trace.name}, lds of coalescing store not skipped"
+        if tunable.block_size < mt_n:
+            assert trace.vector_write_out >= mt_n // tunable.block_size, f"{trace.name}, vector_write_out:{trace.vector_write_out}"
+        print(f"{trace.name}, skip_lds:{trace.skip_lds}, vector_write_out:{trace.vector_write_out}, {len(trace.addr)} element written once")
+
 def run_all_unittest():
     # unittest_share_memory()
     #unittest_coalescing_store()
@@ -278,6 +1272,25 @@ def run_all_unittest():
     #unittest_xdlops_mapping()
     #unittest_coalescing_store_m1_m0_xdlops_iterate()
     # unittest_thread_mapping()
+    # unittest_compile_per_inc_file()
+    # unittest_resource_estimator()
+    # unittest_arch_registry()
+    # unittest_cycle_estimator()
+    # unittest_interleave_n_way()
+    # unittest_list_scheduler()
+    # unittest_waitcnt_relax()
+    # unittest_gpr_allocator()
+    # unittest_peephole()
+    # unittest_global_macro_referenced()
+    # unittest_macro_inline()
+    # unittest_icache_estimator()
+    # unittest_lds_bank_simulator()
+    # unittest_global_coalescing_analyzer()
+    # unittest_coalescing_store_cost_model()
+    # unittest_coalescing_store_vector_write_out()
+    # unittest_coalescing_store_index_table()
+    # unittest_xdlops_mapping_index()
+    # unittest_coalescing_store_skinny_xdlops()
     unittest_macro()
 
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+# s_waitcnt relaxed by waitcnt_relax_pass_t for every kernel in config/*.config, and violations found by
+# waitcnt_checker_t before and after the pass.
+# run from top directory:
+#   python3 test/waitcnt_benchmark.py [-v] [config_file ...]
+import sys, os, glob
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from igemm import *
+
+CONFIG_DIR = 'config'
+
+def get_flatten_tunable_dicts(config_file):
+    config_content = config_parser_t(config_file)()
+    sec_root = config_content.get_section('codegen')[0]
+    if sec_root['mode'] not in ('flat', 'flatten'):
+        return None, None
+    tunable_dicts = [sec.to_dict() for sec in config_content if sec.get_name().startswith('igemm_')]
+    for td in tunable_dicts:
+        td['arch'] = sec_root['arch']
+    return amdgpu_arch_config_t({'arch' : amdgpu_string_to_arch(sec_root['arch'])}), tunable_dicts
+
+def emit_kernel_body(arch_config, tunable_dict):
+    tunable = igemm_gtc_tunable_parameter_t(tunable_dict)
+    emitter = mc_emit_to_string_t()
+    kernel_class = {'fwd' : igemm_fwd_gtc_t, 'bwd' : igemm_bwd_gtc_t, 'wrw' : igemm_wrw_gtc_t}[tunable.direction]
+    kernel = kernel_class(mc_asm_printer_t(emitter, arch_config), tunable)
+    kernel.emit_kernel_body()
+    return kernel, emitter.get_buffer()
+
+def run_waitcnt_benchmark(config_files, verbose):
+    print(f"{'config':<40} {'kernels':>7} {'waitcnt':>8} {'relaxed':>8} {'removed':>8} {'viol_before':>11} {'viol_after':>10}")
+    for config_file in config_files:
+        try:
+            arch_config, tunable_dicts = get_flatten_tunable_dicts(config_file)
+        except Exception as e:
+            print(f"{os.path.basename(config_file):<40} skipped, {type(e).__name__}:{e}")
+            continue
+        if tunable_dicts is None:
+            continue
+        num, num_waitcnt, num_relaxed, num_removed, viol_before, viol_after = 0, 0, 0, 0, 0, 0
+        for td in tunable_dicts:
+            try:
+                kernel, text = emit_kernel_body(arch_config, td)
+            except Exception as e:
+                continue    # tunable not valid for this codegen
+            symbol_table = sym_get_table(kernel.sgpr, kernel.vgpr, getattr(kernel, 'agpr', None))
+            relax_pass = waitcnt_relax_pass_t(symbol_table)
+            checker = waitcnt_checker_t(symbol_table)
+            relaxed = relax_pass(text)
+            before, after = len(checker(text)), len(checker(relaxed))
+            if verbose:
+                print(f"    {kernel.name()} waitcnt:{relax_pass.num_waitcnt} relaxed:{relax_pass.num_relaxed} " + \
+                        f"removed:{relax_pass.num_removed} violation:{before}->{after}")
+            num += 1
+            num_waitcnt += relax_pass.num_waitcnt
+            num_relaxed += relax_pass.num_relaxed
+            num_removed += relax_pass.num_removed
+            viol_before += before
+            viol_after += after
+        if num == 0:
+            continue
+        print(f"{os.path.basename(config_file):<40} {num:>7} {num_waitcnt:>8} {num_relaxed:>8} {num_removed:>8} {viol_before:>11} {viol_after:>10}", flush=True)
+
+if __name__ == '__main__':
+    verbose = '-v' in sys.argv[1:]
+    config_files = [f for f in sys.argv[1:] if f != '-v']
+    if len(config_files) == 0:
+        config_files = sorted(glob.glob(os.path.join(CONFIG_DIR, '*.config')))
+    run_waitcnt_benchmark(config_files, verbose)